@@ -30,6 +30,7 @@ from mycodo.databases.utils import session_scope
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import get_last_measurement
 from mycodo.utils.influx import get_past_measurements
+from mycodo.utils.influx import get_past_statistics
 
 
 class AbstractBaseController(object):
@@ -533,6 +534,10 @@ class AbstractBaseController(object):
     def get_past_measurements(device_id, measurement_id, max_age=None):
         return get_past_measurements(device_id, measurement_id, max_age=max_age)
 
+    @staticmethod
+    def get_past_statistics(device_id, measurement_id, max_age, median=False):
+        return get_past_statistics(device_id, measurement_id, max_age, median=median)
+
     @staticmethod
     def get_output_channel_from_channel_id(channel_id):
         """Return channel number from channel ID."""
@@ -4,6 +4,7 @@ from flask_babel import lazy_gettext
 from mycodo.actions.base_action import AbstractFunctionAction
 from mycodo.databases.models import Actions
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.equations import compile_equation
 from mycodo.utils.system_pi import get_measurement
 
 ACTION_INFORMATION = {
@@ -85,19 +86,16 @@ class ActionModule(AbstractFunctionAction):
             dict_vars['message'] += msg
             return dict_vars
 
-        equation_str = self.equation
-        equation_str = equation_str.replace("x", str(original_value))
+        self.logger.debug("Equation: {}, x = {}".format(self.equation, original_value))
 
-        self.logger.debug("Equation: {} = {}".format(self.equation, equation_str))
-
-        dict_vars['measurements_dict'][channel]['value'] = eval(equation_str)
+        dict_vars['measurements_dict'][channel]['value'] = compile_equation(self.equation)(float(original_value))
 
         self.logger.debug(
             f"Input channel: {channel}, "
             f"original value: {original_value}, "
             f"returned value: {dict_vars['measurements_dict'][channel]['value']}")
 
-        dict_vars['message'] += f" Equation '{equation_str}', return value = {dict_vars['measurements_dict'][channel]['value']}."
+        dict_vars['message'] += f" Equation '{self.equation}' (x = {original_value}), return value = {dict_vars['measurements_dict'][channel]['value']}."
 
         return dict_vars
 
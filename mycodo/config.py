@@ -117,6 +117,69 @@ if DOCKER_CONTAINER:
     PYRO_URI = 'PYRO:mycodo.pyro_server@mycodo_daemon:9080'
 else:
     PYRO_URI = 'PYRO:mycodo.pyro_server@127.0.0.1:9080'
+# Inside the daemon, call the daemon directly instead of through Pyro5
+DAEMON_LOCAL_CALLS = True
+# Connected Pyro5 proxies kept for reuse by each process, and how long they're kept idle
+PYRO_PROXY_POOL_SIZE = 4
+PYRO_PROXY_IDLE_SEC = 60
+PYRO_TIMEOUT_REFRESH_SEC = 60  # Read the Pyro timeout setting from the database at most this often
+
+# Controller scheduler
+# Instead of each controller's thread waking every sample period to check its timer, the loops
+# of controllers of these types are run by a pool of worker threads when due. Input and Function
+# modules with 'dedicated_thread': True in their information keep their own thread.
+CONTROLLER_SCHEDULER_ENABLED = False
+CONTROLLER_SCHEDULER_TYPES = ['Conditional', 'Function', 'Input', 'PID', 'Trigger']
+CONTROLLER_SCHEDULER_WORKERS = os.cpu_count() or 4
+CONTROLLER_SCHEDULER_MAX_WAIT_SEC = 30  # Check each controller's next due time at least this often
+
+# Measurement database (InfluxDB) clients
+INFLUXDB_SETTINGS_REFRESH_SEC = 60  # Check the Misc table for changed settings this often
+INFLUXDB_CONNECTION_POOL_SIZE = 20  # Keep-alive HTTP connections held by each client
+
+# Measurement write pipeline
+# Points are queued and written in batches when either the size or age limit is reached
+INFLUXDB_WRITE_QUEUE_SIZE = 50000  # Maximum number of points waiting to be written
+INFLUXDB_WRITE_BATCH_SIZE = 1000  # Write a batch once this many points are queued
+INFLUXDB_WRITE_BATCH_AGE_SEC = 1.0  # Write a batch once the oldest point has waited this long
+INFLUXDB_WRITE_ENQUEUE_TIMEOUT_SEC = 2.0  # How long to wait for space in a full queue
+
+# Measurement spool
+# Points that can't be written are stored on disk and replayed when the database recovers
+INFLUXDB_SPOOL_PATH = os.path.join(DATABASE_PATH, 'measurement_spool')
+INFLUXDB_SPOOL_MAX_POINTS = 10000000  # Points beyond this are dropped
+INFLUXDB_SPOOL_REPLAY_RATE = 5000  # Maximum points per second replayed from the spool
+INFLUXDB_SPOOL_RETRY_SEC = 10  # Wait this long to retry after a failed write
+
+# Measurement rollups
+# The daemon aggregates every series into 1 minute, 1 hour, and 1 day tiers (count, sum, min, max),
+# used for averages, sums, and graphs of long periods. Disabled by default: when enabled, the rollups
+# are stored as rollup_* series in the measurement database, and measurements already stored are
+# rolled up first (up to MEASUREMENT_ROLLUP_BACKFILL_DAYS back). Points written through Mycodo with
+# past times are rolled up again, but points written to the measurement database by other programs
+# with times already rolled up aren't.
+MEASUREMENT_ROLLUP_ENABLED = False
+MEASUREMENT_ROLLUP_STATE_PATH = os.path.join(DATABASE_PATH, 'measurement_rollups.json')
+MEASUREMENT_ROLLUP_BACKFILL_DAYS = 7  # Roll up measurements this far back when first enabled
+MEASUREMENT_ROLLUP_DELAY_SEC = 120  # Only roll up measurements at least this old
+MEASUREMENT_ROLLUP_INTERVAL_SEC = 30
+
+# Measurement export
+# Exports are read this many seconds at a time, bounding memory use for long periods
+MEASUREMENT_EXPORT_WINDOW_SEC = 21600
+
+# Graph downsampling
+# Graphs of many points are reduced on the server to about this many points per series
+GRAPH_DOWNSAMPLE_METHOD = 'lttb'  # 'lttb', 'minmax', or 'mean'
+GRAPH_DOWNSAMPLE_POINTS = 700
+GRAPH_DOWNSAMPLE_POINTS_MAX = 10000
+GRAPH_DOWNSAMPLE_PREAGGREGATE = 4  # For lttb, InfluxDB returns the min/max of this many times more windows
+
+# Module information cache
+# Information (INPUT_INFORMATION, etc.) parsed from Input/Output/Function/Action/Widget modules,
+# reused until the module file changes
+PATH_MODULE_INFORMATION_CACHE = os.path.join(DATABASE_PATH, 'module_information_cache')
+MODULE_INFORMATION_STATIC_PARSE = True  # Read information from module source without loading the module, if possible
 
 # Anonymous statistics
 STATS_INTERVAL = 86400
@@ -132,6 +195,11 @@ ID_FILE = os.path.join(INSTALL_DIRECTORY, 'statistics.id')
 LOGIN_ATTEMPTS = 5
 LOGIN_BAN_SECONDS = 600  # 10 minutes
 
+# Authorization cache
+# Users found by API key and the permissions of roles are kept this long by each web server
+# process, and forgotten when users or roles are changed through the same process
+AUTHORIZATION_CACHE_TTL_SEC = 30
+
 # Check for upgrade every 2 days (if enabled)
 UPGRADE_CHECK_INTERVAL = 172800
 
@@ -9,12 +9,16 @@ All Controllers should inherit from this class and overwrite methods that raise
 NotImplementedErrors
 """
 import logging
+import threading
 import time
 import timeit
 
 import Pyro5
 
 from mycodo.abstract_base_controller import AbstractBaseController
+from mycodo.config import CONTROLLER_SCHEDULER_ENABLED
+from mycodo.config import CONTROLLER_SCHEDULER_TYPES
+from mycodo.utils.controller_scheduler import controller_scheduler
 
 
 class AbstractController(AbstractBaseController):
@@ -22,6 +26,8 @@ class AbstractController(AbstractBaseController):
     Base Controller class that ensures certain methods and values are present
     in controllers.
     """
+    controller_type = None  # Controller types in CONTROLLER_SCHEDULER_TYPES can be run by the scheduler
+
     def __init__(self, ready, unique_id=None, name=__name__):
         super().__init__(unique_id, name=__name__)
 
@@ -31,6 +37,9 @@ class AbstractController(AbstractBaseController):
         self.sample_rate = 0.25
         self.unique_id = unique_id
         self.ready = ready
+        self.dedicated_thread = False  # Set by controllers of modules that block in loop()
+        self.loop_scheduler = None
+        self.stopped = threading.Event()
 
         logger_name = f"{name}"
         if self.unique_id:
@@ -62,6 +71,15 @@ class AbstractController(AbstractBaseController):
         """Executed when the controller is instructed to stop."""
         pass
 
+    def next_loop_time(self):
+        """
+        Return the time (epoch seconds) loop() is next due, when run by the controller scheduler
+
+        Controllers acting on a timer return the timer. None waits for wake_loop() (or at most
+        CONTROLLER_SCHEDULER_MAX_WAIT_SEC).
+        """
+        return time.time() + self.sample_rate
+
     #
     # End functions the user typically overwrites
     #
@@ -76,6 +94,12 @@ class AbstractController(AbstractBaseController):
             dur = (timeit.default_timer() - self.thread_startup_timer) * 1000
             self.logger.info(f"Activated in {dur:.1f} ms")
 
+            if self.running and self.use_loop_scheduler():
+                # The thread ends, and the controller scheduler runs loop() when due and finish() when stopped
+                self.loop_scheduler = controller_scheduler
+                self.loop_scheduler.add(self)
+                return
+
             while self.running:
                 try:
                     self.loop()
@@ -90,13 +114,41 @@ class AbstractController(AbstractBaseController):
             self.logger.exception("Run Error")
             self.thread_shutdown_timer = timeit.default_timer()
         finally:
+            if self.loop_scheduler is None:
+                self.finish()
+
+    def finish(self):
+        """Run once loop() has run for the last time."""
+        if self.stopped.is_set():
+            return
+        try:
             self.run_finally()
+        finally:
             self.running = False
             if self.thread_shutdown_timer:
                 dur = (timeit.default_timer() - self.thread_shutdown_timer) * 1000
                 self.logger.info(f"Deactivated in {dur:.1f} ms")
             else:
                 self.logger.error("Deactivated unexpectedly")
+            self.stopped.set()
+
+    def use_loop_scheduler(self):
+        """Return whether loop() is to be run by the controller scheduler instead of this controller's thread."""
+        return (CONTROLLER_SCHEDULER_ENABLED and
+                self.controller_type in CONTROLLER_SCHEDULER_TYPES and
+                not self.dedicated_thread)
+
+    def wake_loop(self):
+        """Run loop() as soon as possible if run by the controller scheduler (e.g. after its timer changed)."""
+        if self.loop_scheduler is not None:
+            self.loop_scheduler.wake(self)
+
+    def join(self, timeout=None):
+        """Wait until the controller has stopped."""
+        if self.loop_scheduler is None:
+            threading.Thread.join(self, timeout)
+        else:
+            self.stopped.wait(timeout)
 
     def is_running(self):
         return self.running
@@ -105,6 +157,7 @@ class AbstractController(AbstractBaseController):
         self.thread_shutdown_timer = timeit.default_timer()
         self.pre_stop()
         self.running = False
+        self.wake_loop()
 
     def set_log_level_debug(self, log_level_debug):
         if log_level_debug:
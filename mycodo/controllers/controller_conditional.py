@@ -46,6 +46,8 @@ class ConditionalController(AbstractController, threading.Thread):
     This code typically queries measurement data and causes execution of function
     actions as a result of the conditions set by the user.
     """
+    controller_type = 'Conditional'
+
     def __init__(self, ready, unique_id):
         threading.Thread.__init__(self)
         super().__init__(ready, unique_id=unique_id, name=__name__)
@@ -89,6 +91,11 @@ class ConditionalController(AbstractController, threading.Thread):
 
             self.attempt_execute(self.check_conditionals)
 
+    def next_loop_time(self):
+        if self.pause_loop:
+            return time.time()
+        return self.timer_period
+
     def initialize_variables(self):
         """Define all settings."""
         cond = db_retrieve_table_daemon(
@@ -149,6 +156,7 @@ class ConditionalController(AbstractController, threading.Thread):
     def refresh_settings(self):
         """Signal to pause the main loop and wait for verification, the refresh settings."""
         self.pause_loop = True
+        self.wake_loop()
         while not self.verify_pause_loop:
             time.sleep(0.1)
 
@@ -157,6 +165,7 @@ class ConditionalController(AbstractController, threading.Thread):
 
         self.pause_loop = False
         self.verify_pause_loop = False
+        self.wake_loop()
         return "Conditional settings successfully refreshed"
 
     def check_conditionals(self):
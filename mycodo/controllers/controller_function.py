@@ -37,6 +37,8 @@ class FunctionController(AbstractController, threading.Thread):
     """
     Class for controlling the Function
     """
+    controller_type = 'Function'
+
     def __init__(self, ready, unique_id):
         threading.Thread.__init__(self)
         super().__init__(ready, unique_id=unique_id, name=__name__)
@@ -76,6 +78,10 @@ class FunctionController(AbstractController, threading.Thread):
             except Exception:
                 self.logger.exception("Exception while running loop()")
 
+    def next_loop_time(self):
+        if self.has_loop:
+            return self.timer_loop
+
     def run_finally(self):
         try:
             self.run_function.stop_function()
@@ -100,6 +106,7 @@ class FunctionController(AbstractController, threading.Thread):
         self.device = function.device
 
         if self.device in self.dict_function:
+            self.dedicated_thread = self.dict_function[self.device].get('dedicated_thread', False)
             function_loaded, status = load_module_from_file(
                 self.dict_function[self.device]['file_path'],
                 'function')
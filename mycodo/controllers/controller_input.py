@@ -34,6 +34,7 @@ from mycodo.databases.models import (SMTP, Conversion,
 from mycodo.inputs.base_input import AbstractInput
 from mycodo.mycodo_client import DaemonControl
 from mycodo.utils.actions import run_input_actions
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import add_measurements_influxdb
 from mycodo.utils.inputs import parse_input_information, parse_measurement
@@ -66,6 +67,8 @@ class InputController(AbstractController, threading.Thread):
     """
     Class for controlling the input
     """
+    controller_type = 'Input'
+
     def __init__(self, ready, unique_id):
         threading.Thread.__init__(self)
         super().__init__(ready, unique_id=unique_id, name=__name__)
@@ -237,6 +240,13 @@ class InputController(AbstractController, threading.Thread):
 
         self.trigger_cond = False
 
+    def next_loop_time(self):
+        if self.get_new_measurement:
+            # Waiting for the pre-output before measuring
+            return time.time() + self.sample_rate
+        if self.has_loop:
+            return self.next_measurement
+
     def run_finally(self):
         try:
             self.measure_input.stop_input()
@@ -306,6 +316,7 @@ class InputController(AbstractController, threading.Thread):
         self.device_recognized = True
 
         if self.device in self.dict_inputs:
+            self.dedicated_thread = self.dict_inputs[self.device].get('dedicated_thread', False)
             input_loaded, status = load_module_from_file(
                 self.dict_inputs[self.device]['file_path'], 'inputs')
 
@@ -393,18 +404,13 @@ class InputController(AbstractController, threading.Thread):
         self.lastUpdate = time.time()
 
     def create_measurements_dict(self):
-        device_measurements = db_retrieve_table_daemon(
-            DeviceMeasurements).filter(
-            DeviceMeasurements.device_id == self.unique_id)
-
         measurements_record = {}
         for each_channel, each_measurement in self.measurement.values.items():
-            measurement = device_measurements.filter(
-                DeviceMeasurements.channel == each_channel).first()
+            measurement = config_cache.first_by(
+                DeviceMeasurements, device_id=self.unique_id, channel=each_channel)
 
             if measurement and 'value' in each_measurement:
-                conversion = db_retrieve_table_daemon(Conversion).filter(
-                    Conversion.unique_id == measurement.conversion_id).first()
+                conversion = config_cache.get(Conversion, measurement.conversion_id)
 
                 # If a timestamp is passed from the module, use it
                 if 'timestamp_utc' in each_measurement:
@@ -427,6 +433,7 @@ class InputController(AbstractController, threading.Thread):
     def force_measurements(self):
         """Signal that a measurement needs to be obtained."""
         self.next_measurement = time.time()
+        self.wake_loop()
         return 0, "Input instructed to begin acquiring measurements"
 
     def call_module_function(self, button_id, args_dict, thread=True, return_from_function=False):
@@ -26,11 +26,11 @@ import time
 import timeit
 
 from mycodo.controllers.base_controller import AbstractController
-from mycodo.databases.models import Misc
 from mycodo.databases.models import Output
 from mycodo.databases.models import SMTP
 from mycodo.mycodo_client import DaemonControl
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.deadline_scheduler import DeadlineScheduler
 from mycodo.utils.modules import load_module_from_file
 from mycodo.utils.outputs import output_types
 from mycodo.utils.outputs import parse_output_information
@@ -53,6 +53,7 @@ class OutputController(AbstractController, threading.Thread):
         self.allowed_to_send_notice = None
 
         self.sample_rate = None
+        self.output_off_scheduler = DeadlineScheduler()
         self.output = {}
         self.dict_outputs = {}
         self.output_unique_id = {}
@@ -61,7 +62,8 @@ class OutputController(AbstractController, threading.Thread):
 
     def initialize_variables(self):
         """Begin initializing output parameters."""
-        self.sample_rate = db_retrieve_table_daemon(Misc, entry='first').sample_rate_controller_output
+        # loop() waits until the next time an output is to turn off
+        self.sample_rate = 0
 
         self.logger.debug("Initializing Outputs")
         try:
@@ -82,24 +84,49 @@ class OutputController(AbstractController, threading.Thread):
             self.logger.exception("Problem initializing outputs")
 
     def loop(self):
-        """Main loop of the output controller."""
-        for output_id in self.output:
-            for each_channel in self.output_unique_id[output_id]:
+        """Main loop of the output controller: turn outputs off when their durations on end."""
+        # The timeout is a fallback: stop_controller() wakes the scheduler after running is cleared
+        self.output_off_scheduler.run_pending(timeout=1)
 
-                # Execute if past the time the output was supposed to turn off
-                if (self.output[output_id].output_setup and
-                        each_channel in self.output[output_id].output_on_until and
-                        self.output[output_id].output_on_until[each_channel] < datetime.datetime.now() and
-                        self.output[output_id].output_on_duration[each_channel] and
-                        not self.output[output_id].output_off_triggered[each_channel]):
-
-                    # Use a thread to prevent blocking the loop
-                    self.output[output_id].output_off_triggered[each_channel] = True
-                    turn_output_off = threading.Thread(
-                        target=self.output[output_id].output_on_off,
-                        args=('off',),
-                        kwargs={'output_channel': each_channel})
-                    turn_output_off.start()
+    def wake_loop(self):
+        super().wake_loop()
+        self.output_off_scheduler.wake()
+
+    def schedule_output_off(self, output_id, output_channel, off_time):
+        """
+        Schedule an output channel on for a duration to turn off
+
+        Called by the output when it's turned on for a duration, or its duration is changed.
+
+        :param off_time: datetime the output is to turn off
+        """
+        self.output_off_scheduler.schedule(
+            (output_id, output_channel),
+            (off_time - datetime.datetime.now()).total_seconds(),
+            self.output_off_due, output_id, output_channel)
+
+    def output_off_due(self, output_id, output_channel):
+        """Turn an output channel off if it's past the time it was supposed to turn off."""
+        output = self.output.get(output_id)
+        if (output is None or
+                not output.output_setup or
+                output_channel not in output.output_on_until or
+                not output.output_on_duration[output_channel] or
+                output.output_off_triggered[output_channel]):
+            return  # Turned off, or no longer on for a duration, since it was scheduled
+
+        if output.output_on_until[output_channel] > datetime.datetime.now():
+            # The clock was changed since it was scheduled
+            self.schedule_output_off(output_id, output_channel, output.output_on_until[output_channel])
+            return
+
+        # Use a thread to prevent blocking the scheduler
+        output.output_off_triggered[output_channel] = True
+        turn_output_off = threading.Thread(
+            target=output.output_on_off,
+            args=('off',),
+            kwargs={'output_channel': output_channel})
+        turn_output_off.start()
 
     def run_finally(self):
         """Run when the controller is shutting down."""
@@ -140,6 +167,7 @@ class OutputController(AbstractController, threading.Thread):
 
                     if output_loaded:
                         self.output[each_output.unique_id] = output_loaded.OutputModule(each_output)
+                        self.output[each_output.unique_id].output_off_scheduler = self.schedule_output_off
                         self.output[each_output.unique_id].try_initialize()
                         self.output[each_output.unique_id].init_post()
 
@@ -192,6 +220,7 @@ class OutputController(AbstractController, threading.Thread):
                         'outputs')
                     if output_loaded:
                         self.output[output_id] = output_loaded.OutputModule(output)
+                        self.output[output_id].output_off_scheduler = self.schedule_output_off
                         self.output[output_id].try_initialize()
                         self.output[output_id].init_post()
 
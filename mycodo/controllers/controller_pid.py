@@ -64,21 +64,24 @@ from mycodo.databases.models import OutputChannel
 from mycodo.databases.models import PID
 from mycodo.databases.utils import session_scope
 from mycodo.mycodo_client import DaemonControl
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import add_measurements_influxdb
-from mycodo.utils.influx import read_influxdb_single
-from mycodo.utils.influx import write_influxdb_value
+from mycodo.utils.influx import queue_influxdb_value
+from mycodo.utils.influx import read_last_influxdb_multi
 from mycodo.utils.method import load_method_handler, parse_db_time
 from mycodo.utils.outputs import parse_output_information
 from mycodo.utils.pid_controller_default import PIDControl
-from mycodo.utils.system_pi import get_measurement
 from mycodo.utils.system_pi import return_measurement_info
+from mycodo.utils.utils import record_timing
 
 
 class PIDController(AbstractController, threading.Thread):
     """
     Class to operate discrete PID controller in Mycodo
     """
+    controller_type = 'PID'
+
     def __init__(self, ready, unique_id):
         threading.Thread.__init__(self)
         super().__init__(ready, unique_id=unique_id, name=__name__)
@@ -105,6 +108,11 @@ class PIDController(AbstractController, threading.Thread):
         self.setpoint_tracking_type = None
         self.setpoint_tracking_id = None
         self.setpoint_tracking_max_age = None
+        self.setpoint_tracking_value = None
+        self.measurement_info = None
+        self.setpoint_tracking_info = None
+        self.measurement_info_generation = None
+        self.cycle_timing = {}
         self.raise_output_id = None
         self.raise_output_channel_id = None
         self.raise_output_channel = None
@@ -139,6 +147,9 @@ class PIDController(AbstractController, threading.Thread):
                 self.timer = self.timer + self.period
             self.attempt_execute(self.check_pid)
 
+    def next_loop_time(self):
+        return self.timer
+
     def run_finally(self):
         # Turn off output used in PID when the controller is deactivated
         if self.raise_output_id and self.PID_Controller.direction in ['raise', 'both']:
@@ -214,6 +225,9 @@ class PIDController(AbstractController, threading.Thread):
             self.PID_Controller.integrator_max = pid.integrator_max
             self.PID_Controller.first_start = True
 
+        self.resolve_measurement_info()
+        self.cycle_timing = {}
+
         if self.setpoint_tracking_type == 'method' and self.setpoint_tracking_id != '':
             self.setup_method(self.setpoint_tracking_id)
 
@@ -236,18 +250,19 @@ class PIDController(AbstractController, threading.Thread):
         # A PID on hold will sustain the current output and
         # not update the control variable.
         if self.is_activated and (not self.is_paused or not self.is_held):
+            timer = timeit.default_timer()
             self.get_last_measurement_pid()
+            record_timing(self.cycle_timing, 'read', timer)
 
             if self.last_measurement_success:
+                timer = timeit.default_timer()
                 if self.setpoint_tracking_type == 'method' and self.setpoint_tracking_id != '':
                     # Update setpoint using a method
-                    this_pid = db_retrieve_table_daemon(PID, unique_id=self.unique_id)
-
                     now = datetime.datetime.now()
 
                     method = load_method_handler(self.setpoint_tracking_id, self.logger)
-                    new_setpoint, ended = method.calculate_setpoint(now, this_pid.method_start_time)
-                    self.logger.debug(f"Method {self.setpoint_tracking_id} {method} {now} {this_pid.method_start_time}")
+                    new_setpoint, ended = method.calculate_setpoint(now, self.method_start_time)
+                    self.logger.debug(f"Method {self.setpoint_tracking_id} {method} {now} {self.method_start_time}")
 
                     if ended:
                         # point in time is out of method range
@@ -276,46 +291,33 @@ class PIDController(AbstractController, threading.Thread):
                         self.PID_Controller.setpoint = self.setpoint
 
                 if self.setpoint_tracking_type == 'input-math' and self.setpoint_tracking_id != '':
-                    # Update setpoint using an Input
-                    device_id = self.setpoint_tracking_id.split(',')[0]
-                    measurement_id = self.setpoint_tracking_id.split(',')[1]
-
-                    measurement = get_measurement(measurement_id)
-                    if not measurement:
+                    # Update setpoint using an Input (read with the measurement)
+                    if not self.setpoint_tracking_info:
                         return False, None
 
-                    conversion = db_retrieve_table_daemon(
-                        Conversion, unique_id=measurement.conversion_id)
-                    channel, unit, measurement = return_measurement_info(
-                        measurement, conversion)
-
-                    last_measurement = read_influxdb_single(
-                        device_id,
-                        unit,
-                        channel,
-                        measure=measurement,
-                        duration_sec=self.setpoint_tracking_max_age,
-                        value='LAST')
-
-                    if last_measurement[1] is not None:
-                        self.PID_Controller.setpoint = last_measurement[1]
+                    if self.setpoint_tracking_value is not None:
+                        self.PID_Controller.setpoint = self.setpoint_tracking_value
                     else:
                         self.logger.debug(
                             "Could not find measurement for Setpoint "
                             f"Tracking. Max Age of {self.setpoint_tracking_max_age} exceeded for measuring "
-                            f"device ID {device_id} (measurement {measurement_id})")
+                            f"device ID {self.setpoint_tracking_info['unique_id']} "
+                            f"(measurement {self.setpoint_tracking_id.split(',')[1]})")
                         self.PID_Controller.setpoint = None
 
                 # Calculate new control variable (output) from PID Controller
                 self.PID_Controller.update_pid_output(self.last_measurement)
 
                 self.write_pid_values()  # Write variables to database
+                record_timing(self.cycle_timing, 'compute', timer)
 
         # Is PID in a state that allows manipulation of outputs
         if (self.is_activated and
                 self.PID_Controller.setpoint is not None and
                 (not self.is_paused or self.is_held)):
+            timer = timeit.default_timer()
             self.manipulate_output()
+            record_timing(self.cycle_timing, 'actuate', timer)
 
     def setup_method(self, method_id):
         """Initialize method variables to start running a method."""
@@ -381,22 +383,20 @@ class PIDController(AbstractController, threading.Thread):
         ]
 
         measurement_dict = {}
-        measurements = db_retrieve_table_daemon(DeviceMeasurements).filter(
-            DeviceMeasurements.device_id == self.unique_id).all()
+        measurements = config_cache.filter_by(DeviceMeasurements, device_id=self.unique_id)
         for each_channel, each_measurement in enumerate(measurements):
             if (each_measurement.channel not in measurement_dict and
                     each_measurement.channel < len(list_measurements)):
 
                 # If setpoint, get unit from PID measurement
                 if each_measurement.measurement_type == 'setpoint':
-                    setpoint_pid = db_retrieve_table_daemon(
-                        PID, unique_id=each_measurement.device_id)
+                    setpoint_pid = config_cache.get(PID, each_measurement.device_id)
                     if setpoint_pid and ',' in setpoint_pid.measurement:
                         pid_measurement = setpoint_pid.measurement.split(',')[1]
-                        setpoint_measurement = db_retrieve_table_daemon(DeviceMeasurements, unique_id=pid_measurement)
+                        setpoint_measurement = config_cache.get(DeviceMeasurements, pid_measurement)
                         if setpoint_measurement:
-                            conversion = db_retrieve_table_daemon(
-                                Conversion, unique_id=setpoint_measurement.conversion_id)
+                            conversion = config_cache.get(
+                                Conversion, setpoint_measurement.conversion_id)
                             _, unit, _ = return_measurement_info(
                                 setpoint_measurement, conversion)
                             measurement_dict[each_channel] = {
@@ -413,36 +413,65 @@ class PIDController(AbstractController, threading.Thread):
 
         add_measurements_influxdb(self.unique_id, measurement_dict)
 
+    def resolve_measurement_info(self):
+        """
+        Find the series of the measurement and of the setpoint tracking Input (if used)
+
+        Resolved when the PID is initialized and again only after the cached settings change
+        (e.g. the unit or conversion of the measurement is changed).
+        """
+        self.measurement_info_generation = config_cache.generation
+        self.measurement_info = self.series_info(self.device_id, self.measurement_id)
+        self.measurement_info['duration_sec'] = int(self.max_measure_age)
+
+        self.setpoint_tracking_info = None
+        if (self.setpoint_tracking_type == 'input-math' and
+                self.setpoint_tracking_id and ',' in self.setpoint_tracking_id):
+            device_id, measurement_id = self.setpoint_tracking_id.split(',')[:2]
+            if config_cache.get(DeviceMeasurements, measurement_id):
+                self.setpoint_tracking_info = self.series_info(device_id, measurement_id)
+                self.setpoint_tracking_info['duration_sec'] = self.setpoint_tracking_max_age
+
+    @staticmethod
+    def series_info(device_id, measurement_id):
+        """Return the series (as used by read_last_influxdb_multi()) of a device measurement."""
+        device_measurement = config_cache.get(DeviceMeasurements, measurement_id)
+        if device_measurement:
+            conversion = config_cache.get(Conversion, device_measurement.conversion_id)
+        else:
+            conversion = None
+        channel, unit, measurement = return_measurement_info(
+            device_measurement, conversion)
+        return {'unique_id': device_id, 'unit': unit, 'channel': channel, 'measure': measurement}
+
     def get_last_measurement_pid(self):
         """
-        Retrieve the latest input measurement from InfluxDB
+        Retrieve the latest input measurement (and setpoint tracking measurement) from InfluxDB,
+        with a single query
 
         :rtype: None
         """
         self.last_measurement_success = False
+        self.setpoint_tracking_value = None
 
         # Get latest measurement from influxdb
         try:
-            device_measurement = get_measurement(self.measurement_id)
-
-            if device_measurement:
-                conversion = db_retrieve_table_daemon(
-                    Conversion, unique_id=device_measurement.conversion_id)
-            else:
-                conversion = None
-            channel, unit, measurement = return_measurement_info(
-                device_measurement, conversion)
-
-            last_measurement = read_influxdb_single(
-                self.device_id,
-                unit,
-                channel,
-                measure=measurement,
-                duration_sec=int(self.max_measure_age),
-                value='LAST')
-
-            if last_measurement:
-                self.last_time = last_measurement[0] / 1000
+            if self.measurement_info_generation != config_cache.generation:
+                self.resolve_measurement_info()
+
+            channels_data = [self.measurement_info]
+            if self.setpoint_tracking_info:
+                channels_data.append(self.setpoint_tracking_info)
+            last_measurements = read_last_influxdb_multi(channels_data)
+
+            if self.setpoint_tracking_info:
+                self.setpoint_tracking_value = last_measurements[1][1]
+
+            channel = self.measurement_info['channel']
+            unit = self.measurement_info['unit']
+            last_measurement = last_measurements[0]
+            if last_measurement[0] is not None:
+                self.last_time = last_measurement[0]
                 self.last_measurement = last_measurement[1]
 
                 local_timestamp = str(datetime.datetime.fromtimestamp(self.last_time))
@@ -799,17 +828,16 @@ class PIDController(AbstractController, threading.Thread):
             return output_channel.channel
 
     def write_pid_output_influxdb(self, unit, measurement, channel, value):
-        write_pid_out_db = threading.Thread(
-            target=write_influxdb_value,
-            args=(self.unique_id,
-                  unit,
-                  value,),
-            kwargs={'measure': measurement,
-                    'channel': channel})
-        write_pid_out_db.start()
+        queue_influxdb_value(
+            self.unique_id,
+            unit,
+            value,
+            measure=measurement,
+            channel=channel)
 
     def pid_mod(self):
         if self.initialize_variables():
+            self.wake_loop()
             return "success"
         else:
             return "error"
@@ -948,13 +976,22 @@ class PIDController(AbstractController, threading.Thread):
             d_value = self.PID_Controller.D_value
         total = p_value + i_value + d_value
 
+        string_status = ("This info is being returned from the PID Controller."
+                         f"\nCurrent time: {datetime.datetime.now()}"
+                         f"\nControl Variable: {total:.4f} = "
+                         f"{p_value:.4f} (P), "
+                         f"{i_value:.4f} (I), "
+                         f"{d_value:.4f} (D)")
+        for phase in ['read', 'compute', 'actuate']:
+            if phase in self.cycle_timing:
+                timing = self.cycle_timing[phase]
+                string_status += (f"\nCycle {phase.capitalize()}: {timing['last_ms']:.1f} ms "
+                                  f"(avg {timing['avg_ms']:.1f} ms, max {timing['max_ms']:.1f} ms, "
+                                  f"{timing['count']} cycles)")
+
         return_dict = {
-            'string_status': "This info is being returned from the PID Controller."
-                             f"\nCurrent time: {datetime.datetime.now()}"
-                             f"\nControl Variable: {total:.4f} = "
-                             f"{p_value:.4f} (P), "
-                             f"{i_value:.4f} (I), "
-                             f"{d_value:.4f} (D)",
+            'string_status': string_status,
+            'cycle_timing': {phase: dict(timing) for phase, timing in self.cycle_timing.items()},
             'error': []
         }
         return return_dict
@@ -982,3 +1019,5 @@ class PIDController(AbstractController, threading.Thread):
                 mod_pid.is_activated = False
                 mod_pid.autotune_activated = False
                 db_session.commit()
+
+        self.wake_loop()
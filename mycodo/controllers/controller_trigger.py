@@ -38,7 +38,7 @@ from mycodo.databases.models import SMTP
 from mycodo.databases.models import Trigger
 from mycodo.databases.utils import session_scope
 from mycodo.mycodo_client import DaemonControl
-from mycodo.utils.actions import parse_action_information
+from mycodo.utils.actions import get_action_information
 from mycodo.utils.actions import trigger_controller_actions
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.method import load_method_handler, parse_db_time
@@ -63,6 +63,8 @@ class TriggerController(AbstractController, threading.Thread):
     the Input and Output controllers, respectively, and the
     trigger_all_actions() function in this class will be ran.
     """
+    controller_type = 'Trigger'
+
     def __init__(self, ready, unique_id):
         threading.Thread.__init__(self)
         super().__init__(ready, unique_id=unique_id, name=__name__)
@@ -126,7 +128,7 @@ class TriggerController(AbstractController, threading.Thread):
                 self.timer_period += self.trigger.period
                 self.set_output_duty_cycle(pwm_duty_cycle)
 
-                actions = parse_action_information()
+                actions = get_action_information()
 
                 if self.trigger_actions_at_period:
                     trigger_controller_actions(
@@ -158,12 +160,19 @@ class TriggerController(AbstractController, threading.Thread):
                 self.logger.debug("Executing Trigger Actions")
                 self.attempt_execute(self.check_triggers)
 
+    def next_loop_time(self):
+        if self.pause_loop:
+            return time.time()
+        if self.is_activated:
+            return self.timer_period
+
     def run_finally(self):
         pass
 
     def refresh_settings(self):
         """Signal to pause the main loop and wait for verification, the refresh settings."""
         self.pause_loop = True
+        self.wake_loop()
         while not self.verify_pause_loop:
             time.sleep(0.1)
 
@@ -172,6 +181,7 @@ class TriggerController(AbstractController, threading.Thread):
 
         self.pause_loop = False
         self.verify_pause_loop = False
+        self.wake_loop()
         return "Trigger settings successfully refreshed"
 
     def initialize_variables(self):
@@ -386,7 +396,7 @@ class TriggerController(AbstractController, threading.Thread):
                 trigger.time_offset_minutes, trigger.rise_or_set)
 
         # If the code hasn't returned by now, action should be executed
-        actions = parse_action_information()
+        actions = get_action_information()
         trigger_controller_actions(
             actions,
             self.unique_id,
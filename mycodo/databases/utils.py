@@ -1,35 +1,118 @@
 # coding=utf-8
 import logging
+import threading
 from contextlib import contextmanager
 
 from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.orm import scoped_session
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 logger = logging.getLogger(__name__)
 
+# Milliseconds SQLite waits for a lock to be released before raising "database is locked"
+SQLITE_BUSY_TIMEOUT_MS = 30000
 
-@contextmanager
-def session_scope(db_uri):
-    """Provide a transactional scope around a series of operations."""
+# Connections kept open in each engine's pool (more are opened, then closed, when needed)
+SQLITE_POOL_SIZE = 10
+
+_engines_lock = threading.Lock()
+_engines = {}
+_sessions = {}
+_session_depth = threading.local()
 
-    # configure Session class with desired options
-    Session = sessionmaker()
 
-    # later, we create the engine
+def get_engine_url(db_uri):
     try:
         # Custom URI
         from mycodo.config_override import SQLALCHEMY_DATABASE_URI
-        engine_url = SQLALCHEMY_DATABASE_URI
+        return SQLALCHEMY_DATABASE_URI
     except:
         # SQLite3
-        engine_url = f"{db_uri}?check_same_thread=False"
+        return f"{db_uri}?check_same_thread=False"
+
+
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+
+def get_engine(db_uri):
+    """
+    Return the engine for a database URI, creating it on first use
+
+    SQLite file databases use a connection pool, WAL mode (readers don't block the
+    writer), and a busy timeout so concurrent writers wait for the lock rather than
+    failing immediately.
+    """
+    engine_url = get_engine_url(db_uri)
+    engine = _engines.get(engine_url)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        if engine_url in _engines:
+            return _engines[engine_url]
+
+        is_sqlite = engine_url.startswith('sqlite')
+        is_sqlite_file = is_sqlite and not engine_url.startswith(('sqlite://?', 'sqlite:///:memory:'))
+
+        if is_sqlite_file:
+            engine = create_engine(
+                engine_url,
+                poolclass=QueuePool,
+                pool_size=SQLITE_POOL_SIZE,
+                max_overflow=-1)
+        else:
+            engine = create_engine(engine_url)
+
+        if is_sqlite:
+            event.listen(engine, 'connect', _set_sqlite_pragma)
+
+        _engines[engine_url] = engine
+        _sessions[engine_url] = scoped_session(sessionmaker(bind=engine))
+        return engine
+
+
+def get_scoped_session(db_uri):
+    """Return the thread-local session registry for a database URI."""
+    get_engine(db_uri)
+    return _sessions[get_engine_url(db_uri)]
+
+
+def dispose_engines():
+    """Close all pooled connections (e.g. after forking or replacing the database file)."""
+    with _engines_lock:
+        for each_session in _sessions.values():
+            each_session.remove()
+        for each_engine in _engines.values():
+            each_engine.dispose()
+        _engines.clear()
+        _sessions.clear()
+
+
+@contextmanager
+def session_scope(db_uri):
+    """
+    Provide a transactional scope around a series of operations.
 
-    engine = create_engine(engine_url)
+    The outermost scope in a thread uses that thread's scoped session, which is
+    removed from the registry when the scope ends (so queries returned from the scope
+    and executed later don't share a session with the next scope). A nested scope gets
+    its own session, so closing it doesn't detach the outer scope's objects.
+    """
+    registry = get_scoped_session(db_uri)
 
-    # associate it with our custom Session class
-    Session.configure(bind=engine)
+    depth = getattr(_session_depth, 'depth', 0)
+    if depth:
+        session = registry.session_factory()
+    else:
+        session = registry()
+    _session_depth.depth = depth + 1
 
-    session = Session()
     try:
         yield session
         session.commit()
@@ -39,4 +122,8 @@ def session_scope(db_uri):
         session.rollback()
         raise
     finally:
-        session.close()
+        if depth:
+            session.close()
+        else:
+            registry.remove()
+        _session_depth.depth = depth
@@ -30,6 +30,7 @@ from mycodo.functions.base_function import AbstractFunction
 from mycodo.mycodo_client import DaemonControl
 from mycodo.utils.constraints_pass import constraints_pass_positive_value
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.equations import compile_equation
 from mycodo.utils.influx import write_influxdb_value
 
 measurements_dict = {
@@ -206,13 +207,11 @@ class CustomModule(AbstractFunction):
 
         # Perform equation and save to DB here
         if last_measurement_a and last_measurement_b:
-            equation_str = self.equation
-            equation_str = equation_str.replace("a", str(last_measurement_a[1]))
-            equation_str = equation_str.replace("b", str(last_measurement_b[1]))
+            self.logger.debug("Equation: {}, a = {}, b = {}".format(
+                self.equation, last_measurement_a[1], last_measurement_b[1]))
 
-            self.logger.debug("Equation: {} = {}".format(self.equation, equation_str))
-
-            equation_output = eval(equation_str)
+            equation_output = compile_equation(self.equation, ('a', 'b'))(
+                last_measurement_a[1], last_measurement_b[1])
 
             self.logger.debug("Output: {}".format(equation_output))
 
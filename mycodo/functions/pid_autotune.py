@@ -129,6 +129,82 @@ FUNCTION_INFORMATION = {
             'name': lazy_gettext('Direction'),
             'phrase': 'The direction the Output will push the Measurement'
         }
+    ],
+
+    'custom_commands_message': 'While the autotune runs, a model of how the Output affects the Measurement can be '
+                               'fitted from the recorded Measurement and Output durations, and used to simulate '
+                               'the PID controller with every combination of gains from 0 to the maximum gains, '
+                               'responding to the Setpoint from the first recorded Measurement. The best gains '
+                               'are returned and sent to the Daemon log. Requires numpy.',
+    'custom_commands': [
+        {
+            'id': 'sweep_history_hours',
+            'type': 'float',
+            'default_value': 2.0,
+            'name': 'History (Hours)',
+            'phrase': 'How far back to use the recorded Measurement and Output durations'
+        },
+        {
+            'id': 'sweep_max_delay',
+            'type': 'integer',
+            'default_value': 120,
+            'name': 'Maximum Delay (Seconds)',
+            'phrase': 'The longest delay between the Output turning on and the Measurement changing to consider'
+        },
+        {
+            'id': 'sweep_kp_max',
+            'type': 'float',
+            'default_value': 10.0,
+            'name': 'Maximum Kp',
+            'phrase': 'The largest proportional gain simulated'
+        },
+        {
+            'id': 'sweep_ki_max',
+            'type': 'float',
+            'default_value': 1.0,
+            'name': 'Maximum Ki',
+            'phrase': 'The largest integral gain simulated'
+        },
+        {
+            'id': 'sweep_kd_max',
+            'type': 'float',
+            'default_value': 10.0,
+            'name': 'Maximum Kd',
+            'phrase': 'The largest derivative gain simulated'
+        },
+        {
+            'id': 'sweep_steps',
+            'type': 'integer',
+            'default_value': 15,
+            'name': 'Values per Gain',
+            'phrase': 'How many values of each gain are simulated (the number of simulations is this cubed)'
+        },
+        {
+            'id': 'sweep_minutes',
+            'type': 'integer',
+            'default_value': 60,
+            'name': 'Simulated Duration (Minutes)',
+            'phrase': 'How long to simulate the PID controller'
+        },
+        {
+            'id': 'sweep_rank_by',
+            'type': 'select',
+            'default_value': 'iae',
+            'options_select': [
+                ('iae', 'Integral of Absolute Error'),
+                ('ise', 'Integral of Squared Error'),
+                ('overshoot', 'Overshoot'),
+                ('settling_time', 'Settling Time')
+            ],
+            'name': 'Rank By',
+            'phrase': 'The score the best gains have the lowest of'
+        },
+        {
+            'id': 'sweep_gains',
+            'type': 'button',
+            'wait_for_return': True,
+            'name': 'Simulate Gains'
+        }
     ]
 }
 
@@ -257,6 +333,52 @@ class CustomModule(AbstractFunction):
                 self.output_device_id,
                 output_channel=self.output_channel)
 
+    def sweep_gains(self, args_dict):
+        """Fit a model from the recorded measurements and output durations, and simulate a range of gains."""
+        try:
+            import numpy as np
+            from mycodo.utils.pid_sweep import SCORES, fit_plant, resample_history, sweep
+        except ImportError:
+            return "Simulating gains requires numpy to be installed"
+        if args_dict.get('sweep_rank_by', 'iae') not in SCORES:
+            return f"Unknown score: {args_dict['sweep_rank_by']}"
+
+        max_age = int(args_dict.get('sweep_history_hours', 2.0) * 3600)
+        measurements = self.get_past_measurements(
+            self.measurement_device_id, self.measurement_measurement_id, max_age=max_age)
+        output_durations = self.get_past_measurements(
+            self.output_device_id, self.output_measurement_id, max_age=max_age)
+        if not measurements:
+            return "No measurements found"
+
+        try:
+            values, duty = resample_history(measurements, output_durations or [], self.period)
+            plant = fit_plant(values, duty, self.period, max_delay=args_dict.get('sweep_max_delay', 120))
+            steps = args_dict.get('sweep_steps', 15)
+            best = sweep(
+                plant,
+                np.linspace(0, args_dict.get('sweep_kp_max', 10.0), steps),
+                np.linspace(0, args_dict.get('sweep_ki_max', 1.0), steps),
+                np.linspace(0, args_dict.get('sweep_kd_max', 10.0), steps),
+                self.setpoint,
+                values[0],
+                int(args_dict.get('sweep_minutes', 60) * 60 / self.period),
+                rank_by=args_dict.get('sweep_rank_by', 'iae'),
+                top=5,
+                direction=self.direction)
+        except ValueError as err:
+            return f"Could not simulate gains: {err}"
+
+        msg = (f"Model: y[k+1] = {plant.a:.4f} * y[k] + {plant.b:.4f} * duty[k] + {plant.c:.4f}, "
+               f"delay {plant.delay_steps * self.period} seconds. Best gains of {steps ** 3} simulated:")
+        for each_result in best:
+            msg += (f" Kp: {each_result['kp']:.4g}, Ki: {each_result['ki']:.4g}, Kd: {each_result['kd']:.4g} "
+                    f"(IAE: {each_result['iae']:.4g}, ISE: {each_result['ise']:.4g}, "
+                    f"overshoot: {each_result['overshoot']:.4g}, "
+                    f"settling time: {each_result['settling_time']:.4g} s);")
+        self.logger.info(msg)
+        return msg
+
     def deactivate_self(self):
         self.logger.info("Deactivating Autotune Function")
         with session_scope(MYCODO_DB_PATH) as new_session:
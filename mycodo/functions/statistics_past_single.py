@@ -22,8 +22,6 @@
 #  Contact at kylegabriel.com
 #
 import time
-from statistics import median
-from statistics import stdev
 
 from flask_babel import lazy_gettext
 
@@ -160,29 +158,26 @@ class CustomModule(AbstractFunction):
             self.logger.error("Could not find Device Measurement")
             return
 
-        past_measurements = self.get_past_measurements(
+        past_statistics = self.get_past_statistics(
             self.select_measurement_device_id,
             self.select_measurement_measurement_id,
-            max_age=self.max_measure_age)
+            self.max_measure_age,
+            median=True)
 
-        self.logger.debug("Past Measurements returned: {}".format(
-            past_measurements))
+        self.logger.debug("Past measurement statistics returned: {}".format(
+            past_statistics))
 
-        if not past_measurements:
+        if not past_statistics or not past_statistics['count']:
             self.logger.error(
                 "Could not find measurements within the set Max Age")
             return False
 
-        measure = []
-        for each_measure in past_measurements:
-            measure.append(each_measure[1])
-
-        if len(measure) > 1:
-            stat_mean = float(sum(measure) / float(len(measure)))
-            stat_median = median(measure)
-            stat_minimum = min(measure)
-            stat_maximum = max(measure)
-            stdev_ = stdev(measure)
+        if past_statistics['count'] > 1:
+            stat_mean = past_statistics['mean']
+            stat_median = past_statistics['median']
+            stat_minimum = past_statistics['min']
+            stat_maximum = past_statistics['max']
+            stdev_ = past_statistics['stdev']
             stdev_mean_upper = stat_mean + stdev_
             stdev_mean_lower = stat_mean - stdev_
 
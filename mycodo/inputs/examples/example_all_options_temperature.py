@@ -77,6 +77,11 @@ INPUT_INFORMATION = {
     # Set False to use the timestamp generated when self.value_set() is used to save measurement.
     'measurements_use_same_timestamp': True,
 
+    # Set True if get_measurement() can block for a long time (e.g. waiting on a slow device).
+    # When the controller scheduler is enabled (CONTROLLER_SCHEDULER_ENABLED in config.py), the
+    # Input then keeps its own thread instead of sharing the scheduler's worker threads.
+    'dedicated_thread': False,
+
     # Web User Interface display options
     # Options that are enabled will be editable from the input options page.
     # Options that are disabled will appear on the input options page but not be editable.
@@ -4,7 +4,6 @@ import datetime
 from flask_babel import lazy_gettext
 
 from mycodo.config_translations import TRANSLATIONS
-from mycodo.databases.models import Conversion
 from mycodo.databases.models import InputChannel
 from mycodo.inputs.base_input import AbstractInput
 from mycodo.utils.actions import run_input_actions
@@ -12,6 +11,7 @@ from mycodo.utils.constraints_pass import constraints_pass_positive_value
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import add_measurements_influxdb
 from mycodo.utils.inputs import parse_measurement
+from mycodo.utils.mqtt_topics import TopicIndex
 from mycodo.utils.utils import random_alphanumeric
 
 # Measurements
@@ -157,6 +157,7 @@ class InputModule(AbstractInput):
 
         self.log_level_debug = None
         self.client = None
+        self.topic_index = None
 
         self.mqtt_hostname = None
         self.mqtt_port = None
@@ -183,6 +184,10 @@ class InputModule(AbstractInput):
             InputChannel).filter(InputChannel.input_id == self.input_dev.unique_id).all()
         self.options_channels = self.setup_custom_channel_options_json(
             INPUT_INFORMATION['custom_channel_options'], input_channels)
+        self.topic_index = TopicIndex({
+            channel: self.options_channels['subscribe_topic'][channel]
+            for channel in self.channels_measurement
+        })
 
         self.client = mqtt.Client(
             self.mqtt_clientid,
@@ -230,9 +235,13 @@ class InputModule(AbstractInput):
     def subscribe(self):
         """Set up the subscriptions to the proper MQTT channels to listen to."""
         try:
-            for channel in self.channels_measurement:
-                self.logger.debug(f"Subscribing to MQTT topic '{self.channels_measurement[channel].name}'")
-                self.client.subscribe(self.options_channels['subscribe_topic'][channel])
+            topics = self.topic_index.filters()
+            if not topics:
+                return
+            for each_topic in topics:
+                self.logger.debug(f"Subscribing to MQTT topic '{each_topic}'")
+            # Subscribe to all topics with a single request
+            self.client.subscribe([(each_topic, 0) for each_topic in topics])
         except:
             self.logger.error(f"Could not subscribe to MQTT channel '{self.mqtt_channel}'")
 
@@ -257,27 +266,24 @@ class InputModule(AbstractInput):
             self.logger.error(f"Payload could not be decoded: {exc}")
             return
 
-        datetime_utc = datetime.datetime.utcnow()
-        measurement = {}
-        channel = None
-        for each_channel in self.channels_measurement:
-            if self.options_channels['subscribe_topic'][each_channel] == msg.topic:
-                self.logger.debug(f"Found channel {each_channel} with topic '{self.options_channels['subscribe_topic'][each_channel]}'")
-                channel = each_channel
-
-        if channel is None:
+        channels = self.topic_index.match(msg.topic)
+        if not channels:
             self.logger.error(f"Could not determine channel for topic '{msg.topic}'")
             return
 
         try:
             value = float(payload)
             self.logger.debug(f"Payload represents a float: {value}")
-            measurement[channel] = {}
-            measurement[channel]['measurement'] = self.channels_measurement[channel].measurement
-            measurement[channel]['unit'] = self.channels_measurement[channel].unit
-            measurement[channel]['value'] = value
-            measurement[channel]['timestamp_utc'] = datetime_utc
-            measurement = self.check_conversion(channel, measurement)
+            datetime_utc = datetime.datetime.utcnow()
+            measurement = {}
+            for channel in channels:
+                self.logger.debug(f"Found channel {channel} with topic '{msg.topic}'")
+                measurement[channel] = {}
+                measurement[channel]['measurement'] = self.channels_measurement[channel].measurement
+                measurement[channel]['unit'] = self.channels_measurement[channel].unit
+                measurement[channel]['value'] = value
+                measurement[channel]['timestamp_utc'] = datetime_utc
+                measurement = self.check_conversion(channel, measurement)
 
             if measurement:
                 message, measurement = run_input_actions(self.unique_id, "", measurement, self.log_level_debug)
@@ -292,23 +298,20 @@ class InputModule(AbstractInput):
 
     def check_conversion(self, channel, measurement):
         # Convert value/unit is conversion_id present and valid
+        # (the Conversion of each channel is loaded once, when the Input is set up)
         try:
             if self.channels_conversion[channel]:
-                conversion = db_retrieve_table_daemon(
-                    Conversion,
-                    unique_id=self.channels_measurement[channel].conversion_id)
-                if conversion:
-                    meas = parse_measurement(
-                        self.channels_conversion[channel],
-                        self.channels_measurement[channel],
-                        measurement,
-                        channel,
-                        measurement[channel],
-                        timestamp=measurement[channel]['timestamp_utc'])
-
-                    measurement[channel]['measurement'] = meas[channel]['measurement']
-                    measurement[channel]['unit'] = meas[channel]['unit']
-                    measurement[channel]['value'] = meas[channel]['value']
+                meas = parse_measurement(
+                    self.channels_conversion[channel],
+                    self.channels_measurement[channel],
+                    measurement,
+                    channel,
+                    measurement[channel],
+                    timestamp=measurement[channel]['timestamp_utc'])
+
+                measurement[channel]['measurement'] = meas[channel]['measurement']
+                measurement[channel]['unit'] = meas[channel]['unit']
+                measurement[channel]['value'] = meas[channel]['value']
         except:
             self.logger.exception("Checking conversion")
 
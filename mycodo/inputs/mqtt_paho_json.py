@@ -5,7 +5,6 @@ import json
 from flask_babel import lazy_gettext
 from mycodo.utils.actions import run_input_actions
 from mycodo.config_translations import TRANSLATIONS
-from mycodo.databases.models import Conversion
 from mycodo.databases.models import InputChannel
 from mycodo.inputs.base_input import AbstractInput
 from mycodo.utils.constraints_pass import constraints_pass_positive_value
@@ -173,6 +172,7 @@ class InputModule(AbstractInput):
         self.log_level_debug = None
         self.client = None
         self.jmespath = None
+        self.jmes_expressions = {}
         self.options_channels = None
 
         self.mqtt_hostname = None
@@ -203,6 +203,14 @@ class InputModule(AbstractInput):
         self.options_channels = self.setup_custom_channel_options_json(
             INPUT_INFORMATION['custom_channel_options'], input_channels)
 
+        # Compile the JMESPath expression of each channel once, rather than for every message
+        for each_channel in self.channels_measurement:
+            json_name = self.options_channels['json_name'][each_channel]
+            try:
+                self.jmes_expressions[each_channel] = self.jmespath.compile(json_name)
+            except Exception as err:
+                self.logger.error(f"Invalid JMESPath expression '{json_name}': {err}")
+
         self.client = mqtt.Client(
             self.mqtt_clientid,
             transport='websockets' if self.mqtt_use_websockets else 'tcp')
@@ -295,7 +303,7 @@ class InputModule(AbstractInput):
             self.logger.debug("Searching JSON for {}".format(json_name))
 
             try:
-                jmesexpression = self.jmespath.compile(json_name)
+                jmesexpression = self.jmes_expressions[each_channel]
                 value = float(jmesexpression.search(json_values))
                 self.logger.debug(
                     "Found key: {}, value: {}".format(json_name, value))
@@ -320,26 +328,23 @@ class InputModule(AbstractInput):
 
     def check_conversion(self, channel, measurement):
         # Convert value/unit is conversion_id present and valid
+        # (the Conversion of each channel is loaded once, when the Input is set up)
         try:
             if self.channels_conversion[channel]:
-                conversion = db_retrieve_table_daemon(
-                    Conversion,
-                    unique_id=self.channels_measurement[channel].conversion_id)
-                if conversion:
-                    meas = parse_measurement(
-                        self.channels_conversion[channel],
-                        self.channels_measurement[channel],
-                        measurement,
-                        channel,
-                        measurement[channel],
-                        timestamp=measurement[channel]['timestamp_utc'])
-
-                    measurement[channel]['measurement'] = meas[channel]['measurement']
-                    measurement[channel]['unit'] = meas[channel]['unit']
-                    measurement[channel]['value'] = meas[channel]['value']
+                meas = parse_measurement(
+                    self.channels_conversion[channel],
+                    self.channels_measurement[channel],
+                    measurement,
+                    channel,
+                    measurement[channel],
+                    timestamp=measurement[channel]['timestamp_utc'])
+
+                measurement[channel]['measurement'] = meas[channel]['measurement']
+                measurement[channel]['unit'] = meas[channel]['unit']
+                measurement[channel]['value'] = meas[channel]['value']
         except:
             self.logger.exception("Checking conversion")
-        
+
         return measurement
 
     def stop_input(self):
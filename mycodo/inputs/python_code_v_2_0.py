@@ -3,6 +3,7 @@ import copy
 import importlib.util
 import os
 import textwrap
+import timeit
 
 from flask import current_app
 from flask import flash
@@ -17,6 +18,7 @@ from mycodo.utils.inputs import parse_input_information
 from mycodo.utils.system_pi import assure_path_exists
 from mycodo.utils.system_pi import cmd_output
 from mycodo.utils.system_pi import set_user_grp
+from mycodo.utils.utils import record_timing
 
 
 def generate_code(input_id, python_code):
@@ -174,7 +176,9 @@ INPUT_INFORMATION = {
                'Actions. This method does allow the use of Input Actions. (11/21/2023 Update: The Python 3 Code '
                '(v1.0) Input now allows the execution of Actions). '
                'All channels require a Measurement Unit to be selected and saved in order to store values to the '
-               'database. Your code is executed from the same Python virtual environment that Mycodo runs from. '
+               'database. Your code is run by the same object for every measurement, so attributes set on self (e.g. '
+               'self.count) are kept between measurements. '
+               'Your code is executed from the same Python virtual environment that Mycodo runs from. '
                'Therefore, you must install Python libraries to this environment if you want them to be available to '
                'your code. This virtualenv is located at /opt/Mycodo/env and if you wanted to install a library, for '
                'example "my_library" using pip, you would execute "sudo /opt/Mycodo/env/bin/pip install my_library".',
@@ -228,6 +232,9 @@ class InputModule(AbstractInput):
 
         self.input_dev = input_dev
         self.python_code = None
+        self.run_python = None
+        self.file_run_stat = None
+        self.code_timing = {}
 
         self.use_pylint = None
 
@@ -248,14 +255,11 @@ class InputModule(AbstractInput):
             self.measure_info[each_measure.channel]['unit'] = each_measure.unit
             self.measure_info[each_measure.channel]['measurement'] = each_measure.measurement
 
-    def get_measurement(self):
-        """Determine if the return value of the command is a number."""
-        if not self.python_code:
-            self.logger.error("Error 101: Device not set up. See https://kizniche.github.io/Mycodo/Error-Codes#error-101 for more info.")
-            return
-
-        self.return_dict = copy.deepcopy(self.measure_info)
+        if self.python_code:
+            self.load_python_code()
 
+    def load_python_code(self):
+        """Load the code file and create PythonInputRun, unless already loaded and the file is unchanged."""
         file_run = '{}/input_python_code_{}.py'.format(PATH_PYTHON_CODE_USER, self.unique_id)
 
         # If the file to execute doesn't exist, generate it
@@ -263,6 +267,11 @@ class InputModule(AbstractInput):
             dict_inputs = parse_input_information()
             execute_at_creation([], self.input_dev, dict_inputs)
 
+        file_stat = os.stat(file_run)
+        file_run_stat = (file_stat.st_mtime_ns, file_stat.st_size)
+        if self.run_python is not None and file_run_stat == self.file_run_stat:
+            return
+
         with open(file_run, 'r') as file:
             self.logger.debug("Python Code:\n{}".format(file.read()))
 
@@ -270,13 +279,40 @@ class InputModule(AbstractInput):
         spec = importlib.util.spec_from_file_location(module_name, file_run)
         python_code_run = importlib.util.module_from_spec(spec)
         spec.loader.exec_module(python_code_run)
-        run = python_code_run.PythonInputRun(self.logger, self.unique_id, self.measure_info, self.channels_conversion, self.channels_measurement)
+        self.run_python = python_code_run.PythonInputRun(
+            self.logger, self.unique_id, self.measure_info, self.channels_conversion, self.channels_measurement)
+        self.file_run_stat = file_run_stat
+
+    def record_code_timing(self, timer):
+        """Record the duration of python_code_run(), started at timer."""
+        timing = record_timing(self.code_timing, 'python_code_run', timer)
+        duration_ms = timing['last_ms']
+        self.logger.debug(
+            f"python_code_run() took {duration_ms:.1f} ms (average {timing['avg_ms']:.1f} ms, "
+            f"max {timing['max_ms']:.1f} ms, {timing['count']} runs)")
+        if self.input_dev.period and duration_ms > self.input_dev.period * 1000:
+            self.logger.warning(
+                f"python_code_run() took {duration_ms / 1000:.1f} seconds, "
+                f"longer than the Period of {self.input_dev.period} seconds")
+
+    def get_measurement(self):
+        """Determine if the return value of the command is a number."""
+        if not self.python_code:
+            self.logger.error("Error 101: Device not set up. See https://kizniche.github.io/Mycodo/Error-Codes#error-101 for more info.")
+            return
+
+        self.return_dict = copy.deepcopy(self.measure_info)
+
+        self.load_python_code()
 
+        timer = timeit.default_timer()
         try:
-            return_value = run.python_code_run()
+            return_value = self.run_python.python_code_run()
             for channel, value in return_value.items():
                 self.return_dict[channel]['value'] = value
         except Exception:
             self.logger.exception(1)
+        finally:
+            self.record_code_timing(timer)
 
         return self.return_dict
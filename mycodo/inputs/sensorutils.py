@@ -9,7 +9,8 @@ import math
 import os
 
 from mycodo.databases.models import Conversion
-from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.config_cache import config_cache
+from mycodo.utils.equations import compile_equation
 
 logger = logging.getLogger(__name__)
 
@@ -38,10 +39,9 @@ def convert_units(conversion_id, measure_value):
     :param measure_value: The value to convert
     :return: converted value
     """
-    conversion = db_retrieve_table_daemon(Conversion, unique_id=conversion_id)
+    conversion = config_cache.get(Conversion, conversion_id)
     if conversion:
-        replaced_str = conversion.equation.replace('x', str(measure_value))
-        return float('{0:.5f}'.format(eval(replaced_str)))
+        return round(compile_equation(conversion.equation)(float(measure_value)), 5)
     else:
         logger.error("Conversion not found, not converting.")
         return measure_value
@@ -57,12 +57,10 @@ def convert_from_x_to_y_unit(unit_from, unit_to, in_value):
     """
     if unit_from == unit_to:  # Units are the same, no conversion
         return in_value
-    conversion = db_retrieve_table_daemon(Conversion)
-    conversion = conversion.filter(Conversion.convert_unit_from == unit_from)
-    conversion = conversion.filter(Conversion.convert_unit_to == unit_to).first()
+    conversion = config_cache.first_by(
+        Conversion, convert_unit_from=unit_from, convert_unit_to=unit_to)
     if conversion:
-        replaced_str = conversion.equation.replace('x', str(in_value))
-        return float('{0:.5f}'.format(eval(replaced_str)))
+        return round(compile_equation(conversion.equation)(float(in_value)), 5)
     else:
         logger.error("Conversion not found for '{uf}' to '{ut}'.".format(
             uf=unit_to, ut=unit_from))
@@ -25,7 +25,10 @@ import argparse
 import datetime
 import logging
 import os
+import select
 import sys
+import threading
+import time
 import traceback
 
 import Pyro5.errors
@@ -33,7 +36,9 @@ from Pyro5.api import Proxy
 
 sys.path.append(os.path.abspath(os.path.join(os.path.realpath(__file__), '../..')))
 
-from mycodo.config import PYRO_URI
+from mycodo.config import (DAEMON_LOCAL_CALLS, PYRO_PROXY_IDLE_SEC,
+                           PYRO_PROXY_POOL_SIZE, PYRO_TIMEOUT_REFRESH_SEC,
+                           PYRO_URI)
 from mycodo.databases.models import SMTP, Misc
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.send_data import send_email as send_email_notification
@@ -46,6 +51,201 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# The daemon's Pyro server object, set when running inside the daemon process
+local_daemon = None
+
+
+def set_local_daemon(server):
+    """Call server directly (instead of through Pyro5) from DaemonControl objects in this process."""
+    global local_daemon
+    if DAEMON_LOCAL_CALLS:
+        local_daemon = server
+
+
+# Calls that may wait for the calling thread (e.g. a controller deactivating itself)
+# run in their own thread, as they do when called through Pyro5
+LOCAL_THREADED_CALLS = [
+    'controller_activate',
+    'controller_deactivate',
+    'controller_restart',
+    'terminate_daemon'
+]
+
+
+class LocalDaemonProxy:
+    """
+    Used in place of a Pyro5 proxy inside the daemon process, calling the daemon's
+    Pyro server object directly (without serializing arguments or opening a connection).
+    """
+    def __init__(self, server, timeout=None):
+        self._server = server
+        self._pyroTimeout = timeout
+
+    def __getattr__(self, name):
+        function = getattr(self._server, name)
+        if name not in LOCAL_THREADED_CALLS:
+            return function
+
+        def call_in_thread(*args, **kwargs):
+            result = {}
+
+            def run():
+                try:
+                    result['return'] = function(*args, **kwargs)
+                except Exception as err:
+                    result['error'] = err
+
+            thread = threading.Thread(target=run, daemon=True)
+            thread.start()
+            thread.join(self._pyroTimeout)
+            if thread.is_alive():
+                raise Pyro5.errors.TimeoutError(f"Call to {name}() timed out")
+            if 'error' in result:
+                raise result['error']
+            return result.get('return')
+        return call_in_thread
+
+
+class ProxyPool:
+    """
+    Connected Pyro5 proxies, reused by DaemonControl calls instead of connecting for every call
+
+    Each proxy is used by one thread at a time. A pooled proxy whose connection was closed
+    (e.g. the daemon restarted) is replaced with a new connection before the call is sent.
+    Calls are never sent twice, since a call that failed after it was sent may have already
+    run in the daemon (e.g. turning an output on).
+    Proxies idle for longer than idle_sec are closed, so connections (each holding a
+    daemon worker thread) aren't held open indefinitely.
+    """
+    def __init__(self, max_idle=PYRO_PROXY_POOL_SIZE, idle_sec=PYRO_PROXY_IDLE_SEC):
+        self.max_idle = max_idle
+        self.idle_sec = idle_sec
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.idle = {}
+        self.stats = {
+            'calls': 0,
+            'connections': 0,
+            'reuses': 0,
+            'reconnects': 0
+        }
+
+    def acquire(self, uri):
+        """Return (proxy, True if it's a reused connection)."""
+        now = time.monotonic()
+        with self.lock:
+            if os.getpid() != self.pid:
+                # Connections can't be shared with a forked process
+                self.pid = os.getpid()
+                self.idle = {}
+
+            proxies = self.idle.get(uri, [])
+            while proxies:
+                proxy, last_used = proxies.pop()
+                if now - last_used < self.idle_sec:
+                    if self.connection_closed(proxy):
+                        self.stats['reconnects'] += 1
+                    else:
+                        self.stats['reuses'] += 1
+                        proxy._pyroClaimOwnership()
+                        return proxy, True
+                self.close(proxy)
+
+            self.stats['connections'] += 1
+        return Proxy(uri), False
+
+    def release(self, uri, proxy):
+        with self.lock:
+            proxies = self.idle.setdefault(uri, [])
+            if len(proxies) < self.max_idle:
+                proxies.append((proxy, time.monotonic()))
+                return
+        self.close(proxy)
+
+    @staticmethod
+    def connection_closed(proxy):
+        """Return True if an idle proxy's connection was closed by the daemon (or can't be used)."""
+        connection = proxy._pyroConnection
+        if connection is None:
+            return True
+        try:
+            # The daemon doesn't send anything between calls, so a readable socket was closed
+            readable, _, _ = select.select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return True
+        return bool(readable)
+
+    @staticmethod
+    def close(proxy):
+        try:
+            proxy._pyroRelease()
+        except Exception:
+            pass
+
+    def call(self, uri, timeout, method, args, kwargs):
+        self.stats['calls'] += 1
+        proxy, _ = self.acquire(uri)
+        try:
+            proxy._pyroTimeout = timeout
+        except OSError:
+            self.close(proxy)
+            proxy = Proxy(uri)
+            proxy._pyroTimeout = timeout
+
+        try:
+            result = getattr(proxy, method)(*args, **kwargs)
+        except Pyro5.errors.CommunicationError:
+            # Including timeouts. Not made again, the daemon may have received the call before the connection failed
+            self.close(proxy)
+            raise
+        except Exception:
+            # An exception raised by the daemon, the connection can be used again
+            self.release(uri, proxy)
+            raise
+        self.release(uri, proxy)
+        return result
+
+    def clear(self):
+        with self.lock:
+            idle = self.idle
+            self.idle = {}
+        for each_proxies in idle.values():
+            for each_proxy, _ in each_proxies:
+                self.close(each_proxy)
+
+
+proxy_pool = ProxyPool()
+
+
+class PooledProxy:
+    """Used in place of a Pyro5 proxy, making each call with a connected proxy from the pool."""
+    def __init__(self, pool, uri, timeout):
+        self._pool = pool
+        self._uri = uri
+        self._pyroTimeout = timeout
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+
+        def call(*args, **kwargs):
+            return self._pool.call(self._uri, self._pyroTimeout, name, args, kwargs)
+        return call
+
+
+# The Pyro timeout setting: [seconds, time read (monotonic)]
+pyro_timeout_setting = [None, None]
+
+
+def get_pyro_timeout():
+    """Return the Pyro timeout setting, only reading it from the database every PYRO_TIMEOUT_REFRESH_SEC."""
+    now = time.monotonic()
+    if pyro_timeout_setting[1] is None or now - pyro_timeout_setting[1] > PYRO_TIMEOUT_REFRESH_SEC:
+        misc = db_retrieve_table_daemon(Misc, entry='first')
+        pyro_timeout_setting[0] = misc.rpyc_timeout  # TODO: Rename to rpc_timeout at next major revision
+        pyro_timeout_setting[1] = now
+    return pyro_timeout_setting[0]
+
 
 class DaemonControl:
     """Communicate with the daemon to execute commands or retrieve information."""
@@ -54,24 +254,54 @@ class DaemonControl:
         try:
             if pyro_timeout:
                 self.pyro_timeout = pyro_timeout
+            elif local_daemon is not None and pyro_uri == PYRO_URI:
+                pass  # Calls are made directly
             else:
-                misc = db_retrieve_table_daemon(Misc, entry='first')
-                self.pyro_timeout = misc.rpyc_timeout  # TODO: Rename to rpc_timeout at next major revision
+                self.pyro_timeout = get_pyro_timeout()
         except Exception:
             logger.exception("Could not access SQL table to determine Pyro Timeout. Using 30 seconds.")
 
         self.uri= pyro_uri
 
     def proxy(self, timeout=None):
-        try:
-            proxy = Proxy(self.uri)
-            if timeout:
-                proxy._pyroTimeout = timeout
-            else:
-                proxy._pyroTimeout = self.pyro_timeout
-            return proxy
-        except Exception as e:
-            logger.error(f"Pyro5 proxy error: {e}")
+        if local_daemon is not None and self.uri == PYRO_URI:
+            return LocalDaemonProxy(local_daemon, timeout=timeout or self.pyro_timeout)
+        return PooledProxy(proxy_pool, self.uri, timeout or self.pyro_timeout)
+
+    #
+    # Batched calls
+    #
+
+    def batch(self, calls, timeout=None):
+        """
+        Make several calls with a single request to the daemon
+
+        :param calls: list of (method name, list of args, dict of kwargs), e.g.
+            [('output_state', [output_id, 0], {}), ('controller_is_active', [pid_id], {})]
+        :return: list of the return value of each call (an exception is raised if any call fails)
+        """
+        results = []
+        for success, result in self.proxy(timeout=timeout).batch(
+                [[method, list(args), dict(kwargs)] for method, args, kwargs in calls]):
+            if not success:
+                raise Exception(f"Daemon batch call error: {result}")
+            results.append(result)
+        return results
+
+    def controllers_active(self, controller_ids):
+        """Return {controller ID: True if active} of several controllers, with one request."""
+        return dict(zip(controller_ids, self.batch(
+            [('controller_is_active', [each_id], {}) for each_id in controller_ids])))
+
+    def function_statuses(self, function_ids):
+        """Return {function ID: status} of several Functions, with one request."""
+        return dict(zip(function_ids, self.batch(
+            [('function_status', [each_id], {}) for each_id in function_ids])))
+
+    def output_states(self, output_channels):
+        """Return the state of each (output ID, channel) of a list, with one request."""
+        return self.batch(
+            [('output_state', [output_id, channel], {}) for output_id, channel in output_channels])
 
     #
     # Status functions
@@ -192,6 +422,19 @@ class DaemonControl:
     def get_condition_measurement_dict(self, condition_id):
         return self.proxy().get_condition_measurement_dict(condition_id)
 
+    def measurement_write_status(self):
+        return self.proxy().measurement_write_status()
+
+    def last_measurement(self, unique_id, unit, channel, measure=None, duration_sec=None):
+        return self.proxy().last_measurement(
+            unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+
+    def config_cache_invalidate(self, table_name=None, unique_id=None):
+        return self.proxy().config_cache_invalidate(table_name=table_name, unique_id=unique_id)
+
+    def measurement_rollups_rewind(self, seconds):
+        return self.proxy().measurement_rollups_rewind(seconds)
+
     #
     # Output Controller
     #
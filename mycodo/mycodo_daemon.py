@@ -54,12 +54,25 @@ from mycodo.databases.models import (PID, Camera, Conditional,
                                      CustomController, Input, Misc, Trigger)
 from mycodo.databases.utils import session_scope
 from mycodo.devices.camera import camera_record
-from mycodo.utils.actions import (get_condition_value,
-                                  get_condition_value_dict,
-                                  parse_action_information, trigger_action,
+from mycodo.mycodo_client import set_local_daemon
+from mycodo.utils.actions import (enable_action_runtime_cache,
+                                  get_action_information,
+                                  get_condition_value,
+                                  get_condition_value_dict, trigger_action,
                                   trigger_controller_actions)
+from mycodo.utils.config_cache import config_cache, enable_config_cache
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.equations import check_stored_equations
 from mycodo.utils.github_release_info import MycodoRelease
+from mycodo.utils.influx import (enable_last_measurement_store,
+                                 enable_measurement_windows,
+                                 get_measurement_write_stats,
+                                 read_influxdb_single, reset_influxdb_clients,
+                                 rewind_rollups,
+                                 start_measurement_rollups,
+                                 start_measurement_write_pipeline,
+                                 stop_measurement_rollups,
+                                 stop_measurement_write_pipeline)
 from mycodo.utils.stats import (add_update_csv, recreate_stat_file,
                                 return_stat_file_dict, send_anonymous_stats)
 from mycodo.utils.tools import generate_output_usage_report, next_schedule
@@ -137,8 +150,36 @@ class DaemonController:
         self.logger.debug(f"Anonymous statistics {state}")
 
     def run(self):
+        try:
+            # Serve settings read by controller loops from memory
+            enable_config_cache()
+        except Exception:
+            self.logger.exception("Could not enable the configuration cache")
+
         self.load_actions()
 
+        try:
+            # Report equations saved before equations were checked, which fail each time they're used
+            check_stored_equations()
+        except Exception:
+            self.logger.exception("Could not check the saved equations")
+
+        # Answer requests for the latest measurements and recent statistics from memory
+        enable_last_measurement_store()
+        enable_measurement_windows()
+
+        try:
+            # Start writing measurements (and replaying any left in the spool)
+            start_measurement_write_pipeline()
+        except Exception:
+            self.logger.exception("Could not start the measurement write pipeline")
+
+        try:
+            # Keep the 1 minute, 1 hour, and 1 day rollups of every series up to date
+            start_measurement_rollups()
+        except Exception:
+            self.logger.exception("Could not start the measurement rollups")
+
         try:
             self.start_all_controllers()
         except Exception:
@@ -274,6 +315,11 @@ class DaemonController:
                 mod_cont.is_activated = True
                 new_session.commit()
 
+        # The controller's settings may have changed while it was inactive (other changed
+        # rows are invalidated when they're committed)
+        config_cache.invalidate(
+            table_name=controller_manage['type'].__tablename__, unique_id=cont_id)
+
         self.controller[cont_type][cont_id] = controller_manage['function'](ready, cont_id)
         self.controller[cont_type][cont_id].daemon = True
         self.controller[cont_type][cont_id].start()
@@ -508,6 +554,68 @@ class DaemonController:
         else:
             return {'error': [f"Function ID not found. Is the Function activated?"]}
 
+    def config_cache_invalidate(self, table_name=None, unique_id=None):
+        """
+        Discard cached settings after they were changed outside the daemon
+
+        :param table_name: table (__tablename__) of the changed rows, or None for all tables
+        :type table_name: str
+        :param unique_id: unique ID (or list of unique IDs) of the changed rows, or None for the whole table
+        :type unique_id: str or list
+        """
+        try:
+            config_cache.invalidate(table_name=table_name, unique_id=unique_id)
+        except Exception:
+            self.logger.exception("Could not invalidate configuration cache")
+
+    def measurement_rollups_rewind(self, seconds):
+        """
+        Roll up measurements from a past time again (after older points were written by another process)
+
+        :param seconds: time (seconds since the epoch) of the oldest point written
+        :type seconds: float
+        """
+        try:
+            rewind_rollups(seconds)
+        except Exception:
+            self.logger.exception("Could not rewind measurement rollups")
+
+    def last_measurement(self, unique_id, unit, channel, measure=None, duration_sec=None):
+        """
+        Return the latest measurement of a series, from memory if it was written by the daemon
+
+        :return: [time, value], or [None, None] if there's no measurement in the past duration_sec
+        :rtype: list
+
+        :param unique_id: Unique ID of the device
+        :type unique_id: str
+        :param unit: Unit of the measurement
+        :type unit: str
+        :param channel: Channel of the measurement
+        :type channel: int
+        :param measure: Measurement (e.g. 'temperature')
+        :type measure: str or None
+        :param duration_sec: How many seconds to look for a past measurement (None for any age)
+        :type duration_sec: int or None
+        """
+        return read_influxdb_single(
+            unique_id, unit, channel, measure=measure, duration_sec=duration_sec, value='LAST')
+
+    def measurement_write_status(self):
+        """
+        Return the status of the measurement write pipeline
+
+        :return: queue depth, points queued/written/failed/dropped, batch and backpressure
+            counters, and spool depth and replay throughput
+        :rtype: dict
+        """
+        try:
+            return get_measurement_write_stats()
+        except Exception as except_msg:
+            message = f"Could not get measurement write status: {except_msg}"
+            self.logger.exception(message)
+            return {'error': [message]}
+
     def lcd_reset(self, lcd_id):
         """
         Resets an LCD
@@ -619,6 +727,7 @@ class DaemonController:
 
     def pid_mod(self, pid_id):
         try:
+            config_cache.invalidate(table_name='pid', unique_id=pid_id)
             return self.controller['PID'][pid_id].pid_mod()
         except KeyError:
             message = "PID not running"
@@ -696,6 +805,7 @@ class DaemonController:
 
     def refresh_daemon_conditional_settings(self, unique_id):
         try:
+            config_cache.invalidate(table_name='conditional_data')
             return self.controller['Conditional'][unique_id].refresh_settings()
         except Exception as except_msg:
             message = f"Could not refresh conditional settings: {except_msg}"
@@ -711,11 +821,13 @@ class DaemonController:
             self.output_usage_report_span = misc.output_usage_report_span
             self.output_usage_report_day = misc.output_usage_report_day
             self.output_usage_report_hour = misc.output_usage_report_hour
+            reset_influxdb_clients()
         except Exception:
             self.logger.exception("Could not refresh misc settings")
 
     def refresh_daemon_trigger_settings(self, unique_id):
         try:
+            config_cache.invalidate(table_name='trigger', unique_id=unique_id)
             return self.controller['Trigger'][unique_id].refresh_settings()
         except Exception:
             self.logger.exception("Could not refresh trigger settings")
@@ -796,6 +908,8 @@ class DaemonController:
         :type output_id: str
         """
         try:
+            for each_table in ['output_channel', 'device_measurements', 'conversion']:
+                config_cache.invalidate(table_name=each_table)
             return self.controller['Output'].output_setup(action, output_id)
         except Exception as except_msg:
             message = f"Could not set up output: {except_msg}"
@@ -833,7 +947,8 @@ class DaemonController:
         add_update_csv(STATS_CSV, 'daemon_startup_seconds', self.startup_time)
 
     def load_actions(self):
-        self.actions = parse_action_information()
+        enable_action_runtime_cache()
+        self.actions = get_action_information()
 
     def start_all_controllers(self):
         """
@@ -938,10 +1053,21 @@ class DaemonController:
         except Exception as err:
             self.logger.info(f"Widget controller had an issue stopping: {err}")
 
+        try:
+            stop_measurement_rollups()
+        except Exception as err:
+            self.logger.info(f"Measurement rollups had an issue stopping: {err}")
+
+        try:
+            stop_measurement_write_pipeline()
+            self.logger.info("Measurement write pipeline stopped")
+        except Exception as err:
+            self.logger.info(f"Measurement write pipeline had an issue stopping: {err}")
+
     def trigger_action(self, action_id, value={}, debug=False):
         try:
             return trigger_action(
-                self.actions,
+                get_action_information(),
                 action_id,
                 value=value,
                 debug=debug)
@@ -952,7 +1078,7 @@ class DaemonController:
     def trigger_all_actions(self, function_id, message='', debug=False):
         try:
             return trigger_controller_actions(
-                self.actions, function_id, message=message, debug=debug)
+                get_action_information(), function_id, message=message, debug=debug)
         except Exception as err:
             message = f"Could not trigger Conditional Actions: {err}"
             self.logger.exception(message)
@@ -1092,6 +1218,25 @@ class PyroServer(object):
     def __init__(self, mycodo):
         self.mycodo = mycodo
 
+    def batch(self, calls):
+        """
+        Make several calls with a single request
+
+        :param calls: list of [method name, list of args, dict of kwargs]
+        :return: list of [True, return value] or [False, error message] for each call
+        """
+        results = []
+        for method, args, kwargs in calls:
+            if (method.startswith('_') or method in ['batch', 'terminate_daemon'] or
+                    not callable(getattr(self, method, None))):
+                results.append([False, f"Unknown method: {method}"])
+                continue
+            try:
+                results.append([True, getattr(self, method)(*args, **kwargs)])
+            except Exception as err:
+                results.append([False, f"{method}(): {err}"])
+        return results
+
     def lcd_reset(self, lcd_id):
         """Resets an LCD."""
         return self.mycodo.lcd_reset(lcd_id)
@@ -1162,6 +1307,23 @@ class PyroServer(object):
         """Updates all input information."""
         return self.mycodo.input_force_measurements(input_id)
 
+    def last_measurement(self, unique_id, unit, channel, measure=None, duration_sec=None):
+        """Return the latest measurement of a series."""
+        return self.mycodo.last_measurement(
+            unique_id, unit, channel, measure=measure, duration_sec=duration_sec)
+
+    def config_cache_invalidate(self, table_name=None, unique_id=None):
+        """Discard cached settings."""
+        return self.mycodo.config_cache_invalidate(table_name=table_name, unique_id=unique_id)
+
+    def measurement_write_status(self):
+        """Return the status of the measurement write pipeline."""
+        return self.mycodo.measurement_write_status()
+
+    def measurement_rollups_rewind(self, seconds):
+        """Roll up measurements from a past time again."""
+        return self.mycodo.measurement_rollups_rewind(seconds)
+
     def pid_hold(self, pid_id):
         """Hold PID Controller operation."""
         return self.mycodo.pid_hold(pid_id)
@@ -1299,12 +1461,13 @@ class PyroDaemon(threading.Thread):
 
         self.logger = logging.getLogger('mycodo.pyro_daemon')
         self.mycodo = mycodo
+        self.server = PyroServer(self.mycodo)
 
     def run(self):
         try:
             self.logger.info("Starting Pyro5 daemon")
             serve({
-                PyroServer(self.mycodo): 'mycodo.pyro_server',
+                self.server: 'mycodo.pyro_server',
             }, host="0.0.0.0", port=9080, use_ns=False)
         except Exception:
             self.logger.exception("PyroDaemon")
@@ -1356,6 +1519,9 @@ class MycodoDaemon:
             pd.daemon = True
             pd.start()
 
+            # Code running in the daemon calls it directly, not through Pyro5
+            set_local_daemon(pd.server)
+
             # pm = PyroMonitor()
             # pm.daemon = True
             # pm.start()
@@ -20,7 +20,8 @@ ns_daemon = api.namespace('daemon', description='Daemon operations')
 daemon_status_fields = ns_daemon.model('Daemon Status Fields', {
     'is_running': fields.Boolean,
     'RAM': fields.Float,
-    'python_virtual_env': fields.Boolean
+    'python_virtual_env': fields.Boolean,
+    'measurement_writes': fields.Raw
 })
 
 daemon_terminate_fields = ns_daemon.model('Daemon Terminate Fields', {
@@ -46,17 +47,20 @@ class DaemonStatus(Resource):
             status = control.daemon_status()
             ram = control.ram_use()
             virtualenv = control.is_in_virtualenv()
+            measurement_writes = control.measurement_write_status()
             if status == 'alive':
                 return {
                    'is_running': True,
                    'RAM': ram,
-                   'python_virtual_env': virtualenv
+                   'python_virtual_env': virtualenv,
+                   'measurement_writes': measurement_writes
                 }, 200
         except Exception:
             return {
                'is_running': False,
                'RAM': None,
-               'python_virtual_env': None
+               'python_virtual_env': None,
+               'measurement_writes': None
             }, 200
 
 
@@ -10,9 +10,11 @@ from flask_restx import Resource, abort, fields
 from mycodo.databases.models import Unit
 from mycodo.mycodo_flask.api import api, default_responses
 from mycodo.mycodo_flask.utils import utils_general
+from mycodo.mycodo_flask.utils.utils_export import export_measurements_response
 from mycodo.utils.influx import (read_influxdb_list, read_influxdb_multi,
                                  read_influxdb_single, valid_date_str,
                                  write_influxdb_value)
+from mycodo.utils.measurement_export import EXPORT_FORMATS, export_format_error
 from mycodo.utils.system_pi import add_custom_units
 
 logger = logging.getLogger(__name__)
@@ -70,6 +72,15 @@ multi_measurement_response_fields = ns_measurement.model('Multi Measurement Resp
                                description='List of measurement results')
 })
 
+export_request_fields = ns_measurement.model('Measurement Export Request', {
+    'channels': fields.List(fields.Nested(channel_spec_fields), required=True,
+                           description='List of channel specifications to export, one column each'),
+    'epoch_start': fields.Integer(required=True, description='The start time, as epoch'),
+    'epoch_end': fields.Integer(required=True, description='The end time, as epoch'),
+    'format': fields.String(required=False, default='csv', enum=list(EXPORT_FORMATS),
+                            description='csv, csv_gzip, parquet, or arrow (parquet and arrow require pyarrow)')
+})
+
 
 @ns_measurement.route('/create/<string:unique_id>/<string:unit>/<int:channel>/<value>')
 @ns_measurement.doc(
@@ -381,3 +392,80 @@ class MeasurementsMulti(Resource):
             abort(500,
                   message='An exception occurred',
                   error=traceback.format_exc())
+
+
+@ns_measurement.route('/export')
+@ns_measurement.doc(
+    security='apikey',
+    responses=default_responses
+)
+class MeasurementsExport(Resource):
+    """Export the measurements of multiple channels."""
+
+    @accept('application/vnd.mycodo.v1+json')
+    @ns_measurement.expect(export_request_fields)
+    @flask_login.login_required
+    def post(self):
+        """
+        Export the measurements of multiple channels within a time range.
+
+        The export is streamed as a file with a row for each timestamp and a column
+        for each channel, read a time window at a time so any length of time can be exported.
+        """
+        if not utils_general.user_has_permission('view_settings'):
+            abort(403)
+
+        if not ns_measurement.payload:
+            abort(422, custom='Request body is required')
+
+        channels = ns_measurement.payload.get('channels', [])
+        epoch_start = ns_measurement.payload.get('epoch_start')
+        epoch_end = ns_measurement.payload.get('epoch_end')
+        file_format = ns_measurement.payload.get('format', 'csv')
+
+        if not channels or not isinstance(channels, list):
+            abort(422, custom='channels must be a list and cannot be empty')
+        if not isinstance(epoch_start, int) or not isinstance(epoch_end, int):
+            abort(422, custom='epoch_start and epoch_end are required')
+        if epoch_start < 0 or epoch_end <= epoch_start:
+            abort(422, custom='epoch_start must be >= 0 and less than epoch_end')
+
+        format_error = export_format_error(file_format)
+        if format_error:
+            abort(422, custom=format_error)
+
+        valid_units = add_custom_units(Unit.query.all())
+
+        series_list = []
+        columns = []
+        for idx, channel_spec in enumerate(channels):
+            if not isinstance(channel_spec, dict):
+                abort(422, custom=f'Channel at index {idx} must be an object')
+
+            unique_id = channel_spec.get('unique_id')
+            unit = channel_spec.get('unit')
+            channel = channel_spec.get('channel')
+            measure = channel_spec.get('measure')
+
+            if not unique_id:
+                abort(422, custom=f'unique_id is required for channel at index {idx}')
+            if unit not in valid_units:
+                abort(422, custom=f'Unit ID not found for channel at index {idx}: {unit}')
+            if not isinstance(channel, int) or channel < 0:
+                abort(422, custom=f'channel must be an integer >= 0 for channel at index {idx}')
+
+            series = (unit, unique_id, channel, measure)
+            if series in series_list:
+                continue
+            series_list.append(series)
+            columns.append(f'{unique_id} CH{channel} {measure or unit} ({unit})')
+
+        try:
+            return export_measurements_response(
+                series_list, columns, epoch_start, epoch_end,
+                file_format=file_format,
+                filename=f'measurements_{epoch_start}_{epoch_end}')
+        except Exception:
+            abort(500,
+                  message='An exception occurred',
+                  error=traceback.format_exc())
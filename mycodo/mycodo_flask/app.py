@@ -18,6 +18,7 @@ from flask_talisman import Talisman
 from mycodo.config import INSTALL_DIRECTORY, LANGUAGES, ProdConfig
 from mycodo.databases.models import Misc, User, Widget, populate_db
 from mycodo.databases.utils import session_scope
+from mycodo.mycodo_client import DaemonControl
 from mycodo.mycodo_flask import (routes_admin, routes_authentication,
                                  routes_dashboard, routes_function,
                                  routes_general, routes_input, routes_method,
@@ -26,7 +27,11 @@ from mycodo.mycodo_flask import (routes_admin, routes_authentication,
                                  routes_settings, routes_static)
 from mycodo.mycodo_flask.api import api_blueprint, init_api
 from mycodo.mycodo_flask.extensions import db
+from mycodo.mycodo_flask.utils.utils_authorization import (
+    AUTHORIZATION_TABLES, authorization_cache)
 from mycodo.mycodo_flask.utils.utils_general import get_ip_address
+from mycodo.utils.config_cache import (invalidate_changed,
+                                      track_session_changes)
 from mycodo.utils.layouts import update_layout
 from mycodo.utils.widgets import parse_widget_information
 
@@ -57,6 +62,13 @@ def register_extensions(app):
 
     db.init_app(app)  # Influx db time-series database
 
+    if not app.config.get('TESTING'):
+        # Tell the daemon which cached settings were changed
+        track_session_changes(db.session, invalidate_daemon_config_cache)
+
+    # Forget cached API key users and role permissions when users or roles change
+    track_session_changes(db.session, authorization_cache.clear, tables=AUTHORIZATION_TABLES)
+
     init_api(app)
 
     app = extension_babel(app)  # Language translations
@@ -88,6 +100,12 @@ def register_extensions(app):
                     Talisman(app, content_security_policy=csp)
 
 
+def invalidate_daemon_config_cache(changed):
+    """Invalidate the daemon's cached copies of settings rows committed by the frontend."""
+    control = DaemonControl(pyro_timeout=5)
+    invalidate_changed(changed, control.config_cache_invalidate)
+
+
 def register_blueprints(app):
     """register blueprints to the app."""
     app.register_blueprint(routes_admin.blueprint)  # register admin views
@@ -212,7 +230,7 @@ def extension_login_manager(app):
         try:  # first, try to login using the api_key url arg
             api_key = req.args.get('api_key').replace(' ', '+')
             api_key = base64.b64decode(api_key)
-            user = User.query.filter_by(api_key=api_key).first()
+            user = authorization_cache.user_from_api_key(api_key)
             if user:
                 return user
         except:
@@ -222,7 +240,7 @@ def extension_login_manager(app):
             api_key = req.headers.get('Authorization')
             api_key = api_key.replace('Basic ', '', 1)
             api_key = base64.b64decode(api_key)
-            user = User.query.filter_by(api_key=api_key).first()
+            user = authorization_cache.user_from_api_key(api_key)
             if user:
                 return user
         except:
@@ -231,7 +249,7 @@ def extension_login_manager(app):
         try:  # next, try to login using X-API-KEY
             api_key = req.headers.get('X-API-KEY')
             api_key = base64.b64decode(api_key)
-            user = User.query.filter_by(api_key=api_key).first()
+            user = authorization_cache.user_from_api_key(api_key)
             if user:
                 return user
         except:
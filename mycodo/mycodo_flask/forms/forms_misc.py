@@ -54,9 +54,18 @@ class DaemonControl(FlaskForm):
 #
 
 class ExportMeasurements(FlaskForm):
-    measurement = StringField(lazy_gettext('Measurement to Export'))
+    measurement = StringField(lazy_gettext('Measurements to Export'))
     date_range = StringField(lazy_gettext('Time Range MM/DD/YYYY HH:MM'))
-    export_data_csv = SubmitField(lazy_gettext('Export Data as CSV'))
+    export_format = SelectField(
+        lazy_gettext('Format'),
+        choices=[
+            ('csv', 'CSV'),
+            ('csv_gzip', 'CSV (gzip)'),
+            ('parquet', 'Parquet'),
+            ('arrow', 'Arrow')
+        ],
+        default='csv')
+    export_data_csv = SubmitField(lazy_gettext('Export Data'))
 
 
 class ExportSettings(FlaskForm):
@@ -1,34 +1,36 @@
 # coding=utf-8
-import csv
 import datetime
 import json
 import logging
 import os
 import subprocess
 from importlib import import_module
-from io import StringIO
 
 import flask_login
-from flask import (Response, flash, jsonify, redirect, send_file,
+from flask import (Response, flash, jsonify, redirect, request, send_file,
                    send_from_directory, url_for)
 from flask.blueprints import Blueprint
 from flask_babel import gettext
 from flask_limiter import Limiter
 from sqlalchemy import and_
+from werkzeug.utils import secure_filename
 
 from mycodo.config import (DOCKER_CONTAINER, INSTALL_DIRECTORY, LOG_PATH,
                            PATH_CAMERAS, PATH_NOTE_ATTACHMENTS)
 from mycodo.databases.models import (PID, Camera, Conversion, CustomController,
-                                     DeviceMeasurements, Input, Misc, Notes,
-                                     NoteTags, Output, OutputChannel)
+                                     DeviceMeasurements, Misc, Notes, NoteTags,
+                                     OutputChannel)
 from mycodo.mycodo_client import DaemonControl
 from mycodo.mycodo_flask.routes_authentication import clear_cookie_auth
-from mycodo.mycodo_flask.utils import utils_general
+from mycodo.mycodo_flask.utils import utils_export, utils_general
 from mycodo.mycodo_flask.utils.utils_general import get_ip_address
 from mycodo.mycodo_flask.utils.utils_output import get_all_output_states
 from mycodo.utils.database import db_retrieve_table
+from mycodo.utils.downsample import downsample_options
 from mycodo.utils.influx import (influx_to_list, influxdb_get_count_points,
-                                 influxdb_get_first_point, query_string)
+                                 influxdb_get_first_point, query_string,
+                                 read_influxdb_downsampled)
+from mycodo.utils.measurement_export import export_format_error
 from mycodo.utils.system_pi import (assure_path_exists, is_int,
                                     return_measurement_info, str_is_float)
 
@@ -273,6 +275,30 @@ def gpio_state_unique_id(unique_id, channel_id):
     return jsonify(state)
 
 
+@blueprint.route('/outputstates_unique_id')
+@flask_login.login_required
+def gpio_states_unique_id():
+    """
+    Return the states of several output channels with one daemon request, for dashboard outputs.
+    Query arguments: output ("output unique ID,channel unique ID", repeated for each channel).
+    """
+    keys = []
+    output_channels = []
+    for each_key in request.args.getlist('output'):
+        if ',' not in each_key:
+            continue
+        unique_id, channel_id = each_key.split(',', 1)
+        channel = OutputChannel.query.filter(OutputChannel.unique_id == channel_id).first()
+        if channel:
+            keys.append(each_key)
+            output_channels.append((unique_id, channel.channel))
+
+    if not output_channels:
+        return jsonify({})
+    daemon_control = DaemonControl()
+    return jsonify(dict(zip(keys, daemon_control.output_states(output_channels))))
+
+
 @blueprint.route('/widget_execute/<unique_id>')
 @flask_login.login_required
 def widget_execute(unique_id):
@@ -332,6 +358,18 @@ def last_data(unique_id, measure_type, measurement_id, period):
                     Conversion.unique_id == setpoint_measurement.conversion_id).first()
                 _, unit, measurement = return_measurement_info(setpoint_measurement, conversion)
 
+    try:
+        # The daemon answers from its latest written measurements, and only queries influxdb if needed
+        control = DaemonControl()
+        last_time, last_value = control.last_measurement(
+            unique_id, unit, channel, measure=measurement,
+            duration_sec=int(float(period)) if period != '0' else None)
+        if last_time is None:
+            return '', 204
+        return Response(f"[{last_time},{last_value}]", mimetype='text/json')
+    except Exception:
+        logger.debug("Could not get the last measurement from the daemon, querying influxdb")
+
     try:
         if period != '0':
             data = query_string(
@@ -367,67 +405,47 @@ def export_data(unique_id, measurement_id, start_seconds, end_seconds):
     Return data from start_seconds to end_seconds from influxdb.
     Used for exporting data.
     """
-    settings = Misc.query.first()
-    output = Output.query.filter(Output.unique_id == unique_id).first()
-    input_dev = Input.query.filter(Input.unique_id == unique_id).first()
-
-    if output:
-        name = output.name
-    elif input_dev:
-        name = input_dev.name
-    else:
-        name = None
-
-    device_measurement = DeviceMeasurements.query.filter(
-        DeviceMeasurements.unique_id == measurement_id).first()
-    if device_measurement:
-        conversion = Conversion.query.filter(
-            Conversion.unique_id == device_measurement.conversion_id).first()
-    else:
-        conversion = None
-    channel, unit, measurement = return_measurement_info(
-        device_measurement, conversion)
-
-    utc_offset_timedelta = datetime.datetime.utcnow() - datetime.datetime.now()
-    start = datetime.datetime.fromtimestamp(float(start_seconds))
-    start += utc_offset_timedelta
-    start_str = start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-    end = datetime.datetime.fromtimestamp(float(end_seconds))
-    end += utc_offset_timedelta
-    end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-
-    data = query_string(
-        unit, unique_id,
-        measure=measurement, channel=channel,
-        start_str=start_str, end_str=end_str)
-
-    if not data:
-        flash('No measurements to export in this time period', 'error')
+    try:
+        series_list, columns = utils_export.get_export_series([f'{unique_id},{measurement_id}'])
+    except Exception as err:
+        flash(f'Error: {err}', 'error')
         return redirect(url_for('routes_page.page_export'))
 
-    # Generate column names
-    col_1 = 'timestamp (UTC)'
-    col_2 = f'{name} {measurement} ({unique_id})'
-    csv_filename = f'{unique_id}_{name}_{measurement}.csv'
+    _, _, _, measurement = series_list[0]
+    name = utils_export.get_device_name(unique_id)
+    return utils_export.export_measurements_response(
+        series_list, columns, float(start_seconds), float(end_seconds),
+        filename=secure_filename(f'{unique_id}_{name}_{measurement}'))
 
-    def iter_csv(_data):
-        """Stream CSV file to user for download."""
-        line = StringIO()
-        writer = csv.writer(line)
-        writer.writerow([col_1, col_2])
 
-        if settings.measurement_db_name == 'influxdb':
-            for table in _data:
-                for row in table.records:
-                    writer.writerow([row.values['_time'].timestamp(), row.values['_value']])
-                    line.seek(0)
-                    yield line.read()
-                    line.truncate(0)
-                    line.seek(0)
+@blueprint.route('/export_measurements/<start_seconds>/<end_seconds>')
+@flask_login.login_required
+def export_measurements_data(start_seconds, end_seconds):
+    """
+    Stream the measurements of one or more series from start_seconds to end_seconds,
+    aligned on timestamp.
+
+    Query arguments: measurement ("device unique ID,measurement unique ID", repeated
+    for each series) and format (csv, csv_gzip, parquet, or arrow).
+    """
+    file_format = request.args.get('format', 'csv')
+    error = export_format_error(file_format)
+    if not error:
+        try:
+            series_list, columns = utils_export.get_export_series(
+                request.args.getlist('measurement'))
+            if not series_list:
+                error = 'No measurements selected'
+        except Exception as err:
+            error = f'Error: {err}'
+    if error:
+        flash(error, 'error')
+        return redirect(url_for('routes_page.page_export'))
 
-    response = Response(iter_csv(data), mimetype='text/csv')
-    response.headers['Content-Disposition'] = f'attachment; filename="{csv_filename}"'
-    return response
+    return utils_export.export_measurements_response(
+        series_list, columns, float(start_seconds), float(end_seconds),
+        file_format=file_format,
+        filename=f'measurements_{int(float(start_seconds))}_{int(float(end_seconds))}')
 
 
 @blueprint.route('/async/<device_id>/<device_type>/<measurement_id>/<start_seconds>/<end_seconds>')
@@ -436,8 +454,10 @@ def async_data(device_id, device_type, measurement_id, start_seconds, end_second
     """
     Return data from start_seconds to end_seconds from influxdb.
     Used for asynchronous graph display of many points (up to millions).
+
+    The data is downsampled to about the number of points in the 'points' query
+    argument, with the method in the 'method' query argument (lttb, minmax, or mean).
     """
-    count_points = None
     first_point = None
 
     settings = Misc.query.first()
@@ -483,19 +503,6 @@ def async_data(device_id, device_type, measurement_id, start_seconds, end_second
 
     # Get all data if start/end not specified
     if start_seconds == '0' and end_seconds == '0':
-        # Get how many points there are
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            value='COUNT')
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            count_points = influxdb_get_count_points(data)
-
         # Get the timestamp of the first point
         data = query_string(
             unit, device_id,
@@ -509,139 +516,43 @@ def async_data(device_id, device_type, measurement_id, start_seconds, end_second
         if settings.measurement_db_name == 'influxdb':
             first_point = influxdb_get_first_point(data)
 
+        if not first_point:
+            logger.error("No first point")
+            return '', 204
+
+        start = first_point.replace(tzinfo=None)
         end = datetime.datetime.utcnow()
-        end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
 
     # Set the time frame to the past start epoch to now
     elif start_seconds != '0' and end_seconds == '0':
         start = datetime.datetime.utcfromtimestamp(float(start_seconds))
-        start_str = start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
         end = datetime.datetime.utcnow()
-        end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            value='COUNT')
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            count_points = influxdb_get_count_points(data)
-
-        # Get the timestamp of the first point in the past year
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            limit=1)
-
-        if not data:
-            return '', 204
-
-        if settings.measurement_db_name == 'influxdb':
-            first_point = influxdb_get_first_point(data)
     else:
         start = datetime.datetime.utcfromtimestamp(float(start_seconds))
-        start_str = start.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
         end = datetime.datetime.utcfromtimestamp(float(end_seconds))
-        end_str = end.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
 
-        data = query_string(
-            unit, device_id,
-            measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            value='COUNT')
-
-        if not data:
-            return '', 204
+    method, target_points = downsample_options(
+        request.args.get('method'), request.args.get('points'))
 
-        if settings.measurement_db_name == 'influxdb':
-            count_points = influxdb_get_count_points(data)
+    logger.debug(f'Start = {start}')
+    logger.debug(f'End   = {end}')
+    logger.debug(f'Downsample = {method}, {target_points} points')
 
-        # Get the timestamp of the first point in the past year
-        data = query_string(
-            unit, device_id,
+    try:
+        list_data = read_influxdb_downsampled(
+            device_id, unit, channel, start, end,
             measure=measurement,
-            channel=channel,
-            start_str=start_str,
-            end_str=end_str,
-            limit=1)
+            method=method,
+            target_points=target_points)
 
-        if not data:
+        if not list_data:
             return '', 204
 
-        if settings.measurement_db_name == 'influxdb':
-            first_point = influxdb_get_first_point(data)
-
-    if not first_point:
-        logger.error("No first point")
+        return jsonify(list_data)
+    except Exception as err:
+        logger.error(f"URL for 'async_data' raised and error: {err}")
         return '', 204
 
-    start_str = first_point.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
-
-    logger.debug(f'Count = {count_points}')
-    logger.debug(f'Start = {first_point}')
-    logger.debug(f'End   = {end}')
-
-    # How many seconds between the start and end period
-    time_difference_seconds = end.timestamp() - first_point.timestamp()
-    logger.debug(f'Difference seconds = {time_difference_seconds}')
-
-    # If there are more than 700 points in the time frame, we need to group
-    # data points into 700 groups with points averaged in each group.
-    if count_points > 700:
-        # Average period between input reads
-        seconds_per_point = time_difference_seconds / count_points
-        logger.debug(f'Seconds per point = {seconds_per_point}')
-
-        # How many seconds to group data points in
-        group_seconds = int(time_difference_seconds / 700)
-        logger.debug(f'Group seconds = {group_seconds}')
-
-        try:
-            data = query_string(
-                unit, device_id,
-                measure=measurement,
-                channel=channel,
-                start_str=start_str,
-                end_str=end_str,
-                group_sec=group_seconds)
-
-            if not data:
-                return '', 204
-
-            if settings.measurement_db_name == 'influxdb':
-                return jsonify(influx_to_list(data))
-        except Exception as err:
-            logger.error(f"URL for 'async_data' raised and error: {err}")
-            return '', 204
-    else:
-        try:
-            data = query_string(
-                unit, device_id,
-                measure=measurement,
-                channel=channel,
-                start_str=start_str,
-                end_str=end_str)
-
-            if not data:
-                return '', 204
-
-            if settings.measurement_db_name == 'influxdb':
-                return jsonify(influx_to_list(data))
-        except Exception as err:
-            logger.error(f"URL for 'async_data' raised and error: {err}")
-            return '', 204
-
 
 @blueprint.route('/async_usage/<device_id>/<unit>/<channel>/<start_seconds>/<end_seconds>')
 @flask_login.login_required
@@ -6,6 +6,7 @@ import flask_login
 from flask import (Blueprint, flash, jsonify, redirect, render_template,
                    request, url_for)
 from flask_babel import gettext
+from sqlalchemy import or_
 
 from mycodo.config import METHOD_INFO
 from mycodo.config_translations import TRANSLATIONS
@@ -219,12 +220,14 @@ def method_delete(method_id):
         return redirect(url_for('routes_method.method_list'))
 
     try:
-        MethodData.query.filter(
-            MethodData.method_id == method_id).delete()
-        MethodData.query.filter(
-            MethodData.linked_method_id == method_id).delete()
-        Method.query.filter(
-            Method.unique_id == method_id).delete()
+        # Delete rows individually (not query.delete()) so the method's cached setpoint profile is invalidated
+        for each_data in MethodData.query.filter(
+                or_(MethodData.method_id == method_id,
+                    MethodData.linked_method_id == method_id)).all():
+            db.session.delete(each_data)
+        for each_method in Method.query.filter(
+                Method.unique_id == method_id).all():
+            db.session.delete(each_method)
         display_order = csv_to_list_of_str(DisplayOrder.query.first().method)
         display_order.remove(method_id)
         DisplayOrder.query.first().method = list_to_csv(display_order)
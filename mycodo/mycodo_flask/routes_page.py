@@ -43,6 +43,7 @@ from mycodo.mycodo_flask.utils import (utils_camera, utils_dashboard,
                                        utils_export, utils_general, utils_misc,
                                        utils_notes)
 from mycodo.mycodo_flask.utils.utils_general import return_dependencies
+from mycodo.utils.downsample import DOWNSAMPLE_METHODS, downsample_options
 from mycodo.utils.functions import parse_function_information
 from mycodo.utils.inputs import (list_analog_to_digital_converters,
                                  parse_input_information)
@@ -548,10 +549,13 @@ def page_graph_async():
         dict_measure_units[each_measurement.unique_id] = unit
 
     async_height = 600
+    downsample_method, downsample_points = downsample_options()
 
     if request.method == 'POST':
         if request.form['async_height']:
             async_height = request.form['async_height']
+        downsample_method, downsample_points = downsample_options(
+            request.form.get('downsample_method'), request.form.get('downsample_points'))
         seconds = 0
         if request.form['submit'] == 'All Data':
             pass
@@ -576,6 +580,9 @@ def page_graph_async():
     return render_template('pages/graph-async.html',
                            conversion=Conversion,
                            async_height=async_height,
+                           downsample_method=downsample_method,
+                           downsample_methods=DOWNSAMPLE_METHODS,
+                           downsample_points=downsample_points,
                            start_time_epoch=start_time_epoch,
                            device_measurements_dict=device_measurements_dict,
                            dict_measure_measurements=dict_measure_measurements,
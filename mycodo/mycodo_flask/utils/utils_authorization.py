@@ -0,0 +1,107 @@
+# coding=utf-8
+"""
+Cache the users of API keys and the permissions of roles, used to authorize requests.
+
+Every API request is authorized by its API key, and routes check the permissions of
+the user's role, often several times per request. Users found by API key and the
+permissions of roles are kept for AUTHORIZATION_CACHE_TTL_SEC, and forgotten as soon
+as the users or roles tables are changed through this process's database session.
+Changes made by other processes (e.g. other web server workers) are seen once the
+cached entries expire.
+
+Cached users are detached from the database session and must not be modified.
+"""
+import threading
+import time
+
+import flask_login
+from flask import g
+
+from mycodo.config import AUTHORIZATION_CACHE_TTL_SEC
+from mycodo.databases.models import Role
+from mycodo.databases.models import User
+from mycodo.mycodo_flask.extensions import db
+
+# Tables that forget the cached entries when changed
+AUTHORIZATION_TABLES = {'users', 'roles'}
+
+# Permission columns of Role
+PERMISSIONS = [
+    'edit_settings',
+    'edit_controllers',
+    'edit_users',
+    'view_settings',
+    'view_camera',
+    'view_stats',
+    'view_logs',
+    'reset_password'
+]
+
+
+class AuthorizationCache:
+    """
+    Users by API key and permissions by role ID, each kept for ttl seconds
+
+    :param ttl: seconds to keep each entry
+    :param max_entries: the most entries of each kind, cleared when reached
+    """
+    def __init__(self, ttl=AUTHORIZATION_CACHE_TTL_SEC, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.users = {}  # API key: (expiration, User)
+        self.permissions = {}  # Role ID: (expiration, frozenset of permissions)
+
+    def _get(self, entries, key):
+        entry = entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+    def _set(self, entries, key, value):
+        with self.lock:
+            if len(entries) >= self.max_entries:
+                entries.clear()
+            entries[key] = (time.monotonic() + self.ttl, value)
+
+    def user_from_api_key(self, api_key):
+        """Return the User with an API key, or None."""
+        user = self._get(self.users, api_key)
+        if user is None:
+            user = User.query.filter_by(api_key=api_key).first()
+            if user is None:
+                return
+            db.session.expunge(user)
+            self._set(self.users, api_key, user)
+        return user
+
+    def role_permissions(self, role_id):
+        """Return the set of permissions of a role."""
+        permissions = self._get(self.permissions, role_id)
+        if permissions is None:
+            role = Role.query.filter(Role.id == role_id).first()
+            if role is None:
+                return frozenset()
+            permissions = frozenset(
+                each_perm for each_perm in PERMISSIONS if getattr(role, each_perm))
+            self._set(self.permissions, role_id, permissions)
+        return permissions
+
+    def clear(self, changed=None):
+        """Forget all users and permissions (changed: {table name: unique_ids}, from track_session_changes())."""
+        with self.lock:
+            self.users.clear()
+            self.permissions.clear()
+
+
+authorization_cache = AuthorizationCache()
+
+
+def current_user_permissions():
+    """Return the permissions of the current user, looked up once per request."""
+    if 'user_permissions' not in g:
+        user = flask_login.current_user
+        if user and user.is_authenticated:
+            g.user_permissions = authorization_cache.role_permissions(user.role_id)
+        else:
+            g.user_permissions = frozenset()
+    return g.user_permissions
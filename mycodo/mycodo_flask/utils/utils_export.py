@@ -9,7 +9,7 @@ import threading
 import time
 import zipfile
 
-from flask import send_file, url_for
+from flask import Response, request, send_file, url_for
 from packaging.version import parse
 from werkzeug.utils import secure_filename
 
@@ -21,10 +21,17 @@ from mycodo.config import (ALEMBIC_VERSION, DATABASE_NAME, DOCKER_CONTAINER, IMP
                            PATH_USER_SCRIPTS, PATH_WIDGETS_CUSTOM,
                            SQL_DATABASE_MYCODO, DATABASE_PATH)
 from mycodo.config_translations import TRANSLATIONS
+from mycodo.databases.models import (PID, Conversion, CustomController,
+                                     DeviceMeasurements, Input, Output)
 from mycodo.mycodo_flask.utils.utils_general import (flash_form_errors,
                                                      flash_success_errors)
 from mycodo.scripts.measurement_db import get_influxdb_info
-from mycodo.utils.system_pi import assure_path_exists, cmd_output
+from mycodo.utils.influx import read_influxdb_series_window
+from mycodo.utils.measurement_export import (EXPORT_FORMATS,
+                                             export_format_error,
+                                             export_measurements_stream)
+from mycodo.utils.system_pi import (assure_path_exists, cmd_output,
+                                    return_measurement_info)
 from mycodo.utils.tools import (create_measurements_export,
                                 create_settings_export)
 from mycodo.utils.utils import append_to_log
@@ -38,8 +45,8 @@ logger = logging.getLogger(__name__)
 
 def export_measurements(form):
     """
-    Take user input to query the InfluxDB and return a CSV file of timestamps
-    and measurement values
+    Take user input to query the InfluxDB and return the URL of an export of
+    timestamps and the values of one or more measurements
     """
     action = '{action} {controller}'.format(
         action=TRANSLATIONS['export']['title'],
@@ -56,14 +63,22 @@ def export_measurements(form):
                 end_seconds = int(time.mktime(
                     time.strptime(end_time, '%m/%d/%Y %H:%M')))
 
-                unique_id = form.measurement.data.split(',')[0]
-                measurement_id = form.measurement.data.split(',')[1]
-
-                url = '/export_data/{id}/{meas}/{start}/{end}'.format(
-                    id=unique_id,
-                    meas=measurement_id,
-                    start=start_seconds, end=end_seconds)
-                return url
+                # The measurement select allows several measurements
+                measurements = request.form.getlist('measurement')
+                if not measurements:
+                    error.append("Select at least one measurement to export")
+
+                format_error = export_format_error(form.export_format.data)
+                if format_error:
+                    error.append(format_error)
+
+                if not error:
+                    return url_for(
+                        'routes_general.export_measurements_data',
+                        start_seconds=start_seconds,
+                        end_seconds=end_seconds,
+                        measurement=measurements,
+                        format=form.export_format.data)
         except Exception as err:
             error.append(f"Error: {err}")
     else:
@@ -73,6 +88,67 @@ def export_measurements(form):
     flash_success_errors(error, action, url_for('routes_page.page_export'))
 
 
+def get_device_name(unique_id):
+    for each_table in [Input, Output, CustomController, PID]:
+        device = each_table.query.filter(each_table.unique_id == unique_id).first()
+        if device:
+            return device.name
+
+
+def get_export_series(measurements):
+    """
+    Return the series and column names of measurements
+
+    :param measurements: list of "device unique ID,measurement unique ID" strings
+    :return: (list of (unit, unique_id, channel, measure), list of column names)
+    """
+    series_list = []
+    columns = []
+    for each_measurement in measurements:
+        try:
+            unique_id, measurement_id = each_measurement.split(',')[:2]
+        except ValueError:
+            raise Exception(f"Invalid measurement: {each_measurement}")
+
+        device_measurement = DeviceMeasurements.query.filter(
+            DeviceMeasurements.unique_id == measurement_id).first()
+        if not device_measurement:
+            raise Exception(f"Measurement not found: {measurement_id}")
+        conversion = Conversion.query.filter(
+            Conversion.unique_id == device_measurement.conversion_id).first()
+        channel, unit, measurement = return_measurement_info(
+            device_measurement, conversion)
+
+        series = (unit, unique_id, channel, measurement)
+        if series in series_list:
+            continue
+        series_list.append(series)
+        columns.append(f'{get_device_name(unique_id)} CH{channel} {measurement} ({unique_id})')
+    return series_list, columns
+
+
+def export_measurements_response(series_list, columns, start_seconds, end_seconds,
+                                 file_format='csv', filename='measurements'):
+    """
+    Return a response streaming the measurements of series, aligned on timestamp
+
+    :param series_list: list of (unit, unique_id, channel, measure)
+    :param columns: the column name of each series
+    :param file_format: one of EXPORT_FORMATS
+    """
+    mimetype, extension = EXPORT_FORMATS[file_format]
+
+    def read_window(start, end):
+        return read_influxdb_series_window(series_list, start, end)
+
+    response = Response(
+        export_measurements_stream(
+            columns, start_seconds, end_seconds, read_window, file_format=file_format),
+        mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{extension}"'
+    return response
+
+
 def export_settings():
     """
     Save the Mycodo settings database (mycodo.db) to a zip file and serve it
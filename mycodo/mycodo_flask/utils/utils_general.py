@@ -7,7 +7,6 @@ import os
 from collections import OrderedDict
 from datetime import datetime
 
-import flask_login
 import sqlalchemy
 from flask import flash, redirect, request
 from flask_babel import gettext
@@ -20,10 +19,11 @@ from mycodo.config_devices_units import MEASUREMENTS, UNITS
 from mycodo.config_translations import TRANSLATIONS
 from mycodo.databases.models import (PID, Camera, Conditional, Conversion,
                                      CustomController, Dashboard,
-                                     DeviceMeasurements, Input, Output, Role,
-                                     Trigger, User, Widget)
+                                     DeviceMeasurements, Input, Output,
+                                     Trigger, Widget)
 from mycodo.mycodo_client import DaemonControl
 from mycodo.mycodo_flask.extensions import db
+from mycodo.mycodo_flask.utils.utils_authorization import current_user_permissions
 from mycodo.utils.actions import parse_action_information
 from mycodo.utils.functions import parse_function_information
 from mycodo.utils.inputs import parse_input_information
@@ -1140,16 +1140,7 @@ def user_has_permission(permission, silent=False):
     Determine if the currently-logged-in user has permission to perform a
     specific action.
     """
-    user = User.query.filter(User.name == flask_login.current_user.name).first()
-    role = Role.query.filter(Role.id == user.role_id).first()
-    if ((permission == 'edit_settings' and role.edit_settings) or
-            (permission == 'edit_controllers' and role.edit_controllers) or
-            (permission == 'edit_users' and role.edit_users) or
-            (permission == 'view_settings' and role.view_settings) or
-            (permission == 'view_camera' and role.view_camera) or
-            (permission == 'view_stats' and role.view_stats) or
-            (permission == 'view_logs' and role.view_logs) or
-            (permission == 'reset_password' and role.reset_password)):
+    if permission in current_user_permissions():
         return True
     if not silent:
         flash("Insufficient permissions: {}".format(permission), "error")
@@ -8,6 +8,7 @@ from mycodo.databases.models import DeviceMeasurements
 from mycodo.databases.models import Input
 from mycodo.mycodo_flask.extensions import db
 from mycodo.mycodo_flask.utils.utils_misc import determine_controller_type
+from mycodo.utils.equations import compile_equation
 from mycodo.utils.functions import parse_function_information
 from mycodo.utils.inputs import parse_input_information
 
@@ -118,6 +119,11 @@ def measurement_mod_form(messages, page_refresh, form):
                 mod_meas.rescale_method = form["measurement_rescale_method_{}".format(each_meas_id)]
             if "measurement_rescale_equation_{}".format(each_meas_id) in form:
                 mod_meas.rescale_equation = form["measurement_rescale_equation_{}".format(each_meas_id)]
+                if mod_meas.rescale_method == "equation":
+                    try:
+                        compile_equation(mod_meas.rescale_equation)
+                    except ValueError as err:
+                        messages["error"].append(str(err))
             if "measurement_scale_from_min_{}".format(each_meas_id) in form:
                 mod_meas.scale_from_min = form["measurement_scale_from_min_{}".format(each_meas_id)]
             if "measurement_scale_from_max_{}".format(each_meas_id) in form:
@@ -64,7 +64,9 @@ from mycodo.mycodo_flask.utils.utils_general import flash_form_errors
 from mycodo.mycodo_flask.utils.utils_general import flash_success_errors
 from mycodo.utils.actions import parse_action_information
 from mycodo.utils.database import db_retrieve_table
+from mycodo.utils.equations import compile_equation
 from mycodo.utils.functions import parse_function_information
+from mycodo.utils.influx import reset_influxdb_clients
 from mycodo.utils.inputs import parse_input_information
 from mycodo.utils.layouts import update_layout
 from mycodo.utils.modules import load_module_from_file
@@ -462,6 +464,7 @@ def settings_general_mod(form):
                 mod_user.language = form.language.data
 
                 db.session.commit()
+                reset_influxdb_clients()
                 control = DaemonControl()
                 control.refresh_daemon_misc_settings()
                 messages["success"].append('{action} {controller}'.format(
@@ -1901,6 +1904,11 @@ def settings_convert_add(form):
 
     if 'x' not in form.equation.data:
         error.append("'x' must appear in the equation.")
+    else:
+        try:
+            compile_equation(form.equation.data)
+        except ValueError as err:
+            error.append(str(err))
 
     if form.validate():
         new_conversion = Conversion()
@@ -1935,6 +1943,11 @@ def settings_convert_mod(form):
 
     if 'x' not in form.equation.data:
         error.append("'x' must appear in the equation")
+    else:
+        try:
+            compile_equation(form.equation.data)
+        except ValueError as err:
+            error.append(str(err))
 
     try:
         mod_conversion = Conversion.query.filter(
@@ -10,21 +10,17 @@ NotImplementedErrors
 """
 import datetime
 import logging
-import threading
 import time
 import timeit
 
-from sqlalchemy import and_
-from sqlalchemy import or_
-
 from mycodo.abstract_base_controller import AbstractBaseController
 from mycodo.databases.models import Output
 from mycodo.databases.models import OutputChannel
 from mycodo.databases.models import Trigger
 from mycodo.mycodo_client import DaemonControl
-from mycodo.utils.database import db_retrieve_table_daemon
-from mycodo.utils.influx import write_influxdb_value
-from mycodo.utils.outputs import output_types
+from mycodo.utils.config_cache import config_cache
+from mycodo.utils.influx import queue_influxdb_value
+from mycodo.utils.outputs import output_on_duration_triggered, output_types
 
 
 class AbstractOutput(AbstractBaseController):
@@ -53,6 +49,7 @@ class AbstractOutput(AbstractBaseController):
         self.output_off_until = {}
         self.output_off_triggered = {}
         self.output_states = {}
+        self.output_off_scheduler = None
 
         self.output = output
         self.running = True
@@ -302,6 +299,7 @@ class AbstractOutput(AbstractBaseController):
                     self.output_on_until[output_channel] = (
                         current_time + datetime.timedelta(seconds=abs(amount)))
                     self.output_last_duration[output_channel] = amount
+                    self.schedule_output_off(output_channel)
 
                     # Write the amount the output was ON to the
                     # database at the timestamp it turned ON
@@ -314,15 +312,13 @@ class AbstractOutput(AbstractBaseController):
                             duration_on = float(time_on)
                         timestamp = datetime.datetime.utcnow() - datetime.timedelta(seconds=abs(duration_on))
 
-                        write_db = threading.Thread(
-                            target=write_influxdb_value,
-                            args=(self.unique_id,
-                                  's',
-                                  duration_on,),
-                            kwargs={'measure': 'duration_time',
-                                    'channel': output_channel,
-                                    'timestamp': timestamp})
-                        write_db.start()
+                        queue_influxdb_value(
+                            self.unique_id,
+                            's',
+                            duration_on,
+                            measure='duration_time',
+                            channel=output_channel,
+                            timestamp=timestamp)
 
                     return 0, msg
 
@@ -333,6 +329,7 @@ class AbstractOutput(AbstractBaseController):
                     self.output_on_until[output_channel] = (
                         current_time + datetime.timedelta(seconds=abs(amount)))
                     self.output_last_duration[output_channel] = amount
+                    self.schedule_output_off(output_channel)
                     msg = f"Output {self.unique_id} CH{output_channel} ({self.output_name}) is " \
                           f"currently on without an amount. Turning into an amount of {abs(amount):.1f} seconds."
                     self.logger.debug(msg)
@@ -351,6 +348,7 @@ class AbstractOutput(AbstractBaseController):
                         current_time + datetime.timedelta(seconds=abs(amount)))
                     self.output_last_duration[output_channel] = amount
                     self.output_on_duration[output_channel] = True
+                    self.schedule_output_off(output_channel)
 
             # No duration specific, so just turn output on
             elif ('output_types' in self.OUTPUT_INFORMATION and
@@ -433,15 +431,13 @@ class AbstractOutput(AbstractBaseController):
                             measurement_channel = each_measure_channel
                             break
 
-                write_db = threading.Thread(
-                    target=write_influxdb_value,
-                    args=(self.unique_id,
-                          's',
-                          duration_sec,),
-                    kwargs={'measure': 'duration_time',
-                            'channel': measurement_channel,
-                            'timestamp': timestamp})
-                write_db.start()
+                queue_influxdb_value(
+                    self.unique_id,
+                    's',
+                    duration_sec,
+                    measure='duration_time',
+                    channel=measurement_channel,
+                    timestamp=timestamp)
 
             self.output_off_triggered[output_channel] = False
 
@@ -459,8 +455,8 @@ class AbstractOutput(AbstractBaseController):
         This function is executed whenever an output is turned on or off
         It is responsible for executing Output Triggers
         """
-        output_channel_dev = db_retrieve_table_daemon(OutputChannel).filter(
-            and_(OutputChannel.output_id == output_id, OutputChannel.channel == output_channel)).first()
+        output_channel_dev = config_cache.first_by(
+            OutputChannel, output_id=output_id, channel=output_channel)
         if output_channel_dev is None:
             self.logger.error("Could not find channel in database")
             return
@@ -468,71 +464,29 @@ class AbstractOutput(AbstractBaseController):
         #
         # Check On/Off Outputs
         #
-        trigger_output = db_retrieve_table_daemon(Trigger)
-        trigger_output = trigger_output.filter(Trigger.trigger_type == 'trigger_output')
-        trigger_output = trigger_output.filter(Trigger.unique_id_1 == output_id)
-        trigger_output = trigger_output.filter(Trigger.unique_id_2 == output_channel_dev.unique_id)
-        trigger_output = trigger_output.filter(Trigger.is_activated.is_(True))
+        trigger_output = [
+            each_trigger for each_trigger in config_cache.filter_by(
+                Trigger,
+                trigger_type='trigger_output',
+                unique_id_1=output_id,
+                unique_id_2=output_channel_dev.unique_id)
+            if each_trigger.is_activated]
 
         # Find any Output Triggers with the output_id of the output that
         # just changed its state
         if self.is_on(output_channel):
-            trigger_output = trigger_output.filter(
-                or_(Trigger.output_state == 'on_duration_none',
-                    Trigger.output_state == 'on_duration_any',
-                    Trigger.output_state == 'on_duration_none_any',
-                    Trigger.output_state == 'on_duration_equal',
-                    Trigger.output_state == 'on_duration_greater_than',
-                    Trigger.output_state == 'on_duration_equal_greater_than',
-                    Trigger.output_state == 'on_duration_less_than',
-                    Trigger.output_state == 'on_duration_equal_less_than'))
-
-            on_duration_none = and_(
-                Trigger.output_state == 'on_duration_none',
-                amount == 0.0)
-
-            on_duration_any = and_(
-                Trigger.output_state == 'on_duration_any',
-                bool(amount))
-
-            on_duration_none_any = Trigger.output_state == 'on_duration_none_any'
-
-            on_duration_equal = and_(
-                Trigger.output_state == 'on_duration_equal',
-                Trigger.output_duration == amount)
-
-            on_duration_greater_than = and_(
-                Trigger.output_state == 'on_duration_greater_than',
-                amount > Trigger.output_duration)
-
-            on_duration_equal_greater_than = and_(
-                Trigger.output_state == 'on_duration_equal_greater_than',
-                amount >= Trigger.output_duration)
-
-            on_duration_less_than = and_(
-                Trigger.output_state == 'on_duration_less_than',
-                amount < Trigger.output_duration)
-
-            on_duration_equal_less_than = and_(
-                Trigger.output_state == 'on_duration_equal_less_than',
-                amount <= Trigger.output_duration)
-
-            trigger_output = trigger_output.filter(
-                or_(on_duration_none,
-                    on_duration_any,
-                    on_duration_none_any,
-                    on_duration_equal,
-                    on_duration_greater_than,
-                    on_duration_equal_greater_than,
-                    on_duration_less_than,
-                    on_duration_equal_less_than))
+            trigger_output = [
+                each_trigger for each_trigger in trigger_output
+                if output_on_duration_triggered(
+                    each_trigger.output_state, each_trigger.output_duration, amount)]
         else:
-            trigger_output = trigger_output.filter(
-                Trigger.output_state == 'off')
+            trigger_output = [
+                each_trigger for each_trigger in trigger_output
+                if each_trigger.output_state == 'off']
 
         # Execute the Trigger Actions for each Output Trigger
         # for this particular Output device
-        for each_trigger in trigger_output.all():
+        for each_trigger in trigger_output:
             timestamp = datetime.datetime.fromtimestamp(time.time()).strftime('%Y-%m-%d %H:%M:%S')
             message = f"{timestamp}\n[Trigger {each_trigger.unique_id.split('-')[0]} ({each_trigger.name})] " \
                       f"Output {output_id} CH{output_channel} {each_trigger.output_state}"
@@ -543,15 +497,18 @@ class AbstractOutput(AbstractBaseController):
         #
         # Check PWM Outputs
         #
-        trigger_output_pwm = db_retrieve_table_daemon(Trigger)
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.trigger_type == 'trigger_output_pwm')
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.unique_id_1 == output_id)
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.unique_id_2 == output_channel_dev.unique_id)
-        trigger_output_pwm = trigger_output_pwm.filter(Trigger.is_activated.is_(True))
+        trigger_output_pwm = config_cache.filter_by(
+            Trigger,
+            trigger_type='trigger_output_pwm',
+            unique_id_1=output_id,
+            unique_id_2=output_channel_dev.unique_id)
 
         # Execute the Trigger Actions for each Output Trigger
         # for this particular Output device
-        for each_trigger in trigger_output_pwm.all():
+        for each_trigger in trigger_output_pwm:
+            if not each_trigger.is_activated:
+                continue
+
             trigger_trigger = False
             duty_cycle = self.output_state(output_channel)
 
@@ -584,6 +541,11 @@ class AbstractOutput(AbstractBaseController):
             # Check triggers whenever an output is manipulated
             self.control.trigger_all_actions(each_trigger.unique_id, message=message)
 
+    def schedule_output_off(self, output_channel):
+        """Notify the Output controller of the time an output channel on for a duration is to turn off."""
+        if self.output_off_scheduler:
+            self.output_off_scheduler(self.unique_id, output_channel, self.output_on_until[output_channel])
+
     def output_sec_currently_on(self, output_channel):
         """Return how many seconds an output has been currently on for."""
         if not self.is_on(output_channel):
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark running many periodic controllers with their own threads or the controller scheduler.
+
+Stand-in controllers act on a timer, as PID and Conditional controllers do, each with
+its own thread waking every sample period to check its timer, or with its loop() run by
+the controller scheduler when due. Reports the process CPU time used, the number of
+threads, and how late each period's action ran.
+
+Usage: python benchmark_controller_scheduler.py [--controllers 300] [--period 5] [--seconds 20]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+from mycodo.controllers.base_controller import AbstractController
+
+
+class TimerController(AbstractController, threading.Thread):
+    """Acts every period, like a PID or Conditional controller."""
+    def __init__(self, ready, unique_id, period, scheduled):
+        threading.Thread.__init__(self)
+        super().__init__(ready, unique_id=None, name=__name__)
+        self.unique_id = unique_id
+        self.period = period
+        self.scheduled = scheduled
+        self.sample_rate = 0.25
+        self.timer = None
+        self.late = []
+
+    def initialize_variables(self):
+        self.timer = time.time() + self.period * (int(self.unique_id) % 100) / 100
+        self.ready.set()
+        self.running = True
+
+    def loop(self):
+        now = time.time()
+        if now > self.timer:
+            self.late.append(now - self.timer)
+            while now > self.timer:
+                self.timer += self.period
+
+    def next_loop_time(self):
+        return self.timer
+
+    def use_loop_scheduler(self):
+        return self.scheduled
+
+
+def run(controllers, period, seconds, scheduled):
+    """Run the controllers for seconds, return (CPU seconds, threads, lateness list)."""
+    threads_before = threading.active_count()
+    running = []
+    for index in range(controllers):
+        ready = threading.Event()
+        controller = TimerController(ready, str(index), period, scheduled)
+        controller.daemon = True
+        controller.start()
+        ready.wait()
+        running.append(controller)
+
+    time.sleep(1)
+    threads = threading.active_count() - threads_before
+    cpu_timer = time.process_time()
+    time.sleep(seconds)
+    cpu_sec = time.process_time() - cpu_timer
+
+    for each_controller in running:
+        each_controller.stop_controller()
+    for each_controller in running:
+        each_controller.join()
+    return cpu_sec, threads, [late for each_controller in running for late in each_controller.late]
+
+
+def parseargs(parser):
+    parser.add_argument('--controllers', type=int, default=300,
+                        help='Number of controllers')
+    parser.add_argument('--period', type=float, default=5,
+                        help='Period of each controller (seconds)')
+    parser.add_argument('--seconds', type=float, default=20,
+                        help='Duration to measure CPU time during')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Benchmark the controller scheduler."))
+
+    for name, scheduled in [('Threads', False), ('Scheduler', True)]:
+        cpu_sec, threads, late = run(args.controllers, args.period, args.seconds, scheduled)
+        late.sort()
+        print(f"{name:>9}: CPU {cpu_sec / args.seconds * 100:.1f} %, {threads} threads, "
+              f"{len(late):,} periods late by mean {sum(late) / len(late) * 1000:.1f} ms, "
+              f"max {late[-1] * 1000:.1f} ms")
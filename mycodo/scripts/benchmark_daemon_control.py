@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark DaemonControl calls made inside the daemon process.
+
+Compares calls through Pyro5 (serializing the arguments and sending them over the
+loopback interface, as every call from the daemon to itself did previously) with
+calls dispatched directly to the daemon's Pyro server object. A stand-in server
+with the same call signatures is used, so the daemon doesn't need to be running.
+
+Usage: python benchmark_daemon_control.py [--calls 2000] [--port 9099]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+from Pyro5.api import Daemon, expose
+
+from mycodo import mycodo_client
+from mycodo.mycodo_client import DaemonControl
+
+
+@expose
+class BenchmarkServer:
+    """Stand-in for the daemon's PyroServer, returning immediately."""
+    @staticmethod
+    def daemon_status():
+        return 'alive'
+
+    @staticmethod
+    def trigger_action(action_id, value={}, debug=False):
+        value['message'] += f" [Action {action_id}]"
+        return value
+
+    @staticmethod
+    def trigger_all_actions(function_id, message='', debug=False):
+        return message
+
+
+def run_calls(control, calls):
+    """Make calls like those made on every measurement and output change, return calls per second."""
+    measurements = {channel: {'unit': 'C', 'measurement': 'temperature', 'value': 20.0 + channel}
+                    for channel in range(4)}
+    timer = timeit.default_timer()
+    for index in range(calls // 2):
+        control.trigger_action(
+            'action-id', value={'message': '', 'measurements_dict': measurements})
+        control.trigger_all_actions('trigger-id', message=f'Output on {index}')
+    return (calls // 2 * 2) / (timeit.default_timer() - timer)
+
+
+def parseargs(parser):
+    parser.add_argument('--calls', type=int, default=2000,
+                        help='Number of calls per path')
+    parser.add_argument('--port', type=int, default=9099,
+                        help='Port of the temporary Pyro5 server')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Benchmark in-daemon DaemonControl calls."))
+
+    server = BenchmarkServer()
+    pyro_daemon = Daemon(host='127.0.0.1', port=args.port)
+    uri = pyro_daemon.register(server, 'mycodo.pyro_server')
+    threading.Thread(target=pyro_daemon.requestLoop, daemon=True).start()
+    time.sleep(0.5)
+
+    pyro_per_sec = run_calls(DaemonControl(pyro_uri=str(uri), pyro_timeout=10), args.calls)
+
+    mycodo_client.local_daemon = server
+    local_per_sec = run_calls(DaemonControl(), args.calls)
+    mycodo_client.local_daemon = None
+
+    pyro_daemon.shutdown()
+
+    print(f" Pyro5: {pyro_per_sec:,.0f} calls/s")
+    print(f"Direct: {local_per_sec:,.0f} calls/s")
+    print(f"Speedup: {local_per_sec / pyro_per_sec:.1f}x")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark daemon settings database lookups.
+
+Compares the previous session_scope() (new engine and sessionmaker on every call)
+with the cached engine and thread-local sessions, using a temporary copy of the
+Misc table.
+
+Usage: python benchmark_database.py [--lookups 2000] [--threads 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import timeit
+from contextlib import contextmanager
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from mycodo.databases.models import Misc
+from mycodo.databases.utils import dispose_engines, session_scope
+
+
+@contextmanager
+def session_scope_uncached(db_uri):
+    """The previous session_scope(): a new engine for every call."""
+    session = sessionmaker(bind=create_engine(f"{db_uri}?check_same_thread=False"))()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def lookup(scope, db_uri):
+    with scope(db_uri) as new_session:
+        misc = new_session.query(Misc).first()
+        new_session.expunge_all()
+    return misc
+
+
+def run(scope, db_uri, lookups, threads):
+    per_thread = max(1, lookups // threads)
+
+    def worker():
+        for _ in range(per_thread):
+            lookup(scope, db_uri)
+
+    list_threads = [threading.Thread(target=worker) for _ in range(threads)]
+    timer = timeit.default_timer()
+    for each_thread in list_threads:
+        each_thread.start()
+    for each_thread in list_threads:
+        each_thread.join()
+    return per_thread * threads / (timeit.default_timer() - timer)
+
+
+def parseargs(parser):
+    parser.add_argument('--lookups', type=int, default=2000,
+                        help='Number of lookups per run')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='Number of threads performing lookups')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Benchmark settings database lookups."))
+
+    tmp_dir = tempfile.mkdtemp()
+    db_uri = f"sqlite:///{os.path.join(tmp_dir, 'benchmark.db')}"
+
+    engine = create_engine(db_uri)
+    Misc.__table__.create(engine)
+    with engine.begin() as conn:
+        conn.execute(Misc.__table__.insert().values(id=1))
+    engine.dispose()
+
+    for threads in sorted({1, args.threads}):
+        before = run(session_scope_uncached, db_uri, args.lookups, threads)
+        after = run(session_scope, db_uri, args.lookups, threads)
+        print(f"{threads} thread(s): "
+              f"before: {before:,.0f} lookups/sec, "
+              f"after: {after:,.0f} lookups/sec "
+              f"({after / before:.1f}x)")
+
+    dispose_engines()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark parsing the information of all Input, Output, Function, Action, and Widget modules.
+
+Compares a cold parse (no cache) that loads every module with one that reads the
+information from the module source where possible. Each mode runs in a new process,
+so modules imported by one mode don't speed up the other.
+
+Usage: python benchmark_module_information.py [--runs 3]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+MODES = ['load', 'static']
+
+
+def parse_all(mode):
+    """Parse the information of all modules with an empty cache and return the results."""
+    from mycodo.utils import modules
+    from mycodo.utils.actions import parse_action_information
+    from mycodo.utils.functions import parse_function_information
+    from mycodo.utils.inputs import parse_input_information
+    from mycodo.utils.outputs import parse_output_information
+    from mycodo.utils.widgets import parse_widget_information
+
+    modules.module_information_registry = modules.ModuleInformationRegistry(
+        os.path.join(tempfile.mkdtemp(), 'module_information.pickle'),
+        static_parse=mode == 'static')
+
+    timer = timeit.default_timer()
+    parsed = {
+        'inputs': parse_input_information(),
+        'outputs': parse_output_information(),
+        'functions': parse_function_information(),
+        'actions': parse_action_information(),
+        'widgets': parse_widget_information()
+    }
+    seconds = timeit.default_timer() - timer
+
+    return {
+        'seconds': seconds,
+        'stats': modules.module_information_registry.stats,
+        'modules': {each_type: sorted(each_dict) for each_type, each_dict in parsed.items()}
+    }
+
+
+def run_mode(mode):
+    output = subprocess.check_output(
+        [sys.executable, os.path.abspath(__file__), '--mode', mode],
+        stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def parseargs(parser):
+    parser.add_argument('--runs', type=int, default=3,
+                        help='Number of cold parses per mode')
+    parser.add_argument('--mode', choices=MODES, default=None,
+                        help='Parse once in this mode and print the results (used internally)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Benchmark parsing module information."))
+
+    if args.mode:
+        print(json.dumps(parse_all(args.mode)))
+        sys.exit(0)
+
+    results = {}
+    for each_mode in MODES:
+        runs = [run_mode(each_mode) for _ in range(args.runs)]
+        results[each_mode] = runs[0]
+        results[each_mode]['seconds'] = min(each_run['seconds'] for each_run in runs)
+
+    for each_mode in MODES:
+        result = results[each_mode]
+        count = sum(len(each_list) for each_list in result['modules'].values())
+        print(f"{each_mode:>6}: {result['seconds']:.3f} s for {count} modules "
+              f"(read from source: {result['stats']['static_parses']}, "
+              f"loaded: {result['stats']['loads']})")
+
+    print(f"Speedup: {results['load']['seconds'] / results['static']['seconds']:.1f}x")
+
+    if results['load']['modules'] != results['static']['modules']:
+        print("Warning: the modes found different modules")
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the MQTT Input receiving messages on many topics.
+
+A local broker stand-in delivers messages to the Input's on_message() callback (as
+the paho client's network loop does), so neither a broker nor the daemon needs to
+be running. Measurements are converted to line protocol as they would be when queued
+for the measurement writer, but aren't written to a database.
+
+The first result compares finding the channel of a topic by comparing the topic with
+every channel's topic (as each message previously did) with the topic index.
+
+Usage: python benchmark_mqtt_input.py [--topics 500] [--messages 50000]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from types import SimpleNamespace
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+from mycodo.inputs import mqtt_paho
+from mycodo.utils.influx import measurements_to_points
+from mycodo.utils.mqtt_topics import TopicIndex
+
+
+class LocalBroker:
+    """Stand-in for an MQTT broker that delivers published messages to one client's on_message()."""
+    def __init__(self):
+        self.on_message = None
+        self.subscriptions = TopicIndex({})
+
+    def subscribe(self, topics):
+        self.subscriptions = TopicIndex({each_topic: each_topic for each_topic, _ in topics})
+
+    def publish(self, topic, payload):
+        if self.subscriptions.match(topic):
+            self.on_message(self, None, SimpleNamespace(topic=topic, payload=payload))
+
+
+class QueuedLines:
+    """Counts the line protocol strings that would be queued for the measurement writer."""
+    def __init__(self):
+        self.count = 0
+
+    def add_measurements_influxdb(self, unique_id, measurements, use_same_timestamp=True, block=False):
+        points = measurements_to_points(unique_id, measurements, use_same_timestamp)
+        self.count += len([each_point.to_line_protocol() for each_point in points])
+
+
+def create_input(topics):
+    """Return an MQTT Input set up with a channel subscribed to each topic."""
+    input_mqtt = mqtt_paho.InputModule(
+        SimpleNamespace(unique_id='benchmark-mqtt-input', log_level_debug=False), testing=True)
+    input_mqtt.unique_id = 'benchmark-mqtt-input'
+    input_mqtt.log_level_debug = False
+    input_mqtt.options_channels = {'subscribe_topic': {}}
+    for channel, each_topic in enumerate(topics):
+        input_mqtt.channels_measurement[channel] = SimpleNamespace(
+            measurement='temperature', unit='C', conversion_id='')
+        input_mqtt.channels_conversion[channel] = None
+        input_mqtt.options_channels['subscribe_topic'][channel] = each_topic
+    input_mqtt.topic_index = TopicIndex(input_mqtt.options_channels['subscribe_topic'])
+    return input_mqtt
+
+
+def scan_channels(input_mqtt, topic):
+    """Find the channel of a topic by comparing it with every channel's topic."""
+    channel = None
+    for each_channel in input_mqtt.channels_measurement:
+        if input_mqtt.options_channels['subscribe_topic'][each_channel] == topic:
+            channel = each_channel
+    return channel
+
+
+def lookups_per_sec(find_channel, messages):
+    timer = timeit.default_timer()
+    for each_topic, _ in messages:
+        find_channel(each_topic)
+    return len(messages) / (timeit.default_timer() - timer)
+
+
+def parseargs(parser):
+    parser.add_argument('--topics', type=int, default=500,
+                        help='Number of subscribed topics (one channel each)')
+    parser.add_argument('--messages', type=int, default=50000,
+                        help='Number of messages published')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Benchmark the MQTT Input under load."))
+
+    topics = [f'greenhouse/zone{number // 10}/sensor{number % 10}/temperature'
+              for number in range(args.topics)]
+    messages = [(random.choice(topics), f'{random.uniform(15, 30):.2f}'.encode())
+                for _ in range(args.messages)]
+
+    input_mqtt = create_input(topics)
+    scan_per_sec = lookups_per_sec(lambda topic: scan_channels(input_mqtt, topic), messages)
+    index_per_sec = lookups_per_sec(input_mqtt.topic_index.match, messages)
+
+    queued = QueuedLines()
+    mqtt_paho.add_measurements_influxdb = queued.add_measurements_influxdb
+    mqtt_paho.run_input_actions = lambda unique_id, message, measurements, debug: (message, measurements)
+
+    broker = LocalBroker()
+    input_mqtt.client = broker
+    broker.on_message = input_mqtt.on_message
+    input_mqtt.subscribe()
+
+    timer = timeit.default_timer()
+    for each_topic, each_payload in messages:
+        broker.publish(each_topic, each_payload)
+    messages_per_sec = len(messages) / (timeit.default_timer() - timer)
+
+    print(f"Channel lookup, scan:  {scan_per_sec:,.0f} messages/s ({args.topics} topics)")
+    print(f"Channel lookup, index: {index_per_sec:,.0f} messages/s")
+    print(f"on_message():          {messages_per_sec:,.0f} messages/s, {queued.count:,} points queued")
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark turning outputs off at the end of their durations on.
+
+Stand-in outputs are turned on for random durations, and the time each is turned off
+is compared with the time it was supposed to turn off. The Output controller's
+deadline scheduler is compared with polling every output channel each sample period
+(with a thread started for each turn off), as the Output controller previously did.
+The process CPU time used while every output is off is also reported.
+
+Usage: python benchmark_output_off.py [--channels 200] [--seconds 10] [--sample-rate 0.05]
+"""
+import argparse
+import datetime
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+from mycodo.controllers.controller_output import OutputController
+
+
+class StandInOutput:
+    """Keeps the state an output keeps of its durations on, and records how late it turns off."""
+    def __init__(self, unique_id, channels):
+        self.unique_id = unique_id
+        self.output_setup = True
+        self.output_on_until = {channel: datetime.datetime.now() for channel in range(channels)}
+        self.output_on_duration = {channel: False for channel in range(channels)}
+        self.output_off_triggered = {channel: False for channel in range(channels)}
+        self.output_off_scheduler = None
+        self.late = []
+
+    def turn_on(self, output_channel, amount):
+        self.output_on_until[output_channel] = datetime.datetime.now() + datetime.timedelta(seconds=amount)
+        self.output_on_duration[output_channel] = True
+        if self.output_off_scheduler:
+            self.output_off_scheduler(self.unique_id, output_channel, self.output_on_until[output_channel])
+
+    def output_on_off(self, state, output_channel=0):
+        self.late.append((datetime.datetime.now() - self.output_on_until[output_channel]).total_seconds())
+        self.output_on_duration[output_channel] = False
+        self.output_off_triggered[output_channel] = False
+
+
+def poll_outputs(controller):
+    """Check every channel of every output, as the Output controller's loop() previously did."""
+    for output_id in controller.output:
+        for each_channel in controller.output_unique_id[output_id]:
+            if (controller.output[output_id].output_setup and
+                    each_channel in controller.output[output_id].output_on_until and
+                    controller.output[output_id].output_on_until[each_channel] < datetime.datetime.now() and
+                    controller.output[output_id].output_on_duration[each_channel] and
+                    not controller.output[output_id].output_off_triggered[each_channel]):
+                controller.output[output_id].output_off_triggered[each_channel] = True
+                threading.Thread(
+                    target=controller.output[output_id].output_on_off,
+                    args=('off',),
+                    kwargs={'output_channel': each_channel}).start()
+
+
+def run(channels, seconds, scheduled, sample_rate):
+    """Turn random channels on for random durations for seconds, return (lateness list, idle CPU seconds)."""
+    controller = OutputController(threading.Event(), False)
+    outputs = [StandInOutput(f'output-{index}', 8) for index in range(max(1, channels // 8))]
+    for each_output in outputs:
+        controller.output[each_output.unique_id] = each_output
+        controller.output_unique_id[each_output.unique_id] = {channel: None for channel in range(8)}
+        if scheduled:
+            each_output.output_off_scheduler = controller.schedule_output_off
+
+    controller.running = True
+
+    def loop():
+        while controller.running:
+            if scheduled:
+                controller.loop()
+            else:
+                poll_outputs(controller)
+                time.sleep(sample_rate)
+
+    thread = threading.Thread(target=loop)
+    thread.start()
+
+    cpu_timer = time.process_time()
+    time.sleep(seconds / 2)
+    idle_cpu_sec = time.process_time() - cpu_timer
+
+    end = time.time() + seconds
+    while time.time() < end:
+        each_output = random.choice(outputs)
+        channel = random.randrange(8)
+        if not each_output.output_on_duration[channel]:
+            each_output.turn_on(channel, random.uniform(0.1, 2))
+        time.sleep(0.002)
+    time.sleep(2.5)
+
+    controller.running = False
+    controller.wake_loop()
+    thread.join()
+    return [late for each_output in outputs for late in each_output.late], idle_cpu_sec
+
+
+def parseargs(parser):
+    parser.add_argument('--channels', type=int, default=200,
+                        help='Number of output channels')
+    parser.add_argument('--seconds', type=float, default=10,
+                        help='Duration outputs are turned on during (idle for half as long before)')
+    parser.add_argument('--sample-rate', type=float, default=0.05,
+                        help='Sample rate of polling (the previous Output controller sample rate)')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Benchmark turning outputs off after durations."))
+
+    for name, scheduled in [('Polling', False), ('Scheduled', True)]:
+        late, cpu_sec = run(args.channels, args.seconds, scheduled, args.sample_rate)
+        late.sort()
+        print(f"{name:>9}: {len(late):,} turned off, late by mean {sum(late) / len(late) * 1000:.1f} ms, "
+              f"95th percentile {late[int(len(late) * 0.95)] * 1000:.1f} ms, max {late[-1] * 1000:.1f} ms, "
+              f"idle CPU {cpu_sec / (args.seconds / 2) * 100:.1f} %")
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Simulate a PID controller with a range of gains, offline, from exported measurements.
+
+A model of how the output affects the measurement is fitted from a CSV (or csv.gz)
+measurement export containing the measurement and the output's duration ('duration_time')
+measurement, then the PID controller is simulated with every combination of the gains,
+responding to the setpoint from the first exported measurement. Without an export, a
+simulated kettle (as in PID_hirschmann/pid_simulation.py) is used.
+
+Usage: python pid_gain_sweep.py --period 30 --setpoint 25 [--csv export.csv
+    --measurement-column "ID CH0 temperature (C)" --output-column "ID CH0 duration_time (s)"]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(__file__, "../../..")))
+
+from mycodo.utils.pid_sweep import SCORES
+from mycodo.utils.pid_sweep import fit_plant
+from mycodo.utils.pid_sweep import kettle_plant
+from mycodo.utils.pid_sweep import read_history_csv
+from mycodo.utils.pid_sweep import resample_history
+from mycodo.utils.pid_sweep import sweep
+
+
+def parseargs(parser):
+    parser.add_argument('--csv', type=str, default=None,
+                        help='Measurement export (CSV or csv.gz)')
+    parser.add_argument('--measurement-column', type=str, default=None,
+                        help='Column of the measurement the PID controls')
+    parser.add_argument('--output-column', type=str, default=None,
+                        help='Column of the output durations')
+    parser.add_argument('--period', type=float, default=30,
+                        help='PID period (seconds)')
+    parser.add_argument('--setpoint', type=float, default=65,
+                        help='PID setpoint')
+    parser.add_argument('--max-delay', type=float, default=120,
+                        help='Longest delay to consider when fitting the model (seconds)')
+    parser.add_argument('--kp', type=float, nargs=2, default=[0, 10], metavar=('MIN', 'MAX'),
+                        help='Range of Kp')
+    parser.add_argument('--ki', type=float, nargs=2, default=[0, 1], metavar=('MIN', 'MAX'),
+                        help='Range of Ki')
+    parser.add_argument('--kd', type=float, nargs=2, default=[0, 10], metavar=('MIN', 'MAX'),
+                        help='Range of Kd')
+    parser.add_argument('--steps', type=int, default=20,
+                        help='Values of each gain (simulations: steps cubed)')
+    parser.add_argument('--minutes', type=float, default=120,
+                        help='Simulated duration (minutes)')
+    parser.add_argument('--rank-by', type=str, default='iae', choices=SCORES,
+                        help='Score to rank the gains by')
+    parser.add_argument('--top', type=int, default=10,
+                        help='Number of gains to show')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parseargs(argparse.ArgumentParser(description="Simulate a range of PID gains."))
+
+    if args.csv:
+        measurements, output_durations = read_history_csv(
+            args.csv, args.measurement_column, args.output_column)
+        values, duty = resample_history(measurements, output_durations, args.period)
+        plant = fit_plant(values, duty, args.period, max_delay=args.max_delay)
+        initial_value = values[0]
+    else:
+        plant = kettle_plant(35, 40, 6, 20, args.period, delay=15)
+        initial_value = 20
+    print(f"Model: y[k+1] = {plant.a:.6f} * y[k] + {plant.b:.6f} * duty[k] + {plant.c:.6f}, "
+          f"delay: {plant.delay_steps * args.period:g} s")
+
+    timer = timeit.default_timer()
+    best = sweep(
+        plant,
+        np.linspace(*args.kp, args.steps),
+        np.linspace(*args.ki, args.steps),
+        np.linspace(*args.kd, args.steps),
+        args.setpoint,
+        initial_value,
+        int(args.minutes * 60 / args.period),
+        rank_by=args.rank_by,
+        top=args.top)
+    duration = timeit.default_timer() - timer
+
+    print(f"{args.steps ** 3:,} simulations in {duration:.2f} s ({args.steps ** 3 / duration:,.0f}/s)")
+    for each_result in best:
+        print(f"Kp: {each_result['kp']:8.4g}  Ki: {each_result['ki']:8.4g}  Kd: {each_result['kd']:8.4g}  "
+              f"IAE: {each_result['iae']:10.4g}  ISE: {each_result['ise']:10.4g}  "
+              f"Overshoot: {each_result['overshoot']:6.3g}  Settling: {each_result['settling_time']:8.4g} s")
@@ -69,15 +69,17 @@ def test_influxdb_multi():
     # Query multiple channels at once
     channels_data = [
         {'unique_id': device_id, 'unit': 'C', 'channel': 0, 'measure': 'temperature'},
-        {'unique_id': device_id, 'unit': 'percent', 'channel': 1, 'measure': 'humidity'}
+        {'unique_id': device_id, 'unit': 'percent', 'channel': 1, 'measure': 'humidity'},
+        {'unique_id': device_id, 'unit': 'C', 'channel': 0},
+        {'unique_id': device_id, 'unit': 'C'}
     ]
     
     results = read_influxdb_multi(channels_data, past_seconds=1000)
     
     print(f"Multi-channel results: {results}")
     
-    # Verify we got results for both channels
-    assert len(results) == 2
+    # Verify we got results for every requested channel, in request order
+    assert len(results) == 4
     assert 0 in results
     assert 1 in results
     
@@ -86,3 +88,7 @@ def test_influxdb_multi():
     
     # Verify channel 1 humidity
     assert results[1][1] == 65.3
+
+    # Verify a channel without a measure, and an invalid channel
+    assert results[2][1] == 25.5
+    assert results[3] == [None, None]
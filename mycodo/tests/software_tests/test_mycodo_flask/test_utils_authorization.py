@@ -0,0 +1,31 @@
+# coding=utf-8
+"""Tests for the cache of API key users and role permissions."""
+from mycodo.databases.models import Role, User
+from mycodo.mycodo_flask.utils.utils_authorization import authorization_cache
+
+
+def test_role_change_clears_cache(testapp):
+    """Verifies changing a user's role applies to the next lookup of the user's API key."""
+    user = authorization_cache.user_from_api_key(b'secret_guest_api_key')
+    assert user.name == 'guest'
+    assert 'view_settings' not in authorization_cache.role_permissions(user.role_id)
+    assert authorization_cache.user_from_api_key(b'secret_guest_api_key') is user
+
+    guest = User.query.filter(User.name == 'guest').first()
+    guest.role_id = Role.query.filter(Role.name == 'Admin').first().id
+    guest.save()
+
+    user = authorization_cache.user_from_api_key(b'secret_guest_api_key')
+    assert user.role_id == guest.role_id
+    assert 'view_settings' in authorization_cache.role_permissions(user.role_id)
+    assert authorization_cache.user_from_api_key(b'not_an_api_key') is None
+
+
+def test_role_permissions_change_clears_cache(testapp):
+    """Verifies changing the permissions of a role applies to the next lookup of its permissions."""
+    role = Role.query.filter(Role.name == 'Guest').first()
+    assert 'view_camera' not in authorization_cache.role_permissions(role.id)
+
+    role.view_camera = True
+    role.save()
+    assert 'view_camera' in authorization_cache.role_permissions(role.id)
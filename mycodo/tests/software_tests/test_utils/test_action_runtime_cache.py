@@ -0,0 +1,87 @@
+# coding=utf-8
+"""Tests for the Action runtime cache."""
+import threading
+import types
+
+from mycodo.utils.action_runtime_cache import ActionRuntimeCache
+
+
+class FakeActionModule:
+    created = 0
+
+    def __init__(self, action):
+        FakeActionModule.created += 1
+        self.action = action
+        self.runs = 0
+
+    def run_action(self, value):
+        self.runs += 1
+        value['message'] += f" {self.action.unique_id} run {self.runs}"
+        return value
+
+
+def make_cache(tmp_path):
+    path = tmp_path / 'action_fake.py'
+    path.write_text('')
+    loads = []
+
+    def load_module(file_path, module_type):
+        loads.append(file_path)
+        return types.SimpleNamespace(ActionModule=FakeActionModule), 'success'
+
+    FakeActionModule.created = 0
+    cache = ActionRuntimeCache(load_module=load_module)
+    cache.enabled = True
+    return cache, str(path), loads
+
+
+def test_action_reused_until_invalidated(tmp_path):
+    """Verify the module is loaded once and the ActionModule reused until its Action or controller changes."""
+    cache, path, loads = make_cache(tmp_path)
+    action = types.SimpleNamespace(unique_id='action_1', function_id='trigger_1')
+
+    for _ in range(3):
+        value = cache.run_action(action, cache.get_module(path), {'message': ''})
+    assert value['message'] == ' action_1 run 3'
+    assert len(loads) == 1
+    assert FakeActionModule.created == 1
+
+    cache.invalidate('actions', ['action_2'])  # Other Action
+    cache.run_action(action, cache.get_module(path), {'message': ''})
+    assert FakeActionModule.created == 1
+
+    cache.invalidate('trigger', 'trigger_1')  # The controller of the Action
+    value = cache.run_action(action, cache.get_module(path), {'message': ''})
+    assert value['message'] == ' action_1 run 1'
+    assert FakeActionModule.created == 2
+    assert len(loads) == 1
+
+
+def test_action_running_concurrently_gets_own_object(tmp_path):
+    """Verify an Action fired while it's still running isn't run with the same object."""
+    cache, path, _ = make_cache(tmp_path)
+    action = types.SimpleNamespace(unique_id='action_1', function_id='trigger_1')
+    module = cache.get_module(path)
+    cache.run_action(action, module, {'message': ''})
+
+    entry = cache.instances['action_1']
+    with entry['lock']:
+        thread_result = {}
+        thread = threading.Thread(
+            target=lambda: thread_result.update(cache.run_action(action, module, {'message': ''})))
+        thread.start()
+        thread.join()
+    assert thread_result['message'] == ' action_1 run 1'
+    assert entry['instance'].runs == 1
+
+
+def test_disabled_loads_every_time(tmp_path):
+    """Verify a disabled cache (e.g. in the frontend) loads the module and creates the object every run."""
+    cache, path, loads = make_cache(tmp_path)
+    cache.enabled = False
+    action = types.SimpleNamespace(unique_id='action_1', function_id='trigger_1')
+    for _ in range(2):
+        cache.run_action(action, cache.get_module(path), {'message': ''})
+    assert len(loads) == 2
+    assert FakeActionModule.created == 2
+    assert cache.get_action_information(lambda: {'a': 1}) == {'a': 1}
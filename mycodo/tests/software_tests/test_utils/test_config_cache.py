@@ -0,0 +1,53 @@
+# coding=utf-8
+"""Tests for tracking committed changes to cached settings tables."""
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from mycodo.utils.config_cache import invalidate_changed, track_session_changes
+
+Base = declarative_base()
+
+
+class Setting(Base):
+    __tablename__ = 'settings_test'
+    id = Column(Integer, primary_key=True)
+    unique_id = Column(String)
+
+
+class Other(Base):
+    __tablename__ = 'other_test'
+    id = Column(Integer, primary_key=True)
+    unique_id = Column(String)
+
+
+def test_track_row_and_bulk_changes():
+    """Verify committed row changes and bulk deletes/updates are reported, and rollbacks aren't."""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session_maker = sessionmaker(bind=engine)
+    committed = []
+    track_session_changes(session_maker, committed.append, tables={'settings_test'})
+
+    session = session_maker()
+    session.add_all([Setting(unique_id='a'), Setting(unique_id='b'), Other(unique_id='c')])
+    session.commit()
+    assert committed == [{'settings_test': {'a', 'b'}}]
+
+    session.query(Other).delete()
+    session.commit()
+    assert len(committed) == 1  # Nothing changed in the tracked table
+
+    session.query(Setting).filter(Setting.unique_id == 'b').delete()
+    session.rollback()
+    session.query(Setting).filter(Setting.unique_id == 'b').update({'unique_id': 'd'})
+    session.commit()
+    assert committed[1] == {'settings_test': {None}}
+
+    invalidated = []
+    invalidate_changed(committed[1], lambda **kwargs: invalidated.append(kwargs))
+    invalidate_changed({'settings_test': {'a', None}}, lambda **kwargs: invalidated.append(kwargs))
+    invalidate_changed({'settings_test': {'a'}}, lambda **kwargs: invalidated.append(kwargs))
+    assert invalidated == [
+        {'table_name': 'settings_test'},
+        {'table_name': 'settings_test'},
+        {'table_name': 'settings_test', 'unique_id': ['a']}]
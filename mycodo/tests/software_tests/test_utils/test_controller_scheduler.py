@@ -0,0 +1,108 @@
+# coding=utf-8
+"""Tests for the controller scheduler."""
+import logging
+import threading
+import time
+
+from mycodo.utils.controller_scheduler import ControllerScheduler
+
+
+class Controller:
+    """Stand-in controller with a loop() due every period."""
+    def __init__(self, period, loop_sec=0.0):
+        self.unique_id = 'controller'
+        self.logger = logging.getLogger(__name__)
+        self.running = True
+        self.period = period
+        self.loop_sec = loop_sec
+        self.timer = time.time()
+        self.loops = []
+        self.active = 0
+        self.max_active = 0
+        self.finished = 0
+        self.stopped = threading.Event()
+        self.stop_in_next_loop_time = False
+        self.lock = threading.Lock()
+
+    def loop(self):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        now = time.time()
+        if now >= self.timer:
+            self.loops.append(now)
+            self.timer += self.period
+        time.sleep(self.loop_sec)
+        with self.lock:
+            self.active -= 1
+
+    def next_loop_time(self):
+        if self.stop_in_next_loop_time:
+            self.running = False  # Stopped from another thread after running was checked
+        return self.timer
+
+    def finish(self):
+        self.finished += 1
+        self.running = False
+        self.stopped.set()
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.005)
+    return condition()
+
+
+def test_loops_run_when_due():
+    """Verify each controller's loop() runs when due, and a stopped controller finishes once."""
+    scheduler = ControllerScheduler(workers=2, max_wait=10)
+    fast = Controller(0.02)
+    slow = Controller(0.2)
+    scheduler.add(fast)
+    scheduler.add(slow)
+
+    assert wait_for(lambda: len(slow.loops) >= 3)
+    assert len(fast.loops) >= 15
+    intervals = [after - before for before, after in zip(slow.loops, slow.loops[1:])]
+    assert all(0.15 < each_interval < 0.35 for each_interval in intervals)
+
+    slow.running = False
+    scheduler.wake(slow)
+    scheduler.wake(slow)
+    assert wait_for(lambda: slow.finished)
+    time.sleep(0.05)
+    assert slow.finished == 1
+    assert len(scheduler) == 1
+
+    fast.running = False
+    scheduler.wake(fast)
+    assert wait_for(lambda: fast.finished == 1 and len(scheduler) == 0)
+
+
+def test_woken_while_running_loops_again_after():
+    """Verify waking a controller while its loop() runs doesn't run loop() twice at once."""
+    scheduler = ControllerScheduler(workers=4, max_wait=10)
+    controller = Controller(60, loop_sec=0.05)
+    scheduler.add(controller)
+    assert wait_for(lambda: controller.active)
+
+    for _ in range(5):
+        scheduler.wake(controller)
+    controller.timer = 0  # Timer changed while loop() runs, as when woken from another thread
+    assert wait_for(lambda: len(controller.loops) == 2)
+    assert controller.max_active == 1
+
+    controller.running = False
+    scheduler.wake(controller)
+    assert wait_for(lambda: controller.finished == 1)
+
+
+def test_stopped_after_loop_finishes():
+    """Verify a controller stopped while its loop() is scheduled again still finishes."""
+    scheduler = ControllerScheduler(workers=2, max_wait=10)
+    controller = Controller(60)
+    controller.stop_in_next_loop_time = True
+    scheduler.add(controller)
+    assert wait_for(lambda: controller.finished == 1 and len(scheduler) == 0)
+    assert len(controller.loops) == 1
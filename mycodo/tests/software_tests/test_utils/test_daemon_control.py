@@ -0,0 +1,109 @@
+# coding=utf-8
+"""Tests for DaemonControl calls made inside the daemon process."""
+import socket
+import threading
+
+import Pyro5.errors
+import pytest
+
+pytest.importorskip('Pyro5')
+
+from Pyro5.api import Daemon, expose
+
+from mycodo import mycodo_client
+from mycodo.mycodo_client import DaemonControl, LocalDaemonProxy, ProxyPool
+
+
+class FakeServer:
+    def __init__(self):
+        self.threads = []
+
+    def trigger_all_actions(self, function_id, message='', debug=False):
+        self.threads.append(threading.current_thread())
+        return f'{function_id}: {message}'
+
+    def controller_deactivate(self, cont_id):
+        self.threads.append(threading.current_thread())
+        return 0, f'{cont_id} deactivated'
+
+
+def test_calls_dispatched_directly(monkeypatch):
+    """Verify calls inside the daemon go to the server object, in a new thread only when they may wait on the caller."""
+    server = FakeServer()
+    monkeypatch.setattr(mycodo_client, 'local_daemon', server)
+    control = DaemonControl()
+    assert isinstance(control.proxy(), LocalDaemonProxy)
+
+    assert control.trigger_all_actions('trigger_1', message='on') == 'trigger_1: on'
+    assert server.threads[-1] is threading.current_thread()
+
+    assert control.controller_deactivate('conditional_1') == (0, 'conditional_1 deactivated')
+    assert server.threads[-1] is not threading.current_thread()
+
+    # Other daemons are still called through Pyro5
+    assert not isinstance(
+        DaemonControl(pyro_uri='PYRO:mycodo.pyro_server@10.0.0.2:9080', pyro_timeout=1).proxy(),
+        LocalDaemonProxy)
+
+
+@expose
+class EchoServer:
+    @staticmethod
+    def echo(value):
+        return value
+
+
+def start_server(port):
+    pyro_daemon = Daemon(host='127.0.0.1', port=port)
+    uri = pyro_daemon.register(EchoServer(), 'mycodo.pyro_server')
+    threading.Thread(target=pyro_daemon.requestLoop, daemon=True).start()
+    return pyro_daemon, str(uri)
+
+
+def test_proxy_pool_reuses_and_reconnects(monkeypatch):
+    """Verify calls reuse one connection, and reconnect when the connection was closed."""
+    pool = ProxyPool(max_idle=2, idle_sec=60)
+    monkeypatch.setattr(mycodo_client, 'proxy_pool', pool)
+    pyro_daemon, uri = start_server(0)
+
+    control = DaemonControl(pyro_uri=uri, pyro_timeout=5)
+    assert [control.proxy().echo(each_value) for each_value in range(5)] == list(range(5))
+    assert pool.stats['connections'] == 1
+    assert pool.stats['reuses'] == 4
+
+    # Calls from other threads use the same pooled connection
+    thread = threading.Thread(target=lambda: control.proxy().echo('thread'))
+    thread.start()
+    thread.join()
+    assert pool.stats['connections'] == 1
+
+    # A pooled connection closed by the daemon (e.g. when it restarted)
+    pool.idle[uri][0][0]._pyroConnection.sock.shutdown(socket.SHUT_RDWR)
+    assert control.proxy().echo('again') == 'again'
+    assert pool.stats['reconnects'] == 1
+    assert pool.stats['connections'] == 2
+    pyro_daemon.shutdown()
+    pool.clear()
+
+
+class ClosingProxy:
+    """Proxy whose connection is lost after the call was sent."""
+    def __init__(self):
+        self.calls = 0
+
+    def output_on(self, output_id, amount=None):
+        self.calls += 1
+        raise Pyro5.errors.ConnectionClosedError("receiving: connection lost")
+
+
+def test_proxy_pool_call_not_repeated():
+    """Verify a call that failed after it was sent isn't sent again, as the daemon may have run it."""
+    pool = ProxyPool(max_idle=2, idle_sec=60)
+    proxy = ClosingProxy()
+    pool.acquire = lambda uri: (proxy, True)
+
+    with pytest.raises(Pyro5.errors.ConnectionClosedError):
+        pool.call('PYRO:mycodo.pyro_server@127.0.0.1:9080', 5, 'output_on', ('output_1',), {'amount': 10})
+    assert proxy.calls == 1
+    assert pool.stats['reconnects'] == 0
+    assert not pool.idle
@@ -0,0 +1,52 @@
+# coding=utf-8
+"""Tests for the deadline scheduler."""
+import threading
+import time
+
+from mycodo.utils.deadline_scheduler import DeadlineScheduler
+
+
+def test_callbacks_run_in_deadline_order():
+    """Verify callbacks run once due, in order, and rescheduling or cancelling a key replaces its deadline."""
+    scheduler = DeadlineScheduler()
+    ran = []
+    scheduler.schedule(('output', 0), 0.03, ran.append, 'a')
+    scheduler.schedule(('output', 1), 0.01, ran.append, 'b')
+    scheduler.schedule(('output', 2), 0.02, ran.append, 'c')
+    scheduler.schedule(('output', 2), 0.04, ran.append, 'c2')
+    scheduler.schedule(('output', 3), 0.0, ran.append, 'd')
+    scheduler.cancel(('output', 3))
+    assert len(scheduler) == 3
+
+    timer = time.monotonic()
+    while len(scheduler):
+        scheduler.run_pending()
+    assert ran == ['b', 'a', 'c2']
+    assert time.monotonic() - timer >= 0.04
+    assert scheduler.seconds_until_next() is None
+
+    # An exception in a callback doesn't prevent the others running
+    scheduler.schedule('error', -1, lambda: 1 / 0)
+    scheduler.schedule('ok', -1, ran.append, 'e')
+    assert scheduler.run_pending() == 2
+    assert ran[-1] == 'e'
+
+
+def test_waiting_is_interrupted():
+    """Verify waiting ends when an earlier deadline is scheduled, or wake() is called."""
+    scheduler = DeadlineScheduler()
+    ran = []
+    scheduler.schedule('late', 60, ran.append, 'late')
+    assert 59 < scheduler.seconds_until_next() <= 60
+
+    threading.Timer(0.02, scheduler.schedule, args=('early', 0.01, ran.append, 'early')).start()
+    timer = time.monotonic()
+    while not ran:
+        scheduler.run_pending()
+    assert ran == ['early']
+    assert time.monotonic() - timer < 5
+
+    threading.Timer(0.02, scheduler.wake).start()
+    assert scheduler.run_pending() == 0
+    assert scheduler.run_pending(timeout=0.01) == 0
+    assert len(scheduler) == 1
@@ -0,0 +1,61 @@
+# coding=utf-8
+"""Tests for graph downsampling."""
+import math
+
+import pytest
+
+from mycodo.utils import downsample as downsample_module
+from mycodo.utils.downsample import downsample, downsample_options
+
+
+def make_points(count=5000, spike_index=1234):
+    points = [(1600000000.0 + index, math.sin(index / 100.0)) for index in range(count)]
+    points[spike_index] = (points[spike_index][0], 50.0)
+    return points
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax', 'mean'])
+def test_downsample_reduces_points(method):
+    """Verify each method returns at most the target number of points, in time order."""
+    points = make_points()
+    downsampled = downsample(points, method=method, target_points=500)
+    assert 250 <= len(downsampled) <= 500
+    times = [each_point[0] for each_point in downsampled]
+    assert times == sorted(times)
+
+    # Fewer points than the target are returned unchanged (without empty values)
+    assert downsample(points[:10] + [(0, None)], method=method, target_points=500) == [
+        list(each_point) for each_point in points[:10]]
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_keeps_spikes(method):
+    """Verify LTTB and min/max keep a single spike that the mean would hide."""
+    points = make_points()
+    assert max(each_point[1] for each_point in downsample(points, method=method, target_points=300)) == 50.0
+    assert max(each_point[1] for each_point in downsample(points, method='mean', target_points=300)) < 50.0
+
+    downsampled = downsample(points, method='lttb', target_points=300)
+    assert downsampled[0] == list(points[0])
+    assert downsampled[-1] == list(points[-1])
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax', 'mean'])
+def test_downsample_numpy_matches_python(method, monkeypatch):
+    """Verify the NumPy and pure Python implementations select the same points."""
+    pytest.importorskip('numpy')
+    points = make_points(count=3001)
+    with_numpy = downsample(points, method=method, target_points=401)
+    monkeypatch.setattr(downsample_module, 'get_numpy', lambda: None)
+    without_numpy = downsample(points, method=method, target_points=401)
+    assert len(with_numpy) == len(without_numpy)
+    for each_numpy, each_python in zip(with_numpy, without_numpy):
+        assert each_numpy == pytest.approx(each_python)
+
+
+def test_downsample_options():
+    """Verify invalid request arguments are replaced with defaults or limited."""
+    assert downsample_options('minmax', '1000') == ('minmax', 1000)
+    assert downsample_options('unknown', 'abc')[1] > 0
+    assert downsample_options('unknown', 'abc')[0] in downsample_module.DOWNSAMPLE_METHODS
+    assert downsample_options('mean', '1') == ('mean', 10)
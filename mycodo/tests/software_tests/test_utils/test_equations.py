@@ -0,0 +1,51 @@
+# coding=utf-8
+"""Tests for compiled equations."""
+import pytest
+
+from mycodo.config_devices_units import UNIT_CONVERSIONS
+from mycodo.utils.equations import compile_equation
+
+
+def test_equations_match_substituted_eval():
+    """Verify compiled equations give the same values as substituting and evaluating them."""
+    for _, _, equation in UNIT_CONVERSIONS:
+        for value in [-40, 0, 2.5, 1013.25]:
+            expected = eval(equation.replace('x', str(value)))
+            assert compile_equation(equation)(value) == pytest.approx(expected)
+
+    assert compile_equation('a*(2+b)', ('a', 'b'))(3, 4) == 18
+    assert compile_equation('sqrt(x) + math.log10(x) + max(x, 0, 2)')(100) == 112
+    assert compile_equation('(x*9/5)−459.67')(0) == pytest.approx(-459.67)
+    assert compile_equation('x*5+2') is compile_equation('x*5+2')
+
+
+def test_conditional_equations():
+    """Verify conditional expressions, comparisons, boolean operators, int(), and float() are evaluated."""
+    compiled = compile_equation('0 if x < 0 or x > 100 else int(x)')
+    assert [compiled(value) for value in [-5, 2.7, 101]] == [0, 2, 0]
+    assert compile_equation('float(1 < x <= 5 and not x == 3)')(4) == 1.0
+    assert compile_equation('a if a != b else b * 2', ('a', 'b'))(2, 2) == 4
+
+
+def test_invalid_equations_rejected():
+    """Verify equations using anything other than numbers, variables, operators, and math functions are rejected."""
+    for equation in ['', 'X*1000', 'y+1', '__import__("os")', 'x.real', 'math', 'math.system(x)',
+                     'open(x)', '(lambda: 1)()', 'x is 1', 'x in (1,)', '[x]', '"x"', 'x*', 'round(x, ndigits=1)']:
+        with pytest.raises(ValueError):
+            compile_equation(equation)
+
+
+def test_apply_array():
+    """Verify equations applied to arrays give the same values as applied to each value."""
+    np = pytest.importorskip('numpy')
+    values = np.linspace(-50, 150, 101)
+    for equation in ['(x-32)*5/9', 'abs(x)/2 + sqrt(abs(x))', 'min(x, 20, 100) + round(x, 1)', '5']:
+        compiled = compile_equation(equation)
+        np.testing.assert_allclose(compiled.apply_array(values), [compiled(value) for value in values])
+
+    for equation in ['int(x) + float(x)', '0 if x < 0 else x', 'float(x > 1 and not x > 100)', '1 if 2 > 1 else 0']:
+        compiled = compile_equation(equation)
+        np.testing.assert_allclose(compiled.apply_array(values), [compiled(value) for value in values])
+
+    compiled = compile_equation('a/b', ('a', 'b'))
+    np.testing.assert_allclose(compiled.apply_array([1, 2, 3], 2), [0.5, 1, 1.5])
@@ -0,0 +1,75 @@
+# coding=utf-8
+"""Tests for the last measurement store."""
+import datetime
+import time
+
+from mycodo.utils.last_measurement_store import LastMeasurementStore
+
+
+def test_store_returns_latest_value_within_max_age():
+    """Verify the newest value of a series is returned, and only if it's recent enough."""
+    store = LastMeasurementStore()
+    store.enabled = True
+    now = time.time()
+
+    store.update('ID_1', 'C', 0, 'temperature', 21.0, now - 100)
+    store.update('ID_1', 'C', 0, 'temperature', 22.0, time.time_ns())
+    store.update('ID_1', 'C', 0, 'temperature', 20.0, now - 50)  # Older, ignored
+
+    assert store.get('ID_1', 'C', 0, measure='temperature')[1] == 22.0
+    assert store.get('ID_1', 'C', '0', measure='temperature', max_age=10)[1] == 22.0
+    assert store.get('ID_1', 'C', 0)[1] == 22.0  # Any measure
+    assert store.get('ID_1', 'C', 1, measure='temperature') is None
+
+    store.update('ID_2', '%', 1, 'humidity', 50.0,
+                 datetime.datetime.utcnow() - datetime.timedelta(seconds=120))
+    assert store.get('ID_2', '%', 1, measure='humidity', max_age=60) is None
+    assert store.get('ID_2', '%', 1, measure='humidity', max_age=600)[1] == 50.0
+
+    stats = store.get_stats()
+    assert stats['series'] == 2
+    assert stats['misses'] == 2
+
+
+def test_store_disabled():
+    """Verify a disabled store doesn't record or return values."""
+    store = LastMeasurementStore()
+    store.update('ID_1', 'C', 0, 'temperature', 21.0)
+    assert store.get('ID_1', 'C', 0, measure='temperature') is None
+    assert store.get_stats()['series'] == 0
+
+
+def test_read_last_multi_uses_store_then_one_query(monkeypatch):
+    """Verify stored series aren't queried and the others are read with a single query, each with its max age."""
+    from mycodo.utils import influx
+
+    store = LastMeasurementStore()
+    store.enabled = True
+    monkeypatch.setattr(influx, 'last_measurement_store', store)
+    now = time.time()
+    store.update('ID_1', 'C', 0, 'temperature', 21.0, now - 5)
+
+    queries = []
+
+    def read_influxdb_multi(channels_data, past_seconds=None, value='LAST'):
+        queries.append((channels_data, past_seconds))
+        return {0: [now - 30, 55.0], 1: [now - 100, 10.0]}
+
+    monkeypatch.setattr(influx, 'read_influxdb_multi', read_influxdb_multi)
+    results = influx.read_last_influxdb_multi([
+        {'unique_id': 'ID_1', 'unit': 'C', 'channel': 0, 'measure': 'temperature', 'duration_sec': 60},
+        {'unique_id': 'ID_2', 'unit': '%', 'channel': 1, 'measure': 'humidity', 'duration_sec': 60},
+        {'unique_id': 'ID_3', 'unit': 'C', 'channel': 0, 'measure': None, 'duration_sec': 120}])
+
+    assert len(queries) == 1
+    assert [each_spec['unique_id'] for each_spec in queries[0][0]] == ['ID_2', 'ID_3']
+    assert queries[0][1] == 120
+    assert results[0] == [now - 5, 21.0]
+    assert results[1] == [now - 30, 55.0]
+    assert results[2] == [now - 100, 10.0]
+    assert store.get('ID_2', '%', 1, measure='humidity') is None  # Only the daemon's writes are stored
+
+    # Too old for its own max age
+    monkeypatch.setattr(influx, 'read_influxdb_multi', lambda channels_data, past_seconds=None: {0: [now - 100, 1.0]})
+    assert influx.read_last_influxdb_multi(
+        [{'unique_id': 'ID_4', 'unit': 'C', 'channel': 0, 'duration_sec': 60}])[0] == [None, None]
@@ -0,0 +1,68 @@
+# coding=utf-8
+"""Tests for the streaming measurement export."""
+import csv
+import gzip
+import io
+
+import pytest
+
+from mycodo.utils.measurement_export import (TIMESTAMP_COLUMN,
+                                             export_measurements_stream,
+                                             iter_aligned_windows)
+
+COLUMNS = ['Input CH0 temperature (ID_1)', 'Input CH1 humidity (ID_1)']
+
+
+def make_reader(rows):
+    reads = []
+
+    def read_window(start, end):
+        reads.append((start, end))
+        return [each_row for each_row in rows if start <= each_row[0] < end]
+    return read_window, reads
+
+
+def test_windows_align_series_on_timestamp():
+    """Verify each window is read separately and series are aligned on timestamp."""
+    rows = [(30.0, 1, 60.0), (0.0, 0, 20.0), (0.0, 1, 50.0), (150.0, 0, 21.0)]
+    read_window, reads = make_reader(rows)
+    windows = list(iter_aligned_windows(2, 0, 200, read_window, window_sec=100))
+    assert reads == [(0, 100), (100, 200)]
+    assert windows == [
+        [(0.0, [20.0, 50.0]), (30.0, [None, 60.0])],
+        [(150.0, [21.0, None])]
+    ]
+
+
+def test_csv_gzip_round_trip():
+    """Verify the gzip-compressed CSV contains every row, streamed in several chunks."""
+    rows = [(float(seconds), seconds % 2, seconds / 10.0) for seconds in range(0, 20000)]
+    read_window, _ = make_reader(rows)
+    chunks = list(export_measurements_stream(
+        COLUMNS, 0, 20000, read_window, file_format='csv_gzip', window_sec=5000))
+    assert len(chunks) > 1
+
+    reader = csv.reader(io.StringIO(gzip.decompress(b''.join(chunks)).decode('utf-8')))
+    assert next(reader) == [TIMESTAMP_COLUMN] + COLUMNS
+    exported = list(reader)
+    assert len(exported) == 20000
+    assert exported[3] == ['3.0', '', '0.3']
+
+
+@pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+def test_columnar_export(file_format):
+    """Verify Parquet and Arrow exports contain the aligned rows."""
+    pa = pytest.importorskip('pyarrow')
+    rows = [(0.0, 0, 20.0), (0.0, 1, 50.0), (150.0, 0, 21.0)]
+    read_window, _ = make_reader(rows)
+    data = b''.join(export_measurements_stream(
+        COLUMNS, 0, 200, read_window, file_format=file_format, window_sec=100))
+
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        table = pq.read_table(io.BytesIO(data))
+    else:
+        table = pa.ipc.open_stream(data).read_all()
+    assert table.column_names == [TIMESTAMP_COLUMN] + COLUMNS
+    assert table.column(COLUMNS[0]).to_pylist() == [20.0, 21.0]
+    assert table.column(COLUMNS[1]).to_pylist() == [50.0, None]
@@ -0,0 +1,106 @@
+# coding=utf-8
+"""Tests for the measurement rollup tiers."""
+import os
+
+from mycodo.utils.measurement_rollups import (MeasurementRollupWorker,
+                                              add_to_aggregate,
+                                              load_rollup_coverage,
+                                              new_aggregate, plan_segments)
+
+DAY = 86400
+SERIES = ('C', 'ID_1', '0', 'temperature')
+
+
+def test_plan_segments_uses_coarsest_tiers():
+    """Verify a period is split into raw, 1m, 1h, and 1d segments that exactly cover it."""
+    coverage = {'1m': (0, 10 * DAY), '1h': (0, 10 * DAY), '1d': (0, 5 * DAY)}
+    start = DAY + 3600 + 90.5
+    end = 6 * DAY + 7200 + 30
+
+    segments = plan_segments(start, end, coverage)
+    assert [each_segment[0] for each_segment in segments] == [None, '1m', '1h', '1d', '1h', None]
+    assert segments[0] == (None, start, DAY + 3600 + 120)
+    assert segments[3] == ('1d', 2 * DAY, 5 * DAY)
+    assert segments[-1] == (None, 6 * DAY + 7200, end)
+    for each_segment, next_segment in zip(segments, segments[1:]):
+        assert each_segment[2] == next_segment[1]
+
+    # Nothing covered
+    assert plan_segments(start, end, {}) == [(None, start, end)]
+
+
+def test_worker_rolls_up_tiers_from_raw(tmp_path):
+    """Verify each tier is calculated from the tier before it and matches the raw measurements."""
+    raw = [(SERIES, float(seconds), 1, seconds % 7, seconds % 7, seconds % 7)
+           for seconds in range(0, 2 * DAY, 30)]
+    stored = {'1m': {}, '1h': {}, '1d': {}}
+
+    def read_rows(source, start, end):
+        if source is None:
+            return [each_row for each_row in raw if start <= each_row[1] < end]
+        return [(series, seconds) + tuple(aggregate)
+                for (series, seconds), aggregate in stored[source].items() if start <= seconds < end]
+
+    def write_rollups(tier, aggregates):
+        stored[tier].update(aggregates)
+
+    path_state = os.path.join(str(tmp_path), 'rollups.json')
+    worker = MeasurementRollupWorker(
+        path_state, read_rows, write_rollups, backfill_sec=2 * DAY, delay_sec=0)
+    now = 2 * DAY + 30
+    while worker.step(now):
+        pass
+
+    coverage = load_rollup_coverage(path_state)
+    assert coverage['1m'] == (0, 2 * DAY)
+    assert coverage['1d'] == (0, 2 * DAY)
+    assert len(stored['1m']) == 2 * 24 * 60
+    assert len(stored['1d']) == 2
+
+    aggregate_raw = new_aggregate()
+    for each_row in raw[:DAY // 30]:
+        add_to_aggregate(aggregate_raw, *each_row[2:])
+    assert stored['1d'][(SERIES, 0)] == aggregate_raw
+
+    # Measurements written late are rolled up again
+    raw.append((SERIES, DAY + 15.0, 1, 100, 100, 100))
+    worker.rewind(DAY + 15)
+    assert load_rollup_coverage(path_state)['1h'] == (0, DAY)
+    while worker.step(now):
+        pass
+    assert stored['1d'][(SERIES, DAY)][3] == 100
+
+    # Measurements newer than the rolled up period don't rewind it
+    saved = []
+    worker.save_state = lambda: saved.append(1)
+    worker.rewind(now)
+    assert not saved
+    assert load_rollup_coverage(path_state)['1m'] == (0, 2 * DAY)
+
+
+def test_rewind_from_other_processes(monkeypatch):
+    """Verify a process other than the daemon asks the daemon to rewind rollups for points older than them."""
+    from mycodo.utils import influx
+
+    rewound = []
+
+    class DaemonControl:
+        def __init__(self, pyro_timeout=None):
+            pass
+
+        def measurement_rollups_rewind(self, seconds):
+            rewound.append(seconds)
+
+    monkeypatch.setattr(influx, 'MEASUREMENT_ROLLUP_ENABLED', True)
+    monkeypatch.setattr(influx, 'DaemonControl', DaemonControl)
+    monkeypatch.setattr(influx.measurement_rollup_worker, 'thread', None)
+    monkeypatch.setattr(influx.rollup_coverage_reader, 'get', lambda: {'1m': (0, 2 * DAY), '1h': (0, DAY)})
+
+    influx.rewind_rollups(2 * DAY + 10)
+    influx.rewind_rollups_for_lines([f'C,device_id=ID_1 value=1.0 {int(2 * DAY + 5) * 10 ** 9}',
+                                     f'C,device_id=ID_1 value=2.0 {int(DAY + 5) * 10 ** 9}'])
+    assert rewound == [DAY + 5]
+
+    monkeypatch.setattr(influx, 'MEASUREMENT_ROLLUP_ENABLED', False)
+    influx.rewind_rollups(5)
+    assert rewound == [DAY + 5]
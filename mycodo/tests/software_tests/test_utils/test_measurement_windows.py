@@ -0,0 +1,83 @@
+# coding=utf-8
+"""Tests for the rolling measurement windows."""
+import statistics
+import time
+
+import pytest
+
+from mycodo.utils.measurement_windows import (MeasurementWindow,
+                                              MeasurementWindowStore,
+                                              calculate_statistics)
+
+
+def test_window_statistics_as_points_expire():
+    """Verify the window's statistics match those calculated from the points still in the window."""
+    window = MeasurementWindow(10, 0)
+    values = [5.0, 1.0, 7.0, 3.0, 9.0, 2.0, 8.0, 4.0, 6.0, 0.5, 3.5, 2.5]
+    for seconds, value in enumerate(values):
+        window.add(float(seconds), value)
+    window.add(3.5, 11.0)  # Out of order
+
+    window.expire(14.0)  # Points older than 4 seconds expire
+    remaining = values[4:]
+    stats = window.get_statistics(median=True)
+    assert stats['count'] == len(remaining)
+    assert stats['sum'] == pytest.approx(sum(remaining))
+    assert stats['mean'] == pytest.approx(statistics.mean(remaining))
+    assert stats['stdev'] == pytest.approx(statistics.stdev(remaining))
+    assert stats['median'] == statistics.median(remaining)
+    assert stats['min'] == 0.5
+    assert stats['max'] == 9.0  # 11.0 at 3.5 seconds has expired
+
+    assert calculate_statistics([(float(s), v) for s, v in enumerate(values)])['max'] == 9.0
+
+
+def test_store_seeds_window_then_follows_writes():
+    """Verify a window is filled from the seed once, then updated by writes without seeding again."""
+    store = MeasurementWindowStore()
+    store.enabled = True
+    now = time.time()
+    seed_calls = []
+
+    def seed():
+        seed_calls.append(1)
+        return [(now - 50, 1.0), (now - 20, 3.0), (now - 5000, 100.0)]
+
+    assert store.get_statistics('ID_1', 'C', 0, 'temperature', 60, seed=seed)['mean'] == 2.0
+
+    store.update('ID_1', 'C', 0, 'temperature', 5.0, time.time_ns())
+    store.update('ID_1', 'C', 1, 'temperature', 50.0)  # Other series, ignored
+    stats = store.get_statistics('ID_1', 'C', '0', 'temperature', 60, seed=seed)
+    assert stats['count'] == 3
+    assert stats['sum'] == 9.0
+    assert len(seed_calls) == 1
+    assert store.get_stats()['hits'] == 1
+
+    # Without a seed, a new window isn't complete until it has collected max_age seconds
+    assert store.get_statistics('ID_1', 'C', 0, 'temperature', 600) is None
+
+
+def test_store_ignores_windows_not_written_by_daemon():
+    """Verify a window the daemon hasn't written to within its age isn't used after it's filled."""
+    store = MeasurementWindowStore()
+    store.enabled = True
+    now = time.time()
+
+    def seed():
+        return [(now - 30, 4.0)]
+
+    assert store.get_statistics('ID_2', 'C', 0, 'temperature', 60, seed=seed)['mean'] == 4.0
+    assert store.get_statistics('ID_2', 'C', 0, 'temperature', 60, seed=seed) is None  # Query the database
+
+    store.update('ID_2', 'C', 0, 'temperature', 6.0)
+    assert store.get_statistics('ID_2', 'C', 0, 'temperature', 60, seed=seed)['mean'] == 5.0
+
+    store.windows[('ID_2', 'C', '0', 'temperature', 60.0)].last_update = now - 61
+    assert store.get_statistics('ID_2', 'C', 0, 'temperature', 60, seed=seed) is None
+
+
+def test_store_disabled():
+    """Verify a disabled store doesn't create windows."""
+    store = MeasurementWindowStore()
+    assert store.get_statistics('ID_1', 'C', 0, 'temperature', 60, seed=lambda: []) is None
+    assert store.get_stats()['windows'] == 0
@@ -0,0 +1,114 @@
+# coding=utf-8
+"""Tests for the compiled method setpoint profiles."""
+import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from mycodo.utils import method as method_module
+from mycodo.utils.method import (DailyBezierMethod, MethodHandlerCache,
+                                 bezier_curve_y_out, create_method_handler,
+                                 load_method_handler)
+
+FIELDS = ['time_start', 'time_end', 'duration_sec', 'duration_end', 'output_id', 'setpoint_start',
+          'setpoint_end', 'amplitude', 'frequency', 'shift_angle', 'shift_y',
+          'x0', 'y0', 'x1', 'y1', 'x2', 'y2', 'x3', 'y3', 'linked_method_id']
+
+
+def method_data(**kwargs):
+    row = {each_field: None for each_field in FIELDS}
+    row.update(kwargs)
+    return SimpleNamespace(**row)
+
+
+def create_method(method_type, rows):
+    return create_method_handler(
+        SimpleNamespace(unique_id='method-1', method_type=method_type, name='Method'), rows)
+
+
+def test_date_and_daily_spans():
+    """Verify time spans are found and interpolated, with and without overlapping spans."""
+    method = create_method('Daily', [
+        method_data(time_start='06:00:00', time_end='12:00:00', setpoint_start=20.0, setpoint_end=30.0),
+        method_data(time_start='00:00:00', time_end='06:00:00', setpoint_start=10.0),
+        method_data(time_start='12:00:00', time_end='23:59:59', setpoint_start=30.0, setpoint_end=15.0)])
+    assert not method.spans_overlap
+    assert method.calculate_setpoint(datetime.datetime(2024, 5, 1, 9, 0, 0, 900000)) == (25.0, False)
+    assert method.calculate_setpoint(datetime.datetime(2024, 5, 1, 3, 0)) == (10.0, False)
+    assert method.calculate_setpoint(datetime.datetime(2024, 5, 1, 6, 0)) == (None, False)
+
+    method = create_method('Date', [
+        method_data(time_start='2024-01-01 00:00:00', time_end='2024-01-11 00:00:00', setpoint_start=0.0,
+                    setpoint_end=10.0),
+        method_data(time_start='2024-01-05 00:00:00', time_end='2024-01-06 00:00:00', setpoint_start=50.0),
+        method_data(time_start='bad', time_end='2024-01-06 00:00:00', setpoint_start=50.0)])
+    assert method.spans_overlap
+    # The first span in order of the method's data is used
+    assert method.calculate_setpoint(datetime.datetime(2024, 1, 5, 12)) == (4.5, False)
+    assert method.calculate_setpoint(datetime.datetime(2024, 2, 1)) == (None, False)
+
+
+def test_duration_rows_and_repeat():
+    """Verify the row of a duration method is found from the time since the method started."""
+    start = datetime.datetime(2024, 1, 1)
+    rows = [
+        method_data(duration_sec=100.0, setpoint_start=10.0, setpoint_end=20.0),
+        method_data(duration_sec=50.0, setpoint_start=20.0, setpoint_end=0.0),
+        method_data(duration_sec=0.0, duration_end=400.0)]
+    method = create_method('Duration', rows)
+    assert method.cycle_duration() == 150.0
+    assert method.repeat_duration() == 400.0
+    assert method.calculate_setpoint(start + datetime.timedelta(seconds=50), str(start)) == (15.0, False)
+    assert method.calculate_setpoint(start + datetime.timedelta(seconds=125), str(start)) == (10.0, False)
+    # Repeated, then ended after the repeat duration
+    assert method.calculate_setpoint(start + datetime.timedelta(seconds=200), str(start)) == (15.0, False)
+    assert method.calculate_setpoint(start + datetime.timedelta(seconds=400), str(start)) == (None, True)
+
+    method = create_method('Duration', rows[:2])
+    assert method.repeat_duration() is None
+    assert method.calculate_setpoint(start + datetime.timedelta(seconds=150), str(start)) == (None, True)
+
+
+def test_bezier_table_matches_curve():
+    """Verify the Bezier setpoint table and plot match solving the curve for each second."""
+    pytest.importorskip('numpy')
+    row = method_data(shift_angle=30.0, x0=20.0, y0=20.0, x1=10.0, y1=13.5, x2=15.0, y2=55.0, x3=0.0, y3=30.0)
+    method = create_method('DailyBezier', [row])
+    assert method.get_setpoint_table() is not None
+
+    for seconds in [0, 1, 7200, 43210, 64800, 86399]:
+        now = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=seconds, microseconds=500000)
+        expected = bezier_curve_y_out(
+            row.shift_angle, (row.x0, row.y0), (row.x1, row.y1), (row.x2, row.y2), (row.x3, row.y3), seconds)
+        assert method.calculate_setpoint(now)[0] == pytest.approx(expected, abs=1e-9)
+
+    plot = method.get_plot(700)
+    assert len(plot) == 700
+    assert plot[350][1] == pytest.approx(method.calculate_setpoint(datetime.datetime(1900, 1, 1, 12))[0])
+
+    sine = create_method('DailySine', [method_data(amplitude=10.0, frequency=1.0, shift_angle=0.0, shift_y=50.0)])
+    assert sine.get_plot(4)[1] == [21600000.0, pytest.approx(60.0)]
+
+
+def test_cached_bezier_table_built_once(monkeypatch):
+    """Verify the Bezier setpoint table of a cached method is built once, not for each load_method_handler()."""
+    pytest.importorskip('numpy')
+    row = method_data(shift_angle=0.0, x0=20.0, y0=20.0, x1=10.0, y1=13.5, x2=15.0, y2=55.0, x3=0.0, y3=30.0)
+    monkeypatch.setattr(method_module.config_cache, 'is_cached', lambda table: True)
+    monkeypatch.setattr(method_module, 'method_handler_cache', MethodHandlerCache())
+    monkeypatch.setattr(MethodHandlerCache, 'create',
+                        staticmethod(lambda method_id: create_method('DailyBezier', [row])))
+    builds = []
+    build_setpoint_table = DailyBezierMethod.build_setpoint_table
+
+    def count_builds(self):
+        builds.append(1)
+        return build_setpoint_table(self)
+
+    monkeypatch.setattr(DailyBezierMethod, 'build_setpoint_table', count_builds)
+    setpoints = []
+    for _ in range(2):
+        handler = load_method_handler('method-1')
+        setpoints.append(handler.calculate_setpoint(datetime.datetime(2024, 1, 1, 12))[0])
+    assert len(builds) == 1
+    assert setpoints[0] == setpoints[1]
@@ -0,0 +1,96 @@
+# coding=utf-8
+"""Tests for the module information registry."""
+import os
+
+import pytest
+
+from mycodo.utils.modules import (ModuleInformationRegistry, StaticParseError,
+                                  parse_information_static)
+
+
+def write_module(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_registry_reloads_changed_modules_only(tmp_path):
+    """Verify information is loaded once, reloaded when the file changes, and read back from disk."""
+    path_module = os.path.join(str(tmp_path), 'module_test.py')
+    path_cache = os.path.join(str(tmp_path), 'cache', 'module_information.pickle')
+    write_module(path_module, "TEST_INFORMATION = {'name_unique': 'test', 'value': 1}\n")
+
+    registry = ModuleInformationRegistry(path_cache, static_parse=False)
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['value'] == 1
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['value'] == 1
+    assert registry.stats['loads'] == 1
+    assert registry.stats['hits'] == 1
+    registry.save()
+
+    registry = ModuleInformationRegistry(path_cache, static_parse=False)
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['value'] == 1
+    assert registry.stats['disk_hits'] == 1
+    assert registry.stats['loads'] == 0
+
+    write_module(path_module, "TEST_INFORMATION = {'name_unique': 'test', 'value': 22}\n")
+    stat = os.stat(path_module)
+    os.utime(path_module, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['value'] == 22
+    assert registry.stats['loads'] == 1
+
+
+def test_registry_keeps_module_functions_in_memory(tmp_path):
+    """Verify information referencing the module's own functions isn't written to disk."""
+    path_module = os.path.join(str(tmp_path), 'module_function.py')
+    path_cache = os.path.join(str(tmp_path), 'module_information.pickle')
+    write_module(path_module, "def execute():\n    return 1\n\nTEST_INFORMATION = {'execute': execute}\n")
+
+    registry = ModuleInformationRegistry(path_cache, static_parse=False)
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['execute']() == 1
+    registry.save()
+
+    registry = ModuleInformationRegistry(path_cache, static_parse=False)
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['execute']() == 1
+    assert registry.stats['disk_hits'] == 0
+    assert registry.stats['loads'] == 1
+
+
+def test_static_parse_does_not_load_module(tmp_path):
+    """Verify information is read from the source without executing the module."""
+    path_module = os.path.join(str(tmp_path), 'module_static.py')
+    write_module(path_module, (
+        "from flask_babel import lazy_gettext\n"
+        "import module_that_does_not_exist\n"
+        "measurements_dict = {0: {'measurement': 'temperature', 'unit': 'C'}}\n"
+        "TEST_INFORMATION = {\n"
+        "    'name_unique': 'test',\n"
+        "    'name': '{}: {}'.format('Test', lazy_gettext('Name')),\n"
+        "    'measurements_dict': measurements_dict,\n"
+        "    'interfaces': ['I2C'] + ['UART']\n"
+        "}\n"))
+
+    information = parse_information_static(path_module, 'TEST_INFORMATION')
+    assert information['name'] == 'Test: Name'
+    assert information['measurements_dict'][0]['unit'] == 'C'
+    assert information['interfaces'] == ['I2C', 'UART']
+
+    registry = ModuleInformationRegistry(os.path.join(str(tmp_path), 'cache.pickle'))
+    assert registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['name_unique'] == 'test'
+    assert registry.stats['static_parses'] == 1
+    assert registry.stats['loads'] == 0
+
+
+def test_static_parse_falls_back_to_loading(tmp_path):
+    """Verify modules whose information depends on code are loaded."""
+    path_module = os.path.join(str(tmp_path), 'module_dynamic.py')
+    write_module(path_module, (
+        "measurements_dict = {}\n"
+        "for channel in range(2):\n"
+        "    measurements_dict[channel] = {'measurement': 'voltage', 'unit': 'V'}\n"
+        "TEST_INFORMATION = {'measurements_dict': measurements_dict}\n"))
+
+    with pytest.raises(StaticParseError):
+        parse_information_static(path_module, 'TEST_INFORMATION')
+
+    registry = ModuleInformationRegistry(os.path.join(str(tmp_path), 'cache.pickle'))
+    assert len(registry.get_information(path_module, 'inputs', 'TEST_INFORMATION')['measurements_dict']) == 2
+    assert registry.stats['loads'] == 1
@@ -0,0 +1,39 @@
+# coding=utf-8
+"""Tests for the MQTT topic index."""
+from mycodo.utils.mqtt_topics import TopicIndex
+
+
+def test_topic_index_matches_exact_and_wildcard_filters():
+    """Verify received topics are matched to subscriptions following the MQTT wildcard rules."""
+    index = TopicIndex({
+        0: 'home/kitchen/temperature',
+        1: 'home/+/humidity',
+        2: 'home/#',
+        3: '#',
+        4: 'home/kitchen/temperature',
+        5: '',
+        6: '$SYS/broker/load'
+    })
+
+    assert index.filters() == ['home/kitchen/temperature', 'home/+/humidity', 'home/#', '#', '$SYS/broker/load']
+    assert sorted(index.match('home/kitchen/temperature')) == [0, 2, 3, 4]
+    assert sorted(index.match('home/garage/humidity')) == [1, 2, 3]
+    assert sorted(index.match('home')) == [2, 3]
+    assert index.match('garden/soil') == [3]
+    assert sorted(index.match('home/garage/humidity/raw')) == [2, 3]
+
+    # Wildcards at the first level don't match topics beginning with '$'
+    assert index.match('$SYS/broker/load') == [6]
+    assert index.match('$SYS/broker/uptime') == []
+
+    # Matches of received topics are remembered
+    assert index.match('home/garage/humidity') is index.match('home/garage/humidity')
+
+
+def test_topic_index_cache_is_bounded():
+    """Verify the remembered matches are discarded once the cache is full."""
+    index = TopicIndex({'sensor': 'sensors/+/value'}, cache_size=10)
+    for number in range(25):
+        assert index.match(f'sensors/{number}/value') == ['sensor']
+    assert len(index.cache) <= 10
+    assert TopicIndex({'sensor': 'sensors/1/value'}).match('sensors/2/value') == []
@@ -0,0 +1,80 @@
+# coding=utf-8
+"""Tests for the batch PID simulation."""
+import logging
+from collections import deque
+
+import pytest
+
+from mycodo.utils.PID_hirschmann.pid_kettle import Kettle
+from mycodo.utils.pid_controller_default import PIDControl
+
+np = pytest.importorskip('numpy')
+
+from mycodo.utils.pid_sweep import fit_plant, kettle_plant, resample_history, simulate, sweep
+
+KETTLE = {'diameter': 35, 'volume': 40, 'heater_power': 6, 'ambient_temp': 20, 'sampletime': 5}
+
+
+def simulate_kettle(kp, ki, kd, setpoint, steps, delay):
+    """Simulate one PID controlling a kettle, one period at a time."""
+    pid = PIDControl(logging.getLogger(), setpoint, kp, ki, kd, 'raise', 0)
+    kettle = Kettle(KETTLE['diameter'], KETTLE['volume'], KETTLE['ambient_temp'])
+    delayed_temps = deque(maxlen=max(1, round(delay / KETTLE['sampletime'])))
+    delayed_temps.extend(delayed_temps.maxlen * [KETTLE['ambient_temp']])
+    sensor_temps = []
+    for _ in range(steps):
+        sensor_temps.append(delayed_temps[0])
+        pid.update_pid_output(delayed_temps[0])
+        seconds_on = min(max(pid.control_variable, 0), KETTLE['sampletime'])
+        kettle.heat(KETTLE['heater_power'] * seconds_on / KETTLE['sampletime'], KETTLE['sampletime'])
+        delayed_temps.append(kettle.cool(KETTLE['sampletime'], KETTLE['ambient_temp']))
+    return sensor_temps
+
+
+def test_simulation_matches_pid_controller():
+    """Verify simulating many gains at once matches the PID controller, one set at a time."""
+    plant = kettle_plant(delay=15, **KETTLE)
+    kp, ki, kd = np.array([0.5, 2.0, 8.0]), np.array([0.0, 0.01, 0.1]), np.array([0.0, 1.0, 5.0])
+    results = simulate(plant, kp, ki, kd, 65, KETTLE['ambient_temp'], 300, trajectories=True)
+
+    for index in range(3):
+        expected = simulate_kettle(kp[index], ki[index], kd[index], 65, 300, delay=15)
+        assert results['values'][index] == pytest.approx(expected)
+
+    # Without gains, the value never changes and never settles
+    results = simulate(plant, 0, 0, 0, 65, KETTLE['ambient_temp'], 100)
+    assert results['iae'][0] == pytest.approx(45 * 100 * KETTLE['sampletime'])
+    assert results['overshoot'][0] == 0
+    assert results['settling_time'][0] == np.inf
+
+
+def test_fit_and_sweep():
+    """Verify the plant is fitted from recorded output durations, and gains are ranked."""
+    plant = kettle_plant(delay=10, **KETTLE)
+    random = np.random.default_rng(1)
+    seconds_on = random.uniform(0, KETTLE['sampletime'], 400) * (random.uniform(size=400) > 0.3)
+    value = KETTLE['ambient_temp']
+    values = [value, value]
+    for each_seconds_on in seconds_on:
+        value = plant.a * value + plant.b * each_seconds_on / KETTLE['sampletime'] + plant.c
+        values.append(value)
+    # Measurements are read each period, one period late (the sensor delay)
+    measurements = [(1000 + index * 5, each_value) for index, each_value in enumerate(values[:-2])]
+    durations = [(1000 + index * 5, each_seconds_on) for index, each_seconds_on in enumerate(seconds_on)]
+
+    values, duty = resample_history(measurements, durations, KETTLE['sampletime'])
+    assert duty[:10] == pytest.approx(seconds_on[:10] / KETTLE['sampletime'])
+    fitted = fit_plant(values, duty, KETTLE['sampletime'], max_delay=30)
+    assert fitted.delay_steps == plant.delay_steps == 1
+    assert fitted[:3] == pytest.approx(plant[:3], rel=1e-6)
+
+    with pytest.raises(ValueError):
+        fit_plant(values, np.zeros(len(values)), KETTLE['sampletime'])
+
+    best = sweep(fitted, [0, 1, 4], [0, 0.005], [0, 2], 65, KETTLE['ambient_temp'], 300, top=3)
+    assert len(best) == 3
+    assert best[0]['kp'] > 0
+    assert [each['iae'] for each in best] == sorted(each['iae'] for each in best)
+    overshoot = sweep(fitted, [0, 1, 4], [0, 0.005], [0, 2], 65, KETTLE['ambient_temp'], 300,
+                      rank_by='overshoot', top=1)
+    assert overshoot[0]['overshoot'] == 0
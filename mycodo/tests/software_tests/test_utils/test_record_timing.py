@@ -0,0 +1,25 @@
+# coding=utf-8
+"""Tests for the timing accumulator used by controllers and Inputs."""
+from mycodo.utils import utils
+from mycodo.utils.utils import record_timing
+
+
+def test_record_timing(monkeypatch):
+    """Verify the count, last, average, and max durations are kept for each timed section."""
+    now = {'time': 10.0}
+    monkeypatch.setattr(utils.timeit, 'default_timer', lambda: now['time'])
+    timings = {}
+
+    for duration in [0.1, 0.3, 0.2]:
+        now['time'] += duration
+        timing = record_timing(timings, 'read', now['time'] - duration)
+    now['time'] += 0.5
+    record_timing(timings, 'actuate', now['time'] - 0.5)
+
+    assert timing is timings['read']
+    assert timing['count'] == 3
+    assert round(timing['last_ms'], 6) == 200
+    assert round(timing['avg_ms'], 6) == 200
+    assert round(timing['max_ms'], 6) == 300
+    assert timings['actuate']['count'] == 1
+    assert round(timings['actuate']['max_ms'], 6) == 500
@@ -0,0 +1,137 @@
+# coding=utf-8
+"""
+Loaded Action modules and ActionModule objects, reused each time an Action runs.
+
+Without the cache, every run of an Action loads its module file and creates a new
+ActionModule (which reads its options from the settings database). The daemon
+enables the cache at startup, after which each module file is loaded once (again
+only when the file changes) and each Action's ActionModule is created once, then
+reused until the Action (or its controller) is changed.
+
+Objects are discarded when the configuration cache is invalidated, which happens
+when the frontend commits changes to an Action and when a controller is activated.
+"""
+import logging
+import os
+import threading
+
+from mycodo.utils.modules import load_module_from_file
+
+logger = logging.getLogger("mycodo.action_runtime_cache")
+
+
+class ActionRuntimeCache:
+    """Action modules by file path and ActionModule objects by Action unique_id."""
+    def __init__(self, load_module=load_module_from_file):
+        self.load_module = load_module
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.modules = {}
+        self.instances = {}
+        self.action_information = None
+        self.stats = {
+            'hits': 0,
+            'module_loads': 0,
+            'instances_created': 0,
+            'invalidations': 0
+        }
+
+    def get_module(self, file_path):
+        """Return the loaded module of file_path (or None), loading it again only if the file changed."""
+        if not self.enabled:
+            module, _ = self.load_module(file_path, 'action')
+            return module
+
+        try:
+            mtime = os.stat(file_path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        entry = self.modules.get(file_path)
+        if entry and entry[0] == mtime:
+            return entry[1]
+
+        module, _ = self.load_module(file_path, 'action')
+        if module:
+            self.stats['module_loads'] += 1
+            with self.lock:
+                self.modules[file_path] = (mtime, module)
+        return module
+
+    def get_action_information(self, parse):
+        """Return the parsed Action information, only parsing with parse() once while enabled."""
+        if not self.enabled:
+            return parse()
+        if self.action_information is None:
+            self.action_information = parse()
+        return self.action_information
+
+    def run_action(self, action, module, value):
+        """
+        Run an Action with its ActionModule, creating it only if it isn't cached
+
+        :param action: Actions row
+        :param module: the Action's module, from get_module()
+        :param value: the object passed to run_action()
+        :return: the return value of run_action()
+        """
+        if not self.enabled:
+            return module.ActionModule(action).run_action(value)
+
+        entry = self.instances.get(action.unique_id)
+        if entry is None or entry['module'] is not module:
+            entry = {
+                'module': module,
+                'function_id': action.function_id,
+                'instance': module.ActionModule(action),
+                'lock': threading.Lock()
+            }
+            self.stats['instances_created'] += 1
+            with self.lock:
+                self.instances[action.unique_id] = entry
+        else:
+            self.stats['hits'] += 1
+
+        if entry['lock'].acquire(blocking=False):
+            try:
+                return entry['instance'].run_action(value)
+            finally:
+                entry['lock'].release()
+
+        # The Action is already running (e.g. fired again while it pauses), so don't share the object
+        self.stats['instances_created'] += 1
+        return module.ActionModule(action).run_action(value)
+
+    def invalidate(self, table_name=None, unique_id=None):
+        """
+        Discard ActionModule objects built from changed rows (a configuration cache listener)
+
+        :param table_name: table (__tablename__) of the changed rows, or None for any table
+        :param unique_id: unique_id (or list of unique_ids) of the changed rows. If None, all
+            objects are discarded.
+        """
+        with self.lock:
+            self.stats['invalidations'] += 1
+            if table_name in [None, 'actions']:
+                # An Action of a newly imported type may have been added
+                self.action_information = None
+
+            if unique_id is None:
+                self.instances.clear()
+                return
+
+            unique_ids = set(unique_id if isinstance(unique_id, (list, tuple, set)) else [unique_id])
+            for each_id, each_entry in list(self.instances.items()):
+                # A changed Action, or a changed controller the Action belongs to
+                if each_id in unique_ids or each_entry['function_id'] in unique_ids:
+                    del self.instances[each_id]
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        stats['modules'] = len(self.modules)
+        stats['instances'] = len(self.instances)
+        return stats
+
+
+action_runtime_cache = ActionRuntimeCache()
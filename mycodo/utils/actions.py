@@ -23,10 +23,14 @@ from mycodo.databases.models import Trigger
 from mycodo.databases.utils import session_scope
 from mycodo.devices.camera import camera_record
 from mycodo.mycodo_client import DaemonControl
+from mycodo.utils.action_runtime_cache import action_runtime_cache
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.database import db_retrieve_table_daemon
 from mycodo.utils.influx import get_last_measurement
 from mycodo.utils.influx import get_past_measurements
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.influx import get_past_statistics
+from mycodo.utils.modules import (load_module_information,
+                                  save_module_information)
 from mycodo.utils.system_pi import return_measurement_info
 
 logger = logging.getLogger("mycodo.actions")
@@ -71,7 +75,7 @@ def parse_action_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            function_action, status = load_module_from_file(full_path, 'actions')
+            function_action = load_module_information(full_path, 'actions', 'ACTION_INFORMATION')
 
             if not function_action or not hasattr(function_action, 'ACTION_INFORMATION'):
                 continue
@@ -100,6 +104,8 @@ def parse_action_information(exclude_custom=False):
             dict_actions = dict_has_value(dict_actions, function_action, 'dependencies_message')
             dict_actions = dict_has_value(dict_actions, function_action, 'custom_options')
 
+    save_module_information()
+
     return dict_actions
 
 
@@ -139,8 +145,7 @@ def get_condition_value(condition_id):
         logger.error("Must provide a Condition ID")
         return
 
-    sql_condition = db_retrieve_table_daemon(ConditionalConditions).filter(
-        ConditionalConditions.unique_id == condition_id).first()
+    sql_condition = config_cache.get(ConditionalConditions, condition_id)
 
     if not sql_condition:
         logger.error("Condition ID not found")
@@ -151,11 +156,9 @@ def get_condition_value(condition_id):
         device_id = sql_condition.measurement.split(',')[0]
         measurement_id = sql_condition.measurement.split(',')[1]
 
-        device_measurement = db_retrieve_table_daemon(
-            DeviceMeasurements, unique_id=measurement_id)
+        device_measurement = config_cache.get(DeviceMeasurements, measurement_id)
         if device_measurement:
-            conversion = db_retrieve_table_daemon(
-                Conversion, unique_id=device_measurement.conversion_id)
+            conversion = config_cache.get(Conversion, device_measurement.conversion_id)
         else:
             conversion = None
         channel, unit, measurement = return_measurement_info(
@@ -186,11 +189,9 @@ def get_condition_value(condition_id):
         device_id = sql_condition.measurement.split(',')[0]
         measurement_id = sql_condition.measurement.split(',')[1]
 
-        device_measurement = db_retrieve_table_daemon(
-            DeviceMeasurements, unique_id=measurement_id)
+        device_measurement = config_cache.get(DeviceMeasurements, measurement_id)
         if device_measurement:
-            conversion = db_retrieve_table_daemon(
-                Conversion, unique_id=device_measurement.conversion_id)
+            conversion = config_cache.get(Conversion, device_measurement.conversion_id)
         else:
             conversion = None
         channel, unit, measurement = return_measurement_info(
@@ -212,19 +213,19 @@ def get_condition_value(condition_id):
             else:
                 return_measurement = None
         elif sql_condition.condition_type == 'measurement_past_average':
-            measurement_list = []
-            past_measurements = get_past_measurements(
-                device_id, measurement_id, max_age=max_age)
-            for each_set in past_measurements:
-                measurement_list.append(float(each_set[1]))
-            return_measurement = sum(measurement_list) / len(measurement_list)
+            past_statistics = get_past_statistics(
+                device_id, measurement_id, max_age)
+            if past_statistics is not None:
+                return_measurement = past_statistics['mean']
+            else:
+                return_measurement = None
         elif sql_condition.condition_type == 'measurement_past_sum':
-            measurement_list = []
-            past_measurements = get_past_measurements(
-                device_id, measurement_id, max_age=max_age)
-            for each_set in past_measurements:
-                measurement_list.append(float(each_set[1]))
-            return_measurement = sum(measurement_list)
+            past_statistics = get_past_statistics(
+                device_id, measurement_id, max_age)
+            if past_statistics is not None:
+                return_measurement = past_statistics['sum']
+            else:
+                return_measurement = None
         else:
             return
 
@@ -246,8 +247,7 @@ def get_condition_value(condition_id):
     elif sql_condition.condition_type == 'output_state':
         output_id = sql_condition.output_id.split(",")[0]
         channel_id = sql_condition.output_id.split(",")[1]
-        channel = db_retrieve_table_daemon(OutputChannel).filter(
-            OutputChannel.unique_id == channel_id).first()
+        channel = config_cache.get(OutputChannel, channel_id)
         control = DaemonControl()
         return control.output_state(output_id, output_channel=channel.channel)
 
@@ -255,8 +255,7 @@ def get_condition_value(condition_id):
     elif sql_condition.condition_type == 'output_duration_on':
         output_id = sql_condition.output_id.split(",")[0]
         channel_id = sql_condition.output_id.split(",")[1]
-        channel = db_retrieve_table_daemon(OutputChannel).filter(
-            OutputChannel.unique_id == channel_id).first()
+        channel = config_cache.get(OutputChannel, channel_id)
         control = DaemonControl()
         return control.output_sec_currently_on(output_id, output_channel=channel.channel)
 
@@ -276,8 +275,7 @@ def get_condition_value_dict(condition_id):
         logger.error("Must provide a Condition ID")
         return
 
-    sql_condition = db_retrieve_table_daemon(ConditionalConditions).filter(
-        ConditionalConditions.unique_id == condition_id).first()
+    sql_condition = config_cache.get(ConditionalConditions, condition_id)
 
     if not sql_condition:
         logger.error("Condition ID not found")
@@ -289,11 +287,9 @@ def get_condition_value_dict(condition_id):
         measurement_id = sql_condition.measurement.split(',')[1]
         max_age = sql_condition.max_age
 
-        device_measurement = db_retrieve_table_daemon(
-            DeviceMeasurements, unique_id=measurement_id)
+        device_measurement = config_cache.get(DeviceMeasurements, measurement_id)
         if device_measurement:
-            conversion = db_retrieve_table_daemon(
-                Conversion, unique_id=device_measurement.conversion_id)
+            conversion = config_cache.get(Conversion, device_measurement.conversion_id)
         else:
             conversion = None
         channel, unit, measurement = return_measurement_info(
@@ -331,6 +327,17 @@ def action_video(cond_action, message):
         return message, None
 
 
+def enable_action_runtime_cache():
+    """Reuse loaded Action modules and ActionModule objects, discarding them when settings change."""
+    action_runtime_cache.enabled = True
+    config_cache.add_listener(action_runtime_cache.invalidate)
+
+
+def get_action_information():
+    """Return parse_action_information(), only parsed once in the daemon."""
+    return action_runtime_cache.get_action_information(parse_action_information)
+
+
 def trigger_action(
         dict_actions,
         action_id,
@@ -346,7 +353,7 @@ def trigger_action(
 
     :return: dict with 'message' as a key
     """
-    action = db_retrieve_table_daemon(Actions, unique_id=action_id)
+    action = config_cache.get(Actions, action_id)
     if not value or 'message' not in value:
         message = ''
     else:
@@ -364,23 +371,21 @@ def trigger_action(
     else:
         logger_actions.setLevel(logging.INFO)
 
-    # Set up function action to run from standalone action module file
-    run_function_action = None
+    # Run the action from its standalone action module file
     if action.action_type in dict_actions:
         message += "\n[Action {id}, {name}]:".format(
             id=action.unique_id.split('-')[0],
             name=dict_actions[action.action_type]['name'])
         try:
-            action_loaded, status = load_module_from_file(
-                dict_actions[action.action_type]['file_path'], 'action')
+            action_loaded = action_runtime_cache.get_module(
+                dict_actions[action.action_type]['file_path'])
             if action_loaded:
-                run_function_action = action_loaded.ActionModule(action)
-                value = run_function_action.run_action(value)
+                value = action_runtime_cache.run_action(action, action_loaded, value)
 
                 if value and "message" in value:
                     message = value["message"]
         except:
-            message += " Exception executing action: {}".format(traceback.print_exc())
+            message += " Exception executing action: {}".format(traceback.format_exc())
 
     logger_actions.debug("Message: {}".format(message))
 
@@ -389,8 +394,7 @@ def trigger_action(
 
 def run_input_actions(unique_id, message, measurements_dict, debug=False):
     control = DaemonControl()
-    actions = db_retrieve_table_daemon(Actions).filter(
-        Actions.function_id == unique_id).all()
+    actions = config_cache.filter_by(Actions, function_id=unique_id)
 
     for each_action in actions:
         try:
@@ -430,10 +434,8 @@ def trigger_controller_actions(dict_actions, controller_id, message='', debug=Fa
     else:
         logger_actions.setLevel(logging.INFO)
 
-    actions = db_retrieve_table_daemon(Actions)
-    actions = actions.filter(
-        Actions.function_id == controller_id).all()
-    
+    actions = config_cache.filter_by(Actions, function_id=controller_id)
+
     dict_return = {'message': message}
 
     for each_action in actions:
@@ -0,0 +1,273 @@
+# coding=utf-8
+"""
+In-memory cache of rarely-changing settings rows read by daemon loops.
+
+The daemon enables the cache at startup. Rows are loaded from the settings
+database once per table and served from memory until the table (or a single
+row, by unique_id) is invalidated, either by the daemon's own commits, by the
+refresh/restart paths of the daemon, or by the frontend over Pyro after it
+commits changes.
+
+When the cache is not enabled (e.g. in the frontend), every lookup falls
+through to the database, so the same helpers can be used in any process.
+
+Rows returned from the cache are shared, detached objects and must not be modified.
+"""
+import logging
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from mycodo.databases.models import (PID, Actions, ConditionalConditions,
+                                     Conversion, DeviceMeasurements, Method,
+                                     MethodData, OutputChannel, Trigger)
+from mycodo.utils.database import db_retrieve_table_daemon
+
+logger = logging.getLogger("mycodo.config_cache")
+
+# Tables held in the cache
+CACHED_TABLES = [
+    Actions,
+    ConditionalConditions,
+    Conversion,
+    DeviceMeasurements,
+    Method,
+    MethodData,
+    OutputChannel,
+    PID,
+    Trigger
+]
+
+
+class ConfigCache:
+    """Read-mostly cache of settings rows, indexed by unique_id and by filter columns."""
+    def __init__(self, tables):
+        self.tables = {each_table.__tablename__: each_table for each_table in tables}
+        self.lock = threading.RLock()
+        self.enabled = False
+        self.cache = {}
+        self.listeners = []
+        self.generation = 0  # Incremented on every invalidation, to detect changes
+        self.stats = {
+            'hits': 0,
+            'loads': 0,
+            'invalidations': 0
+        }
+
+    def is_cached(self, table):
+        return self.enabled and table.__tablename__ in self.tables
+
+    def populate(self):
+        """Enable the cache and load all cached tables."""
+        with self.lock:
+            self.enabled = True
+            for each_table in self.tables.values():
+                self._load_table(each_table)
+
+    def _store(self, table_name, rows):
+        # Replace the table's entry as a whole, so readers never see a partial update
+        self.cache[table_name] = {
+            'rows': rows,
+            'by_unique_id': {each_row.unique_id: each_row for each_row in rows},
+            'indexes': {}
+        }
+        return self.cache[table_name]
+
+    def _load_table(self, table):
+        rows = db_retrieve_table_daemon(table, entry='all')
+        if rows is None:
+            # Don't cache a failed read
+            return None
+        self.stats['loads'] += 1
+        return self._store(table.__tablename__, rows)
+
+    def _table(self, table):
+        entry = self.cache.get(table.__tablename__)
+        if entry is None:
+            with self.lock:
+                entry = self.cache.get(table.__tablename__)
+                if entry is None:
+                    entry = self._load_table(table)
+        return entry
+
+    def all(self, table):
+        """Return all rows of a table."""
+        entry = self._table(table) if self.is_cached(table) else None
+        if entry is None:
+            return db_retrieve_table_daemon(table, entry='all')
+        self.stats['hits'] += 1
+        return list(entry['rows'])
+
+    def get(self, table, unique_id):
+        """Return the row with a unique_id, or None."""
+        if not unique_id:
+            return None
+        entry = self._table(table) if self.is_cached(table) else None
+        if entry is None:
+            return db_retrieve_table_daemon(table, unique_id=unique_id)
+        self.stats['hits'] += 1
+        return entry['by_unique_id'].get(unique_id)
+
+    def filter_by(self, table, **kwargs):
+        """Return a list of rows whose columns equal the keyword arguments."""
+        entry = self._table(table) if self.is_cached(table) else None
+        if entry is None:
+            return db_retrieve_table_daemon(table).filter_by(**kwargs).all()
+
+        keys = tuple(sorted(kwargs))
+        index = entry['indexes'].get(keys)
+        if index is None:
+            index = {}
+            for each_row in entry['rows']:
+                row_values = tuple(getattr(each_row, each_key) for each_key in keys)
+                index.setdefault(row_values, []).append(each_row)
+            entry['indexes'][keys] = index
+
+        self.stats['hits'] += 1
+        return list(index.get(tuple(kwargs[each_key] for each_key in keys), []))
+
+    def first_by(self, table, **kwargs):
+        """Return the first row whose columns equal the keyword arguments, or None."""
+        rows = self.filter_by(table, **kwargs)
+        if rows:
+            return rows[0]
+
+    def add_listener(self, listener):
+        """Call listener(table_name, unique_id) after every invalidation, to discard objects built from rows."""
+        self.listeners.append(listener)
+
+    def invalidate(self, table_name=None, unique_id=None):
+        """
+        Discard cached rows
+
+        :param table_name: Table (__tablename__) to invalidate. If None, all tables are invalidated
+            (or, if unique_id is set, the row with that unique_id in any table).
+        :param unique_id: unique_id (or list of unique_ids) of the row(s) to reload. If None,
+            the whole table is invalidated.
+        """
+        try:
+            self._invalidate(table_name=table_name, unique_id=unique_id)
+        finally:
+            for each_listener in self.listeners:
+                try:
+                    each_listener(table_name, unique_id)
+                except Exception:
+                    logger.exception("Cache invalidation listener error")
+
+    def _invalidate(self, table_name=None, unique_id=None):
+        if table_name is not None and table_name not in self.tables:
+            return
+
+        with self.lock:
+            self.stats['invalidations'] += 1
+            self.generation += 1
+
+            if unique_id is None:
+                if table_name is None:
+                    self.cache.clear()
+                else:
+                    self.cache.pop(table_name, None)
+                return
+
+            unique_ids = unique_id if isinstance(unique_id, (list, tuple, set)) else [unique_id]
+            if table_name is None:
+                table_names = [
+                    each_table_name for each_table_name, each_entry in self.cache.items()
+                    if any(each_id in each_entry['by_unique_id'] for each_id in unique_ids)]
+            else:
+                table_names = [table_name]
+
+            for each_table_name in table_names:
+                entry = self.cache.get(each_table_name)
+                if entry is None:
+                    continue  # Not loaded, will be read when next used
+                rows = [each_row for each_row in entry['rows']
+                        if each_row.unique_id not in unique_ids]
+                for each_id in unique_ids:
+                    row = db_retrieve_table_daemon(self.tables[each_table_name], unique_id=each_id)
+                    if row is not None:
+                        rows.append(row)
+                rows.sort(key=lambda row: row.id)
+                self._store(each_table_name, rows)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        stats['tables'] = {
+            each_table_name: len(each_entry['rows'])
+            for each_table_name, each_entry in list(self.cache.items())}
+        return stats
+
+
+config_cache = ConfigCache(CACHED_TABLES)
+
+
+def session_changed_rows(session, tables):
+    """Return {table name: set of unique_ids} for cached rows added, modified, or deleted in a session."""
+    changed = {}
+    for each_obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table_name = getattr(each_obj, '__tablename__', None)
+        if table_name in tables:
+            changed.setdefault(table_name, set()).add(getattr(each_obj, 'unique_id', None))
+    return changed
+
+
+def track_session_changes(session_target, on_commit, tables=None):
+    """
+    Call on_commit(changed) after a session commits changes to cached tables
+
+    :param session_target: Session class, sessionmaker, scoped_session, or Session to listen to
+    :param on_commit: function receiving {table name: set of unique_ids}
+    :param tables: table names to track (default: the cached tables)
+    """
+    if tables is None:
+        tables = config_cache.tables
+    info_key = ('config_cache_changed', id(on_commit))  # Separate for each listener of a session
+
+    def after_flush(session, flush_context):
+        changed = session.info.setdefault(info_key, {})
+        for table_name, unique_ids in session_changed_rows(session, tables).items():
+            changed.setdefault(table_name, set()).update(unique_ids)
+
+    def do_orm_execute(orm_execute_state):
+        # Bulk UPDATE/DELETE statements (e.g. query.delete()) don't flush the rows they change
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        mapper = orm_execute_state.bind_mapper
+        table_name = getattr(mapper.class_, '__tablename__', None) if mapper is not None else None
+        if table_name in tables:
+            changed = orm_execute_state.session.info.setdefault(info_key, {})
+            changed.setdefault(table_name, set()).add(None)  # Unknown rows: the whole table
+
+    def after_commit(session):
+        changed = session.info.pop(info_key, None)
+        if changed:
+            try:
+                on_commit(changed)
+            except Exception:
+                logger.exception("Could not invalidate cached settings")
+
+    def after_rollback(session):
+        session.info.pop(info_key, None)
+
+    event.listen(session_target, 'after_flush', after_flush)
+    event.listen(session_target, 'do_orm_execute', do_orm_execute)
+    event.listen(session_target, 'after_commit', after_commit)
+    event.listen(session_target, 'after_soft_rollback', lambda session, previous_transaction: after_rollback(session))
+
+
+def invalidate_changed(changed, invalidate):
+    """Invalidate changed rows (whole table if any new/unknown unique_id or many rows)."""
+    for table_name, unique_ids in changed.items():
+        if not unique_ids or not all(unique_ids) or len(unique_ids) > 20:
+            invalidate(table_name=table_name)
+        else:
+            invalidate(table_name=table_name, unique_id=list(unique_ids))
+
+
+def enable_config_cache():
+    """Populate the cache and keep it in sync with the daemon's own commits."""
+    config_cache.populate()
+    track_session_changes(
+        Session, lambda changed: invalidate_changed(changed, config_cache.invalidate))
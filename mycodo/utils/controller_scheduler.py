@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+Run the loop() of many controllers from a pool of worker threads, each when it's due.
+
+Rather than each controller's thread waking every sample period to check its timer, a
+controller is added to the scheduler once initialized, and its loop() is run when the
+time returned by its next_loop_time() is reached. A controller's loop() never runs on
+two workers at once. Controllers are woken (wake()) when stopped or when their timer is
+changed from outside loop(), and waiting is capped at CONTROLLER_SCHEDULER_MAX_WAIT_SEC
+so a timer changed without waking the controller is still noticed.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import Pyro5
+
+from mycodo.config import CONTROLLER_SCHEDULER_MAX_WAIT_SEC
+from mycodo.config import CONTROLLER_SCHEDULER_WORKERS
+from mycodo.utils.deadline_scheduler import DeadlineScheduler
+
+logger = logging.getLogger("mycodo.controller_scheduler")
+
+
+class ControllerScheduler:
+    """
+    Runs the loops of controllers when due
+
+    :param workers: number of worker threads running loops
+    :param max_wait: the most seconds to wait before checking a controller's next due time
+    """
+    def __init__(self, workers=CONTROLLER_SCHEDULER_WORKERS, max_wait=CONTROLLER_SCHEDULER_MAX_WAIT_SEC):
+        self.workers = workers
+        self.max_wait = max_wait
+        self.deadlines = DeadlineScheduler()
+        self.executor = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.busy = set()  # Controllers with loop() running, or waiting for a worker
+        self.woken = set()  # Busy controllers woken, to run again once loop() returns
+
+    def __len__(self):
+        return len(self.deadlines) + len(self.busy)
+
+    def add(self, controller):
+        """Run loop() of an initialized controller now, then whenever it's due, until it stops running."""
+        with self.lock:
+            if self.thread is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix='controller_scheduler')
+                self.thread = threading.Thread(target=self.run, name='controller_scheduler', daemon=True)
+                self.thread.start()
+            self.deadlines.schedule(controller, 0, self.dispatch, controller)
+
+    def wake(self, controller):
+        """Run loop() of a controller as soon as possible (e.g. when its timer changed, or it's stopping)."""
+        with self.lock:
+            if controller in self.busy:
+                self.woken.add(controller)
+            else:
+                self.deadlines.schedule(controller, 0, self.dispatch, controller)
+
+    def run(self):
+        while True:
+            self.deadlines.run_pending()
+
+    def dispatch(self, controller):
+        with self.lock:
+            if controller in self.busy:
+                self.woken.add(controller)
+                return
+            self.busy.add(controller)
+        self.executor.submit(self.run_loop, controller)
+
+    def run_loop(self, controller):
+        """Run loop() of a controller once, then schedule it for when it's next due, or finish it if stopped."""
+        delay = self.max_wait
+        try:
+            if controller.running:
+                try:
+                    controller.loop()
+                except Pyro5.errors.TimeoutError:
+                    controller.logger.exception("Pyro5 TimeoutError")
+                except Exception:
+                    controller.logger.exception("loop() Error")
+
+            if controller.running:
+                next_time = controller.next_loop_time()
+                if next_time is not None:
+                    delay = min(max(next_time - time.time(), 0), self.max_wait)
+            else:
+                controller.finish()
+        except Exception:
+            logger.exception(f"Error running controller {controller.unique_id}")
+        finally:
+            with self.lock:
+                self.busy.discard(controller)
+                if controller in self.woken:
+                    self.woken.discard(controller)
+                    delay = 0
+                if not controller.stopped.is_set():
+                    # Also when stopped since running was checked above: the next run finishes it
+                    if not controller.running:
+                        delay = 0
+                    self.deadlines.schedule(controller, delay, self.dispatch, controller)
+
+
+controller_scheduler = ControllerScheduler()
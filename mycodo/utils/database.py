@@ -10,6 +10,10 @@ from mycodo.databases.utils import session_scope
 
 logger = logging.getLogger("mycodo.database")
 
+# Attempts to read a locked database (each attempt already waits for SQLite's busy timeout)
+DB_LOCKED_TRIES = 2
+DB_LOCKED_BACKOFF_SEC = 0.5
+
 
 def db_retrieve_table(table, entry=None, unique_id=None):
     """
@@ -50,7 +54,7 @@ def db_retrieve_table_daemon(
     If device_id is set, the first entry with that device ID is returned.
     Otherwise, the table object is returned.
     """
-    tries = 5
+    tries = DB_LOCKED_TRIES
     while tries > 0:
         try:
             with session_scope(MYCODO_DB_PATH) as new_session:
@@ -72,22 +76,16 @@ def db_retrieve_table_daemon(
                     return_table = return_table.all()
 
                 new_session.expunge_all()
-                new_session.close()
             return return_table
-        except OperationalError:
-            pass
-        except sqlalchemy.exc.OperationalError:
-            pass
-
-        if tries == 1:
-            logger.exception(
-                "Could not read the Mycodo database. "
-                "Please submit a New Issue at "
-                "https://github.com/kizniche/Mycodo/issues/new")
-        else:
-            logger.error(
-                "The Mycodo database is locked. "
-                "Trying to access again in 1 second...")
-
-        time.sleep(1)
-        tries -= 1
+        except (OperationalError, sqlalchemy.exc.OperationalError) as err:
+            # SQLite already waited busy_timeout for the lock (see session_scope()),
+            # so only retry a lock error, with a short backoff, before giving up.
+            tries -= 1
+            if 'locked' not in str(err) or tries == 0:
+                logger.exception(
+                    "Could not read the Mycodo database. "
+                    "Please submit a New Issue at "
+                    "https://github.com/kizniche/Mycodo/issues/new")
+                return None
+            logger.error("The Mycodo database is locked. Trying to access again...")
+            time.sleep(DB_LOCKED_BACKOFF_SEC * (DB_LOCKED_TRIES - tries))
@@ -0,0 +1,109 @@
+# coding=utf-8
+"""
+Run callbacks at deadlines, held in a min-heap ordered by deadline.
+
+The thread running the scheduler waits until the earliest deadline, or until an
+earlier deadline is scheduled, rather than polling. Callbacks therefore run close to
+their deadline, and a scheduler with no deadlines due doesn't wake, however many
+deadlines it holds.
+
+Each deadline has a key, and scheduling a key again replaces its previous deadline
+(e.g. when an output's duration on is extended).
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger("mycodo.deadline_scheduler")
+
+REMOVED = object()
+
+
+class DeadlineScheduler:
+    """Callbacks to run at deadlines, one deadline per key"""
+    def __init__(self):
+        self.heap = []
+        self.entries = {}  # key: heap entry of the key's deadline
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def schedule(self, key, delay, callback, *args):
+        """
+        Run callback(*args) in delay seconds, replacing the deadline of key
+
+        :param key: hashable identifying the deadline
+        :param delay: seconds from now (run as soon as possible if negative)
+        """
+        entry = [time.monotonic() + delay, next(self.counter), key, callback, args]
+        with self.condition:
+            previous = self.entries.get(key)
+            if previous is not None:
+                previous[2] = REMOVED
+            self.entries[key] = entry
+            heapq.heappush(self.heap, entry)
+            if self.heap[0] is entry:
+                # Earlier than the deadline being waited for
+                self.condition.notify_all()
+
+    def cancel(self, key):
+        """Remove the deadline of key, if scheduled."""
+        with self.condition:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                entry[2] = REMOVED
+
+    def seconds_until_next(self):
+        """Return the seconds until the earliest deadline (negative if past), or None if there are none."""
+        with self.condition:
+            self._discard_removed()
+            if self.heap:
+                return self.heap[0][0] - time.monotonic()
+
+    def wake(self):
+        """Return from run_pending() without waiting for the next deadline (e.g. when stopping)."""
+        with self.condition:
+            self.condition.notify_all()
+
+    def run_pending(self, timeout=None):
+        """
+        Wait until the earliest deadline, then run every callback that's due
+
+        :param timeout: the most seconds to wait (None: until a deadline or wake())
+        :return: the number of callbacks run
+        """
+        with self.condition:
+            due = self._pop_due()
+            if not due:
+                self._discard_removed()
+                wait = timeout
+                if self.heap:
+                    until_next = self.heap[0][0] - time.monotonic()
+                    wait = until_next if timeout is None else min(until_next, timeout)
+                self.condition.wait(wait)
+                due = self._pop_due()
+
+        for callback, args in due:
+            try:
+                callback(*args)
+            except Exception:
+                logger.exception(f"Error running scheduled {getattr(callback, '__name__', callback)}{args}")
+        return len(due)
+
+    def _discard_removed(self):
+        while self.heap and self.heap[0][2] is REMOVED:
+            heapq.heappop(self.heap)
+
+    def _pop_due(self):
+        due = []
+        now = time.monotonic()
+        while self.heap and self.heap[0][0] <= now:
+            _, _, key, callback, args = heapq.heappop(self.heap)
+            if key is not REMOVED:
+                del self.entries[key]
+                due.append((callback, args))
+        return due
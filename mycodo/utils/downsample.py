@@ -0,0 +1,156 @@
+# coding=utf-8
+"""
+Reduce a series of (time, value) points to a number of points that can be graphed.
+
+lttb: Largest-Triangle-Three-Buckets, keeps the points that preserve the visual shape
+minmax: the minimum and maximum of each bucket, keeps every spike and dip
+mean: the mean of each bucket (the previous behavior, smooths spikes away)
+
+NumPy is used when it's installed, otherwise the same algorithms run in pure Python.
+"""
+import math
+
+from mycodo.config import (GRAPH_DOWNSAMPLE_METHOD, GRAPH_DOWNSAMPLE_POINTS,
+                           GRAPH_DOWNSAMPLE_POINTS_MAX)
+from mycodo.utils.utils import get_numpy
+
+DOWNSAMPLE_METHODS = ['lttb', 'minmax', 'mean']
+
+
+def downsample_options(method=None, points=None):
+    """Return a valid (method, target points) from request arguments, using the defaults for invalid values."""
+    if method not in DOWNSAMPLE_METHODS:
+        method = GRAPH_DOWNSAMPLE_METHOD
+    try:
+        points = min(max(int(points), 10), GRAPH_DOWNSAMPLE_POINTS_MAX)
+    except (TypeError, ValueError):
+        points = GRAPH_DOWNSAMPLE_POINTS
+    return method, points
+
+
+def bucket_edges(count, buckets):
+    """Return the index of the first point of each of buckets buckets, and count."""
+    return [int(math.floor(each_bucket * count / buckets)) for each_bucket in range(buckets)] + [count]
+
+
+def downsample(points, method='lttb', target_points=700):
+    """
+    Return at most target_points points representing points
+
+    :param points: list of (time, value), in time order, values may be None
+    :param method: one of DOWNSAMPLE_METHODS
+    :param target_points: the maximum number of points to return
+    :return: list of [time, value]
+    """
+    points = [each_point for each_point in points if each_point[1] is not None]
+    target_points = int(target_points)
+    if len(points) <= target_points or target_points < 3:
+        return [[each_time, each_value] for each_time, each_value in points]
+
+    if method == 'minmax':
+        return downsample_min_max(points, target_points)
+    elif method == 'mean':
+        return downsample_mean(points, target_points)
+    return downsample_lttb(points, target_points)
+
+
+def downsample_lttb(points, target_points):
+    """Largest-Triangle-Three-Buckets, keeping the first and last points."""
+    np = get_numpy()
+    count = len(points)
+    # The first and last points are kept, the rest are split into target_points - 2 buckets
+    edges = [each_edge + 1 for each_edge in bucket_edges(count - 2, target_points - 2)]
+
+    if np is not None:
+        times = np.fromiter((each_point[0] for each_point in points), dtype=float, count=count)
+        values = np.fromiter((each_point[1] for each_point in points), dtype=float, count=count)
+        selected = [0]
+        for each_bucket in range(target_points - 2):
+            start, end = edges[each_bucket], edges[each_bucket + 1]
+            if each_bucket + 2 < len(edges):
+                next_start, next_end = edges[each_bucket + 1], edges[each_bucket + 2]
+                next_time = times[next_start:next_end].mean()
+                next_value = values[next_start:next_end].mean()
+            else:
+                next_time, next_value = times[-1], values[-1]
+            previous = selected[-1]
+            areas = np.abs(
+                (times[previous] - next_time) * (values[start:end] - values[previous]) -
+                (times[previous] - times[start:end]) * (next_value - values[previous]))
+            selected.append(start + int(areas.argmax()))
+        selected.append(count - 1)
+    else:
+        selected = [0]
+        for each_bucket in range(target_points - 2):
+            start, end = edges[each_bucket], edges[each_bucket + 1]
+            if each_bucket + 2 < len(edges):
+                next_points = points[edges[each_bucket + 1]:edges[each_bucket + 2]]
+                next_time = math.fsum(each_point[0] for each_point in next_points) / len(next_points)
+                next_value = math.fsum(each_point[1] for each_point in next_points) / len(next_points)
+            else:
+                next_time, next_value = points[-1]
+            previous_time, previous_value = points[selected[-1]]
+            index_max = start
+            area_max = -1
+            for index in range(start, end):
+                area = abs(
+                    (previous_time - next_time) * (points[index][1] - previous_value) -
+                    (previous_time - points[index][0]) * (next_value - previous_value))
+                if area > area_max:
+                    area_max = area
+                    index_max = index
+            selected.append(index_max)
+        selected.append(count - 1)
+
+    return [[points[index][0], points[index][1]] for index in selected]
+
+
+def downsample_min_max(points, target_points):
+    """The minimum and maximum of each of target_points / 2 buckets, in time order."""
+    np = get_numpy()
+    count = len(points)
+    buckets = max(target_points // 2, 1)
+    edges = bucket_edges(count, buckets)
+
+    selected = []
+    if np is not None:
+        values = np.fromiter((each_point[1] for each_point in points), dtype=float, count=count)
+        starts = np.array(edges[:-1])
+        # Index of the minimum and maximum of every bucket, without looping over points
+        order = np.lexsort((values, np.repeat(np.arange(buckets), np.diff(edges))))
+        minimums = order[starts]
+        maximums = order[np.array(edges[1:]) - 1]
+        for index_min, index_max in zip(minimums.tolist(), maximums.tolist()):
+            selected.extend(sorted({index_min, index_max}))
+    else:
+        for each_bucket in range(buckets):
+            indexes = range(edges[each_bucket], edges[each_bucket + 1])
+            index_min = min(indexes, key=lambda index: points[index][1])
+            index_max = max(indexes, key=lambda index: points[index][1])
+            selected.extend(sorted({index_min, index_max}))
+
+    return [[points[index][0], points[index][1]] for index in selected]
+
+
+def downsample_mean(points, target_points):
+    """The mean time and value of each of target_points buckets."""
+    np = get_numpy()
+    count = len(points)
+    edges = bucket_edges(count, target_points)
+
+    if np is not None:
+        times = np.fromiter((each_point[0] for each_point in points), dtype=float, count=count)
+        values = np.fromiter((each_point[1] for each_point in points), dtype=float, count=count)
+        starts = np.array(edges[:-1])
+        sizes = np.diff(edges)
+        mean_times = np.add.reduceat(times, starts) / sizes
+        mean_values = np.add.reduceat(values, starts) / sizes
+        return [[each_time, each_value] for each_time, each_value in zip(mean_times.tolist(), mean_values.tolist())]
+
+    downsampled = []
+    for each_bucket in range(target_points):
+        bucket = points[edges[each_bucket]:edges[each_bucket + 1]]
+        downsampled.append([
+            math.fsum(each_point[0] for each_point in bucket) / len(bucket),
+            math.fsum(each_point[1] for each_point in bucket) / len(bucket)])
+    return downsampled
@@ -0,0 +1,225 @@
+# coding=utf-8
+"""
+Compile user equations (conversions, rescaling, Equation Functions and Actions) once.
+
+An equation, such as "(x-32)*5/9", "sqrt(a) + b", or "0 if x < 0 else x", is parsed
+and checked to only contain numbers, the named variables, arithmetic, comparison, and
+boolean operators, conditional expressions, and the functions and constants in
+EQUATION_FUNCTIONS (also available as math.<name>). It's compiled to a function taking
+the variables as arguments, rather than substituting the values into the equation and
+evaluating the string each time. Compiled equations are cached by their text and
+variables.
+
+Equations can also be applied to whole NumPy arrays (apply_array()), so many values
+are converted at once.
+"""
+import ast
+import functools
+import json
+import logging
+import math
+import types
+
+from mycodo.databases.models import Actions
+from mycodo.databases.models import Conversion
+from mycodo.databases.models import CustomController
+from mycodo.databases.models import DeviceMeasurements
+from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.utils import get_numpy
+
+logger = logging.getLogger("mycodo.equations")
+
+
+# Functions and constants equations may use: name: (Python, NumPy attribute)
+EQUATION_FUNCTIONS = {
+    'abs': (abs, 'abs'),
+    'int': (int, 'trunc'),
+    'float': (float, 'float64'),
+    'min': (min, 'minimum'),
+    'max': (max, 'maximum'),
+    'round': (round, 'round'),
+    'pow': (pow, 'power'),
+    'sqrt': (math.sqrt, 'sqrt'),
+    'exp': (math.exp, 'exp'),
+    'log': (math.log, 'log'),
+    'log2': (math.log2, 'log2'),
+    'log10': (math.log10, 'log10'),
+    'floor': (math.floor, 'floor'),
+    'ceil': (math.ceil, 'ceil'),
+    'sin': (math.sin, 'sin'),
+    'cos': (math.cos, 'cos'),
+    'tan': (math.tan, 'tan'),
+    'asin': (math.asin, 'arcsin'),
+    'acos': (math.acos, 'arccos'),
+    'atan': (math.atan, 'arctan'),
+    'atan2': (math.atan2, 'arctan2'),
+    'sinh': (math.sinh, 'sinh'),
+    'cosh': (math.cosh, 'cosh'),
+    'tanh': (math.tanh, 'tanh'),
+    'degrees': (math.degrees, 'degrees'),
+    'radians': (math.radians, 'radians'),
+    'pi': (math.pi, 'pi'),
+    'e': (math.e, 'e')
+}
+
+OPERATORS = (
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub, ast.Not, ast.And, ast.Or,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE, ast.Gt, ast.GtE)
+
+# Expressions evaluated one value at a time by apply_array(), since they branch on values
+CONDITIONAL_EXPRESSIONS = (ast.IfExp, ast.Compare, ast.BoolOp, ast.Not)
+
+# Saved equations and the names of their variables
+STORED_EQUATIONS = {
+    'EQUATION_SINGLE': ('x',),  # Function
+    'EQUATION_MULTI': ('a', 'b'),  # Function
+    'input_action_equation': ('x',)  # Action
+}
+
+
+def numpy_reduce(function):
+    """Apply a NumPy function of two arrays (e.g. maximum) to any number of arrays, like max()."""
+    def reduced(*args):
+        return functools.reduce(function, args)
+    return reduced
+
+
+def equation_namespace(functions):
+    namespace = dict(functions)
+    namespace['math'] = types.SimpleNamespace(**functions)
+    namespace['__builtins__'] = {}
+    return namespace
+
+
+class Equation:
+    """
+    A compiled equation, called with the values of its variables
+
+    :param equation: the equation
+    :param variables: the names of the variables, in the order of the arguments
+    """
+    def __init__(self, equation, variables):
+        self.equation = equation
+        self.variables = variables
+
+        expression = parse_equation(equation, variables)
+        self.conditional = any(isinstance(node, CONDITIONAL_EXPRESSIONS) for node in ast.walk(expression))
+        function = ast.Expression(ast.Lambda(
+            args=ast.arguments(
+                posonlyargs=[], args=[ast.arg(arg=each_var) for each_var in variables],
+                kwonlyargs=[], kw_defaults=[], defaults=[]),
+            body=expression.body))
+        self.code = compile(ast.fix_missing_locations(function), '<equation>', 'eval')
+        self.function = eval(self.code, equation_namespace(
+            {name: value for name, (value, _) in EQUATION_FUNCTIONS.items()}))
+        self.function_array = None
+
+    def __repr__(self):
+        return f"Equation({self.equation!r}, {self.variables!r})"
+
+    def __call__(self, *values):
+        return self.function(*values)
+
+    def apply_array(self, *arrays):
+        """Apply the equation to arrays of values, returning an array of floats."""
+        np = get_numpy()
+        if self.function_array is None and self.conditional:
+            # Comparing arrays is ambiguous in conditions, so apply the equation to each value
+            self.function_array = (np.vectorize(self.function, otypes=[float])
+                                   if self.variables else self.function)
+        elif self.function_array is None:
+            functions = {}
+            for name, (_, np_name) in EQUATION_FUNCTIONS.items():
+                functions[name] = getattr(np, np_name)
+            functions['min'] = numpy_reduce(np.minimum)
+            functions['max'] = numpy_reduce(np.maximum)
+            self.function_array = eval(self.code, equation_namespace(functions))
+
+        arrays = [np.asarray(each_array, dtype=float) for each_array in arrays]
+        result = np.asarray(self.function_array(*arrays), dtype=float)
+        shape = np.broadcast_shapes(*(each_array.shape for each_array in arrays))
+        if result.shape != shape:  # e.g. an equation without variables
+            result = np.broadcast_to(result, shape).copy()
+        return result
+
+
+def parse_equation(equation, variables):
+    """Parse an equation and check it only contains what equations may use, raising ValueError if not."""
+    if not isinstance(equation, str) or not equation.strip():
+        raise ValueError("The equation is empty")
+    try:
+        expression = ast.parse(equation.strip().replace('\u2212', '-'), mode='eval')
+    except SyntaxError as err:
+        raise ValueError(f"Invalid equation '{equation}': {err.msg}")
+
+    attribute_names = {id(node.value) for node in ast.walk(expression) if isinstance(node, ast.Attribute)}
+    for node in ast.walk(expression):
+        if isinstance(node, (ast.Expression, ast.BinOp, ast.UnaryOp, ast.IfExp, ast.Compare, ast.BoolOp,
+                             ast.Load) + OPERATORS):
+            continue
+        elif isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Invalid value {node.value!r} in equation '{equation}'")
+        elif isinstance(node, ast.Name):
+            if (node.id not in variables and node.id not in EQUATION_FUNCTIONS and
+                    not (node.id == 'math' and id(node) in attribute_names)):
+                raise ValueError(f"Unknown name '{node.id}' in equation '{equation}' "
+                                 f"(variables: {', '.join(variables)})")
+        elif isinstance(node, ast.Attribute):
+            if (not isinstance(node.value, ast.Name) or node.value.id != 'math' or
+                    node.attr not in EQUATION_FUNCTIONS):
+                raise ValueError(f"Unknown name '{ast.unparse(node)}' in equation '{equation}'")
+        elif isinstance(node, ast.Call):
+            if node.keywords or not isinstance(node.func, (ast.Name, ast.Attribute)):
+                raise ValueError(f"Invalid call '{ast.unparse(node)}' in equation '{equation}'")
+        else:
+            raise ValueError(f"'{ast.unparse(node)}' isn't allowed in equation '{equation}'")
+    return expression
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_equation(equation, variables=('x',)):
+    """
+    Return the compiled Equation, raising ValueError if the equation isn't valid
+
+    :param equation: the equation, e.g. "(x-32)*5/9"
+    :param variables: tuple of the names of the variables, in the order they're passed to the Equation
+    """
+    return Equation(equation, tuple(variables))
+
+
+def check_stored_equations():
+    """
+    Log the saved equations that aren't valid (e.g. saved before equations were checked)
+
+    :return: list of (description, error message) of each invalid equation
+    """
+    equations = []
+    for each_conversion in db_retrieve_table_daemon(Conversion, entry='all'):
+        equations.append((f"Conversion {each_conversion.convert_unit_from} to {each_conversion.convert_unit_to}",
+                          each_conversion.equation, ('x',)))
+    for each_measurement in db_retrieve_table_daemon(DeviceMeasurements, entry='all'):
+        if each_measurement.rescale_method == 'equation':
+            equations.append((f"Rescale of measurement {each_measurement.unique_id}",
+                              each_measurement.rescale_equation, ('x',)))
+    for table, type_column in [(CustomController, 'device'), (Actions, 'action_type')]:
+        for each_entry in db_retrieve_table_daemon(table, entry='all'):
+            variables = STORED_EQUATIONS.get(getattr(each_entry, type_column))
+            if variables is None:
+                continue
+            try:
+                equation = json.loads(each_entry.custom_options or '{}').get('equation')
+            except Exception:
+                continue
+            if equation is not None:
+                equations.append((f"{table.__name__} {each_entry.unique_id}", equation, variables))
+
+    invalid = []
+    for description, equation, variables in equations:
+        try:
+            compile_equation(equation, variables)
+        except ValueError as err:
+            logger.error(f"{description} has an invalid equation, which will fail when used: {err}")
+            invalid.append((description, str(err)))
+    return invalid
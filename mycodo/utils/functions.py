@@ -25,7 +25,8 @@ import os
 
 from mycodo.config import PATH_FUNCTIONS
 from mycodo.config import PATH_FUNCTIONS_CUSTOM
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import (load_module_information,
+                                  save_module_information)
 
 logger = logging.getLogger("mycodo.utils.functions")
 
@@ -61,7 +62,7 @@ def parse_function_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            function_custom, status = load_module_from_file(full_path, 'functions')
+            function_custom = load_module_information(full_path, 'functions', 'FUNCTION_INFORMATION')
 
             if not function_custom or not hasattr(function_custom, 'FUNCTION_INFORMATION'):
                 continue
@@ -85,6 +86,7 @@ def parse_function_information(exclude_custom=False):
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'channel_quantity_same_as_measurements')
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'enable_channel_unit_select')
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'execute_at_creation')
+            dict_controllers = dict_has_value(dict_controllers, function_custom, 'dedicated_thread')
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'execute_at_modification')
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'modify_settings_without_deactivating')
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'function_status')
@@ -102,4 +104,6 @@ def parse_function_information(exclude_custom=False):
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'custom_commands_message')
             dict_controllers = dict_has_value(dict_controllers, function_custom, 'custom_commands')
 
+    save_module_information()
+
     return dict_controllers
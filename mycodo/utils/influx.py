@@ -1,24 +1,699 @@
 # coding=utf-8
+import atexit
 import datetime
 import logging
+import os
+import queue
+import re
+import sys
 import threading
 import time
 
 import requests
 
+from mycodo.config import (GRAPH_DOWNSAMPLE_METHOD, GRAPH_DOWNSAMPLE_POINTS,
+                           GRAPH_DOWNSAMPLE_PREAGGREGATE,
+                           INFLUXDB_CONNECTION_POOL_SIZE,
+                           INFLUXDB_SETTINGS_REFRESH_SEC,
+                           INFLUXDB_SPOOL_MAX_POINTS, INFLUXDB_SPOOL_PATH,
+                           INFLUXDB_SPOOL_REPLAY_RATE,
+                           INFLUXDB_SPOOL_RETRY_SEC,
+                           INFLUXDB_WRITE_BATCH_AGE_SEC,
+                           INFLUXDB_WRITE_BATCH_SIZE,
+                           INFLUXDB_WRITE_ENQUEUE_TIMEOUT_SEC,
+                           INFLUXDB_WRITE_QUEUE_SIZE,
+                           MEASUREMENT_ROLLUP_BACKFILL_DAYS,
+                           MEASUREMENT_ROLLUP_DELAY_SEC,
+                           MEASUREMENT_ROLLUP_ENABLED,
+                           MEASUREMENT_ROLLUP_INTERVAL_SEC,
+                           MEASUREMENT_ROLLUP_STATE_PATH)
 from mycodo.databases.models import (Conversion, DeviceMeasurements, Misc,
                                      Output)
 from mycodo.mycodo_client import DaemonControl
 from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.downsample import downsample
+from mycodo.utils.last_measurement_store import (LastMeasurementStore,
+                                                 timestamp_to_seconds)
+from mycodo.utils.measurement_rollups import (ROLLUP_MEASUREMENT_PREFIX,
+                                              ROLLUP_MIN_PERIOD_SEC,
+                                              ROLLUP_TIERS,
+                                              MeasurementRollupWorker,
+                                              RollupCoverageReader,
+                                              add_to_aggregate, floor_time,
+                                              new_aggregate, plan_segments,
+                                              rollup_measurement_name)
+from mycodo.utils.measurement_spool import MeasurementSpool
+from mycodo.utils.measurement_windows import (MeasurementWindowStore,
+                                              calculate_statistics)
 from mycodo.utils.system_pi import return_measurement_info
 
 logger = logging.getLogger("mycodo.influx")
 
 
+#
+# Persistent clients (one per process, shared by all read and write helpers)
+#
+
+class InfluxDBClientManager:
+    """
+    Build InfluxDB clients once from the Misc settings and share them.
+
+    The clients keep their HTTP connections alive between calls. They are rebuilt only
+    when the measurement database settings change, either by calling reset() (e.g. from
+    refresh_daemon_misc_settings()) or when a periodic check of the Misc table finds
+    different settings.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.settings = None
+        self.settings_key = None
+        self.timer_settings_check = 0
+        self.bucket = None
+        self.clients = {}
+        self.apis = {}
+
+    @staticmethod
+    def get_settings_key(settings):
+        return (
+            settings.measurement_db_name,
+            settings.measurement_db_version,
+            settings.measurement_db_host,
+            settings.measurement_db_port,
+            settings.measurement_db_dbname,
+            settings.measurement_db_retention_policy,
+            settings.measurement_db_user,
+            settings.measurement_db_password
+        )
+
+    def get_settings(self):
+        """Return the cached Misc settings, re-reading the table only periodically."""
+        with self.lock:
+            now = time.time()
+            if self.settings is None or now > self.timer_settings_check:
+                settings = db_retrieve_table_daemon(Misc, entry='first')
+                self.timer_settings_check = now + INFLUXDB_SETTINGS_REFRESH_SEC
+                if settings is None:
+                    return self.settings
+                settings_key = self.get_settings_key(settings)
+                if self.settings_key is not None and settings_key != self.settings_key:
+                    logger.debug("Measurement database settings changed. Rebuilding clients.")
+                    self._close_clients()
+                self.settings = settings
+                self.settings_key = settings_key
+            return self.settings
+
+    def get_client(self, purpose='query'):
+        """
+        Return a shared client and the bucket to use
+
+        :param purpose: 'write' (5 second timeout) or 'query' (60 second timeout)
+        :return: client, bucket, settings (client and bucket are None on error)
+        """
+        with self.lock:
+            settings = self.get_settings()
+            if settings is None:
+                logger.error("Could not retrieve the measurement database settings")
+                return None, None, None
+
+            if purpose in self.clients:
+                return self.clients[purpose], self.bucket, settings
+
+            from influxdb_client import InfluxDBClient
+
+            timeout = 5000 if purpose == 'write' else 60000
+            enable_gzip = purpose == 'write'
+            influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
+
+            if settings.measurement_db_version == '1':
+                client = InfluxDBClient(
+                    url=influxdb_url,
+                    token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
+                    org='mycodo',
+                    timeout=timeout,
+                    enable_gzip=enable_gzip,
+                    connection_pool_maxsize=INFLUXDB_CONNECTION_POOL_SIZE)
+                self.bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
+            elif settings.measurement_db_version == '2':
+                client = InfluxDBClient(
+                    url=influxdb_url,
+                    username=settings.measurement_db_user,
+                    password=settings.measurement_db_password,
+                    org='mycodo',
+                    timeout=timeout,
+                    enable_gzip=enable_gzip,
+                    connection_pool_maxsize=INFLUXDB_CONNECTION_POOL_SIZE)
+                self.bucket = settings.measurement_db_dbname
+            else:
+                logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
+                return None, None, settings
+
+            self.clients[purpose] = client
+            return client, self.bucket, settings
+
+    def get_write_api(self):
+        """Return a shared synchronous write API, the bucket, and settings."""
+        with self.lock:
+            client, bucket, settings = self.get_client('write')
+            if client is None:
+                return None, None, settings
+            if 'write' not in self.apis:
+                from influxdb_client.client.write_api import SYNCHRONOUS
+                self.apis['write'] = client.write_api(write_options=SYNCHRONOUS)
+            return self.apis['write'], bucket, settings
+
+    def get_query_api(self):
+        """Return a shared query API, the bucket, and settings."""
+        with self.lock:
+            client, bucket, settings = self.get_client('query')
+            if client is None:
+                return None, None, settings
+            if 'query' not in self.apis:
+                self.apis['query'] = client.query_api()
+            return self.apis['query'], bucket, settings
+
+    def reset(self):
+        """Discard the cached settings and clients so they're rebuilt on next use."""
+        with self.lock:
+            self._close_clients()
+            self.settings = None
+            self.settings_key = None
+            self.timer_settings_check = 0
+
+    def _close_clients(self):
+        for each_api in self.apis.values():
+            try:
+                each_api.close()
+            except Exception:
+                pass
+        for each_client in self.clients.values():
+            try:
+                each_client.close()
+            except Exception:
+                pass
+        self.apis = {}
+        self.clients = {}
+        self.bucket = None
+
+
+influxdb_client_manager = InfluxDBClientManager()
+
+
+def get_measurement_db_settings():
+    """Return the (cached) Misc settings used for the measurement database."""
+    return influxdb_client_manager.get_settings()
+
+
+def reset_influxdb_clients():
+    """Rebuild the shared InfluxDB clients on next use (call after the measurement database settings change)."""
+    influxdb_client_manager.reset()
+
+
+#
+# Batched write pipeline (one writer thread per process)
+#
+
+class MeasurementWritePipeline:
+    """
+    Queue measurement points and write them to InfluxDB in batches
+
+    A single writer thread writes the queued points (as gzipped line protocol) when
+    INFLUXDB_WRITE_BATCH_SIZE points are waiting or the oldest waiting point has been
+    queued for INFLUXDB_WRITE_BATCH_AGE_SEC seconds. Points are timestamped when they
+    are queued, so batching doesn't change the time they are stored with.
+
+    Batches that fail to be written are appended to an on-disk spool. While the spool
+    holds points, new batches are also spooled (to preserve order) and the spool is
+    replayed at no more than INFLUXDB_SPOOL_REPLAY_RATE points per second.
+    """
+    def __init__(self,
+                 max_size=INFLUXDB_WRITE_QUEUE_SIZE,
+                 batch_size=INFLUXDB_WRITE_BATCH_SIZE,
+                 batch_age=INFLUXDB_WRITE_BATCH_AGE_SEC,
+                 enqueue_timeout=INFLUXDB_WRITE_ENQUEUE_TIMEOUT_SEC,
+                 spool=None,
+                 replay_rate=INFLUXDB_SPOOL_REPLAY_RATE,
+                 retry_sec=INFLUXDB_SPOOL_RETRY_SEC):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.batch_age = batch_age
+        self.enqueue_timeout = enqueue_timeout
+        self.spool = spool
+        self.replay_rate = replay_rate
+        self.retry_sec = retry_sec
+        self.timer_replay = 0
+        self.on_replay = None
+        self.on_write = None
+        self.lock = threading.Lock()
+        self.thread = None
+        self.running = False
+        self.stats = {
+            'points_queued': 0,
+            'points_written': 0,
+            'points_failed': 0,
+            'points_dropped': 0,
+            'batches_written': 0,
+            'batches_failed': 0,
+            'enqueue_blocked': 0,
+            'last_batch_size': 0,
+            'last_batch_sec': None,
+            'last_batch_time': None
+        }
+
+    def start(self):
+        with self.lock:
+            if self.running and self.thread and self.thread.is_alive():
+                return
+            self.running = True
+            self.thread = threading.Thread(
+                target=self.run, name="mycodo_influxdb_writer", daemon=True)
+            self.thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the writer thread after the queued points have been written."""
+        with self.lock:
+            self.running = False
+            thread = self.thread
+        if thread and thread.is_alive():
+            thread.join(timeout)
+
+    def enqueue(self, lines):
+        """
+        Add line protocol strings to the write queue
+
+        If the queue is full, the caller waits up to enqueue_timeout seconds for space
+        (backpressure) before the point is dropped.
+
+        :return: number of points queued
+        """
+        if not self.running:
+            self.start()
+
+        count_queued = 0
+        for each_line in lines:
+            try:
+                self.queue.put_nowait(each_line)
+            except queue.Full:
+                self.stats['enqueue_blocked'] += 1
+                try:
+                    self.queue.put(each_line, timeout=self.enqueue_timeout)
+                except queue.Full:
+                    self.stats['points_dropped'] += 1
+                    logger.warning(
+                        "Measurement write queue full, dropping point. "
+                        "Is the measurement database reachable?")
+                    continue
+            count_queued += 1
+        self.stats['points_queued'] += count_queued
+        return count_queued
+
+    def run(self):
+        batch = []
+        batch_started = None
+        while self.running or not self.queue.empty():
+            if batch:
+                wait = max(0.0, batch_started + self.batch_age - time.monotonic())
+            else:
+                wait = self.batch_age
+            if self.spool_depth():
+                wait = min(wait, max(0.0, self.timer_replay - time.monotonic()))
+            try:
+                line = self.queue.get(timeout=wait)
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(line)
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch and (len(batch) >= self.batch_size or
+                          time.monotonic() - batch_started >= self.batch_age or
+                          not self.running):
+                self.write_batch(batch)
+                batch = []
+
+            if self.running and self.spool_depth() and time.monotonic() >= self.timer_replay:
+                self.replay_spool()
+
+        if batch:
+            self.write_batch(batch)
+        if self.spool:
+            self.spool.close()
+
+    def spool_depth(self):
+        if not self.spool:
+            return 0
+        return self.spool.get_depth()
+
+    def write_lines(self, lines):
+        """Write line protocol strings to the database, raising an exception on failure."""
+        write_api, bucket, _ = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            raise Exception("Could not create measurement database client")
+        write_api.write(bucket=bucket, record=lines)
+
+    def write_batch(self, lines):
+        if self.spool_depth():
+            # Keep points in order while older points are still waiting to be replayed
+            self.spool.append(lines)
+            return
+
+        timer = time.monotonic()
+        try:
+            self.write_lines(lines)
+        except Exception as err:
+            self.stats['points_failed'] += len(lines)
+            self.stats['batches_failed'] += 1
+            write_fail(None, f"{len(lines)} points", err)
+            if self.spool:
+                self.spool.append(lines)
+                self.timer_replay = time.monotonic() + self.retry_sec
+        else:
+            self.stats['points_written'] += len(lines)
+            self.stats['batches_written'] += 1
+            self.stats['last_batch_size'] = len(lines)
+            self.stats['last_batch_sec'] = time.monotonic() - timer
+            self.stats['last_batch_time'] = time.time()
+            if self.on_write:
+                self.on_write(lines)
+
+    def replay_spool(self):
+        """Write the oldest spooled points, limited to replay_rate points per second."""
+        try:
+            last_id, lines = self.spool.peek(self.batch_size)
+            if not lines:
+                # Replayed by another process sharing the spool
+                self.timer_replay = time.monotonic() + self.retry_sec
+                return
+            timer = time.monotonic()
+            self.write_lines(lines)
+            seconds = time.monotonic() - timer
+            self.spool.remove(last_id, len(lines), seconds=seconds)
+            self.timer_replay = timer + len(lines) / float(self.replay_rate)
+            if self.on_replay:
+                self.on_replay(lines)
+            if not self.spool_depth():
+                logger.info("Measurement spool replay complete")
+        except Exception as err:
+            logger.debug(f"Measurement spool replay failed, retrying in {self.retry_sec} seconds: {err}")
+            self.timer_replay = time.monotonic() + self.retry_sec
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['queue_depth'] = self.queue.qsize()
+        stats['queue_max_size'] = self.queue.maxsize
+        stats['running'] = bool(self.thread and self.thread.is_alive())
+        if self.spool:
+            stats['spool'] = self.spool.get_stats()
+        return stats
+
+
+def get_spool_path():
+    """
+    Return the spool file of the program running (e.g. the daemon or the frontend)
+
+    Each program spools to and replays its own file, so a program that can't reach the
+    measurement database doesn't block the others. Processes of the same program (e.g.
+    web server workers) share a file, which SQLite locking allows.
+    """
+    program = re.sub(r'[^\w-]', '_', os.path.splitext(os.path.basename(sys.argv[0] or ''))[0])
+    return os.path.join(INFLUXDB_SPOOL_PATH, f'spool_{program or "python"}.db')
+
+
+last_measurement_store = LastMeasurementStore()
+measurement_window_store = MeasurementWindowStore()
+
+measurement_write_pipeline = MeasurementWritePipeline(
+    spool=MeasurementSpool(get_spool_path(), max_points=INFLUXDB_SPOOL_MAX_POINTS))
+atexit.register(measurement_write_pipeline.stop)
+
+
+def get_measurement_write_stats():
+    """Return the write pipeline queue depth, throughput/backpressure counters, spool, in-memory store, and rollup status."""
+    stats = measurement_write_pipeline.get_stats()
+    stats['last_measurement_store'] = last_measurement_store.get_stats()
+    stats['measurement_window_store'] = measurement_window_store.get_stats()
+    stats['measurement_rollups'] = measurement_rollup_worker.get_stats()
+    return stats
+
+
+def enable_last_measurement_store():
+    """Keep the latest value of each series written by this process, to answer LAST queries from memory."""
+    last_measurement_store.enabled = True
+
+
+def enable_measurement_windows():
+    """Keep rolling windows of series that statistics are requested for, to answer them from memory."""
+    measurement_window_store.enabled = True
+
+
+def record_measurement(unique_id, unit, channel, measure, value, timestamp):
+    """Add a measurement written by this process to the in-memory stores."""
+    last_measurement_store.update(unique_id, unit, channel, measure, value, timestamp)
+    measurement_window_store.update(unique_id, unit, channel, measure, value, timestamp)
+
+
+def start_measurement_write_pipeline():
+    """Start the writer thread (also replays any points left in the spool)."""
+    measurement_write_pipeline.start()
+
+
+def spool_points(points):
+    """Store Points that failed to be written, to be replayed when the database recovers."""
+    if measurement_write_pipeline.spool is None:
+        return 0
+    count = measurement_write_pipeline.spool.append(
+        [each_point.to_line_protocol() for each_point in points])
+    if count:
+        measurement_write_pipeline.start()
+    return count
+
+
+def stop_measurement_write_pipeline(timeout=10):
+    """Write all queued points and stop the writer thread."""
+    measurement_write_pipeline.stop(timeout=timeout)
+
+
+#
+# Measurement rollups (see mycodo.utils.measurement_rollups)
+#
+
+def flux_time(seconds):
+    """Return a Flux time literal for seconds since the epoch."""
+    return datetime.datetime.utcfromtimestamp(seconds).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def query_rollup_rows(source, start, end, unit=None, unique_id=None, channel=None, measure=None):
+    """
+    Return the measurements of a tier (or raw measurements) from start <= time < end
+
+    :param source: tier name, or None for raw measurements
+    :param unit, unique_id, channel, measure: only return this series (None for all)
+    :return: list of (series, seconds, count, sum, min, max), where series is
+        (unit, device ID, channel, measure)
+    :raises: Exception if the measurements couldn't be read
+    """
+    query_api, bucket, _ = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        raise Exception("Could not create measurement database client")
+
+    query = f'from(bucket: "{bucket}") |> range(start: {flux_time(start)}, stop: {flux_time(end)})'
+    if source is None:
+        prefix = ''
+        query += ' |> filter(fn: (r) => r["_field"] == "value")'
+        if unit is None:
+            query += f' |> filter(fn: (r) => r["_measurement"] !~ /^{ROLLUP_MEASUREMENT_PREFIX}/)'
+        else:
+            query += f' |> filter(fn: (r) => r["_measurement"] == "{flux_string(unit)}")'
+    else:
+        prefix = rollup_measurement_name(source, '')
+        if unit is None:
+            query += f' |> filter(fn: (r) => r["_measurement"] =~ /^{prefix}/)'
+        else:
+            query += f' |> filter(fn: (r) => r["_measurement"] == "{flux_string(prefix + unit)}")'
+    if unique_id is not None:
+        query += f' |> filter(fn: (r) => r["device_id"] == "{flux_string(unique_id)}")'
+    if channel is not None:
+        query += f' |> filter(fn: (r) => r["channel"] == "{flux_string(channel)}")'
+    if measure:
+        query += f' |> filter(fn: (r) => r["measure"] == "{flux_string(measure)}")'
+    if source is not None:
+        query += ' |> pivot(rowKey: ["_time"], columnKey: ["_field"], valueColumn: "_value")'
+
+    logger.debug(f"query_rollup_rows() query: '{query}'")
+
+    rows = []
+    for table in query_api.query(query):
+        for row in table.records:
+            series = (
+                row.values['_measurement'][len(prefix):],
+                row.values.get('device_id'),
+                row.values.get('channel'),
+                row.values.get('measure'))
+            seconds = row.values['_time'].timestamp()
+            if source is None:
+                value = row.values['_value']
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    rows.append((series, seconds, 1, value, value, value))
+            elif row.values.get('count'):
+                rows.append((series, seconds, int(row.values['count']), row.values['sum'],
+                             row.values['min'], row.values['max']))
+    return rows
+
+
+def write_rollups(tier, aggregates):
+    """Write aggregates from aggregate_rows() as rollup points of a tier (raises on failure)."""
+    from influxdb_client import Point
+
+    write_api, bucket, _ = influxdb_client_manager.get_write_api()
+    if write_api is None:
+        raise Exception("Could not create measurement database client")
+
+    lines = []
+    for ((unit, unique_id, channel, measure), start), (count, total, minimum, maximum) in aggregates.items():
+        point = Point(rollup_measurement_name(tier, unit))
+        if unique_id is not None:
+            point = point.tag("device_id", unique_id)
+        if channel is not None:
+            point = point.tag("channel", channel)
+        if measure:
+            point = point.tag("measure", measure)
+        point = (point.field("count", float(count))
+                      .field("sum", float(total))
+                      .field("min", float(minimum))
+                      .field("max", float(maximum))
+                      .time(int(start) * 1000000000))
+        lines.append(point.to_line_protocol())
+
+    for index in range(0, len(lines), INFLUXDB_WRITE_BATCH_SIZE):
+        write_api.write(bucket=bucket, record=lines[index:index + INFLUXDB_WRITE_BATCH_SIZE])
+
+
+def rewind_rollups(seconds):
+    """
+    Roll up the period from seconds again if it was already rolled up
+
+    Points can be written with past times (e.g. the duration an output was on, timed from
+    when it turned on, or points replayed from the spool). The daemon rewinds its rollup
+    worker, and other processes (e.g. the frontend) ask the daemon to.
+    """
+    if not MEASUREMENT_ROLLUP_ENABLED or seconds is None:
+        return
+    if measurement_rollup_worker.thread is not None:
+        measurement_rollup_worker.rewind(seconds)
+        return
+
+    coverage = get_rollup_coverage()
+    if coverage and seconds < max(covered_until for _, covered_until in coverage.values()):
+        try:
+            DaemonControl(pyro_timeout=5).measurement_rollups_rewind(seconds)
+        except Exception as err:
+            logger.debug(f"Could not rewind measurement rollups: {err}")
+
+
+def rewind_rollups_for_lines(lines):
+    """Roll up the period of written points again if it was already rolled up."""
+    try:
+        oldest = min(int(each_line.rsplit(' ', 1)[1]) for each_line in lines) / 1000000000
+    except (IndexError, ValueError):
+        return
+    rewind_rollups(oldest)
+
+
+measurement_rollup_worker = MeasurementRollupWorker(
+    MEASUREMENT_ROLLUP_STATE_PATH,
+    query_rollup_rows,
+    write_rollups,
+    backfill_sec=MEASUREMENT_ROLLUP_BACKFILL_DAYS * 86400,
+    delay_sec=MEASUREMENT_ROLLUP_DELAY_SEC,
+    interval_sec=MEASUREMENT_ROLLUP_INTERVAL_SEC)
+rollup_coverage_reader = RollupCoverageReader(MEASUREMENT_ROLLUP_STATE_PATH)
+if MEASUREMENT_ROLLUP_ENABLED:
+    measurement_write_pipeline.on_replay = rewind_rollups_for_lines
+    measurement_write_pipeline.on_write = rewind_rollups_for_lines
+
+
+def start_measurement_rollups():
+    """Start calculating rollups in the background (only the daemon should call this)."""
+    if not MEASUREMENT_ROLLUP_ENABLED:
+        return
+    measurement_rollup_worker.start()
+
+
+def stop_measurement_rollups(timeout=10):
+    measurement_rollup_worker.stop(timeout=timeout)
+
+
+def get_rollup_coverage():
+    """Return the period each rollup tier covers: {tier: (from, until)} (empty if rollups are disabled)."""
+    if not MEASUREMENT_ROLLUP_ENABLED:
+        return {}
+    return rollup_coverage_reader.get()
+
+
+def rollup_statistics(unique_id, unit, channel, start, end, measure=None):
+    """
+    Return [count, sum, min, max] of a series from start to end (seconds since the epoch)
+
+    The period is split into the coarsest rollup tiers that cover it, with raw
+    measurements read only for the parts no tier covers.
+
+    :return: None if the period is short or no tier covers it (query the raw measurements instead)
+    """
+    if end - start < ROLLUP_MIN_PERIOD_SEC:
+        return None
+    segments = plan_segments(start, end, get_rollup_coverage())
+    if not any(each_segment[0] for each_segment in segments):
+        return None
+
+    aggregate = new_aggregate()
+    try:
+        for tier, segment_start, segment_end in segments:
+            for each_row in query_rollup_rows(
+                    tier, segment_start, segment_end,
+                    unit=unit, unique_id=unique_id, channel=channel, measure=measure):
+                add_to_aggregate(aggregate, *each_row[2:])
+    except Exception as err:
+        logger.debug(f"Could not read measurement rollups: {err}")
+        return None
+    return aggregate
+
+
+def select_rollup_tier(start, end, resolution):
+    """
+    Return the coarsest tier with intervals no longer than resolution seconds that covers start
+
+    :return: (tier, seconds per interval, time the tier covers until), or None
+    """
+    coverage = get_rollup_coverage()
+    for tier, seconds, _ in reversed(ROLLUP_TIERS):
+        if seconds > resolution or tier not in coverage:
+            continue
+        covered_from, covered_until = coverage[tier]
+        if covered_from <= start < covered_until:
+            return tier, seconds, min(covered_until, floor_time(end, seconds))
+
+
 #
 # Influxdb using Flux (influxdb versions 1.8+ and 2.x)
 #
 
+def build_measurement_point(unique_id, unit, value, measure=None, channel=None, timestamp=None):
+    """Return an influxdb_client Point for a single measurement."""
+    from influxdb_client import Point
+
+    point = Point(unit).tag("device_id", unique_id)
+
+    if measure:
+        point = point.tag("measure", measure)
+    if channel is not None:
+        point = point.tag("channel", channel)
+    if timestamp:
+        point = point.time(timestamp)
+
+    return point.field("value", value)
+
+
 def write_influxdb_value(unique_id, unit, value, measure=None, channel=None, timestamp=None):
     """
     Write a value into an Influxdb database (flux edition, using influxdb_client)
@@ -43,55 +718,94 @@ def write_influxdb_value(unique_id, unit, value, measure=None, channel=None, tim
     :param timestamp: If supplied, this timestamp will be used in the influxdb
     :type timestamp: datetime object
     """
-    from influxdb_client import InfluxDBClient, Point
-
-    settings = db_retrieve_table_daemon(Misc, entry='first')
-    influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
-
-    if settings.measurement_db_version == '1':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
-            org='mycodo',
-            timeout=5000)
-        bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
-    elif settings.measurement_db_version == '2':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            username=settings.measurement_db_user,
-            password=settings.measurement_db_password,
-            org='mycodo',
-            timeout=5000)
-        bucket = settings.measurement_db_dbname
-    else:
-        logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
-        return
+    if not timestamp:
+        # Timestamp now, in case the point needs to be spooled and written later
+        timestamp = time.time_ns()
 
-    with client.write_api(success_callback=write_success, error_callback=write_fail) as write_api:
-        point = Point(unit).tag("device_id", unique_id)
+    point = build_measurement_point(
+        unique_id, unit, value, measure=measure, channel=channel, timestamp=timestamp)
+    record_measurement(unique_id, unit, channel, measure, value, timestamp)
 
-        if measure:
-            point = point.tag("measure", measure)
-        if channel is not None:
-            point = point.tag("channel", channel)
-        if timestamp:
-            point = point.time(timestamp)
+    try:
+        write_api, bucket, _ = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            raise Exception("Could not create measurement database client")
+        write_api.write(bucket=bucket, record=point)
+        rewind_rollups(timestamp_to_seconds(timestamp))
+        return 0
+    except Exception as except_msg:
+        if spool_points([point]):
+            logger.debug(
+                f"Failed to write measurement to influxdb (Device ID: {unique_id}), "
+                f"stored in spool to be written later: {except_msg}")
+            return 0
+        logger.debug(
+            f"Failed to write measurement to influxdb (Device ID: {unique_id}): {except_msg}.")
+        return 1
 
-        point = point.field("value", value)
 
-        try:
-            write_api.write(bucket=bucket, record=point)
+def queue_influxdb_value(unique_id, unit, value, measure=None, channel=None, timestamp=None):
+    """
+    Add a value to the batched write pipeline (returns immediately)
+
+    Takes the same parameters as write_influxdb_value(). If timestamp is not
+    supplied, the time the value was queued is used.
+
+    :return: success (0) or failure (1)
+    :rtype: bool
+    """
+    if value is None:
+        return 1
+    if not timestamp:
+        timestamp = time.time_ns()
+    try:
+        point = build_measurement_point(
+            unique_id, unit, value, measure=measure, channel=channel, timestamp=timestamp)
+        record_measurement(unique_id, unit, channel, measure, value, timestamp)
+        if measurement_write_pipeline.enqueue([point.to_line_protocol()]):
             return 0
-        except Exception as except_msg:
-            logger.debug(f"Failed to write measurements to influxdb with ID {unique_id}. Retrying in 5 seconds.")
-            time.sleep(5)
-            try:
-                write_api.write(bucket=bucket, record=point)
-                return 0
-            except:
-                logger.debug(
-                    f"Failed to write measurement to influxdb (Device ID: {unique_id}): {except_msg}.")
-                return 1
+    except Exception:
+        logger.exception(f"Could not queue measurement (Device ID: {unique_id})")
+    return 1
+
+
+def measurements_to_points(unique_id, measurements, use_same_timestamp=True):
+    """
+    Convert a dict of measurements to a list of Points (and record them as the latest
+    value of each series)
+
+    :param unique_id: Unique ID of device
+    :param measurements: dict of measurements
+    :param use_same_timestamp: Use the time of the call for all points, rather than
+        the timestamp stored with each measurement
+    """
+    timestamp_now = time.time_ns()
+    points = []
+    for each_channel, each_measurement in measurements.items():
+        if 'value' not in each_measurement or each_measurement['value'] is None:
+            continue  # skip to next measurement to add
+
+        if use_same_timestamp:
+            timestamp = timestamp_now
+        else:
+            # Use timestamp stored with each measurement
+            timestamp = each_measurement['timestamp_utc']
+
+        points.append(build_measurement_point(
+            unique_id,
+            each_measurement['unit'],
+            each_measurement['value'],
+            measure=each_measurement['measurement'],
+            channel=each_channel,
+            timestamp=timestamp))
+        record_measurement(
+            unique_id,
+            each_measurement['unit'],
+            each_channel,
+            each_measurement['measurement'],
+            each_measurement['value'],
+            timestamp)
+    return points
 
 
 def add_measurements_influxdb_flux(unique_id, measurements, use_same_timestamp=True, block=False):
@@ -99,56 +813,22 @@ def add_measurements_influxdb_flux(unique_id, measurements, use_same_timestamp=T
     Parse measurement data into list to be input into influxdb (flux edition, using influxdb_client)
     :param unique_id: Unique ID of device
     :param measurements: dict of measurements
-    :param use_same_timestamp: Allow influxdb to create the timestamp upon storage
+    :param use_same_timestamp: Use the same timestamp for all measurements
     :return:
     """
-    from influxdb_client import InfluxDBClient, Point
-
-    settings = db_retrieve_table_daemon(Misc, entry='first')
-    influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
-
-    if settings.measurement_db_version == '1':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
-            org='mycodo',
-            timeout=5000)
-        bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
-    elif settings.measurement_db_version == '2':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            username=settings.measurement_db_user,
-            password=settings.measurement_db_password,
-            org='mycodo',
-            timeout=5000)
-        bucket = settings.measurement_db_dbname
-    else:
-        logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
+    points = measurements_to_points(unique_id, measurements, use_same_timestamp)
+    if not points:
         return
 
-    with client.write_api(success_callback=write_success, error_callback=write_fail) as write_api:
-        for each_channel, each_measurement in measurements.items():
-            if 'value' not in each_measurement or each_measurement['value'] is None:
-                continue  # skip to next measurement to add
-
-            if use_same_timestamp:
-                # influxdb will create the timestamp when the data is stored
-                timestamp = None
-            else:
-                # Use timestamp stored with each measurement
-                timestamp = each_measurement['timestamp_utc']
-
-            point = Point(each_measurement['unit']).tag("device_id", unique_id)
-
-            if each_measurement['measurement']:
-                point = point.tag("measure", each_measurement['measurement'])
-            if each_channel is not None:
-                point = point.tag("channel", each_channel)
-            if timestamp:
-                point = point.time(timestamp)
-
-            point = point.field("value", each_measurement['value'])
-            write_api.write(bucket=bucket, record=point)
+    try:
+        write_api, bucket, _ = influxdb_client_manager.get_write_api()
+        if write_api is None:
+            raise Exception("Could not create measurement database client")
+        write_api.write(bucket=bucket, record=points)
+        write_success(None, points)
+    except Exception as err:
+        write_fail(None, points, err)
+        spool_points(points)
 
 
 def write_fail(point_data, written_data, err):
@@ -161,20 +841,58 @@ def write_success(point_data, written_data):
 
 def add_measurements_influxdb(unique_id, measurements, use_same_timestamp=True, block=False):
     """
-    Parse measurement data into list to be input into influxdb (threaded so returns fast)
+    Parse measurement data into list to be input into influxdb (queued so returns fast)
     :param unique_id: Unique ID of device
     :param measurements: dict of measurements
-    :param use_same_timestamp: Allow influxdb to create the timestamp upon storage
+    :param use_same_timestamp: Use the same timestamp for all measurements
     :param block: wait until measurements are added before returning
     :return:
     """
     if block:
         add_measurements_influxdb_flux(unique_id, measurements, use_same_timestamp)
     else:
-        write_db = threading.Thread(
-            target=add_measurements_influxdb_flux,
-            args=(unique_id, measurements, use_same_timestamp,))
-        write_db.start()
+        try:
+            points = measurements_to_points(unique_id, measurements, use_same_timestamp)
+            measurement_write_pipeline.enqueue(
+                [each_point.to_line_protocol() for each_point in points])
+        except Exception:
+            logger.exception(f"Could not queue measurements (Device ID: {unique_id})")
+
+
+def flux_value_function(value, settings):
+    """Return the Flux pipe that reduces each table to a single value (e.g. LAST, MEAN, SUM)."""
+    if value == "LAST":
+        return ' |> last()'
+    elif value == "FIRST":
+        return ' |> first()'
+    elif value == "MAX":
+        return ' |> max()'
+    elif value == "MIN":
+        return ' |> min()'
+    elif value == "COUNT":
+        return ' |> count()'
+    elif value == "SUM":
+        if settings.measurement_db_version == '1':
+            # TODO: Change when issue is fixed
+            # Bug in influxdb/Flux v1.8.10 due to mean
+            # Error: panic: runtime error: invalid memory address or nil pointer dereference
+            # https://github.com/influxdata/influxdb/issues/21649
+            # https://github.com/influxdata/influxdb/pull/23520
+            logger.error("SUM cannot be used with influxdb 1.8.10 without causing an error. "
+                         "Returning all measurements for period to manually sum.")
+        elif settings.measurement_db_version == '2':
+            return ' |> sum(column: "_value")'
+    elif value == "MEAN":
+        if settings.measurement_db_version == '1':
+            # TODO: Change median to mean when issue is fixed
+            # Bug in influxdb/Flux v1.8.10 due to mean
+            # Error: panic: runtime error: invalid memory address or nil pointer dereference
+            # https://github.com/influxdata/influxdb/issues/21649
+            # https://github.com/influxdata/influxdb/pull/23520
+            return ' |> median()'
+        elif settings.measurement_db_version == '2':
+            return ' |> mean()'
+    return ''
 
 
 def query_flux(unit, unique_id,
@@ -182,28 +900,8 @@ def query_flux(unit, unique_id,
                start_str=None, end_str=None, min_value=None, max_value=None, past_sec=None, group_sec=None,
                limit=None):
     """Generate influxdb query string (flux edition, using influxdb_client)."""
-    from influxdb_client import InfluxDBClient
-
-    settings = db_retrieve_table_daemon(Misc, entry='first')
-    influxdb_url = f'http://{settings.measurement_db_host}:{settings.measurement_db_port}'
-
-    if settings.measurement_db_version == '1':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            token=f'{settings.measurement_db_user}:{settings.measurement_db_password}',
-            org='mycodo',
-            timeout=60000)
-        bucket = f'{settings.measurement_db_dbname}/{settings.measurement_db_retention_policy}'
-    elif settings.measurement_db_version == '2':
-        client = InfluxDBClient(
-            url=influxdb_url,
-            username=settings.measurement_db_user,
-            password=settings.measurement_db_password,
-            org='mycodo',
-            timeout=60000)
-        bucket = settings.measurement_db_dbname
-    else:
-        logger.error(f"Unknown Influxdb version: {settings.measurement_db_version}")
+    query_api, bucket, settings = influxdb_client_manager.get_query_api()
+    if query_api is None:
         return
 
     query = f'from(bucket: "{bucket}")'
@@ -217,7 +915,7 @@ def query_flux(unit, unique_id,
     elif end_str:
         query += f' |> range(stop: {end_str})'
     else:
-        query += f' |> range(start: -99999d)'
+        query += ' |> range(start: -99999d)'
 
     if min_value:
         query += f' |> filter(fn: (r) => r._value > {min_value})'
@@ -249,42 +947,11 @@ def query_flux(unit, unique_id,
         query += f' |> limit(n:{limit})'
 
     if value:
-        if value == "LAST":
-            query += ' |> last()'
-        elif value == "FIRST":
-            query += ' |> first()'
-        elif value == "MAX":
-            query += ' |> max()'
-        elif value == "MIN":
-            query += ' |> min()'
-        elif value == "COUNT":
-            query += ' |> count()'
-        elif value == "SUM":
-            if settings.measurement_db_version == '1':
-                # TODO: Change when issue is fixed
-                # Bug in influxdb/Flux v1.8.10 due to mean
-                # Error: panic: runtime error: invalid memory address or nil pointer dereference
-                # https://github.com/influxdata/influxdb/issues/21649
-                # https://github.com/influxdata/influxdb/pull/23520
-                logger.error("SUM cannot be used with influxdb 1.8.10 without causing an error. "
-                             "Returning all measurements for period to manually sum.")
-            elif settings.measurement_db_version == '2':
-                query += ' |> sum(column: "_value")'
-        elif value == "MEAN":
-            if settings.measurement_db_version == '1':
-                # TODO: Change median to mean when issue is fixed
-                # Bug in influxdb/Flux v1.8.10 due to mean
-                # Error: panic: runtime error: invalid memory address or nil pointer dereference
-                # https://github.com/influxdata/influxdb/issues/21649
-                # https://github.com/influxdata/influxdb/pull/23520
-                query += ' |> median()'
-            elif settings.measurement_db_version == '2':
-                query += ' |> mean()'
+        query += flux_value_function(value, settings)
 
     logger.debug(f"query_flux() query: '{query}'")
 
-    tables = client.query_api().query(query)
-    client.close()
+    tables = query_api.query(query)
 
     return tables
 
@@ -295,9 +962,9 @@ def query_string(unit, unique_id,
                  past_sec=None, group_sec=None, limit=None):
     """Generate influxdb query string."""
     ret_value = None
-    settings = db_retrieve_table_daemon(Misc, entry='first')
+    settings = get_measurement_db_settings()
 
-    if settings.measurement_db_name == "influxdb":
+    if settings and settings.measurement_db_name == "influxdb":
         ret_value = query_flux(
             unit, unique_id,
             value=value, measure=measure, channel=channel, ts_str=ts_str,
@@ -368,6 +1035,15 @@ def read_influxdb_single(unique_id, unit, channel,
     :param datetime_obj: return a datetime object as a time
     :type datetime_obj: bool
     """
+    use_store = value == 'LAST' and not start_str and not end_str
+    if use_store:
+        stored = last_measurement_store.get(
+            unique_id, unit, channel, measure=measure, max_age=duration_sec)
+        if stored:
+            if datetime_obj:
+                stored[0] = datetime.datetime.fromtimestamp(stored[0], tz=datetime.timezone.utc)
+            return stored
+
     try:
         data = query_string(
             unit,
@@ -381,7 +1057,7 @@ def read_influxdb_single(unique_id, unit, channel,
 
         if data:
             try:
-                settings = db_retrieve_table_daemon(Misc, entry='first')
+                settings = get_measurement_db_settings()
                 if settings.measurement_db_name == 'influxdb':
                     for table in data:
                         for row in table.records:
@@ -420,6 +1096,45 @@ def get_past_measurements(device_id, measurement_id, max_age=None):
     return past_measurements
 
 
+def get_past_statistics(device_id, measurement_id, max_age, median=False):
+    """
+    Return statistics of a device measurement from the past max_age seconds
+
+    :return: dict of count, sum, mean, min, max, stdev (and median), or None if
+        the measurements couldn't be read
+    """
+    device_measurement = db_retrieve_table_daemon(
+        DeviceMeasurements).filter(
+        DeviceMeasurements.unique_id == measurement_id).first()
+    if device_measurement:
+        conversion = db_retrieve_table_daemon(
+            Conversion, unique_id=device_measurement.conversion_id)
+    else:
+        conversion = None
+    channel, unit, measurement = return_measurement_info(
+        device_measurement, conversion)
+
+    return past_seconds_statistics(
+        device_id, unit, channel, max_age, measure=measurement, median=median)
+
+
+def past_seconds_statistics(unique_id, unit, channel, past_seconds, measure=None, median=False):
+    """Return statistics of a series from the past x seconds, from memory if the series has a window."""
+    def read_past():
+        return read_influxdb_list(
+            unique_id, unit, channel, measure=measure, duration_sec=past_seconds)
+
+    stats = measurement_window_store.get_statistics(
+        unique_id, unit, channel, measure, past_seconds, seed=read_past, median=median)
+    if stats is not None:
+        return stats
+
+    past_measurements = read_past()
+    if past_measurements is None:
+        return None
+    return calculate_statistics(past_measurements, median=median)
+
+
 def read_influxdb_list(unique_id, unit, channel,
                        measure=None,
                        duration_sec=None,
@@ -464,7 +1179,7 @@ def read_influxdb_list(unique_id, unit, channel,
             end_str=end_str,
             past_sec=duration_sec)
 
-        settings = db_retrieve_table_daemon(Misc, entry='first')
+        settings = get_measurement_db_settings()
         if settings.measurement_db_name == 'influxdb':
             list_data = []
             for table in data:
@@ -481,7 +1196,7 @@ def read_influxdb_list(unique_id, unit, channel,
 
 def read_influxdb_multi(channels_data, past_seconds=None, value='LAST'):
     """
-    Query Influxdb for multiple channels at once
+    Query Influxdb for multiple channels at once, with a single query
 
     example:
         channels_data = [
@@ -505,37 +1220,309 @@ def read_influxdb_multi(channels_data, past_seconds=None, value='LAST'):
     :type value: str
     """
     results = {}
-    
+
     if not channels_data:
         return results
-    
-    # Query each channel and collect results
+
+    # Validate each channel and group request indices by series
+    series_indices = {}
     for idx, channel_spec in enumerate(channels_data):
         unique_id = channel_spec.get('unique_id')
         unit = channel_spec.get('unit')
         channel = channel_spec.get('channel')
         measure = channel_spec.get('measure')
-        
+
+        results[idx] = [None, None]
+
         if not unique_id or not unit or channel is None:
             logger.warning(f"Invalid channel specification at index {idx}: {channel_spec}")
-            results[idx] = [None, None]
             continue
-        
+
+        series = (unit, unique_id, str(channel), measure or None)
+        series_indices.setdefault(series, []).append(idx)
+
+    if not series_indices:
+        return results
+
+    try:
+        tables = query_flux_multi(list(series_indices), past_seconds=past_seconds, value=value)
+        if not tables:
+            return results
+
+        # Map each returned series back to the requests for it
+        # (a request without a measure matches the first series with any measure)
+        for table in tables:
+            for row in table.records:
+                unit = row.values.get('_measurement')
+                unique_id = row.values.get('device_id')
+                channel = row.values.get('channel')
+                measure = row.values.get('measure')
+                for each_series in [(unit, unique_id, channel, measure), (unit, unique_id, channel, None)]:
+                    for idx in series_indices.get(each_series, []):
+                        if results[idx] == [None, None]:
+                            results[idx] = [row.values['_time'].timestamp(), row.values['_value']]
+                break  # Only one value per table
+    except requests.exceptions.ConnectionError:
+        logger.debug("Failed to establish a new influxdb connection. Ensure influxdb is running.")
+    except Exception:
+        logger.exception("Error querying multiple channels")
+
+    return results
+
+
+def read_last_influxdb_multi(channels_data):
+    """
+    Return the last measurement of several series, each with its own maximum age, with at most one query
+
+    Measurements the daemon wrote (in the in-memory store) are used first, and the remaining
+    series are read with read_influxdb_multi(), looking back as far as the largest maximum age.
+
+    :param channels_data: list of channel specifications as used by read_influxdb_multi(), each
+        with an optional 'duration_sec' (how many seconds to look for a past measurement)
+    :return: dict mapping the index of each specification to [time, value] ([None, None] if not found)
+    """
+    results = {}
+    missing = []
+    for idx, channel_spec in enumerate(channels_data):
+        stored = last_measurement_store.get(
+            channel_spec.get('unique_id'),
+            channel_spec.get('unit'),
+            channel_spec.get('channel'),
+            measure=channel_spec.get('measure'),
+            max_age=channel_spec.get('duration_sec'))
+        results[idx] = stored if stored else [None, None]
+        if not stored:
+            missing.append(idx)
+
+    if not missing:
+        return results
+
+    max_ages = [channels_data[idx].get('duration_sec') for idx in missing]
+    past_seconds = None if None in max_ages else int(max(max_ages))
+    read = read_influxdb_multi([channels_data[idx] for idx in missing], past_seconds=past_seconds)
+
+    now = time.time()
+    for position, idx in enumerate(missing):
+        last_time, last_value = read.get(position, [None, None])
+        max_age = channels_data[idx].get('duration_sec')
+        if last_time is None or (max_age is not None and last_time < now - max_age):
+            continue
+        results[idx] = [last_time, last_value]
+    return results
+
+
+def read_influxdb_series_window(series_list, start, end):
+    """
+    Return the measurements of several series from start <= time < end, with a single query
+
+    :param series_list: list of (unit, unique_id, channel, measure) tuples, where measure
+        may be None to match any measure
+    :param start: seconds since the epoch
+    :param end: seconds since the epoch
+    :return: list of (time (seconds since the epoch), index in series_list, value)
+    :raises: Exception if the measurements couldn't be read
+    """
+    series_indices = {}
+    for index, (unit, unique_id, channel, measure) in enumerate(series_list):
+        series_indices.setdefault((unit, unique_id, str(channel), measure or None), []).append(index)
+
+    tables = query_flux_multi(
+        list(series_indices), value=None, start_str=flux_time(start), end_str=flux_time(end))
+    if tables is None:
+        raise Exception("Could not query the measurement database")
+
+    rows = []
+    for table in tables:
+        for row in table.records:
+            unit = row.values.get('_measurement')
+            unique_id = row.values.get('device_id')
+            channel = row.values.get('channel')
+            measure = row.values.get('measure')
+            seconds = row.values['_time'].timestamp()
+            indices = series_indices.get((unit, unique_id, channel, measure), [])
+            if measure:
+                indices = indices + series_indices.get((unit, unique_id, channel, None), [])
+            for index in indices:
+                rows.append((seconds, index, row.values['_value']))
+    return rows
+
+
+def flux_string(value):
+    """Escape a value for use in a Flux string literal."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def query_flux_multi(series_list, past_seconds=None, value='LAST', start_str=None, end_str=None):
+    """
+    Query multiple series with a single Flux query, returning one table per series
+
+    :param series_list: list of (unit, unique_id, channel, measure) tuples, where measure
+        may be None to match any measure
+    :param past_seconds: How many seconds to look back
+    :param value: What kind of measurement to return (e.g. LAST, SUM, MIN, MAX, etc.),
+        or None for all measurements
+    :param start_str: Start time, in influxdb format (used with end_str instead of past_seconds)
+    :param end_str: End time, in influxdb format
+    """
+    settings = get_measurement_db_settings()
+    if not settings or settings.measurement_db_name != 'influxdb':
+        return
+
+    query_api, bucket, settings = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        return
+
+    query = f'from(bucket: "{bucket}")'
+    if start_str and end_str:
+        query += f' |> range(start: {start_str}, stop: {end_str})'
+    elif past_seconds:
+        query += f' |> range(start: -{int(past_seconds)}s)'
+    else:
+        query += ' |> range(start: -99999d)'
+
+    # Narrow by unit and device first, then match each series
+    units = sorted({each_series[0] for each_series in series_list})
+    unique_ids = sorted({each_series[1] for each_series in series_list})
+    query += ' |> filter(fn: (r) => {})'.format(
+        ' or '.join(f'r["_measurement"] == "{flux_string(each_unit)}"' for each_unit in units))
+    query += ' |> filter(fn: (r) => {})'.format(
+        ' or '.join(f'r["device_id"] == "{flux_string(each_id)}"' for each_id in unique_ids))
+
+    list_conditions = []
+    for unit, unique_id, channel, measure in series_list:
+        condition = (f'r["_measurement"] == "{flux_string(unit)}" and '
+                     f'r["device_id"] == "{flux_string(unique_id)}" and '
+                     f'r["channel"] == "{flux_string(channel)}"')
+        if measure:
+            condition += f' and r["measure"] == "{flux_string(measure)}"'
+        list_conditions.append(f'({condition})')
+    query += ' |> filter(fn: (r) => {})'.format(' or '.join(list_conditions))
+
+    if value:
+        query += flux_value_function(value, settings)
+
+    logger.debug(f"query_flux_multi() query: '{query}'")
+
+    return query_api.query(query)
+
+
+def query_flux_downsampled(unit, unique_id, start_str, end_str, window_ms,
+                           measure=None, channel=None, method='minmax'):
+    """
+    Query a series aggregated into windows of window_ms milliseconds, in one pass
+
+    :param method: 'mean' for the mean of each window, otherwise the minimum and
+        maximum points of each window (with their original timestamps)
+    """
+    query_api, bucket, settings = influxdb_client_manager.get_query_api()
+    if query_api is None:
+        return
+
+    query = f'data = from(bucket: "{bucket}")'
+    query += f' |> range(start: {start_str}, stop: {end_str})'
+    query += f' |> filter(fn: (r) => r["_measurement"] == "{flux_string(unit)}")'
+    query += f' |> filter(fn: (r) => r["device_id"] == "{flux_string(unique_id)}")'
+    if channel is not None:
+        query += f' |> filter(fn: (r) => r["channel"] == "{flux_string(channel)}")'
+    if measure:
+        query += f' |> filter(fn: (r) => r["measure"] == "{flux_string(measure)}")'
+
+    window_ms = max(int(window_ms), 1)
+    if method == 'mean':
+        # TODO: Change median to mean when influxdb 1.8.10 issue is fixed (see query_flux())
+        fn = 'median' if settings.measurement_db_version == '1' else 'mean'
+        query += f'\ndata |> aggregateWindow(every: {window_ms}ms, fn: {fn}, createEmpty: false)'
+    else:
+        query += f'\nminimums = data |> window(every: {window_ms}ms) |> min()'
+        query += f'\nmaximums = data |> window(every: {window_ms}ms) |> max()'
+        query += '\nunion(tables: [minimums, maximums])'
+        query += ' |> group() |> keep(columns: ["_time", "_value"]) |> sort(columns: ["_time"])'
+
+    logger.debug(f"query_flux_downsampled() query: '{query}'")
+
+    return query_api.query(query)
+
+
+def read_influxdb_downsampled(unique_id, unit, channel, start, end, measure=None,
+                              method=GRAPH_DOWNSAMPLE_METHOD,
+                              target_points=GRAPH_DOWNSAMPLE_POINTS):
+    """
+    Return about target_points points representing a series from start to end
+
+    The series is aggregated into windows by InfluxDB and reduced to target_points
+    in a single query, rather than counting the points first. Long periods are read
+    from the coarsest rollup tier with intervals no longer than a window.
+
+    :param start: datetime (UTC) of the start of the period
+    :param end: datetime (UTC) of the end of the period
+    :param method: one of 'lttb', 'minmax', or 'mean' (see mycodo.utils.downsample)
+    :return: list of [time (seconds since the epoch), value], or None if the query failed
+    """
+    settings = get_measurement_db_settings()
+    if not settings or settings.measurement_db_name != 'influxdb':
+        return
+
+    period_ms = (end - start).total_seconds() * 1000
+    if method == 'mean':
+        window_ms = period_ms / target_points
+    elif method == 'minmax':
+        window_ms = period_ms / max(target_points // 2, 1)
+    else:
+        # Reduce to more points than needed, keeping spikes, then pick points with LTTB
+        window_ms = period_ms / (target_points * GRAPH_DOWNSAMPLE_PREAGGREGATE // 2)
+
+    points = []
+    start_raw = start
+
+    # Use the coarsest rollup tier with intervals no longer than a window, if one covers the start
+    rollup_tier = select_rollup_tier(
+        start.replace(tzinfo=datetime.timezone.utc).timestamp(),
+        end.replace(tzinfo=datetime.timezone.utc).timestamp(),
+        window_ms / 1000)
+    if rollup_tier:
+        tier, _, tier_until = rollup_tier
         try:
-            result = read_influxdb_single(
-                unique_id=unique_id,
-                unit=unit,
-                channel=channel,
+            rows = query_rollup_rows(
+                tier, start.replace(tzinfo=datetime.timezone.utc).timestamp(), tier_until,
+                unit=unit, unique_id=unique_id, channel=channel, measure=measure)
+        except Exception as err:
+            logger.debug(f"Could not read measurement rollups: {err}")
+        else:
+            for _, seconds, count, total, minimum, maximum in sorted(rows, key=lambda row: row[1]):
+                if method == 'mean':
+                    points.append([seconds, total / count])
+                else:
+                    points.append([seconds, minimum])
+                    if maximum != minimum:
+                        points.append([seconds, maximum])
+            start_raw = datetime.datetime.utcfromtimestamp(tier_until)
+
+    try:
+        if start_raw < end:
+            data = query_flux_downsampled(
+                unit, unique_id,
+                start_raw.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                end.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                window_ms,
                 measure=measure,
-                duration_sec=past_seconds,
-                value=value
-            )
-            results[idx] = result if result else [None, None]
-        except Exception as e:
-            logger.error(f"Error reading channel {idx}: {e}")
-            results[idx] = [None, None]
-    
-    return results
+                channel=channel,
+                method=method)
+            if data is None and not points:
+                return
+
+            for table in data or []:
+                for row in table.records:
+                    point = [row.values['_time'].timestamp(), row.values['_value']]
+                    if not points or point != points[-1]:  # The min and max of a window of one point
+                        points.append(point)
+    except Exception as err:
+        logger.debug(f"Could not read downsampled measurements from influxdb: {err}")
+        if not points:
+            return
+
+    if method == 'mean':
+        return points
+    return downsample(points, method=method, target_points=target_points)
 
 
 def output_sec_on(output_id, past_seconds, output_channel=0):
@@ -549,23 +1536,31 @@ def output_sec_on(output_id, past_seconds, output_channel=0):
     # Get the number of seconds not stored in the database (if currently on)
     output_time_on = 0
     try:
-        control = DaemonControl()
-        if control.output_state(output_id, output_channel=output_channel) == 'on':
-            output_time_on = control.output_sec_currently_on(
-                output_id, output_channel=output_channel)
+        state, sec_currently_on = DaemonControl().batch([
+            ('output_state', [output_id, output_channel], {}),
+            ('output_sec_currently_on', [output_id], {'output_channel': output_channel})])
+        if state == 'on':
+            output_time_on = sec_currently_on
     except Exception:
         logger.exception("output_sec_on()")
 
-    data = query_string(
-        's', output.unique_id,
-        measure='duration_time',
-        channel=output_channel,
-        value='SUM',
-        past_sec=past_seconds)
+    now = time.time()
+    aggregate = rollup_statistics(
+        output.unique_id, 's', output_channel, now - past_seconds, now, measure='duration_time')
+    if aggregate is not None:
+        data = None
+        sec_recorded_on = aggregate[1]
+    else:
+        data = query_string(
+            's', output.unique_id,
+            measure='duration_time',
+            channel=output_channel,
+            value='SUM',
+            past_sec=past_seconds)
+        sec_recorded_on = 0
 
-    sec_recorded_on = 0
     if data:
-        settings = db_retrieve_table_daemon(Misc, entry='first')
+        settings = get_measurement_db_settings()
         if settings.measurement_db_name == 'influxdb':
             if settings.measurement_db_version == '1':
                 # TODO: remove when influxdb 1.8.10 issue is fixed
@@ -586,6 +1581,18 @@ def output_sec_on(output_id, past_seconds, output_channel=0):
 
 def average_past_seconds(unique_id, unit, channel, past_seconds, measure=None):
     """Return measurement average for the past x seconds."""
+    stats = measurement_window_store.get_statistics(
+        unique_id, unit, channel, measure, past_seconds,
+        seed=lambda: read_influxdb_list(
+            unique_id, unit, channel, measure=measure, duration_sec=past_seconds))
+    if stats is not None:
+        return stats['mean']
+
+    now = time.time()
+    aggregate = rollup_statistics(unique_id, unit, channel, now - past_seconds, now, measure=measure)
+    if aggregate is not None:
+        return aggregate[1] / aggregate[0] if aggregate[0] else None
+
     data = query_string(
         unit, unique_id,
         measure=measure,
@@ -594,7 +1601,7 @@ def average_past_seconds(unique_id, unit, channel, past_seconds, measure=None):
         past_sec=past_seconds)
 
     if data:
-        settings = db_retrieve_table_daemon(Misc, entry='first')
+        settings = get_measurement_db_settings()
         if settings.measurement_db_name == 'influxdb':
             for table in data:
                 for row in table.records:
@@ -603,6 +1610,18 @@ def average_past_seconds(unique_id, unit, channel, past_seconds, measure=None):
 
 def average_start_end_seconds(unique_id, unit, channel, str_start, str_end, measure=None):
     """Return measurement average for a period of time."""
+    try:
+        start = datetime.datetime.strptime(str_start, '%Y-%m-%dT%H:%M:%S.%fZ').replace(
+            tzinfo=datetime.timezone.utc).timestamp()
+        end = datetime.datetime.strptime(str_end, '%Y-%m-%dT%H:%M:%S.%fZ').replace(
+            tzinfo=datetime.timezone.utc).timestamp()
+    except (TypeError, ValueError):
+        aggregate = None
+    else:
+        aggregate = rollup_statistics(unique_id, unit, channel, start, end, measure=measure)
+    if aggregate is not None:
+        return aggregate[1] / aggregate[0] if aggregate[0] else None
+
     data = query_string(
         unit, unique_id,
         measure=measure,
@@ -612,7 +1631,7 @@ def average_start_end_seconds(unique_id, unit, channel, str_start, str_end, meas
         end_str=str_end)
 
     if data:
-        settings = db_retrieve_table_daemon(Misc, entry='first')
+        settings = get_measurement_db_settings()
         if settings.measurement_db_name == 'influxdb':
             for table in data:
                 for row in table.records:
@@ -621,6 +1640,18 @@ def average_start_end_seconds(unique_id, unit, channel, str_start, str_end, meas
 
 def sum_past_seconds(unique_id, unit, channel, past_seconds, measure=None):
     """Return measurement sum for the past x seconds."""
+    stats = measurement_window_store.get_statistics(
+        unique_id, unit, channel, measure, past_seconds,
+        seed=lambda: read_influxdb_list(
+            unique_id, unit, channel, measure=measure, duration_sec=past_seconds))
+    if stats is not None:
+        return stats['sum'] if stats['count'] else None
+
+    now = time.time()
+    aggregate = rollup_statistics(unique_id, unit, channel, now - past_seconds, now, measure=measure)
+    if aggregate is not None:
+        return aggregate[1] if aggregate[0] else None
+
     data = query_string(
         unit, unique_id,
         measure=measure,
@@ -630,7 +1661,7 @@ def sum_past_seconds(unique_id, unit, channel, past_seconds, measure=None):
 
     if data:
         total_seconds = 0
-        settings = db_retrieve_table_daemon(Misc, entry='first')
+        settings = get_measurement_db_settings()
         if settings.measurement_db_name == 'influxdb':
             if settings.measurement_db_version == '1':
                 # TODO: remove when influxdb 1.8.10 issue is fixed
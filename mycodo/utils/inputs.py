@@ -26,7 +26,9 @@ import os
 from mycodo.config import PATH_INPUTS
 from mycodo.config import PATH_INPUTS_CUSTOM
 from mycodo.inputs.sensorutils import convert_units
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.equations import compile_equation
+from mycodo.utils.modules import (load_module_information,
+                                  save_module_information)
 
 logger = logging.getLogger("mycodo.utils.inputs")
 
@@ -114,8 +116,8 @@ def rescale_measurements(measurement, measurement_value):
                 rescaled_measurement = converted_units
 
         elif measurement.rescale_method == "equation":
-            replaced_str = measurement.rescale_equation.replace('x', str(measurement_value))
-            rescaled_measurement = eval(replaced_str)
+            rescaled_measurement = compile_equation(
+                measurement.rescale_equation)(float(measurement_value))
 
         if rescaled_measurement:
             return rescaled_measurement
@@ -199,7 +201,7 @@ def parse_input_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            input_custom, status = load_module_from_file(full_path, 'inputs')
+            input_custom = load_module_information(full_path, 'inputs', 'INPUT_INFORMATION')
 
             if not input_custom or not hasattr(input_custom, 'INPUT_INFORMATION'):
                 continue
@@ -227,6 +229,7 @@ def parse_input_information(exclude_custom=False):
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'measurements_rescale')
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'do_not_run_periodically')
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'edge_input')
+            dict_inputs = dict_has_value(dict_inputs, input_custom, 'dedicated_thread')
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'message')
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'message_extra')
 
@@ -305,4 +308,6 @@ def parse_input_information(exclude_custom=False):
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'custom_commands_message')
             dict_inputs = dict_has_value(dict_inputs, input_custom, 'custom_commands')
 
+    save_module_information()
+
     return dict_inputs
@@ -0,0 +1,108 @@
+# coding=utf-8
+"""
+In-memory store of the most recent value of each measurement series.
+
+The daemon records every measurement it writes, so the latest value of a series
+can be returned without querying the measurement database. Series are identified
+by device ID, unit, channel, and measure, the same tags used in the database.
+"""
+import datetime
+import threading
+import time
+
+
+def timestamp_to_seconds(timestamp):
+    """
+    Convert a measurement timestamp to seconds since the epoch
+
+    :param timestamp: nanoseconds (int), seconds (float), or datetime (naive datetimes are UTC)
+    :return: float, or None if the timestamp can't be converted
+    """
+    if timestamp is None:
+        return time.time()
+    elif isinstance(timestamp, datetime.datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+        return timestamp.timestamp()
+    elif isinstance(timestamp, int):
+        return timestamp / 1000000000
+    elif isinstance(timestamp, float):
+        return timestamp
+    elif isinstance(timestamp, str):
+        try:
+            return timestamp_to_seconds(datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00')))
+        except ValueError:
+            return None
+    return None
+
+
+class LastMeasurementStore:
+    """Latest value of each measurement series, keyed by device ID, unit, channel, and measure."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.values = {}
+        self.latest_any_measure = {}
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'updates': 0
+        }
+
+    def update(self, unique_id, unit, channel, measure, value, timestamp=None):
+        """
+        Record a measurement, unless a newer one of the same series is already stored
+
+        :param timestamp: time of the measurement (see timestamp_to_seconds()), or None for now
+        """
+        if not self.enabled or value is None or channel is None:
+            return
+        seconds = timestamp_to_seconds(timestamp)
+        if seconds is None:
+            return
+
+        key = (unique_id, unit, str(channel), measure or None)
+        key_any = key[:3]
+        with self.lock:
+            stored = self.values.get(key)
+            if stored is None or seconds >= stored[0]:
+                self.values[key] = (seconds, value)
+                stored_any = self.latest_any_measure.get(key_any)
+                if stored_any is None or seconds >= stored_any[0]:
+                    self.latest_any_measure[key_any] = (seconds, value)
+                self.stats['updates'] += 1
+
+    def get(self, unique_id, unit, channel, measure=None, max_age=None):
+        """
+        Return the latest value of a series
+
+        :param max_age: only return a value from the past max_age seconds (None for any age)
+        :return: [time (seconds since the epoch), value], or None if not stored or too old
+        """
+        if not self.enabled or channel is None:
+            return None
+
+        key = (unique_id, unit, str(channel))
+        if measure:
+            stored = self.values.get(key + (measure,))
+        else:
+            stored = self.latest_any_measure.get(key)
+
+        now = time.time()
+        if stored is None or stored[0] > now or (max_age and stored[0] < now - float(max_age)):
+            self.stats['misses'] += 1
+            return None
+
+        self.stats['hits'] += 1
+        return [stored[0], stored[1]]
+
+    def clear(self):
+        with self.lock:
+            self.values = {}
+            self.latest_any_measure = {}
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        stats['series'] = len(self.values)
+        return stats
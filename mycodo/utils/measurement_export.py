@@ -0,0 +1,186 @@
+# coding=utf-8
+"""
+Export the measurements of many series, aligned on timestamp, as a stream.
+
+The period is read one window at a time (MEASUREMENT_EXPORT_WINDOW_SEC), so memory
+use is bounded by a single window regardless of the length of the period. Each row
+holds a timestamp and the value of every series at that timestamp (empty for
+series without a measurement at that time).
+
+csv: comma-separated values
+csv_gzip: comma-separated values, gzip-compressed
+parquet: Apache Parquet (requires pyarrow), one row group per window
+arrow: Apache Arrow IPC stream (requires pyarrow), one record batch per window
+"""
+import csv
+import io
+import zlib
+
+from mycodo.config import MEASUREMENT_EXPORT_WINDOW_SEC
+
+# Format: (mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'csv_gzip': ('application/gzip', 'csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows')
+}
+
+TIMESTAMP_COLUMN = 'timestamp (UTC)'
+
+# Approximate bytes of CSV collected before a chunk is yielded
+CSV_CHUNK_BYTES = 65536
+
+
+def get_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        pa = None
+    return pa
+
+
+def export_format_error(file_format):
+    """Return an error message if file_format can't be exported, otherwise None."""
+    if file_format not in EXPORT_FORMATS:
+        return f"Unknown export format '{file_format}'. Options: {', '.join(EXPORT_FORMATS)}"
+    if file_format in ['parquet', 'arrow'] and get_pyarrow() is None:
+        return f"Exporting as {file_format} requires pyarrow to be installed (pip install pyarrow)"
+
+
+def iter_aligned_windows(series_count, start, end, read_window, window_sec=MEASUREMENT_EXPORT_WINDOW_SEC):
+    """
+    Read the period window by window, yielding the rows of each window
+
+    :param series_count: number of series
+    :param start: seconds since the epoch
+    :param end: seconds since the epoch
+    :param read_window: function(start, end) returning a list of (seconds, series index, value)
+        from start <= time < end
+    :return: generator of lists of (seconds, [value of each series]), in time order
+    """
+    window_start = start
+    while window_start < end:
+        window_end = min(window_start + window_sec, end)
+        rows = {}
+        for seconds, index, value in read_window(window_start, window_end):
+            if seconds not in rows:
+                rows[seconds] = [None] * series_count
+            rows[seconds][index] = value
+        yield sorted(rows.items())
+        window_start = window_end
+
+
+def export_measurements_stream(columns, start, end, read_window, file_format='csv',
+                               window_sec=MEASUREMENT_EXPORT_WINDOW_SEC):
+    """
+    Return a generator of the bytes of the export
+
+    :param columns: the column name of each series
+    :param file_format: one of EXPORT_FORMATS
+    """
+    windows = iter_aligned_windows(len(columns), start, end, read_window, window_sec=window_sec)
+    if file_format in ['parquet', 'arrow']:
+        return iter_arrow(columns, windows, file_format)
+    return iter_csv(columns, windows, compress=file_format == 'csv_gzip')
+
+
+def iter_csv(columns, windows, compress=False):
+    """Yield the rows of windows as (optionally gzip-compressed) CSV bytes."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip header
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow([TIMESTAMP_COLUMN] + list(columns))
+
+    def take():
+        data = text.getvalue().encode('utf-8')
+        text.seek(0)
+        text.truncate(0)
+        if compressor:
+            return compressor.compress(data)
+        return data
+
+    for each_window in windows:
+        for seconds, values in each_window:
+            writer.writerow([seconds] + ['' if each_value is None else each_value for each_value in values])
+            if text.tell() >= CSV_CHUNK_BYTES:
+                chunk = take()
+                if chunk:
+                    yield chunk
+
+    chunk = take()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+class ChunkSink(io.RawIOBase):
+    """A writable file that collects bytes until they're taken, for streaming writers."""
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_arrow(columns, windows, file_format='parquet'):
+    """Yield the rows of windows as Parquet or Arrow IPC stream bytes, one row group or batch per window."""
+    pa = get_pyarrow()
+    if pa is None:
+        raise Exception(export_format_error(file_format))
+
+    schema = pa.schema(
+        [pa.field(TIMESTAMP_COLUMN, pa.timestamp('us', tz='UTC'))] +
+        [pa.field(each_column, pa.float64()) for each_column in columns])
+
+    sink = ChunkSink()
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    for each_window in windows:
+        if not each_window:
+            continue
+        arrays = [pa.array([int(round(seconds * 1000000)) for seconds, _ in each_window],
+                           type=pa.timestamp('us', tz='UTC'))]
+        for index in range(len(columns)):
+            arrays.append(pa.array([to_float(values[index]) for _, values in each_window], type=pa.float64()))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+        if file_format == 'parquet':
+            writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        chunk = sink.take()
+        if chunk:
+            yield chunk
+
+    writer.close()
+    chunk = sink.take()
+    if chunk:
+        yield chunk
@@ -0,0 +1,283 @@
+# coding=utf-8
+"""
+Rollups of every measurement series into 1 minute, 1 hour, and 1 day tiers.
+
+Each rollup point holds the count, sum, minimum, and maximum of a series' values
+in one interval of the tier, so averages, sums, and min/max envelopes of long
+periods can be calculated from a few rollup points instead of every raw point.
+
+The 1 minute tier is calculated from raw measurements, and each coarser tier from
+the tier before it. The period each tier covers (its coverage) is stored in a
+small state file, so other processes (e.g. the frontend) know which tiers can be
+used for a query. A query is split into segments with plan_segments(): the
+coarsest tier covering each part of the period, and raw measurements for the
+remainder.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger("mycodo.measurement_rollups")
+
+# Tier name, seconds per interval, tier it's calculated from (None for raw measurements)
+ROLLUP_TIERS = (
+    ('1m', 60, None),
+    ('1h', 3600, '1m'),
+    ('1d', 86400, '1h')
+)
+
+# Seconds of the source read at a time when calculating each tier
+ROLLUP_CHUNK_SEC = {
+    '1m': 3600,
+    '1h': 86400,
+    '1d': 86400 * 30
+}
+
+ROLLUP_MEASUREMENT_PREFIX = 'rollup_'
+
+# Shorter periods are answered from raw measurements (a single query)
+ROLLUP_MIN_PERIOD_SEC = 86400
+
+
+def rollup_measurement_name(tier, unit):
+    """Return the measurement name rollup points of a unit are stored with."""
+    return f'{ROLLUP_MEASUREMENT_PREFIX}{tier}_{unit}'
+
+
+def floor_time(seconds, interval):
+    return math.floor(seconds / interval) * interval
+
+
+def ceil_time(seconds, interval):
+    return math.ceil(seconds / interval) * interval
+
+
+def new_aggregate():
+    """Return an empty aggregate: [count, sum, min, max]."""
+    return [0, 0.0, None, None]
+
+
+def add_to_aggregate(aggregate, count, total, minimum, maximum):
+    if not count:
+        return aggregate
+    aggregate[0] += count
+    aggregate[1] += total
+    if aggregate[2] is None or minimum < aggregate[2]:
+        aggregate[2] = minimum
+    if aggregate[3] is None or maximum > aggregate[3]:
+        aggregate[3] = maximum
+    return aggregate
+
+
+def aggregate_rows(rows, interval):
+    """
+    Aggregate rows into intervals
+
+    :param rows: iterable of (series, seconds, count, sum, min, max), where series is a
+        tuple identifying the series (e.g. unit, device ID, channel, measure)
+    :param interval: seconds per interval
+    :return: dict of {(series, interval start seconds): [count, sum, min, max]}
+    """
+    aggregates = {}
+    for series, seconds, count, total, minimum, maximum in rows:
+        key = (series, floor_time(seconds, interval))
+        if key not in aggregates:
+            aggregates[key] = new_aggregate()
+        add_to_aggregate(aggregates[key], count, total, minimum, maximum)
+    return aggregates
+
+
+def plan_segments(start, end, coverage):
+    """
+    Split the period from start to end into segments answered by the coarsest tier possible
+
+    :param coverage: dict of {tier: (from seconds, until seconds)} each tier covers
+    :return: list of (tier, start seconds, end seconds), tier is None for raw measurements
+    """
+    if end <= start:
+        return []
+
+    for tier, seconds, _ in reversed(ROLLUP_TIERS):
+        if tier not in coverage:
+            continue
+        covered_from, covered_until = coverage[tier]
+        tier_start = max(ceil_time(start, seconds), covered_from)
+        tier_end = min(floor_time(end, seconds), covered_until)
+        if tier_start < tier_end:
+            return (plan_segments(start, tier_start, coverage) +
+                    [(tier, tier_start, tier_end)] +
+                    plan_segments(tier_end, end, coverage))
+
+    return [(None, start, end)]
+
+
+def load_rollup_coverage(path):
+    """Return the coverage of each tier from the state file: {tier: (from, until)}."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+        return {
+            each_tier: (each_coverage['from'], each_coverage['until'])
+            for each_tier, each_coverage in state.get('coverage', {}).items()
+        }
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+
+class RollupCoverageReader:
+    """Read the rollup coverage from the state file, only re-reading it when it changes."""
+    def __init__(self, path):
+        self.path = path
+        self.stat_key = None
+        self.coverage = {}
+
+    def get(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return {}
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        if stat_key != self.stat_key:
+            self.coverage = load_rollup_coverage(self.path)
+            self.stat_key = stat_key
+        return self.coverage
+
+
+class MeasurementRollupWorker:
+    """
+    Calculate rollup tiers in a background thread and keep them up to date
+
+    :param read_rows: function(source tier or None for raw, start, end) returning rows
+        for aggregate_rows() from the period start <= time < end (raising on failure)
+    :param write_rollups: function(tier, aggregates) that stores the aggregates returned
+        by aggregate_rows() (raising on failure)
+    :param backfill_sec: when there's no state, start the tiers this long ago
+    :param delay_sec: only roll up raw measurements at least this old, so measurements
+        still being written are included
+    """
+    def __init__(self, path_state, read_rows, write_rollups,
+                 backfill_sec=86400 * 365, delay_sec=120, interval_sec=30, time_budget_sec=5):
+        self.path_state = path_state
+        self.read_rows = read_rows
+        self.write_rollups = write_rollups
+        self.backfill_sec = backfill_sec
+        self.delay_sec = delay_sec
+        self.interval_sec = interval_sec
+        self.time_budget_sec = time_budget_sec
+        self.coverage = None
+        self.lock = threading.Lock()
+        self.event_stop = threading.Event()
+        self.thread = None
+        self.stats = {
+            'steps': 0,
+            'rollup_points': 0,
+            'errors': 0,
+            'last_step_sec': None
+        }
+
+    def load_state(self, now):
+        coverage = load_rollup_coverage(self.path_state)
+        if coverage and all(each_tier in coverage for each_tier, _, _ in ROLLUP_TIERS):
+            self.coverage = {each_tier: list(coverage[each_tier]) for each_tier, _, _ in ROLLUP_TIERS}
+        else:
+            start = floor_time(now - self.backfill_sec, 86400)
+            self.coverage = {each_tier: [start, start] for each_tier, _, _ in ROLLUP_TIERS}
+
+    def save_state(self):
+        state = {
+            'coverage': {
+                each_tier: {'from': covered_from, 'until': covered_until}
+                for each_tier, (covered_from, covered_until) in self.coverage.items()
+            }
+        }
+        path_tmp = f'{self.path_state}.tmp'
+        with open(path_tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(path_tmp, self.path_state)
+
+    def step(self, now):
+        """
+        Roll up the next chunk of the first tier that's behind its source
+
+        :return: True if a chunk was rolled up, False if all tiers are up to date
+        """
+        with self.lock:
+            if self.coverage is None:
+                self.load_state(now)
+
+            for tier, seconds, source in ROLLUP_TIERS:
+                if source is None:
+                    source_until = now - self.delay_sec
+                else:
+                    source_until = self.coverage[source][1]
+                limit = floor_time(source_until, seconds)
+                covered_until = self.coverage[tier][1]
+                if covered_until >= limit:
+                    continue
+
+                end = min(covered_until + ROLLUP_CHUNK_SEC[tier], limit)
+                timer = time.monotonic()
+                aggregates = aggregate_rows(self.read_rows(source, covered_until, end), seconds)
+                if aggregates:
+                    self.write_rollups(tier, aggregates)
+                self.coverage[tier][1] = end
+                self.save_state()
+
+                self.stats['steps'] += 1
+                self.stats['rollup_points'] += len(aggregates)
+                self.stats['last_step_sec'] = time.monotonic() - timer
+                return True
+        return False
+
+    def run_pending(self):
+        """Roll up chunks until all tiers are up to date or the time budget is used."""
+        timer = time.monotonic()
+        while time.monotonic() - timer < self.time_budget_sec:
+            if not self.step(time.time()):
+                break
+
+    def rewind(self, seconds):
+        """Roll up the period from seconds again (e.g. after older measurements were written)."""
+        with self.lock:
+            if self.coverage is None:
+                return
+            rewound = False
+            for tier, tier_sec, _ in ROLLUP_TIERS:
+                covered_from, covered_until = self.coverage[tier]
+                self.coverage[tier][1] = max(covered_from, min(covered_until, floor_time(seconds, tier_sec)))
+                rewound = rewound or self.coverage[tier][1] != covered_until
+            if rewound:
+                self.save_state()
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.event_stop.clear()
+        self.thread = threading.Thread(
+            target=self.run, name="mycodo_measurement_rollups", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=10):
+        self.event_stop.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def run(self):
+        while not self.event_stop.is_set():
+            try:
+                self.run_pending()
+            except Exception as err:
+                self.stats['errors'] += 1
+                logger.debug(f"Could not calculate measurement rollups: {err}")
+            self.event_stop.wait(self.interval_sec)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['running'] = bool(self.thread and self.thread.is_alive())
+        stats['coverage'] = {
+            each_tier: tuple(each_coverage) for each_tier, each_coverage in (self.coverage or {}).items()
+        }
+        return stats
@@ -0,0 +1,152 @@
+# coding=utf-8
+"""
+Durable, append-only spool for measurements that could not be written to the
+measurement database. Points are stored as line protocol in an SQLite database
+(WAL mode) and read back in the order they were added.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("mycodo.measurement_spool")
+
+
+class MeasurementSpool:
+    """Append-only, on-disk FIFO of line protocol strings."""
+    def __init__(self, path, max_points=None):
+        self.path = path
+        self.max_points = max_points
+        self.lock = threading.Lock()
+        self.conn = None
+        self.disabled = False
+        self.depth = 0
+        self.stats = {
+            'points_spooled': 0,
+            'points_replayed': 0,
+            'points_dropped': 0,
+            'replay_points_per_sec': None,
+            'last_replay_time': None
+        }
+        self.replay_totals = {
+            'points': 0,
+            'seconds': 0.0
+        }
+
+    def _connect(self):
+        if self.conn is not None:
+            return self.conn
+        path_dir = os.path.dirname(self.path)
+        if path_dir and not os.path.isdir(path_dir):
+            os.makedirs(path_dir, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS spool ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+            "line TEXT NOT NULL)")
+        self.conn.commit()
+        self.depth = self._count(self.conn)
+        if self.depth:
+            logger.info(f"Measurement spool contains {self.depth} unwritten points")
+        return self.conn
+
+    @staticmethod
+    def _count(conn):
+        # Processes of the same program share the spool, so the depth is read rather than counted
+        return conn.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+
+    def get_depth(self):
+        with self.lock:
+            if self.disabled:
+                return 0
+            try:
+                self._connect()
+            except Exception:
+                self.disabled = True
+                logger.exception(f"Could not open measurement spool {self.path}. Spooling disabled.")
+            return self.depth
+
+    def append(self, lines):
+        """
+        Add line protocol strings to the end of the spool
+
+        :return: number of points stored
+        """
+        if not lines:
+            return 0
+        with self.lock:
+            if self.disabled:
+                self.stats['points_dropped'] += len(lines)
+                return 0
+            try:
+                conn = self._connect()
+                if self.max_points is not None:
+                    space = max(0, self.max_points - self.depth)
+                    if space < len(lines):
+                        self.stats['points_dropped'] += len(lines) - space
+                        logger.error(
+                            f"Measurement spool full ({self.max_points} points), "
+                            f"dropping {len(lines) - space} points")
+                        lines = lines[:space]
+                if not lines:
+                    return 0
+                conn.executemany(
+                    "INSERT INTO spool (line) VALUES (?)",
+                    [(each_line,) for each_line in lines])
+                conn.commit()
+            except Exception:
+                self.stats['points_dropped'] += len(lines)
+                logger.exception("Could not add points to the measurement spool")
+                return 0
+            self.depth += len(lines)
+            self.stats['points_spooled'] += len(lines)
+            return len(lines)
+
+    def peek(self, count):
+        """Return up to count of the oldest points as (last_id, lines)."""
+        with self.lock:
+            conn = self._connect()
+            rows = conn.execute(
+                "SELECT id, line FROM spool ORDER BY id LIMIT ?", (count,)).fetchall()
+            if not rows:
+                self.depth = self._count(conn)  # Another process may have replayed the points
+        if not rows:
+            return None, []
+        return rows[-1][0], [row[1] for row in rows]
+
+    def remove(self, last_id, count, seconds=None):
+        """Remove all points up to and including last_id after they have been replayed."""
+        with self.lock:
+            conn = self._connect()
+            removed = conn.execute("DELETE FROM spool WHERE id <= ?", (last_id,)).rowcount
+            conn.commit()
+            self.depth = self._count(conn)
+            count = min(count, max(removed, 0))  # Not those another process replayed first
+            self.stats['points_replayed'] += count
+            self.stats['last_replay_time'] = time.time()
+            if seconds is not None:
+                self.replay_totals['points'] += count
+                self.replay_totals['seconds'] += seconds
+                if self.replay_totals['seconds'] > 0:
+                    self.stats['replay_points_per_sec'] = (
+                        self.replay_totals['points'] / self.replay_totals['seconds'])
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['depth'] = self.get_depth()
+        stats['enabled'] = not self.disabled
+        stats['max_points'] = self.max_points
+        stats['path'] = self.path
+        return stats
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                try:
+                    self.conn.close()
+                except Exception:
+                    pass
+                self.conn = None
@@ -0,0 +1,255 @@
+# coding=utf-8
+"""
+Rolling windows of recent measurements, with aggregates maintained as points are added.
+
+A window is created for a series (device ID, unit, channel, measure) and age the first
+time statistics are requested for it, filled once from the measurement database, then
+kept up to date by the daemon's write path. The sum, mean, standard deviation, minimum,
+and maximum of a window are updated in constant (amortized) time as points are added
+and expire, so they can be returned without querying the measurement database.
+
+Only series the daemon writes are kept up to date. A window the daemon hasn't added a
+point to within its age isn't used, so statistics of series written by other processes
+are queried from the measurement database.
+"""
+import math
+import statistics
+import threading
+import time
+from collections import deque
+
+from mycodo.utils.last_measurement_store import timestamp_to_seconds
+
+# Windows that haven't been read for this long are discarded
+WINDOW_IDLE_SEC = 3600
+
+# Windows holding more points than this are discarded (statistics are then queried from the database)
+WINDOW_MAX_POINTS = 100000
+
+
+class MeasurementWindow:
+    """Points from the past max_age seconds, with a running sum, sum of squares, minimum, and maximum."""
+    def __init__(self, max_age, covered_from):
+        self.max_age = float(max_age)
+        self.covered_from = covered_from
+        self.last_access = time.time()
+        self.last_update = None  # When the daemon's write path last added a point
+        self.points = deque()
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.minimums = deque()  # Increasing values, the front is the minimum
+        self.maximums = deque()  # Decreasing values, the front is the maximum
+        self.expired_since_recalculation = 0
+
+    def add(self, seconds, value):
+        if self.points and seconds < self.points[-1][0]:
+            # Out of order, rebuild in order
+            self.rebuild(list(self.points) + [(seconds, value)])
+            return
+
+        self.points.append((seconds, value))
+        self.sum += value
+        self.sum_squares += value * value
+        while self.minimums and self.minimums[-1][1] >= value:
+            self.minimums.pop()
+        self.minimums.append((seconds, value))
+        while self.maximums and self.maximums[-1][1] <= value:
+            self.maximums.pop()
+        self.maximums.append((seconds, value))
+
+    def rebuild(self, points):
+        self.points = deque()
+        self.sum = 0.0
+        self.sum_squares = 0.0
+        self.minimums = deque()
+        self.maximums = deque()
+        self.expired_since_recalculation = 0
+        for each_seconds, each_value in sorted(points, key=lambda point: point[0]):
+            self.add(each_seconds, each_value)
+
+    def expire(self, now):
+        cutoff = now - self.max_age
+        while self.points and self.points[0][0] < cutoff:
+            _, value = self.points.popleft()
+            self.sum -= value
+            self.sum_squares -= value * value
+            self.expired_since_recalculation += 1
+        while self.minimums and self.minimums[0][0] < cutoff:
+            self.minimums.popleft()
+        while self.maximums and self.maximums[0][0] < cutoff:
+            self.maximums.popleft()
+
+        if self.expired_since_recalculation > len(self.points):
+            # Recalculate the sums occasionally so rounding errors don't accumulate
+            self.sum = math.fsum(each_point[1] for each_point in self.points)
+            self.sum_squares = math.fsum(each_point[1] * each_point[1] for each_point in self.points)
+            self.expired_since_recalculation = 0
+
+    def get_statistics(self, median=False):
+        count = len(self.points)
+        stats = {
+            'count': count,
+            'sum': 0.0,
+            'mean': None,
+            'min': None,
+            'max': None,
+            'stdev': None
+        }
+        if median:
+            stats['median'] = None
+        if not count:
+            return stats
+
+        mean = self.sum / count
+        stats.update({
+            'sum': self.sum,
+            'mean': mean,
+            'min': self.minimums[0][1],
+            'max': self.maximums[0][1]
+        })
+        if count > 1:
+            variance = (self.sum_squares - count * mean * mean) / (count - 1)
+            stats['stdev'] = math.sqrt(max(variance, 0.0))
+        if median:
+            stats['median'] = statistics.median(each_point[1] for each_point in self.points)
+        return stats
+
+
+def calculate_statistics(points, median=False):
+    """Return the same statistics as MeasurementWindow.get_statistics() for a list of (time, value)."""
+    window = MeasurementWindow(math.inf, 0)
+    window.rebuild([(timestamp_to_seconds(each_time), float(each_value))
+                    for each_time, each_value in points if each_value is not None])
+    return window.get_statistics(median=median)
+
+
+class MeasurementWindowStore:
+    """Rolling windows of measurements, keyed by series and window length."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = False
+        self.windows = {}
+        self.series_windows = {}
+        self.timer_purge = 0
+        self.stats = {
+            'hits': 0,
+            'misses': 0
+        }
+
+    @staticmethod
+    def series_key(unique_id, unit, channel, measure):
+        return unique_id, unit, str(channel), measure or None
+
+    def update(self, unique_id, unit, channel, measure, value, timestamp=None):
+        """Add a measurement to the windows of its series, if there are any."""
+        if not self.enabled or not self.series_windows:
+            return
+        windows = self.series_windows.get(self.series_key(unique_id, unit, channel, measure))
+        if not windows:
+            return
+        seconds = timestamp_to_seconds(timestamp)
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        if seconds is None:
+            return
+
+        with self.lock:
+            now = time.time()
+            for each_window in windows:
+                each_window.last_update = now
+                each_window.add(seconds, value)
+                if len(each_window.points) > WINDOW_MAX_POINTS:
+                    each_window.expire(time.time())
+                    if len(each_window.points) > WINDOW_MAX_POINTS:
+                        self.remove_window(each_window)
+
+    def get_statistics(self, unique_id, unit, channel, measure, max_age, seed=None, median=False):
+        """
+        Return statistics of a series' measurements from the past max_age seconds
+
+        :param seed: function returning a list of (time, value) of the series from the past
+            max_age seconds, from the measurement database, used to fill a new window
+        :param median: also return the median (calculated from all points in the window)
+        :return: dict of count, sum, mean, min, max, stdev (and median), or None if the
+            window doesn't cover the past max_age seconds yet, or the daemon hasn't written
+            to the series within the past max_age seconds (it may be written by another process)
+        """
+        if not self.enabled or not max_age or channel is None or not measure:
+            return None
+
+        now = time.time()
+        series = self.series_key(unique_id, unit, channel, measure)
+        key = series + (float(max_age),)
+
+        with self.lock:
+            if now > self.timer_purge:
+                self.timer_purge = now + 60
+                self.purge_idle(now)
+
+            window = self.windows.get(key)
+            if window is not None:
+                window.last_access = now
+                if (window.covered_from <= now - window.max_age and
+                        window.last_update is not None and
+                        window.last_update >= now - window.max_age):
+                    window.expire(now)
+                    self.stats['hits'] += 1
+                    return window.get_statistics(median=median)
+                elif window.covered_from <= now - window.max_age:
+                    # Filled, but not kept up to date by the daemon's writes
+                    self.stats['misses'] += 1
+                    return None
+            else:
+                # Start collecting from now, then fill the window with older points
+                window = MeasurementWindow(max_age, now)
+                self.windows[key] = window
+                self.series_windows.setdefault(series, []).append(window)
+
+        self.stats['misses'] += 1
+        if seed is None:
+            return None
+
+        try:
+            points = seed()
+        except Exception:
+            points = None
+        if points is None:
+            return None
+
+        with self.lock:
+            first_collected = window.points[0][0] if window.points else None
+            older = []
+            for each_time, each_value in points:
+                seconds = timestamp_to_seconds(each_time)
+                if seconds is None or each_value is None:
+                    continue
+                if first_collected is None or seconds < first_collected:
+                    older.append((seconds, float(each_value)))
+            window.rebuild(older + list(window.points))
+            window.covered_from = min(window.covered_from, now - window.max_age)
+            window.expire(time.time())
+            return window.get_statistics(median=median)
+
+    def remove_window(self, window):
+        for each_key, each_window in list(self.windows.items()):
+            if each_window is window:
+                del self.windows[each_key]
+                series_windows = self.series_windows.get(each_key[:4], [])
+                if window in series_windows:
+                    series_windows.remove(window)
+                if not series_windows:
+                    self.series_windows.pop(each_key[:4], None)
+
+    def purge_idle(self, now):
+        for each_window in list(self.windows.values()):
+            if now - each_window.last_access > max(WINDOW_IDLE_SEC, each_window.max_age):
+                self.remove_window(each_window)
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['enabled'] = self.enabled
+        stats['windows'] = len(self.windows)
+        stats['points'] = sum(len(each_window.points) for each_window in list(self.windows.values()))
+        return stats
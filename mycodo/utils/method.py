@@ -1,16 +1,22 @@
 # coding=utf-8
+import bisect
+import copy
 import datetime
 import logging
+import threading
 import time
 from math import sin, radians
 
 from mycodo.databases.models import Method
 from mycodo.databases.models import MethodData
-from mycodo.utils.database import db_retrieve_table_daemon
+from mycodo.utils.config_cache import config_cache
 from mycodo.utils.system_pi import get_sec
+from mycodo.utils.utils import get_numpy
 
 logger = logging.getLogger(__name__)
 
+SECONDS_PER_DAY = 24 * 60 * 60
+
 
 def parse_db_time(time_string, default=None):
     try:
@@ -31,7 +37,7 @@ class AbstractMethod(object):
         """
         Initializes the method class
         :param method: method entry from method table
-        :param method_data: data queried from method_data table
+        :param method_data: rows (or query) of the method's entries in the method_data table
         :param logger: The logger to use
         :return: 0 (success) or 1 (error) and a setpoint value
         """
@@ -41,11 +47,27 @@ class AbstractMethod(object):
         self.method_type = method.method_type
         self.method_name = method.name
 
-        self.method_data = method_data
+        if hasattr(method_data, 'all'):
+            method_data = method_data.all()
+        self.method_data = list(method_data)
+
+        self.method_data_all = [
+            each_data for each_data in self.method_data if each_data.output_id is None]
+        self.method_data_first = self.method_data_all[0] if self.method_data_all else None
+        self.method_data_repeat = next(
+            (each_data for each_data in self.method_data if each_data.duration_sec == 0), None)
+
+        self.compile()
 
-        self.method_data_all = self.method_data.filter(MethodData.output_id.is_(None)).all()
-        self.method_data_first = self.method_data.filter(MethodData.output_id.is_(None)).first()
-        self.method_data_repeat = self.method_data.filter(MethodData.duration_sec == 0).first()
+    def compile(self):
+        """Calculate the tables used to find setpoints, once, when the method is loaded."""
+        pass
+
+    def with_logger(self, logger):
+        """Return a copy of this (cached) method that logs to logger, sharing the compiled tables."""
+        method = copy.copy(self)
+        method.logger = logger
+        return method
 
     def determine_end_time(self, method_start_time):
         """
@@ -84,55 +106,81 @@ class DateMethod(AbstractMethod):
         """
         return False
 
-    def calculate_setpoint(self, now, method_start_time=None):
-        # Calculate where the current time/date is within the time/date method
+    def parse_time(self, time_string):
+        """Return the comparable start/end time of a time string of the method's data."""
+        return datetime.datetime.strptime(time_string, '%Y-%m-%d %H:%M:%S')
 
-        if self.ignore_date():
-            now = datetime.datetime.strptime(str(now.strftime('%H:%M:%S')), '%H:%M:%S')
+    def time_key(self, now):
+        """Return now in the form returned by parse_time()."""
+        return now
 
+    def compile(self):
+        # Spans of (start, end, setpoint start, setpoint end, time start, time end), sorted by start
+        spans = []
         for each_method in self.method_data_all:
-            if self.ignore_date():
-                start_time = datetime.datetime.strptime(each_method.time_start, '%H:%M:%S')
-                end_time = datetime.datetime.strptime(each_method.time_end, '%H:%M:%S')
-            else:
-                start_time = datetime.datetime.strptime(each_method.time_start, '%Y-%m-%d %H:%M:%S')
-                end_time = datetime.datetime.strptime(each_method.time_end, '%Y-%m-%d %H:%M:%S')
-
-            if start_time < now < end_time:
-                setpoint_start = each_method.setpoint_start
-                if each_method.setpoint_end is not None:
-                    setpoint_end = each_method.setpoint_end
-                else:
-                    setpoint_end = each_method.setpoint_start
-
-                setpoint_diff = abs(setpoint_end - setpoint_start)
-                total_seconds = (end_time - start_time).total_seconds()
-                part_seconds = (now - start_time).total_seconds()
-                percent_total = part_seconds / total_seconds
-
-                if setpoint_start < setpoint_end:
-                    new_setpoint = setpoint_start + (setpoint_diff * percent_total)
-                else:
-                    new_setpoint = setpoint_start - (setpoint_diff * percent_total)
+            try:
+                start_time = self.parse_time(each_method.time_start)
+                end_time = self.parse_time(each_method.time_end)
+            except (AttributeError, TypeError, ValueError):
+                (self.logger or logger).error(
+                    f"[Method] Invalid time span '{each_method.time_start}' to '{each_method.time_end}'")
+                continue
+            spans.append((
+                start_time,
+                end_time,
+                each_method.setpoint_start,
+                each_method.setpoint_start if each_method.setpoint_end is None else each_method.setpoint_end,
+                each_method.time_start,
+                each_method.time_end))
+
+        self.spans = spans
+        self.spans_sorted = sorted(spans, key=lambda span: span[0])
+        self.span_starts = [span[0] for span in self.spans_sorted]
+        # A binary search can only be used if no spans overlap
+        self.spans_overlap = any(
+            self.spans_sorted[index][1] > self.spans_sorted[index + 1][0]
+            for index in range(len(self.spans_sorted) - 1))
+
+    def find_span(self, now):
+        """Return the span that now is within (start < now < end), or None."""
+        if self.spans_overlap:
+            for each_span in self.spans:
+                if each_span[0] < now < each_span[1]:
+                    return each_span
+            return None
+
+        index = bisect.bisect_left(self.span_starts, now) - 1
+        if index >= 0 and now < self.spans_sorted[index][1]:
+            return self.spans_sorted[index]
 
-                if self.logger:
-                    if self.ignore_date():
-                        self.logger.debug("[Method] Start: {start} End: {end}".format(
-                            start=start_time.strftime('%H:%M:%S'),
-                            end=end_time.strftime('%H:%M:%S')))
-                    else:
-                        self.logger.debug("[Method] Start: {start} End: {end}".format(
-                            start=start_time, end=end_time))
-                    self.logger.debug("[Method] Start: {start} End: {end}".format(
-                        start=setpoint_start, end=setpoint_end))
-                    self.logger.debug("[Method] Total: {tot} Part total: {par} ({per}%)".format(
-                        tot=total_seconds, par=part_seconds, per=percent_total))
-                    self.logger.debug("[Method] New Setpoint: {sp}".format(
-                        sp=new_setpoint))
-                return new_setpoint, False
-
-        # Setpoint not needing to be calculated, use default setpoint
-        return None, False
+    def calculate_setpoint(self, now, method_start_time=None):
+        # Calculate where the current time/date is within the time/date method
+        now = self.time_key(now)
+        span = self.find_span(now)
+        if span is None:
+            # Setpoint not needing to be calculated, use default setpoint
+            return None, False
+
+        start_time, end_time, setpoint_start, setpoint_end, time_start, time_end = span
+        total_seconds = self.seconds_between(start_time, end_time)
+        part_seconds = self.seconds_between(start_time, now)
+        percent_total = part_seconds / total_seconds
+        new_setpoint = interpolate_setpoint(setpoint_start, setpoint_end, percent_total)
+
+        if self.logger:
+            self.logger.debug("[Method] Start: {start} End: {end}".format(
+                start=time_start, end=time_end))
+            self.logger.debug("[Method] Start: {start} End: {end}".format(
+                start=setpoint_start, end=setpoint_end))
+            self.logger.debug("[Method] Total: {tot} Part total: {par} ({per}%)".format(
+                tot=total_seconds, par=part_seconds, per=percent_total))
+            self.logger.debug("[Method] New Setpoint: {sp}".format(
+                sp=new_setpoint))
+        return new_setpoint, False
+
+    @staticmethod
+    def seconds_between(start, end):
+        return (end - start).total_seconds()
 
     def get_plot(self, max_points_x=None):
         result = []
@@ -175,6 +223,17 @@ class DailyMethod(DateMethod):
         """
         return True
 
+    def parse_time(self, time_string):
+        return get_sec(time_string)
+
+    def time_key(self, now):
+        # Seconds of the day, without fractions of a second
+        return now.hour * 3600 + now.minute * 60 + now.second
+
+    @staticmethod
+    def seconds_between(start, end):
+        return end - start
+
     def get_plot(self, max_points_x=None):
         result = []
         for each_method in self.method_data_all:
@@ -202,10 +261,27 @@ class AbstractDailyFormulaMethod(AbstractMethod):
     plot by iterating through the x axis and calling the calculate_setpoint function to get the corresponding y values.
     """
 
+    def setpoints_of_day(self, seconds):
+        """
+        Return the setpoints at many seconds of the day at once (a NumPy array), or None if this
+        can't be calculated in a single pass (get_plot() then calls calculate_setpoint() for each point).
+        """
+        return None
+
     def get_plot(self, max_points_x=700):
         result = []
 
         seconds_in_day = 60 * 60 * 24
+        np = get_numpy()
+        if np is not None:
+            percents = np.arange(max_points_x) / float(max_points_x)
+            # As calculate_setpoint(), use whole seconds of the day
+            seconds = np.floor(np.round(percents * seconds_in_day, 6))
+            setpoints = self.setpoints_of_day(seconds)
+            if setpoints is not None:
+                return [[float(percent * seconds_in_day * 1000), float(setpoint)]
+                        for percent, setpoint in zip(percents, setpoints)]
+
         today = datetime.datetime(1900, 1, 1)
         for n in range(max_points_x):
             percent = n / float(max_points_x)
@@ -238,8 +314,93 @@ class DailySineMethod(AbstractDailyFormulaMethod):
                                        angle)
         return new_setpoint, False
 
+    def setpoints_of_day(self, seconds):
+        np = get_numpy()
+        angles = seconds / SECONDS_PER_DAY * 360
+        return (self.method_data_first.amplitude *
+                np.sin(np.radians(self.method_data_first.frequency *
+                                  (angles - self.method_data_first.shift_angle))) +
+                self.method_data_first.shift_y)
+
 
 class DailyBezierMethod(AbstractDailyFormulaMethod):
+    """
+    A daily Bezier curve method define the setpoint over the day based on a cubic Bezier curve.
+    The x-axis start (x3) and end (x0) will be automatically stretched or skewed to fit within a
+    24-hour period and this method will repeat daily.
+
+    The setpoint of every second of the day is calculated in a single pass when the method
+    is first used, so finding a setpoint doesn't require solving the curve's polynomial.
+    """
+
+    def compile(self):
+        # Shared by the copies of a cached method (with_logger()), so the table is built once
+        self.setpoint_table = {}
+        self.setpoint_table_lock = threading.Lock()
+
+    def curve_points(self):
+        data = self.method_data_first
+        return ((data.x0, data.y0), (data.x1, data.y1), (data.x2, data.y2), (data.x3, data.y3))
+
+    def build_setpoint_table(self):
+        """Return the setpoint of each second of the day (a NumPy array), or None if it can't be built."""
+        np = get_numpy()
+        if np is None or self.method_data_first is None:
+            return None
+        P0, P1, P2, P3 = self.curve_points()
+        if None in P0 + P1 + P2 + P3:
+            return None
+
+        # The x of each second of the day, as calculated by bezier_curve_y_out()
+        seconds = np.arange(SECONDS_PER_DAY, dtype=float)
+        shift_angle = self.method_data_first.shift_angle
+        if shift_angle:
+            seconds = seconds + shift_angle / 360 * SECONDS_PER_DAY
+            seconds = np.where(seconds > SECONDS_PER_DAY, seconds - SECONDS_PER_DAY, seconds)
+        x = seconds / SECONDS_PER_DAY * (P0[0] - P3[0])
+
+        def x_of_t(t):
+            return ((1 - t) ** 3 * P0[0] + 3 * (1 - t) ** 2 * t * P1[0] +
+                    3 * (1 - t) * t ** 2 * P2[0] + t ** 3 * P3[0])
+
+        def dx_of_t(t):
+            return (3 * (1 - t) ** 2 * (P1[0] - P0[0]) + 6 * (1 - t) * t * (P2[0] - P1[0]) +
+                    3 * t ** 2 * (P3[0] - P2[0]))
+
+        samples_t = np.linspace(0, 1, 4097)
+        samples_x = x_of_t(samples_t)
+        steps = np.diff(samples_x)
+        if np.all(steps < 0):
+            samples_t = samples_t[::-1]
+            samples_x = samples_x[::-1]
+        elif not np.all(steps > 0):
+            # x doesn't only increase or decrease along the curve, so x may have several solutions
+            return None
+
+        # Estimate t of each x from the samples, then refine it with Newton's method
+        t = np.interp(x, samples_x, samples_t)
+        for _ in range(4):
+            slope = dx_of_t(t)
+            t = np.clip(t - (x_of_t(t) - x) / np.where(slope == 0, 1, slope), 0, 1)
+
+        y = ((1 - t) ** 3 * P0[1] + 3 * (1 - t) ** 2 * t * P1[1] +
+             3 * (1 - t) * t ** 2 * P2[1] + t ** 3 * P3[1])
+
+        # As bezier_curve_y_out(), 0 for an x outside the curve
+        tolerance = 1e-9 * max(abs(samples_x[0]), abs(samples_x[-1]), 1)
+        outside = (x < samples_x[0] - tolerance) | (x > samples_x[-1] + tolerance)
+        return np.where(outside, 0, y)
+
+    def get_setpoint_table(self):
+        with self.setpoint_table_lock:
+            if 'table' not in self.setpoint_table:
+                try:
+                    self.setpoint_table['table'] = self.build_setpoint_table()
+                except Exception:
+                    logger.exception("Could not calculate the Bezier setpoint table")
+                    self.setpoint_table['table'] = None
+            return self.setpoint_table['table']
+
     def calculate_setpoint(self, now, method_start_time=None):
         # Calculate Bezier curve y-axis value from the x-axis (seconds of the day)
 
@@ -247,6 +408,10 @@ class DailyBezierMethod(AbstractDailyFormulaMethod):
                                 minutes=now.minute,
                                 seconds=now.second)
 
+        table = self.get_setpoint_table()
+        if table is not None:
+            return float(table[int(dt.total_seconds())]), False
+
         new_setpoint = bezier_curve_y_out(
             self.method_data_first.shift_angle,
             (self.method_data_first.x0, self.method_data_first.y0),
@@ -257,14 +422,33 @@ class DailyBezierMethod(AbstractDailyFormulaMethod):
 
         return new_setpoint, False
 
+    def setpoints_of_day(self, seconds):
+        table = self.get_setpoint_table()
+        if table is not None:
+            return table[seconds.astype(int)]
+
 
 class DurationMethod(AbstractMethod):
     """
-    A daily Bezier curve method define the setpoint over the day based on a cubic Bezier curve.
-    The x-axis start (x3) and end (x0) will be automatically stretched or skewed to fit within a
-    24-hour period and this method will repeat daily.
+    A duration method changes the setpoint over a series of durations, starting when the method
+    is started. The method ends after the last duration, or repeats if it has a repeat entry.
     """
 
+    def compile(self):
+        # The end of each row, in seconds since the start of the cycle
+        self.row_ends = []
+        total_sec = 0
+        for each_method in self.method_data_all:
+            total_sec += each_method.duration_sec or 0
+            self.row_ends.append(total_sec)
+        self.total_duration = total_sec
+
+        self.repeat = None
+        for each_method in self.method_data_all:
+            if each_method.duration_sec == 0:
+                self.repeat = each_method.duration_end or 0
+                break
+
     def calculate_setpoint(self, now, method_start_time=None):
         # Calculate the duration in the method based on self.method_start_time
 
@@ -285,54 +469,40 @@ class DurationMethod(AbstractMethod):
                 # still repeated
                 seconds_from_start = seconds_from_start % duration_in_seconds
 
-        total_sec = 0
-        previous_total_sec = 0
-        for each_method in self.method_data_all:
-            total_sec += each_method.duration_sec
-            if previous_total_sec <= seconds_from_start < total_sec:
-                row_since_start_sec = seconds_from_start - previous_total_sec
-                percent_row = row_since_start_sec / each_method.duration_sec
-
-                setpoint_start = each_method.setpoint_start
-                if each_method.setpoint_end is not None:
-                    setpoint_end = each_method.setpoint_end
-                else:
-                    setpoint_end = each_method.setpoint_start
-                setpoint_diff = abs(setpoint_end - setpoint_start)
-                if setpoint_start < setpoint_end:
-                    new_setpoint = setpoint_start + (setpoint_diff * percent_row)
-                else:
-                    new_setpoint = setpoint_start - (setpoint_diff * percent_row)
-
-                if self.logger:
-                    self.logger.debug(
-                        "[Method] {sec_method:.1f}s/{sec_cycle:.1f}s/{sec_row:.1f}s "
-                        "since start of method/cycle/row".format(
-                            sec_method=(now - start_time).total_seconds(),
-                            sec_cycle=seconds_from_start,
-                            sec_row=row_since_start_sec))
-                    self.logger.debug(
-                        "[Method] Percent of row: {per:.2f}, new Setpoint {sp:.2f}".format(
-                            per=percent_row, sp=new_setpoint))
-                return new_setpoint, False
+        # The first row ending after seconds_from_start (rows with no duration are passed over)
+        index = bisect.bisect_right(self.row_ends, seconds_from_start)
+        if seconds_from_start < 0 or index >= len(self.row_ends):
+            return self.total_duration, False
 
-            previous_total_sec = total_sec
+        each_method = self.method_data_all[index]
+        previous_total_sec = self.row_ends[index - 1] if index else 0
+        row_since_start_sec = seconds_from_start - previous_total_sec
+        percent_row = row_since_start_sec / each_method.duration_sec
 
-        return previous_total_sec, False
+        setpoint_start = each_method.setpoint_start
+        if each_method.setpoint_end is not None:
+            setpoint_end = each_method.setpoint_end
+        else:
+            setpoint_end = each_method.setpoint_start
+        new_setpoint = interpolate_setpoint(setpoint_start, setpoint_end, percent_row)
+
+        if self.logger:
+            self.logger.debug(
+                "[Method] {sec_method:.1f}s/{sec_cycle:.1f}s/{sec_row:.1f}s "
+                "since start of method/cycle/row".format(
+                    sec_method=(now - start_time).total_seconds(),
+                    sec_cycle=seconds_from_start,
+                    sec_row=row_since_start_sec))
+            self.logger.debug(
+                "[Method] Percent of row: {per:.2f}, new Setpoint {sp:.2f}".format(
+                    per=percent_row, sp=new_setpoint))
+        return new_setpoint, False
 
     def cycle_duration(self):
-        total_sec = 0
-        for each_method in self.method_data_all:
-            total_sec += each_method.duration_sec
-
-        return total_sec
+        return self.total_duration
 
     def repeat_duration(self):
-        for each_method in self.method_data_all:
-            if each_method.duration_sec == 0:
-                return each_method.duration_end or 0
-
-        return None
+        return self.repeat
 
     def determine_end_time(self, method_start_time):
         method_start_time = parse_db_time(method_start_time, datetime.datetime.min)
@@ -435,24 +605,91 @@ def create_method_handler(method, method_data, logger=None):
 
     method_class = globals().get(method.method_type+"Method")
     if not method_class or not issubclass(method_class, AbstractMethod):
-        logger.error("Method {} is unknown.".format(method.method_type))
+        if logger:
+            logger.error("Method {} is unknown.".format(method.method_type))
         method_class = AbstractMethod
 
     return method_class(method, method_data, logger)
 
 
-def load_method_handler(method_id, logger=None):
+class MethodHandlerCache:
     """
-    Loads method type and data from database for the given method_id. Then uses method_by_type to create an instance.
+    Compiled methods by method unique_id
+
+    Methods are only cached while the Method and MethodData tables are held in the configuration
+    cache (in the daemon), and are discarded when either table is invalidated (when a method is edited).
     """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handlers = {}
+        self.stats = {
+            'hits': 0,
+            'compiles': 0,
+            'invalidations': 0
+        }
+
+    @staticmethod
+    def create(method_id):
+        method = config_cache.get(Method, method_id)
+        if not method:
+            return None
+        method_data = config_cache.filter_by(MethodData, method_id=method_id)
+        return create_method_handler(method, method_data)
+
+    def get(self, method_id, logger=None):
+        """Return the method with method_id (or None), compiling it only if it isn't cached."""
+        if not (config_cache.is_cached(Method) and config_cache.is_cached(MethodData)):
+            method = self.create(method_id)
+        else:
+            method = self.handlers.get(method_id)
+            if method is None:
+                method = self.create(method_id)
+                if method is None:
+                    return None
+                self.stats['compiles'] += 1
+                with self.lock:
+                    self.handlers[method_id] = method
+            else:
+                self.stats['hits'] += 1
+
+        if method is None:
+            return None
+        return method.with_logger(logger)
+
+    def invalidate(self, table_name=None, unique_id=None):
+        """Discard compiled methods (a configuration cache listener)."""
+        if table_name not in [None, Method.__tablename__, MethodData.__tablename__]:
+            return
+        with self.lock:
+            self.stats['invalidations'] += 1
+            # Cascade methods use other methods, so discard them all
+            self.handlers.clear()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats['methods'] = len(self.handlers)
+        return stats
 
-    method = db_retrieve_table_daemon(Method).filter(Method.unique_id == method_id).first()
-    if not method:
-        return None
 
-    method_data = db_retrieve_table_daemon(MethodData).filter(MethodData.method_id == method_id)
+method_handler_cache = MethodHandlerCache()
+config_cache.add_listener(method_handler_cache.invalidate)
 
-    return create_method_handler(method, method_data, logger)
+
+def load_method_handler(method_id, logger=None):
+    """
+    Loads method type and data for the given method_id, and uses create_method_handler to create an instance
+    (in the daemon, compiled methods are cached until the method is edited).
+    """
+    return method_handler_cache.get(method_id, logger)
+
+
+def interpolate_setpoint(setpoint_start, setpoint_end, percent):
+    """Return the setpoint at percent (0 to 1) of the way from setpoint_start to setpoint_end."""
+    setpoint_diff = abs(setpoint_end - setpoint_start)
+    if setpoint_start < setpoint_end:
+        return setpoint_start + (setpoint_diff * percent)
+    else:
+        return setpoint_start - (setpoint_diff * percent)
 
 
 def sine_wave_y_out(amplitude, frequency, shift_angle,
@@ -474,11 +711,7 @@ def bezier_curve_y_out(shift_angle, P0, P1, P2, P3, second_of_day):
     Ex: getYfromXforBezSegment((10,0), (5,-5), (5,5), (0,0), 3.2)
     """
 
-    try:
-        import numpy as np
-    except ImportError:
-        np = None
-
+    np = get_numpy()
     if not np:
         return 0
 
@@ -1,8 +1,19 @@
 # coding=utf-8
+import ast
+import collections
+import importlib
 import importlib.util
+import io
 import logging
 import os
+import pickle
+import sys
+import threading
 import traceback
+import types
+
+from mycodo.config import (MODULE_INFORMATION_STATIC_PARSE, MYCODO_VERSION,
+                           PATH_MODULE_INFORMATION_CACHE)
 
 logger = logging.getLogger("mycodo.modules")
 
@@ -19,3 +30,401 @@ def load_module_from_file(path_file, module_type):
         logger.error(f"Path: {path_file}, Type: {module_type}")
         logger.error(f"Could not load module: {traceback.format_exc()}")
         return None, traceback.format_exc()
+
+
+# Modules that names used in information dictionaries may be imported from when parsing
+# information without loading the module. These are quick to import and have no side effects.
+STATIC_PARSE_IMPORTS = [
+    'collections',
+    'flask_babel',
+    'mycodo.config',
+    'mycodo.config_translations',
+    'mycodo.utils.constraints_pass'
+]
+
+STATIC_PARSE_BUILTINS = {
+    'bool': bool,
+    'dict': dict,
+    'float': float,
+    'int': int,
+    'list': list,
+    'set': set,
+    'str': str,
+    'tuple': tuple
+}
+
+STATIC_PARSE_OPERATORS = {
+    ast.Add: lambda a, b: a + b,
+    ast.Sub: lambda a, b: a - b,
+    ast.Mult: lambda a, b: a * b,
+    ast.Div: lambda a, b: a / b,
+    ast.FloorDiv: lambda a, b: a // b,
+    ast.Mod: lambda a, b: a % b,
+    ast.Pow: lambda a, b: a ** b,
+    ast.USub: lambda a: -a,
+    ast.UAdd: lambda a: +a,
+    ast.Not: lambda a: not a
+}
+
+STATIC_PARSE_METHODS = ['format', 'join', 'upper', 'lower', 'capitalize', 'title']
+
+
+class StaticParseError(Exception):
+    """The information can't be determined without loading the module."""
+
+
+class StaticInformationParser:
+    """
+    Evaluate a module's top-level information dictionary from its source, without executing it
+
+    Supports literals, names assigned at the top level of the module, names imported from
+    STATIC_PARSE_IMPORTS, and calls of lazy_gettext(), str.format(), etc. Anything else (e.g.
+    functions defined in the module, or names that are modified after they're assigned) raises
+    StaticParseError, and the module needs to be loaded.
+    """
+    def __init__(self, source, path_file='<module>'):
+        self.tree = ast.parse(source, filename=path_file)
+        self.assignments = {}
+        self.assigned_twice = set()
+        self.imports = {}
+        self.values = {}
+        self.evaluating = set()
+        self.dependencies = set()
+
+        for each_stmt in self.tree.body:
+            if isinstance(each_stmt, ast.ImportFrom) and each_stmt.module and not each_stmt.level:
+                for each_alias in each_stmt.names:
+                    self.imports[each_alias.asname or each_alias.name] = (each_stmt.module, each_alias.name)
+            elif isinstance(each_stmt, (ast.Assign, ast.AnnAssign)):
+                targets = each_stmt.targets if isinstance(each_stmt, ast.Assign) else [each_stmt.target]
+                for each_target in targets:
+                    if isinstance(each_target, ast.Name) and each_stmt.value is not None:
+                        if each_target.id in self.assignments:
+                            self.assigned_twice.add(each_target.id)
+                        self.assignments[each_target.id] = each_stmt
+
+    def evaluate(self, name):
+        """Return the value assigned to a top-level name."""
+        if name not in self.assignments:
+            raise StaticParseError(f"'{name}' is not assigned at the top level")
+        value = self.evaluate_name(name)
+        self.check_not_modified()
+        return value
+
+    def has_assignment(self, name):
+        return name in self.assignments
+
+    def check_not_modified(self):
+        """Raise if top-level code (other than the assignments used) refers to names that were used."""
+        used_statements = {id(self.assignments[each_name]) for each_name in self.dependencies}
+        for each_stmt in self.tree.body:
+            if (id(each_stmt) in used_statements or
+                    isinstance(each_stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef,
+                                           ast.Import, ast.ImportFrom))):
+                continue
+            for each_node in ast.walk(each_stmt):
+                if isinstance(each_node, ast.Name) and each_node.id in self.dependencies:
+                    raise StaticParseError(f"'{each_node.id}' is used by other top-level code")
+
+    def evaluate_name(self, name):
+        if name in self.values:
+            return self.values[name]
+
+        if name in self.assignments:
+            if name in self.assigned_twice:
+                raise StaticParseError(f"'{name}' is assigned more than once")
+            if name in self.evaluating:
+                raise StaticParseError(f"'{name}' refers to itself")
+            self.evaluating.add(name)
+            self.dependencies.add(name)
+            value = self.evaluate_node(self.assignments[name].value)
+            self.evaluating.discard(name)
+        elif name in self.imports:
+            module_name, attribute = self.imports[name]
+            if module_name not in STATIC_PARSE_IMPORTS:
+                raise StaticParseError(f"'{name}' is imported from {module_name}")
+            try:
+                value = getattr(importlib.import_module(module_name), attribute)
+            except Exception as err:
+                raise StaticParseError(f"Could not import '{name}' from {module_name}: {err}")
+        elif name in STATIC_PARSE_BUILTINS:
+            value = STATIC_PARSE_BUILTINS[name]
+        else:
+            raise StaticParseError(f"'{name}' is not defined at the top level")
+
+        self.values[name] = value
+        return value
+
+    def evaluate_node(self, node):
+        if isinstance(node, ast.Constant):
+            return node.value
+        elif isinstance(node, ast.Name):
+            return self.evaluate_name(node.id)
+        elif isinstance(node, ast.Dict):
+            if None in node.keys:
+                raise StaticParseError("Dictionary unpacking is not supported")
+            return {self.evaluate_node(k): self.evaluate_node(v) for k, v in zip(node.keys, node.values)}
+        elif isinstance(node, ast.List):
+            return [self.evaluate_node(each_elt) for each_elt in node.elts]
+        elif isinstance(node, ast.Tuple):
+            return tuple(self.evaluate_node(each_elt) for each_elt in node.elts)
+        elif isinstance(node, ast.Set):
+            return {self.evaluate_node(each_elt) for each_elt in node.elts}
+        elif isinstance(node, ast.BinOp) and type(node.op) in STATIC_PARSE_OPERATORS:
+            return STATIC_PARSE_OPERATORS[type(node.op)](
+                self.evaluate_node(node.left), self.evaluate_node(node.right))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in STATIC_PARSE_OPERATORS:
+            return STATIC_PARSE_OPERATORS[type(node.op)](self.evaluate_node(node.operand))
+        elif isinstance(node, ast.Subscript):
+            container = self.evaluate_node(node.value)
+            if not isinstance(container, (dict, list, tuple, str)):
+                raise StaticParseError("Only dictionaries, lists, tuples, and strings can be subscripted")
+            return container[self.evaluate_node(node.slice)]
+        elif isinstance(node, ast.JoinedStr):
+            return ''.join(str(self.evaluate_node(each_value)) for each_value in node.values)
+        elif isinstance(node, ast.FormattedValue):
+            value = self.evaluate_node(node.value)
+            if node.conversion == ord('r'):
+                value = repr(value)
+            elif node.conversion == ord('s'):
+                value = str(value)
+            elif node.conversion == ord('a'):
+                value = ascii(value)
+            format_spec = self.evaluate_node(node.format_spec) if node.format_spec else ''
+            return format(value, format_spec)
+        elif isinstance(node, ast.Call):
+            return self.evaluate_call(node)
+        raise StaticParseError(f"Unsupported expression: {type(node).__name__}")
+
+    def evaluate_call(self, node):
+        if isinstance(node.func, ast.Attribute):
+            # Methods of strings, e.g. "{}: {}".format(...)
+            obj = self.evaluate_node(node.func.value)
+            if not isinstance(obj, str) or node.func.attr not in STATIC_PARSE_METHODS:
+                raise StaticParseError(f"Unsupported method call: {node.func.attr}")
+            func = getattr(obj, node.func.attr)
+        else:
+            func = self.evaluate_node(node.func)
+            if not (func in STATIC_PARSE_BUILTINS.values() or
+                    func is collections.OrderedDict or
+                    (getattr(func, '__module__', None) or '').startswith('flask_babel')):
+                raise StaticParseError(f"Unsupported call: {ast.dump(node.func)}")
+
+        args = []
+        for each_arg in node.args:
+            if isinstance(each_arg, ast.Starred):
+                raise StaticParseError("Argument unpacking is not supported")
+            args.append(self.evaluate_node(each_arg))
+        kwargs = {}
+        for each_keyword in node.keywords:
+            if each_keyword.arg is None:
+                raise StaticParseError("Keyword argument unpacking is not supported")
+            kwargs[each_keyword.arg] = self.evaluate_node(each_keyword.value)
+        return func(*args, **kwargs)
+
+
+def parse_information_static(path_file, attribute):
+    """
+    Return a module's information dictionary without loading the module
+
+    :param path_file: path to the module file
+    :param attribute: name of the information dictionary (e.g. 'INPUT_INFORMATION')
+    :return: the dictionary, or None if the module doesn't assign the attribute
+    :raises StaticParseError: if the module needs to be loaded to determine the information
+    """
+    try:
+        with open(path_file, 'rb') as f:
+            source = f.read()
+        parser = StaticInformationParser(source, path_file)
+    except (OSError, SyntaxError, ValueError) as err:
+        raise StaticParseError(f"Could not parse {path_file}: {err}")
+
+    if not parser.has_assignment(attribute):
+        # May be assigned in another way (e.g. imported), so load the module to find out
+        raise StaticParseError(f"'{attribute}' is not assigned at the top level")
+
+    try:
+        return parser.evaluate(attribute)
+    except StaticParseError:
+        raise
+    except Exception as err:
+        raise StaticParseError(f"Could not evaluate {attribute}: {err}")
+
+
+class ModuleInformationRegistry:
+    """
+    Cache of the information dictionaries (INPUT_INFORMATION, etc.) of module files
+
+    Each module is only parsed when its file is new or has changed (by modification time
+    and size). If static_parse is enabled, the information is read from the module source
+    when possible, and the module is only loaded when it can't be. Information is also stored on disk, so a new process doesn't need to load
+    every module again. Information that references objects that can't be stored (e.g.
+    functions defined in the module itself) is only cached in memory.
+    """
+    def __init__(self, path_cache, static_parse=MODULE_INFORMATION_STATIC_PARSE):
+        self.path_cache = path_cache
+        self.static_parse = static_parse
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.disk_entries = None
+        self.disk_dirty = False
+        self.stats = {
+            'hits': 0,
+            'disk_hits': 0,
+            'static_parses': 0,
+            'loads': 0
+        }
+
+    @staticmethod
+    def file_key(path_file):
+        try:
+            stat = os.stat(path_file)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, get_language()
+
+    def _load_disk(self):
+        if self.disk_entries is not None:
+            return
+        self.disk_entries = {}
+        try:
+            with open(self.path_cache, 'rb') as f:
+                header, entries = pickle.load(f)
+            if header == cache_header():
+                self.disk_entries = entries
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.debug(f"Could not read module information cache {self.path_cache}: {traceback.format_exc()}")
+
+    def get_information(self, path_file, module_type, attribute):
+        """
+        Return the information dictionary of a module file
+
+        :param path_file: path to the module file
+        :param module_type: 'inputs', 'outputs', 'functions', 'actions', or 'widgets'
+        :param attribute: name of the information dictionary (e.g. 'INPUT_INFORMATION')
+        :return: dict, or None if the module couldn't be loaded or doesn't have the attribute
+        """
+        key = self.file_key(path_file)
+        cache_id = (path_file, attribute)
+
+        with self.lock:
+            entry = self.entries.get(cache_id)
+            if entry is not None and entry[0] == key:
+                self.stats['hits'] += 1
+                return entry[1]
+
+            self._load_disk()
+            disk_entry = self.disk_entries.get(cache_id)
+            if disk_entry is not None and disk_entry[0] == key:
+                try:
+                    information = pickle.loads(disk_entry[1])
+                    self.entries[cache_id] = (key, information)
+                    self.stats['disk_hits'] += 1
+                    return information
+                except Exception:
+                    logger.debug(f"Could not read cached information of {path_file}")
+
+            information = self.parse_information(path_file, module_type, attribute)
+            self.entries[cache_id] = (key, information)
+
+            try:
+                self.disk_entries[cache_id] = (key, dumps_information(information))
+            except Exception:
+                self.disk_entries.pop(cache_id, None)
+            self.disk_dirty = True
+            return information
+
+    def parse_information(self, path_file, module_type, attribute):
+        """Read the information from the module's source if possible, otherwise load the module."""
+        if self.static_parse:
+            try:
+                information = parse_information_static(path_file, attribute)
+                self.stats['static_parses'] += 1
+                return information
+            except StaticParseError as err:
+                logger.debug(f"Loading {path_file} to determine {attribute}: {err}")
+
+        module_loaded, status = load_module_from_file(path_file, module_type)
+        self.stats['loads'] += 1
+        return getattr(module_loaded, attribute, None) if module_loaded else None
+
+    def save(self):
+        """Write new or changed information to the disk cache."""
+        with self.lock:
+            if not self.disk_dirty:
+                return
+            self.disk_dirty = False
+            try:
+                os.makedirs(os.path.dirname(self.path_cache), exist_ok=True)
+                path_tmp = f"{self.path_cache}.{os.getpid()}.tmp"
+                with open(path_tmp, 'wb') as f:
+                    pickle.dump((cache_header(), self.disk_entries), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(path_tmp, self.path_cache)
+            except Exception:
+                logger.debug(f"Could not write module information cache {self.path_cache}: {traceback.format_exc()}")
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.disk_entries = {}
+            self.disk_dirty = True
+
+
+class _InformationPickler(pickle.Pickler):
+    """Pickler that refuses functions and classes that can't be found without importing a module."""
+    def reducer_override(self, obj):
+        if isinstance(obj, (types.FunctionType, type)):
+            module = sys.modules.get(getattr(obj, '__module__', None))
+            found = module
+            for each_name in getattr(obj, '__qualname__', '').split('.'):
+                found = getattr(found, each_name, None)
+            if found is not obj:
+                raise pickle.PicklingError(f"{obj!r} is only available by loading its module")
+        return NotImplemented
+
+
+def dumps_information(information):
+    f = io.BytesIO()
+    _InformationPickler(f, protocol=pickle.HIGHEST_PROTOCOL).dump(information)
+    return f.getvalue()
+
+
+def cache_header():
+    return MYCODO_VERSION, sys.version_info[:2]
+
+
+def get_language():
+    """Return the language of the current request (module information may contain translated text)."""
+    try:
+        from flask_babel import get_locale
+        locale = get_locale()
+        return str(locale) if locale else None
+    except Exception:
+        return None
+
+
+def get_module_cache_path():
+    """Return the cache file, shared by the daemon and frontend (save() replaces it atomically)."""
+    return os.path.join(PATH_MODULE_INFORMATION_CACHE, 'module_information.pickle')
+
+
+module_information_registry = ModuleInformationRegistry(get_module_cache_path())
+
+
+def load_module_information(path_file, module_type, attribute):
+    """
+    Return an object with the module's information dictionary as an attribute (or None)
+
+    The returned object can be used in place of the loaded module to read the information
+    dictionary (e.g. module_info.INPUT_INFORMATION), which must not be modified.
+    """
+    information = module_information_registry.get_information(path_file, module_type, attribute)
+    if information is None:
+        return None
+    return types.SimpleNamespace(**{attribute: information})
+
+
+def save_module_information():
+    module_information_registry.save()
@@ -0,0 +1,80 @@
+# coding=utf-8
+"""
+Index of MQTT topic filters, to find the subscriptions a received topic matches.
+
+Topic filters without wildcards are found with a single dict lookup. Filters with
+wildcards ('+' matches one topic level, '#' matches any remaining levels) are held
+in a tree of topic levels, and the result of matching each received topic against
+them is remembered, so a listener receiving messages on hundreds of topics doesn't
+compare every topic with every filter.
+"""
+
+# Received topics whose wildcard matches are remembered
+TOPIC_MATCH_CACHE_SIZE = 4096
+
+
+def topic_has_wildcard(topic_filter):
+    return '+' in topic_filter or '#' in topic_filter
+
+
+class TopicIndex:
+    """
+    Subscriptions (e.g. Input channels) by MQTT topic filter
+
+    :param subscriptions: dict of {key: topic filter}
+    """
+    def __init__(self, subscriptions, cache_size=TOPIC_MATCH_CACHE_SIZE):
+        self.exact = {}
+        self.tree = {}
+        self.cache = {}
+        self.cache_size = cache_size
+        self.topic_filters = []
+
+        for key, topic_filter in subscriptions.items():
+            if not topic_filter:
+                continue
+            if topic_filter not in self.topic_filters:
+                self.topic_filters.append(topic_filter)
+            if not topic_has_wildcard(topic_filter):
+                self.exact.setdefault(topic_filter, []).append(key)
+                continue
+            node = self.tree
+            for each_level in topic_filter.split('/'):
+                node = node.setdefault(each_level, {})
+            node.setdefault(None, []).append(key)  # None holds the keys of filters ending here
+
+    def filters(self):
+        """Return the topic filters to subscribe to, without duplicates."""
+        return list(self.topic_filters)
+
+    def match(self, topic):
+        """Return the keys of the subscriptions whose topic filter matches a received topic."""
+        if not self.tree:
+            return self.exact.get(topic, [])
+
+        keys = self.cache.get(topic)
+        if keys is None:
+            keys = list(self.exact.get(topic, []))
+            levels = topic.split('/')
+            # Wildcards don't match topics beginning with '$' (e.g. $SYS) at the first level
+            self._match_levels(self.tree, levels, 0, keys, levels[0].startswith('$'))
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[topic] = keys
+        return keys
+
+    def _match_levels(self, node, levels, index, keys, system_topic):
+        if '#' in node and not (index == 0 and system_topic):
+            # '#' also matches the parent level (e.g. 'a/#' matches 'a')
+            keys.extend(key for key in node['#'].get(None, []) if key not in keys)
+
+        if index == len(levels):
+            keys.extend(key for key in node.get(None, []) if key not in keys)
+            return
+
+        child = node.get(levels[index])
+        if child is not None and levels[index] not in ('+', '#'):
+            self._match_levels(child, levels, index + 1, keys, system_topic)
+        child = node.get('+')
+        if child is not None and not (index == 0 and system_topic):
+            self._match_levels(child, levels, index + 1, keys, system_topic)
@@ -25,7 +25,8 @@ import os
 
 from mycodo.config import PATH_OUTPUTS
 from mycodo.config import PATH_OUTPUTS_CUSTOM
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import (load_module_information,
+                                  save_module_information)
 
 logger = logging.getLogger("mycodo.utils.outputs")
 
@@ -68,7 +69,7 @@ def parse_output_information(exclude_custom=False):
                 continue
 
             full_path = "{}/{}".format(real_path, each_file)
-            output_custom, status = load_module_from_file(full_path, 'outputs')
+            output_custom = load_module_information(full_path, 'outputs', 'OUTPUT_INFORMATION')
 
             if not output_custom or not hasattr(output_custom, 'OUTPUT_INFORMATION'):
                 continue
@@ -145,6 +146,8 @@ def parse_output_information(exclude_custom=False):
             dict_outputs = dict_has_value(dict_outputs, output_custom, 'custom_commands_message')
             dict_outputs = dict_has_value(dict_outputs, output_custom, 'custom_commands')
 
+    save_module_information()
+
     return dict_outputs
 
 
@@ -187,3 +190,33 @@ def output_types():
         'value': outputs_value(),
         'volume': outputs_volume()
     }
+
+
+def output_on_duration_triggered(output_state, output_duration, amount):
+    """
+    Determine if an Output Trigger fires when its output turns on
+
+    :param output_state: the Trigger's output_state (e.g. 'on_duration_greater_than')
+    :param output_duration: the Trigger's output_duration
+    :param amount: the duration the output turned on for (0 or None if indefinitely)
+    :return: True if the Trigger's actions should be executed
+    """
+    if output_state == 'on_duration_none':
+        return amount == 0.0
+    elif output_state == 'on_duration_any':
+        return bool(amount)
+    elif output_state == 'on_duration_none_any':
+        return True
+    elif amount is None or output_duration is None:
+        return False
+    elif output_state == 'on_duration_equal':
+        return output_duration == amount
+    elif output_state == 'on_duration_greater_than':
+        return amount > output_duration
+    elif output_state == 'on_duration_equal_greater_than':
+        return amount >= output_duration
+    elif output_state == 'on_duration_less_than':
+        return amount < output_duration
+    elif output_state == 'on_duration_equal_less_than':
+        return amount <= output_duration
+    return False
@@ -0,0 +1,248 @@
+# coding=utf-8
+"""
+Simulate a PID controller with many sets of gains at once, to compare gains offline.
+
+The plant (what the PID controls) is modelled as a first-order system with dead time,
+sampled once per PID period:
+
+    y[k + 1] = a * y[k] + b * u[k] + c
+
+where u[k] is the fraction of period k the output was on (0 to 1) and the PID reads the
+value of y from delay_steps periods earlier. The model is fitted from recorded
+measurements and output durations (fit_plant()), or built from the simulated kettle of
+the PID_hirschmann simulation (kettle_plant()).
+
+All sets of gains are simulated together with NumPy arrays, following the default PID
+controller (pid_controller_default.PIDControl, without a hysteresis band, with the
+control variable being the seconds to turn the output on each period), and scored by
+the integral of absolute error (IAE), integral of squared error (ISE), overshoot and
+settling time of the plant's response to a setpoint.
+"""
+import csv
+import gzip
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from mycodo.utils.PID_hirschmann.pid_kettle import Kettle
+
+logger = logging.getLogger("mycodo.pid_sweep")
+
+PlantModel = namedtuple('PlantModel', ['a', 'b', 'c', 'delay_steps', 'sampletime'])
+
+SCORES = ['iae', 'ise', 'overshoot', 'settling_time']
+
+
+def kettle_plant(diameter, volume, heater_power, ambient_temp, sampletime,
+                 delay=0, heat_loss_factor=1, density=1):
+    """
+    Return the PlantModel of the simulated kettle (see PID_hirschmann/pid_simulation.py)
+
+    :param diameter: kettle diameter (cm)
+    :param volume: content volume (liters)
+    :param heater_power: heater power (kW), when the output is on for the whole period
+    :param ambient_temp: ambient temperature (°C)
+    :param sampletime: PID period (seconds)
+    :param delay: delay of the temperature sensor (seconds)
+    """
+    def step(temp, duty):
+        kettle = Kettle(diameter, volume, temp, density=density)
+        kettle.heat(heater_power * duty, sampletime)
+        return kettle.cool(sampletime, ambient_temp, heat_loss_factor)
+
+    # The kettle is linear, so its model is found from steps of a kettle at 0 and 1 °C
+    c = step(0, 0)
+    return PlantModel(
+        a=step(1, 0) - c,
+        b=step(0, 1) - c,
+        c=c,
+        delay_steps=max(1, round(delay / sampletime)) - 1,
+        sampletime=sampletime)
+
+
+def resample_history(measurements, output_durations, sampletime):
+    """
+    Return the measurements and the fraction of time the output was on, once per period
+
+    :param measurements: list of (timestamp, value)
+    :param output_durations: list of (timestamp the output turned on, seconds on), as
+        recorded by outputs (negative durations are treated as positive)
+    :param sampletime: PID period (seconds)
+    :return: NumPy arrays of (values, output duty), one entry per period
+    """
+    measurements = sorted((float(t), float(v)) for t, v in measurements if v is not None)
+    if len(measurements) < 2:
+        raise ValueError("At least two measurements are required")
+    times, values = np.array(measurements).T
+    edges = np.arange(times[0], times[-1], sampletime)
+    values = np.interp(edges, times, values)
+
+    # Time the output has been on since the start, at each change of the output
+    on_time = [0.0]
+    breakpoints = [edges[0]]
+    durations = sorted((float(t), abs(float(d))) for t, d in output_durations if d)
+    for index, (turned_on, duration) in enumerate(durations):
+        if index + 1 < len(durations):
+            # Outputs turned on again before turning off record two overlapping durations
+            duration = min(duration, durations[index + 1][0] - turned_on)
+        if turned_on < breakpoints[-1]:
+            duration = max(0.0, turned_on + duration - breakpoints[-1])
+            turned_on = breakpoints[-1]
+        breakpoints.extend([turned_on, turned_on + duration])
+        on_time.extend([on_time[-1], on_time[-1] + duration])
+    on_time = np.interp(np.append(edges, edges[-1] + sampletime), breakpoints, on_time)
+    return values, np.diff(on_time) / sampletime
+
+
+def fit_plant(values, duty, sampletime, max_delay=0):
+    """
+    Fit a PlantModel to values measured once per period, by least squares
+
+    :param values: values measured at the start of each period
+    :param duty: fraction of each period the output was on
+    :param sampletime: PID period (seconds)
+    :param max_delay: the longest dead time to consider (seconds)
+    """
+    values = np.asarray(values, dtype=float)
+    duty = np.asarray(duty, dtype=float)
+    best = None
+    for delay_steps in range(int(max_delay // sampletime) + 1):
+        if len(values) - delay_steps < 4:
+            break
+        # The value read at k + 1 is y[k + 1 - delay], from the output during k - delay
+        regressors = np.column_stack([
+            values[delay_steps:-1],
+            duty[:len(values) - delay_steps - 1],
+            np.ones(len(values) - delay_steps - 1)])
+        coefficients, _, rank, _ = np.linalg.lstsq(regressors, values[delay_steps + 1:], rcond=None)
+        if rank < 3:
+            raise ValueError("The output must have turned on and off while the measurements were recorded")
+        error = np.mean((regressors @ coefficients - values[delay_steps + 1:]) ** 2)
+        if best is None or error < best[0]:
+            best = (error, PlantModel(*coefficients, delay_steps, sampletime))
+    if best is None:
+        raise ValueError("Too few measurements to fit a model")
+    return best[1]
+
+
+def read_history_csv(path, measurement_column, output_column):
+    """
+    Return the measurements and output durations of a CSV (or csv.gz) measurement export
+
+    :return: (measurements, output_durations), lists of (timestamp, value)
+    """
+    opener = gzip.open if path.endswith('.gz') else open
+    measurements = []
+    output_durations = []
+    with opener(path, 'rt', newline='') as csv_file:
+        reader = csv.reader(csv_file)
+        header = next(reader)
+        measurement_index = header.index(measurement_column)
+        output_index = header.index(output_column)
+        for row in reader:
+            if row[measurement_index] != '':
+                measurements.append((float(row[0]), float(row[measurement_index])))
+            if row[output_index] != '':
+                output_durations.append((float(row[0]), float(row[output_index])))
+    return measurements, output_durations
+
+
+def parameter_grid(kp_values, ki_values, kd_values):
+    """Return arrays of (Kp, Ki, Kd) with every combination of the values."""
+    kp, ki, kd = np.meshgrid(kp_values, ki_values, kd_values, indexing='ij')
+    return kp.ravel(), ki.ravel(), kd.ravel()
+
+
+def simulate(plant, kp, ki, kd, setpoint, initial_value, steps,
+             output_max=None, direction='raise', integrator_min=-500, integrator_max=500,
+             settling_band=0.02, trajectories=False):
+    """
+    Simulate the PID with each set of gains controlling the plant
+
+    :param plant: PlantModel
+    :param kp: array of Kp, one for each simulation (as are ki and kd)
+    :param setpoint: setpoint of the PID
+    :param initial_value: value of the plant at the start
+    :param steps: number of PID periods to simulate
+    :param output_max: maximum seconds the output is on each period (default: the period)
+    :param direction: 'raise' if the output raises the value, 'lower' if it lowers it
+        (fit the plant from the lowering output)
+    :param settling_band: the response has settled once it stays within this fraction of
+        the step (setpoint - initial value) from the setpoint
+    :param trajectories: also return the measured value and output of each period
+    :return: dict of score arrays (see SCORES), and the 'values' and 'outputs' arrays of
+        shape (simulations, steps) if trajectories is True
+    """
+    kp, ki, kd = np.broadcast_arrays(*[np.asarray(gains, dtype=float) for gains in (kp, ki, kd)])
+    count = kp.size
+    if output_max is None:
+        output_max = plant.sampletime
+    step = setpoint - initial_value
+    sign = 1 if step >= 0 else -1
+    band = max(abs(step) * settling_band, 1e-9)
+
+    value = np.full(count, float(initial_value))
+    history = np.full((plant.delay_steps + 1, count), float(initial_value))
+    integrator = np.zeros(count)
+    derivator = None
+    results = {
+        'iae': np.zeros(count),
+        'ise': np.zeros(count),
+        'overshoot': np.zeros(count),
+        'last_unsettled': np.full(count, -1)
+    }
+    if trajectories:
+        results['values'] = np.empty((count, steps))
+        results['outputs'] = np.empty((count, steps))
+
+    for index in range(steps):
+        history[index % len(history)] = value
+        measured = history[(index + 1) % len(history)]
+
+        error = setpoint - measured
+        integrator = np.clip(integrator + error, integrator_min, integrator_max)
+        if derivator is None:
+            derivator = error  # Prevent large initial D-value
+        control_variable = kp * error + ki * integrator + kd * (error - derivator)
+        derivator = error
+
+        if direction == 'raise':
+            seconds_on = np.clip(control_variable, 0, output_max)
+        else:
+            seconds_on = np.clip(-control_variable, 0, output_max)
+        value = plant.a * value + plant.b * (seconds_on / plant.sampletime) + plant.c
+
+        error = setpoint - value
+        results['iae'] += np.abs(error) * plant.sampletime
+        results['ise'] += error ** 2 * plant.sampletime
+        np.maximum(results['overshoot'], -sign * error, out=results['overshoot'])
+        results['last_unsettled'][np.abs(error) > band] = index
+        if trajectories:
+            results['values'][:, index] = measured
+            results['outputs'][:, index] = seconds_on
+
+    last_unsettled = results.pop('last_unsettled')
+    results['settling_time'] = np.where(
+        last_unsettled == steps - 1, np.inf, (last_unsettled + 1) * plant.sampletime)
+    return results
+
+
+def sweep(plant, kp_values, ki_values, kd_values, setpoint, initial_value, steps,
+          rank_by='iae', top=10, **kwargs):
+    """
+    Simulate every combination of the gains and return the best
+
+    :param rank_by: score to rank by (see SCORES), lowest first
+    :param top: number of results to return
+    :param kwargs: options of simulate()
+    :return: list of dicts of kp, ki, kd, and each score
+    """
+    if rank_by not in SCORES:
+        raise ValueError(f"Unknown score '{rank_by}'. Options: {', '.join(SCORES)}")
+    kp, ki, kd = parameter_grid(kp_values, ki_values, kd_values)
+    scores = simulate(plant, kp, ki, kd, setpoint, initial_value, steps, **kwargs)
+    order = np.lexsort((scores['iae'], scores[rank_by]))[:top]
+    return [dict({'kp': float(kp[i]), 'ki': float(ki[i]), 'kd': float(kd[i])},
+                 **{score: float(scores[score][i]) for score in SCORES})
+            for i in order]
@@ -27,10 +27,39 @@ import os
 import re
 import string
 import sys
+import timeit
 
 logger = logging.getLogger("mycodo.utils")
 
 
+def get_numpy():
+    """Return the numpy module, or None if it isn't installed (it's an optional dependency)."""
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    return np
+
+
+def record_timing(timings, name, timer):
+    """
+    Record the duration of a timed section, started at timer (timeit.default_timer())
+
+    :param timings: dict of {name: {'count', 'last_ms', 'avg_ms', 'max_ms'}}, updated in place
+    :param name: name of the timed section
+    :return: the timing of the section, including the duration (ms) in 'last_ms'
+    """
+    duration_ms = (timeit.default_timer() - timer) * 1000
+    timing = timings.get(name)
+    if timing is None:
+        timing = timings[name] = {'count': 0, 'last_ms': 0, 'avg_ms': 0, 'max_ms': 0}
+    timing['count'] += 1
+    timing['last_ms'] = duration_ms
+    timing['avg_ms'] += (duration_ms - timing['avg_ms']) / timing['count']
+    timing['max_ms'] = max(timing['max_ms'], duration_ms)
+    return timing
+
+
 def append_to_log(log_file, str_append):
     """Write to a file. Do not use when may be executed more than once at a time."""
     if os.path.exists:
@@ -25,7 +25,8 @@ import os
 
 from mycodo.config import PATH_WIDGETS
 from mycodo.config import PATH_WIDGETS_CUSTOM
-from mycodo.utils.modules import load_module_from_file
+from mycodo.utils.modules import (load_module_information,
+                                  save_module_information)
 
 logger = logging.getLogger("mycodo.utils.widgets")
 
@@ -69,7 +70,7 @@ def parse_widget_information(exclude_custom=False):
                 continue
 
             full_path = f"{real_path}/{each_file}"
-            widget_custom, status = load_module_from_file(full_path, 'widgets')
+            widget_custom = load_module_information(full_path, 'widgets', 'WIDGET_INFORMATION')
 
             if not widget_custom or not hasattr(widget_custom, 'WIDGET_INFORMATION'):
                 continue
@@ -128,4 +129,6 @@ def parse_widget_information(exclude_custom=False):
             dict_widgets = dict_has_value(dict_widgets, widget_custom, 'widget_dashboard_js_ready')
             dict_widgets = dict_has_value(dict_widgets, widget_custom, 'widget_dashboard_js_ready_end')
 
+    save_module_information()
+
     return dict_widgets
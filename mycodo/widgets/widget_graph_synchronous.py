@@ -29,10 +29,13 @@ import re
 import flask_login
 from flask import flash
 from flask import jsonify
+from flask import request
 from flask_babel import lazy_gettext
 from flask_login import current_user
 from pytz import timezone
 
+from mycodo.config import GRAPH_DOWNSAMPLE_METHOD
+from mycodo.config import GRAPH_DOWNSAMPLE_POINTS
 from mycodo.config import THEMES_DARK
 from mycodo.databases.models import Conversion
 from mycodo.databases.models import CustomController
@@ -45,6 +48,8 @@ from mycodo.databases.models import Output
 from mycodo.databases.models import PID
 from mycodo.mycodo_flask.utils.utils_general import use_unit_generate
 from mycodo.utils.constraints_pass import constraints_pass_positive_value
+from mycodo.utils.downsample import downsample_options
+from mycodo.utils.influx import read_influxdb_downsampled
 from mycodo.utils.influx import read_influxdb_list
 from mycodo.utils.system_pi import add_custom_measurements
 from mycodo.utils.system_pi import return_measurement_info
@@ -54,7 +59,12 @@ logger = logging.getLogger(__name__)
 
 
 def past_data(unique_id, measure_type, measurement_id, past_seconds):
-    """Return data from past_seconds until present from influxdb."""
+    """
+    Return data from past_seconds until present from influxdb.
+
+    If the 'method' query argument is given (lttb, minmax, or mean), the data is
+    downsampled to about the number of points in the 'points' query argument.
+    """
     if not current_user.is_authenticated:
         return "You are not logged in and cannot access this endpoint"
     if not str_is_float(past_seconds):
@@ -108,11 +118,22 @@ def past_data(unique_id, measure_type, measurement_id, past_seconds):
                     _, unit, measurement = return_measurement_info(setpoint_measurement, conversion)
 
         try:
-            list_data = read_influxdb_list(
-                unique_id, unit,
-                channel=channel,
-                measure=measurement,
-                duration_sec=past_seconds)
+            if request.args.get('method'):
+                method, target_points = downsample_options(
+                    request.args.get('method'), request.args.get('points'))
+                end = datetime.datetime.utcnow()
+                list_data = read_influxdb_downsampled(
+                    unique_id, unit, channel,
+                    end - datetime.timedelta(seconds=float(past_seconds)), end,
+                    measure=measurement,
+                    method=method,
+                    target_points=target_points)
+            else:
+                list_data = read_influxdb_list(
+                    unique_id, unit,
+                    channel=channel,
+                    measure=measurement,
+                    duration_sec=past_seconds)
 
             if not list_data:
                 return '', 204
@@ -268,6 +289,26 @@ WIDGET_INFORMATION = {
             'name': 'X-Axis Duration (minutes)',
             'phrase': 'The x-axis duration'
         },
+        {
+            'id': 'downsample_method',
+            'type': 'select',
+            'default_value': GRAPH_DOWNSAMPLE_METHOD,
+            'options_select': [
+                ('lttb', 'LTTB (keep the shape of the data)'),
+                ('minmax', 'Min/Max (keep every minimum and maximum)'),
+                ('mean', 'Mean (average the data)')
+            ],
+            'name': 'Downsample Method',
+            'phrase': 'How to reduce the initial data to the set number of points'
+        },
+        {
+            'id': 'downsample_points',
+            'type': 'integer',
+            'default_value': GRAPH_DOWNSAMPLE_POINTS,
+            'constraints_pass': constraints_pass_positive_value,
+            'name': 'Downsample Points',
+            'phrase': 'The maximum number of points of each series to load initially'
+        },
         {
             'id': 'enable_auto_refresh',
             'type': 'bool',
@@ -582,6 +623,7 @@ WIDGET_INFORMATION = {
 
   let note_timestamps = {};
   let last_output_time_mil = {};  // Store the time (epoch) of the last data point received
+  let downsample_query = {};  // Downsampling query string of each widget, for initial data
 
   function graphMenuFunction(widget_id) {
     var x = document.getElementById("widget-graph-responsive-controls-" + widget_id);
@@ -624,7 +666,8 @@ WIDGET_INFORMATION = {
                        measurement_id,
                        past_seconds) {
     const epoch_mil = new Date().getTime();
-    const url = '/past/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + past_seconds;
+    let url = '/past/' + unique_id + '/' + measure_type + '/' + measurement_id + '/' + past_seconds;
+    if (measure_type !== 'tag' && widget_id in downsample_query) url += downsample_query[widget_id];
     const update_id = widget_id + "-" + series + "-" + unique_id + "-" + measure_type + '-' + measurement_id;
 
     $.getJSON(url,
@@ -779,6 +822,9 @@ WIDGET_INFORMATION = {
 {% set graph_function_ids = widget_options['measurements_function'] %}
 {% set graph_pid_ids = widget_options['measurements_pid'] %}
 {% set graph_note_tag_ids = widget_options['measurements_note_tag'] %}
+{% if widget_options['downsample_method'] %}
+  downsample_query['{{each_widget.unique_id}}'] = '?method={{widget_options['downsample_method']}}&points={{widget_options['downsample_points']}}';
+{% endif %}
 
   widget['{{each_widget.unique_id}}'] = new Highcharts.StockChart({
     chart : {
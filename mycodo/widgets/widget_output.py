@@ -343,34 +343,58 @@ WIDGET_INFORMATION = {
     }, period_sec * 1000);
   }
 
+  // The output states of all Output widgets are requested together, with one request
+  let output_state_queue = {};
+  let output_state_timer = null;
+
   function getGPIOStateOutput(widget_id, unique_id, channel_id) {
-    const url = '/outputstate_unique_id/' + unique_id + '/' + channel_id;
+    const key = unique_id + ',' + channel_id;
+    if (!(key in output_state_queue)) output_state_queue[key] = [];
+    output_state_queue[key].push(widget_id);
+    if (output_state_timer === null) {
+      output_state_timer = setTimeout(requestGPIOStatesOutput, 50);
+    }
+  }
+
+  function requestGPIOStatesOutput() {
+    const queue = output_state_queue;
+    output_state_queue = {};
+    output_state_timer = null;
+    const url = '/outputstates_unique_id?' + Object.keys(queue).map(key => 'output=' + encodeURIComponent(key)).join('&');
     $.getJSON(url,
-      function(state, responseText, jqXHR) {
-        if (jqXHR.status !== 204) {
-          if (state !== null) {
-            document.getElementById("container-output-" + widget_id).className = "active-background";
-            if (state !== 'off') {
-              if (state === 'on') {
-                document.getElementById("text-output-state-" + widget_id).innerHTML = '({{_('Active')}})';
-              } else {
-                document.getElementById("text-output-state-" + widget_id).innerHTML = '({{_('Active')}}, ' + state.toFixed(1) + ')';
-              }
+      function(states, responseText, jqXHR) {
+        for (const key in queue) {
+          for (const widget_id of queue[key]) {
+            if (jqXHR.status !== 204 && key in states) {
+              showGPIOStateOutput(widget_id, states[key]);
             }
             else {
-              document.getElementById("container-output-" + widget_id).className = "inactive-background";
-              document.getElementById("text-output-state-" + widget_id).innerHTML = '({{_('Inactive')}})';
+              document.getElementById("container-output-" + widget_id).className = "pause-background";
+              document.getElementById("text-output-state-" + widget_id).innerHTML = '{{_('No Connection')}}';
             }
           }
         }
-        else {
-          document.getElementById("container-output-" + widget_id).className = "pause-background";
-          document.getElementById("text-output-state-" + widget_id).innerHTML = '{{_('No Connection')}}';
-        }
       }
     );
   }
 
+  function showGPIOStateOutput(widget_id, state) {
+    if (state !== null) {
+      document.getElementById("container-output-" + widget_id).className = "active-background";
+      if (state !== 'off') {
+        if (state === 'on') {
+          document.getElementById("text-output-state-" + widget_id).innerHTML = '({{_('Active')}})';
+        } else {
+          document.getElementById("text-output-state-" + widget_id).innerHTML = '({{_('Active')}}, ' + state.toFixed(1) + ')';
+        }
+      }
+      else {
+        document.getElementById("container-output-" + widget_id).className = "inactive-background";
+        document.getElementById("text-output-state-" + widget_id).innerHTML = '({{_('Inactive')}})';
+      }
+    }
+  }
+
   function repeatGPIOStateOutput(widget_id, unique_id, channel_id, refresh_duration) {
     setInterval(function () {
       getGPIOStateOutput(widget_id, unique_id, channel_id);